@@ -52,11 +52,24 @@ from .io import (
 
 from .image import (
     union_boxes,
+    scale_box,
     crop_and_save,
     crop_page_and_save,
     compose_vertical,
     compute_smart_crop_box,
     find_footer_top_from_meta,
+    DecodedPage,
+    decode_page_image,
+    estimate_decoded_bytes,
+)
+
+from .page_store import (
+    page_store_enabled,
+    page_image_exists,
+    open_page_image,
+    open_page_for_crops,
+    page_image_size,
+    remove_raw_pages,
 )
 
 from .ocr_models import (
@@ -65,7 +78,13 @@ from .ocr_models import (
     layout_blocks_from_doc,
 )
 
+from .keyword_matcher import (
+    KeywordMatcher,
+    SECTION_MATCHER,
+)
+
 from .utils import (
+    parse_int_env,
     is_section_boundary_block,
     detect_section_boundaries,
     detect_continuation_blocks,
@@ -102,16 +121,31 @@ __all__ = [
     "JOB_META_FILENAME",
     # image
     "union_boxes",
+    "scale_box",
     "crop_and_save",
     "crop_page_and_save",
     "compose_vertical",
     "compute_smart_crop_box",
     "find_footer_top_from_meta",
+    "DecodedPage",
+    "decode_page_image",
+    "estimate_decoded_bytes",
+    # page_store
+    "page_store_enabled",
+    "page_image_exists",
+    "open_page_image",
+    "open_page_for_crops",
+    "page_image_size",
+    "remove_raw_pages",
     # ocr_models
     "get_offline_model_path",
     "get_ppstructure",
     "layout_blocks_from_doc",
+    # keyword_matcher
+    "KeywordMatcher",
+    "SECTION_MATCHER",
     # utils
+    "parse_int_env",
     "is_section_boundary_block",
     "detect_section_boundaries",
     "detect_continuation_blocks",
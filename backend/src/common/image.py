@@ -4,10 +4,13 @@ image.py - 图片处理工具
 提供图片裁剪、拼接等工具函数
 """
 
+import math
 from pathlib import Path
-from typing import Optional
+from typing import Any, Optional
 from PIL import Image
 
+from .page_store import open_page_for_crops, open_raw_page, page_image_exists
+
 
 def union_boxes(
     boxes: list[list[int]] | list[tuple[int, int, int, int]]
@@ -32,6 +35,36 @@ def union_boxes(
     return (min(xs), min(ys), max(xs), max(ys))
 
 
+def scale_box(
+    box: list[float] | tuple[float, float, float, float],
+    src_size: tuple[int, int],
+    dst_size: tuple[int, int],
+) -> tuple[int, int, int, int]:
+    """
+    把 bbox 从 src_size 坐标系映射到 dst_size 坐标系。
+
+    左上角向下取整、右下角向上取整，映射后的框覆盖原框的全部像素；
+    结果限制在 dst_size 范围内。
+
+    Args:
+        box: (x1, y1, x2, y2)
+        src_size: box 所在坐标系 (width, height)
+        dst_size: 目标坐标系 (width, height)
+
+    Returns:
+        目标坐标系中的 (x1, y1, x2, y2)
+    """
+    src_w, src_h = src_size
+    dst_w, dst_h = dst_size
+    sx = dst_w / src_w if src_w else 1.0
+    sy = dst_h / src_h if src_h else 1.0
+    x1 = max(0, min(dst_w, math.floor(float(box[0]) * sx)))
+    y1 = max(0, min(dst_h, math.floor(float(box[1]) * sy)))
+    x2 = max(0, min(dst_w, math.ceil(float(box[2]) * sx)))
+    y2 = max(0, min(dst_h, math.ceil(float(box[3]) * sy)))
+    return (x1, y1, x2, y2)
+
+
 def crop_and_save(
     img_path: Path,
     box: tuple[int, int, int, int],
@@ -48,7 +81,7 @@ def crop_and_save(
     Returns:
         实际使用的裁剪框（经过边界修正）
     """
-    with Image.open(img_path) as img:
+    with open_page_for_crops(img_path) as img:
         x1, y1, x2, y2 = box
 
         x1 = max(0, min(x1, img.width))
@@ -90,10 +123,10 @@ def crop_page_and_save(
         FileNotFoundError: 页面图片不存在时抛出
     """
     img_path = img_dir / f"{page}.png"
-    if not img_path.is_file():
+    if not page_image_exists(img_path):
         raise FileNotFoundError(img_path)
 
-    with Image.open(img_path) as img:
+    with open_page_for_crops(img_path) as img:
         x1, y1, x2, y2 = box
         x1 = max(0, min(x1, img.width))
         x2 = max(0, min(x2, img.width))
@@ -121,6 +154,61 @@ def crop_page_and_save(
     return str(rel_path), final_box
 
 
+class DecodedPage:
+    """
+    已完整解码的页面像素（numpy 数组，与 np.array(PIL.Image) 相同布局）。
+
+    由预解码阶段生成，OCR 直接使用数组，避免在持有 GPU 槽位时解码 PNG。
+    """
+
+    __slots__ = ("array", "mode", "width", "height")
+
+    def __init__(self, array: Any, mode: str, width: int, height: int) -> None:
+        self.array = array
+        self.mode = mode
+        self.width = width
+        self.height = height
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.array.nbytes)
+
+    def model_input(self) -> Any:
+        """传给 PP-StructureV3 的数组：模型按 cv2 约定把 ndarray 视为 BGR（返回视图，不复制）。"""
+        arr = self.array
+        if arr.ndim == 3 and arr.shape[2] == 3:
+            return arr[:, :, ::-1]
+        return arr
+
+
+def estimate_decoded_bytes(img_path: Path) -> int:
+    """只读取图片头，估算完整解码后的字节数（宽 x 高 x 通道数）。"""
+    raw = open_raw_page(img_path)
+    if raw is not None:
+        with raw:
+            return raw.width * raw.height * raw.channels
+    with Image.open(img_path) as img:
+        return img.width * img.height * len(img.getbands())
+
+
+def decode_page_image(img_path: Path) -> DecodedPage:
+    """
+    完整解码页面图片为 numpy 数组（PNG 的 zlib 解压在此完成）。
+
+    存在 page_N.raw 时直接复制原始像素（不解压），复制后即关闭映射。
+    """
+    import numpy as np
+
+    raw = open_raw_page(img_path)
+    if raw is not None:
+        with raw:
+            return DecodedPage(raw.array(), raw.mode, raw.width, raw.height)
+
+    with Image.open(img_path) as img:
+        img.load()
+        return DecodedPage(np.array(img), img.mode, img.width, img.height)
+
+
 def compose_vertical(images: list[Image.Image]) -> Image.Image:
     """
     将多张图片按顺序竖直拼接成一张长图。
@@ -0,0 +1,138 @@
+"""
+keyword_matcher.py - 多类别关键字匹配器
+
+部分标题、部分说明、资料分析开头等判断原本对每个版面块逐个关键字做
+`k in raw or k in compact`，再在两个文本视图上分别跑几条正则，一个块要做
+几十次子串查找。
+
+KeywordMatcher 在导入时编译一次：所有类别的关键字合并为一个字面量交替正则
+（按长度降序），一次扫描文本即得到命中的全部类别；正则类别只在该类别尚未被
+关键字命中时才匹配。返回命中类别的 frozenset，由调用方组合判断条件。
+
+重叠关键字：每次命中后从命中起点 +1 继续查找，所以起点不同的重叠关键字
+（如 "根据资料" 与 "资料分析"）都会被找到；同一起点只返回最长的关键字，
+其中包含的较短关键字的类别在编译时并入（子串闭包）。
+"""
+
+import re
+from typing import Dict, FrozenSet, Iterable, List, Mapping, Optional, Pattern, Set, Tuple, Union
+
+from .types import (
+    DATA_INTRO_KEYWORDS,
+    QUESTION_RANGE_PATTERN,
+    SECTION_HEAD_KEYWORDS,
+    SECTION_INTRO_KEYWORDS,
+    SECTION_PART_PATTERN,
+    SECTION_TITLE_PATTERN,
+)
+
+PatternSpec = Union[Pattern, Iterable[Pattern]]
+
+
+class KeywordMatcher:
+    """
+    一次扫描返回命中的全部类别。
+
+    Args:
+        keywords: {类别: 关键字列表}，同一关键字可属于多个类别
+        patterns: {类别: 正则或正则列表}，与关键字类别可以同名（任一命中即算命中）
+        compact_patterns: 正则中可能出现空白的位置都写作 \\s*（可匹配空串），
+            原文上的匹配去掉空白后仍是紧凑视图上的匹配，match_views 的正则只需
+            匹配紧凑视图
+    """
+
+    def __init__(
+        self,
+        keywords: Optional[Mapping[str, Iterable[str]]] = None,
+        patterns: Optional[Mapping[str, PatternSpec]] = None,
+        compact_patterns: bool = False,
+    ) -> None:
+        categories_of: Dict[str, Set[str]] = {}
+        for category, words in (keywords or {}).items():
+            for word in words:
+                if word:
+                    categories_of.setdefault(word, set()).add(category)
+
+        # 子串闭包：命中长关键字时，其中包含的短关键字必然也出现
+        self._keyword_categories: Dict[str, FrozenSet[str]] = {
+            word: frozenset().union(*(cats for other, cats in categories_of.items() if other in word))
+            for word in categories_of
+        }
+        ordered = sorted(categories_of, key=len, reverse=True)
+        self._keyword_re: Optional[Pattern] = (
+            re.compile("|".join(re.escape(word) for word in ordered)) if ordered else None
+        )
+
+        # 关键字不含空白时，原文中的命中在紧凑视图中必然也命中，只需扫描紧凑视图
+        self._keywords_need_raw = any(any(ch.isspace() for ch in word) for word in categories_of)
+
+        self._compact_patterns = compact_patterns
+        self._patterns: List[Tuple[str, Pattern]] = []
+        for category, spec in (patterns or {}).items():
+            for pattern in [spec] if isinstance(spec, re.Pattern) else spec:
+                self._patterns.append((category, pattern))
+
+        self.categories: FrozenSet[str] = frozenset(
+            {c for cats in categories_of.values() for c in cats} | {c for c, _ in self._patterns}
+        )
+
+    def _collect_keywords(self, text: str, hits: Set[str]) -> None:
+        keyword_re = self._keyword_re
+        if keyword_re is None:
+            return
+        match = keyword_re.search(text)
+        while match is not None:
+            hits.update(self._keyword_categories[match.group()])
+            match = keyword_re.search(text, match.start() + 1)
+
+    def _collect_patterns(self, text: str, hits: Set[str]) -> None:
+        for category, pattern in self._patterns:
+            if category not in hits and pattern.search(text) is not None:
+                hits.add(category)
+
+    def match(self, text: str) -> FrozenSet[str]:
+        """text 中命中的类别。"""
+        hits: Set[str] = set()
+        if text:
+            self._collect_keywords(text, hits)
+            self._collect_patterns(text, hits)
+        return frozenset(hits)
+
+    def match_views(self, raw: str, compact: str) -> FrozenSet[str]:
+        """
+        原始文本与紧凑文本（去全部空白）两个视图中命中的类别（并集）。
+
+        用于处理"资 料 分 析"这类空格断字的 OCR 文本；两个视图相同时只扫描一次。
+        """
+        hits: Set[str] = set()
+        views = [raw] if compact == raw else [raw, compact]
+        for text in views if self._keywords_need_raw else views[-1:]:
+            if text:
+                self._collect_keywords(text, hits)
+        for text in views[-1:] if self._compact_patterns else views:
+            if text:
+                self._collect_patterns(text, hits)
+        return frozenset(hits)
+
+
+# ============ 部分标题/说明 ============
+SECTION_TITLE = "section_title"  # "一、常识判断"
+SECTION_PART = "section_part"  # "第X部分"
+SECTION_HEAD = "section_head"  # 大题名称
+SECTION_INTRO = "section_intro"  # "本部分包括"、"每题" 等说明用语
+DATA_INTRO = "data_intro"  # 资料分析/材料类开篇提示
+QUESTION_RANGE = "question_range"  # "回答XX-XX题"
+
+SECTION_MATCHER = KeywordMatcher(
+    keywords={
+        SECTION_HEAD: SECTION_HEAD_KEYWORDS,
+        SECTION_INTRO: SECTION_INTRO_KEYWORDS,
+        DATA_INTRO: DATA_INTRO_KEYWORDS,
+    },
+    patterns={
+        SECTION_TITLE: SECTION_TITLE_PATTERN,
+        SECTION_PART: SECTION_PART_PATTERN,
+        QUESTION_RANGE: QUESTION_RANGE_PATTERN,
+    },
+    compact_patterns=True,
+)
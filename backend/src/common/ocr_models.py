@@ -4,7 +4,9 @@ ocr_models.py - OCR模型管理
 提供PaddleOCR和PP-StructureV3的单例管理
 """
 
+import hashlib
 import inspect
+import json
 import os
 import threading
 from pathlib import Path
@@ -15,6 +17,17 @@ from typing import Any, Optional
 _pipeline_cache: Optional[Any] = None
 _pipeline_lock = threading.Lock()
 _pipeline_init_error: Optional[BaseException] = None
+# 当前实例的构造参数（用于计算 OCR 结果的配置指纹）
+_pipeline_config: Optional[dict[str, Any]] = None
+
+# 表格分支开关不同的两个实例（EXAMPAPER_TABLE_PASS=conditional 时按需创建）
+PIPELINE_VARIANT_LIGHT = "light"
+PIPELINE_VARIANT_FULL = "full"
+# 高精度实例（更低的检测阈值 + 文本行方向分类，较慢；只用于可疑页面的重新识别）
+PIPELINE_VARIANT_ACCURATE = "accurate"
+PIPELINE_VARIANTS = (PIPELINE_VARIANT_LIGHT, PIPELINE_VARIANT_FULL, PIPELINE_VARIANT_ACCURATE)
+_variant_cache: dict[str, Any] = {}
+_variant_config: Optional[dict[str, Any]] = None
 
 
 def get_offline_model_path(model_name: str) -> Path:
@@ -76,12 +89,57 @@ def _clamp_batches_for_vram(det_batch: int, rec_batch: int, vram_gb: float) -> t
     return min(det_batch, max_det), min(rec_batch, max_rec)
 
 
-def _create_ppstructure() -> Any:
+def conditional_table_pass_enabled() -> bool:
+    """
+    是否按页决定表格识别（EXAMPAPER_TABLE_PASS=conditional）。
+
+    所有页面先用关闭表格分支的 light 实例识别，只有版面中有表格区域的页面再用
+    full 实例重跑。
+    """
+    return (os.getenv("EXAMPAPER_TABLE_PASS", "") or "").strip().lower() == "conditional"
+
+
+# 高精度配置：降低版面/文字检测阈值，开启文本行方向分类（仅传入构造函数支持的参数）
+_ACCURATE_KWARGS: dict[str, Any] = {
+    "use_textline_orientation": True,
+    "layout_threshold": 0.3,
+    "text_det_thresh": 0.2,
+    "text_det_box_thresh": 0.45,
+    "text_det_unclip_ratio": 2.0,
+}
+
+
+def _ppstructure_kwargs(device: str, use_table_recognition: bool) -> dict[str, Any]:
+    """
+    PPStructureV3 的公共构造参数（不含批大小等与签名相关的可选参数）。
+
+    构造实例与计算配置指纹（get_ppstructure_fingerprint）共用，两边的键保持一致。
+    """
+    # PPStructureV3 默认会加载表格/公式/图表等多套子模型，
+    # 在 Web 场景里非常吃内存。切题/资料分析主要依赖版面与文字块，
+    # 因此关闭不必要的分支以显著降低占用。
+    return {
+        "device": device,
+        "use_doc_orientation_classify": False,
+        "use_doc_unwarping": False,
+        "use_formula_recognition": False,
+        "use_chart_recognition": False,
+        "use_seal_recognition": False,
+        "use_table_recognition": use_table_recognition,
+    }
+
+
+def _create_ppstructure(use_table_recognition: Optional[bool] = None, accurate: bool = False) -> Any:
     """
     Create a new PP-StructureV3 pipeline instance.
 
     NOTE: This does not use any global cache; callers should decide whether to
     cache or pool instances.
+
+    Args:
+        use_table_recognition: Force the table branch on/off (None: follow
+            EXAMPAPER_LIGHT_TABLE)
+        accurate: Use the slower high-accuracy detection settings
     """
     from paddleocr import PPStructureV3
 
@@ -131,10 +189,9 @@ def _create_ppstructure() -> Any:
         print("[WARNING] GPU requested but not available, falling back to CPU")
         use_gpu = False
 
-    # PPStructureV3 默认会加载表格/公式/图表等多套子模型，
-    # 在 Web 场景里非常吃内存。切题/资料分析主要依赖版面与文字块，
-    # 因此关闭不必要的分支以显著降低占用。
     light_table = os.getenv("EXAMPAPER_LIGHT_TABLE", "0") == "1"
+    if use_table_recognition is not None:
+        light_table = not use_table_recognition
 
     # PaddleOCR 3.x 使用 device 参数代替 use_gpu
     if use_gpu:
@@ -183,15 +240,13 @@ def _create_ppstructure() -> Any:
         except Exception:
             pass
 
-    pp_kwargs: dict[str, Any] = {
-        "device": device,
-        "use_doc_orientation_classify": False,
-        "use_doc_unwarping": False,
-        "use_formula_recognition": False,
-        "use_chart_recognition": False,
-        "use_seal_recognition": False,
-        "use_table_recognition": not light_table,
-    }
+    pp_kwargs = _ppstructure_kwargs(device, use_table_recognition=not light_table)
+
+    global _pipeline_config
+    _pipeline_config = dict(pp_kwargs, det_batch_size=det_batch_size, rec_batch_size=rec_batch_size)
+
+    # CPU 推理线程数（OCR 进程池中每个 worker 只占用一部分核心；不影响识别结果，不计入指纹）
+    cpu_threads = _parse_batch_env("EXAMPAPER_CPU_THREADS", default=0)
 
     # 兼容旧版 PPStructureV3：仅在构造函数支持时传入批大小
     try:
@@ -200,6 +255,10 @@ def _create_ppstructure() -> Any:
             pp_kwargs["det_batch_size"] = det_batch_size
         if "rec_batch_size" in sig.parameters:
             pp_kwargs["rec_batch_size"] = rec_batch_size
+        if not use_gpu and cpu_threads > 0 and "cpu_threads" in sig.parameters:
+            pp_kwargs["cpu_threads"] = cpu_threads
+        if accurate:
+            pp_kwargs.update({k: v for k, v in _ACCURATE_KWARGS.items() if k in sig.parameters})
     except Exception:
         pass
 
@@ -210,11 +269,53 @@ def _create_ppstructure() -> Any:
         if "det_batch_size" in pp_kwargs or "rec_batch_size" in pp_kwargs:
             pp_kwargs.pop("det_batch_size", None)
             pp_kwargs.pop("rec_batch_size", None)
+            pp_kwargs.pop("cpu_threads", None)
             print(f"[WARNING] PPStructureV3 不支持 batch size 参数 ({e})，使用默认值")
             return PPStructureV3(**pp_kwargs)
         raise
 
 
+def _paddleocr_version() -> str:
+    try:
+        from importlib.metadata import version
+
+        return version("paddleocr")
+    except Exception:
+        return "unknown"
+
+
+def get_ppstructure_fingerprint() -> str:
+    """
+    PP-StructureV3 配置指纹：同一页面像素 + 相同指纹 => 相同 OCR 结果。
+
+    优先使用本进程实际构造实例时的参数；模型在其他进程加载时按环境变量推算。
+    包含 device、批大小、表格开关、内容裁剪设置和 paddleocr 版本。
+    """
+    config = _pipeline_config
+    if config is None and _variant_cache:
+        config = _variant_config
+    if config is None:
+        use_gpu = os.getenv("EXAMPAPER_USE_GPU", "1") == "1"
+        gpu_id = (os.getenv("EXAMPAPER_GPU_ID", "0") or "0").strip()
+        config = dict(
+            _ppstructure_kwargs(
+                f"gpu:{gpu_id}" if use_gpu else "cpu",
+                use_table_recognition=os.getenv("EXAMPAPER_LIGHT_TABLE", "0") != "1",
+            ),
+            det_batch_size=_parse_batch_env("EXAMPAPER_DET_BATCH_SIZE", default=2),
+            rec_batch_size=_parse_batch_env("EXAMPAPER_REC_BATCH_SIZE", default=16),
+        )
+    if conditional_table_pass_enabled():
+        config = dict(config, use_table_recognition="conditional")
+    payload = {
+        "config": config,
+        "trim_non_text_max": (os.getenv("EXAMPAPER_TRIM_NON_TEXT_CONTENT_MAX", "") or "").strip(),
+        "paddleocr": _paddleocr_version(),
+    }
+    raw = json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
 def get_ppstructure() -> Any:
     """
     获取单例 PP-StructureV3 实例（避免重复初始化）。
@@ -243,14 +344,52 @@ def get_ppstructure() -> Any:
     return _pipeline_cache
 
 
-def warmup_ppstructure() -> None:
+def get_ppstructure_variant(variant: str) -> Any:
+    """
+    获取 light（关闭表格分支）、full（开启表格分支）或 accurate（高精度）实例，首次调用时创建。
+
+    与 get_ppstructure() 的单例互相独立，每个变体各自只创建一次。
+    """
+    global _pipeline_config, _variant_config
+    if variant not in PIPELINE_VARIANTS:
+        raise ValueError(f"Unknown pipeline variant: {variant}")
+    pipeline = _variant_cache.get(variant)
+    if pipeline is not None:
+        return pipeline
+    with _pipeline_lock:
+        pipeline = _variant_cache.get(variant)
+        if pipeline is None:
+            saved = _pipeline_config
+            accurate = variant == PIPELINE_VARIANT_ACCURATE
+            pipeline = _create_ppstructure(
+                use_table_recognition=(variant != PIPELINE_VARIANT_LIGHT),
+                accurate=accurate,
+            )
+            # 变体不改变默认实例的指纹；变体的公共参数（device、批大小）单独记录
+            if _variant_config is None and not accurate:
+                _variant_config = _pipeline_config
+            _pipeline_config = saved
+            _variant_cache[variant] = pipeline
+    return pipeline
+
+
+def warmup_ppstructure(pipeline: Optional[Any] = None, sample: Optional[Any] = None) -> None:
     """
     Pre-load PP-StructureV3 weights and run a small inference once.
 
-    Use a page-like synthetic image (text-like strokes + table grid) to increase
-    the chance of triggering lazy init for common branches.
+    Without a sample, use a page-like synthetic image (text-like strokes + table
+    grid) to increase the chance of triggering lazy init for common branches.
+
+    Args:
+        pipeline: Instance to warm up (default: get_ppstructure())
+        sample: Real page input (path or ndarray) to predict on instead of the
+            synthetic image (see services/models/warmup.py)
     """
-    pipeline = get_ppstructure()
+    if pipeline is None:
+        pipeline = get_ppstructure()
+    if sample is not None:
+        pipeline.predict(sample)
+        return
 
     import tempfile
     from PIL import Image, ImageDraw
@@ -306,8 +445,10 @@ def layout_blocks_from_doc(doc: dict[str, Any]) -> list[dict[str, Any]]:
 
     parsing_list = doc.get("parsing_res_list") or []
     for blk in parsing_list:
-        # blk is a LayoutBlock object
-        if hasattr(blk, "to_dict"):
+        # blk is a LayoutBlock object (or an already-normalized dict, e.g. from the OCR process pool)
+        if isinstance(blk, dict):
+            info = blk
+        elif hasattr(blk, "to_dict"):
             info = blk.to_dict()
         else:
             info = getattr(blk, "__dict__", {})
@@ -0,0 +1,245 @@
+"""
+page_store.py - 页面原始像素存储（page_N.raw）
+
+300 DPI 页面在 Step 0 由 pix.save() 编码为 PNG，随后 OCR、题目裁剪、跨页续接、
+PageImageCache 各自再解码一次，一页要付出四次以上的 zlib 解压。
+
+启用 EXAMPAPER_PAGE_STORE=raw 后，渲染进程把 pixmap 原样写入 page_N.raw：
+
+    header : magic "EXPR", version, channels, width, height, reserved
+    pixels : height 行 x width 列 x channels 字节（RGB / 灰度，行优先，无填充）
+
+各阶段通过 mmap 读取，无需解压：RawPage.view() 是映射上的只读 numpy 视图
+（不复制），裁剪阶段用 RawPage.crop() 只复制需要的区域；预解码得到的页面
+要活过映射，array() / image() 才复制整页。PNG 在渲染后由渲染进程池异步补写
+（供归档和 HTTP 访问），不在 OCR 的关键路径上。raw 文件较大（约 20MB/页），
+全部阶段完成后由 collect_results 删除。
+"""
+
+from __future__ import annotations
+
+import logging
+import mmap
+import os
+import struct
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Iterator, List, Optional, Tuple, Union
+
+from PIL import Image
+
+MAGIC = b"EXPR"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIII")
+
+_MODES = {1: "L", 3: "RGB"}
+
+logger = logging.getLogger(__name__)
+
+
+def page_store_enabled() -> bool:
+    """是否使用原始像素存储（EXAMPAPER_PAGE_STORE=raw）。"""
+    return (os.getenv("EXAMPAPER_PAGE_STORE", "png") or "").strip().lower() == "raw"
+
+
+def raw_path_for(img_path: Path) -> Path:
+    """page_N.png -> page_N.raw"""
+    return Path(img_path).with_suffix(".raw")
+
+
+def write_raw_page(path: Path, width: int, height: int, channels: int, samples: Any) -> None:
+    """原子写入原始像素文件（samples 为 bytes / memoryview，长度 = width*height*channels）。"""
+    if channels not in _MODES:
+        raise ValueError(f"unsupported channel count: {channels}")
+    if len(samples) != width * height * channels:
+        raise ValueError("pixel buffer size does not match page dimensions")
+    path = Path(path)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, channels, width, height, 0))
+        f.write(samples)
+    os.replace(tmp, path)
+
+
+class RawPage:
+    """
+    mmap 映射的原始像素页面（只读）。
+
+    view() 与 crop() 直接读取映射：前者不复制，后者只复制裁剪区域；
+    image() / array() / read_bytes() 返回整页副本，可在 close() 之后继续使用。
+    用完即可 close()（或用作上下文管理器）。
+    """
+
+    __slots__ = ("path", "width", "height", "channels", "_mm")
+
+    def __init__(self, path: Path) -> None:
+        self.path = Path(path)
+        with self.path.open("rb") as f:
+            head = f.read(_HEADER.size)
+            if len(head) < _HEADER.size:
+                raise ValueError(f"truncated raw page: {self.path}")
+            magic, version, channels, width, height, _reserved = _HEADER.unpack(head)
+            if magic != MAGIC or version != VERSION or channels not in _MODES:
+                raise ValueError(f"not a raw page file: {self.path}")
+            if os.fstat(f.fileno()).st_size < _HEADER.size + width * height * channels:
+                raise ValueError(f"truncated raw page: {self.path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.width = width
+        self.height = height
+        self.channels = channels
+
+    def __enter__(self) -> "RawPage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """
+        释放映射（可重复调用）。
+
+        仍有 view() 得到的数组未释放时，映射在这些数组被回收后才真正解除。
+        """
+        try:
+            self._mm.close()
+        except BufferError:
+            logger.debug("raw page %s closed while views are alive", self.path)
+
+    @property
+    def mode(self) -> str:
+        return _MODES[self.channels]
+
+    @property
+    def size(self) -> Tuple[int, int]:
+        return (self.width, self.height)
+
+    def read_bytes(self) -> bytes:
+        """像素区的副本。"""
+        n = self.width * self.height * self.channels
+        with memoryview(self._mm) as view:
+            return bytes(view[_HEADER.size : _HEADER.size + n])
+
+    @property
+    def shape(self) -> Tuple[int, ...]:
+        """像素数组形状（H x W x C，灰度为 H x W）。"""
+        if self.channels == 1:
+            return (self.height, self.width)
+        return (self.height, self.width, self.channels)
+
+    @contextmanager
+    def view(self) -> Iterator[Any]:
+        """
+        映射上的只读 numpy 视图（不复制），形状见 shape。
+
+        视图及其切片只在 with 块内使用；需要保留的数据先 copy()。
+        """
+        import numpy as np
+
+        arr = np.frombuffer(self._mm, dtype=np.uint8, count=self.width * self.height * self.channels, offset=_HEADER.size)
+        try:
+            yield arr.reshape(self.shape)
+        finally:
+            del arr
+
+    def crop(self, box: Tuple[int, int, int, int]) -> Image.Image:
+        """
+        裁剪区域的 PIL 图像（与 Image.crop 相同语义：超出页面的部分填黑）。
+
+        只复制区域内的像素，不解码、不复制整页。
+        """
+        x1, y1, x2, y2 = (int(v) for v in box)
+        if x2 < x1 or y2 < y1:
+            raise ValueError(f"invalid crop box: {box}")
+        cx1, cy1 = max(0, min(x1, self.width)), max(0, min(y1, self.height))
+        cx2, cy2 = max(cx1, min(x2, self.width)), max(cy1, min(y2, self.height))
+        with self.view() as arr:
+            region = arr[cy1:cy2, cx1:cx2].copy()
+        if (cx1, cy1, cx2, cy2) == (x1, y1, x2, y2) and region.size:
+            return Image.fromarray(region)
+        out = Image.new(self.mode, (x2 - x1, y2 - y1), 0)
+        if region.size:
+            out.paste(Image.fromarray(region), (cx1 - x1, cy1 - y1))
+        return out
+
+    def image(self) -> Image.Image:
+        """PIL 图像（直接由像素构造，无需 PNG 解压；复制一次，不引用映射）。"""
+        n = self.width * self.height * self.channels
+        with memoryview(self._mm) as view:
+            return Image.frombytes(self.mode, self.size, view[_HEADER.size : _HEADER.size + n])
+
+    def array(self) -> Any:
+        """numpy 数组副本（H x W x C，或灰度 H x W）。"""
+        with self.view() as arr:
+            return arr.copy()
+
+
+def open_raw_page(img_path: Path) -> Optional[RawPage]:
+    """打开 page_N.png 对应的 raw 文件；不存在或损坏时返回 None。"""
+    raw = raw_path_for(img_path)
+    try:
+        return RawPage(raw)
+    except (FileNotFoundError, ValueError):
+        return None
+
+
+def page_image_exists(img_path: Path) -> bool:
+    """页面图片可用（PNG 或 raw 任一存在）。"""
+    return Path(img_path).is_file() or raw_path_for(img_path).is_file()
+
+
+def open_page_image(img_path: Path) -> Image.Image:
+    """
+    打开页面图片：优先 raw（无需解压），否则打开 PNG。
+
+    与 Image.open 一样可用作上下文管理器。
+    """
+    raw = open_raw_page(img_path)
+    if raw is not None:
+        with raw:
+            return raw.image()
+    return Image.open(img_path)
+
+
+def open_page_for_crops(img_path: Path) -> Union[RawPage, Image.Image]:
+    """
+    打开页面用于裁剪：优先 raw（crop() 只复制区域），否则打开 PNG。
+
+    返回值都支持 width / height / size / crop(box)，并可用作上下文管理器。
+    """
+    raw = open_raw_page(img_path)
+    if raw is not None:
+        return raw
+    return Image.open(img_path)
+
+
+def page_image_size(img_path: Path) -> Tuple[int, int]:
+    """页面尺寸 (width, height)，只读取文件头。"""
+    raw = raw_path_for(img_path)
+    if raw.is_file():
+        with raw.open("rb") as f:
+            head = f.read(_HEADER.size)
+        if len(head) == _HEADER.size:
+            magic, _version, _channels, width, height, _reserved = _HEADER.unpack(head)
+            if magic == MAGIC:
+                return (width, height)
+    with Image.open(img_path) as img:
+        return (img.width, img.height)
+
+
+def list_raw_pages(workdir: Path) -> List[Path]:
+    """试卷目录下的 page_*.raw 文件。"""
+    return sorted(Path(workdir).glob("page_*.raw"))
+
+
+def remove_raw_pages(workdir: Path) -> int:
+    """删除已有 PNG 的 raw 文件（所有阶段完成后调用），返回删除数量。"""
+    removed = 0
+    for raw in list_raw_pages(workdir):
+        if raw.with_suffix(".png").is_file():
+            try:
+                raw.unlink()
+                removed += 1
+            except OSError as e:
+                logger.warning("无法删除原始像素文件 %s: %s", raw, e)
+    return removed
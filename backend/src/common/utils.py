@@ -1,20 +1,44 @@
 """
 utils.py - 通用工具函数
 
-提供版面分析、section boundary检测等工具函数
+提供版面分析、section boundary检测、环境变量解析等工具函数
 """
 
-from typing import Any, Optional, Pattern
-from .types import (
-    QUESTION_HEAD_PATTERN,
-    SECTION_TITLE_PATTERN,
-    SECTION_PART_PATTERN,
-    SECTION_HEAD_KEYWORDS,
-    SECTION_INTRO_KEYWORDS,
-    DATA_INTRO_KEYWORDS,
-    QUESTION_RANGE_PATTERN,
+import os
+from typing import Any, Optional
+from .types import QUESTION_HEAD_PATTERN
+from .keyword_matcher import (
+    SECTION_MATCHER,
+    SECTION_TITLE,
+    SECTION_PART,
+    SECTION_HEAD,
+    SECTION_INTRO,
+    DATA_INTRO,
+    QUESTION_RANGE,
 )
 
+# 单独命中即为 section boundary 的类别：
+# 显式的大题标题（"一、常识判断"）、"第X部分"、资料分析/材料类的开篇提示、"回答XX-XX题"
+_BOUNDARY_CATEGORIES = frozenset({SECTION_TITLE, SECTION_PART, DATA_INTRO, QUESTION_RANGE})
+# 同时命中才算：带有部分说明的句子，如 "数量关系：本部分包括……"
+_SECTION_HEAD_WITH_INTRO = frozenset({SECTION_HEAD, SECTION_INTRO})
+
+
+def parse_int_env(name: str, default: int, lo: int = 1, hi: int = 256) -> int:
+    """解析整数环境变量：未设置或无效时返回默认值，超出范围时限制到 [lo, hi]。"""
+    raw = (os.getenv(name, "") or "").strip()
+    if not raw:
+        return default
+    try:
+        v = int(raw)
+        if v < lo:
+            return lo
+        if v > hi:
+            return hi
+        return v
+    except ValueError:
+        return default
+
 
 def _text_views(content: Any) -> tuple[str, str]:
     """
@@ -34,36 +58,6 @@ def _text_views(content: Any) -> tuple[str, str]:
     return raw, compact
 
 
-def _contains_in_views(texts: tuple[str, str], keywords: list[str]) -> bool:
-    """
-    检查关键词是否在任一文本视图中出现。
-    
-    Args:
-        texts: (原始文本, 紧凑文本) 元组
-        keywords: 关键词列表
-        
-    Returns:
-        是否包含任一关键词
-    """
-    raw, compact = texts
-    return any((k in raw) or (k in compact) for k in keywords)
-
-
-def _search_in_views(texts: tuple[str, str], pattern: Pattern) -> bool:
-    """
-    检查正则模式是否在任一文本视图中匹配。
-    
-    Args:
-        texts: (原始文本, 紧凑文本) 元组
-        pattern: 正则表达式模式
-        
-    Returns:
-        是否匹配
-    """
-    raw, compact = texts
-    return bool(pattern.search(raw) or pattern.search(compact))
-
-
 def is_section_boundary_block(blk: dict[str, Any]) -> bool:
     """
     判断某个版面块是否是"部分标题/说明"，如 "一、常识判断"。
@@ -80,33 +74,12 @@ def is_section_boundary_block(blk: dict[str, Any]) -> bool:
     if label in {"footer", "number", "header"}:
         return False
 
-    text = _text_views(blk.get("content"))
-    if not text[0]:
+    raw, compact = _text_views(blk.get("content"))
+    if not raw:
         return False
 
-    # 显式的大题标题，如 "一、常识判断"
-    if _search_in_views(text, SECTION_TITLE_PATTERN):
-        return True
-
-    # "第X部分" 这一类提示
-    if _search_in_views(text, SECTION_PART_PATTERN):
-        return True
-
-    # 带有部分说明的句子，如 "数量关系：本部分包括……"
-    if _contains_in_views(text, SECTION_HEAD_KEYWORDS) and _contains_in_views(
-        text, SECTION_INTRO_KEYWORDS
-    ):
-        return True
-
-    # 资料分析/材料类的开篇提示
-    if _contains_in_views(text, DATA_INTRO_KEYWORDS):
-        return True
-
-    # "回答XX-XX题" 范围提示
-    if _search_in_views(text, QUESTION_RANGE_PATTERN):
-        return True
-
-    return False
+    hits = SECTION_MATCHER.match_views(raw, compact)
+    return not hits.isdisjoint(_BOUNDARY_CATEGORIES) or _SECTION_HEAD_WITH_INTRO <= hits
 
 
 def detect_section_boundaries(blocks: list[dict[str, Any]]) -> set[int]:
@@ -5,8 +5,19 @@ Provides singleton providers for ML models used in the pipeline.
 """
 
 from .model_provider import PPStructureProvider, ThreadSafePipeline
+from .ocr_process_pool import OcrProcessPool, ocr_isolated_worker_enabled, ocr_process_pool_enabled
+from .page_scheduler import LANE_BULK, LANE_INTERACTIVE, PageScheduler, TaskSlot
+from .table_pass import ConditionalTablePipeline
 
 __all__ = [
     "PPStructureProvider",
     "ThreadSafePipeline",
+    "OcrProcessPool",
+    "ocr_process_pool_enabled",
+    "ocr_isolated_worker_enabled",
+    "PageScheduler",
+    "TaskSlot",
+    "LANE_BULK",
+    "LANE_INTERACTIVE",
+    "ConditionalTablePipeline",
 ]
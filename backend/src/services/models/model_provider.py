@@ -13,12 +13,33 @@ from __future__ import annotations
 
 import asyncio
 import functools
+import logging
 import os
 import threading
+import time
 from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, ContextManager, Optional
+from typing import Any, ContextManager, Dict, Optional
+
+from ..predict_batcher import close_predict_batchers
+from .ocr_process_pool import (
+    OcrProcessPool,
+    get_ocr_pool_size,
+    ocr_isolated_worker_enabled,
+    ocr_process_pool_enabled,
+    start_isolated_ocr_worker,
+    start_ocr_process_pool,
+)
+from .ocr_warm_worker import RemoteOcrWorker, connect_warm_ocr_worker, ocr_warm_worker_address
+from .page_scheduler import LANE_BULK, POLICIES, POLICY_WEIGHTED, PageScheduler
+from .table_pass import ConditionalTablePipeline
+from .warmup import format_startup_report, load_warm_pipeline
+
+logger = logging.getLogger(__name__)
+
+# Scheduler task for get_gpu_semaphore() callers that are not tied to a task
+SHARED_TASK_ID = "__shared__"
 
 
 class PPStructureProvider:
@@ -29,6 +50,23 @@ class PPStructureProvider:
     Uses a combination of asyncio locks (for async code) and threading
     locks (for sync inference calls).
 
+    With EXAMPAPER_TABLE_PASS=conditional the pipeline is a
+    ConditionalTablePipeline over the light/full variants (see table_pass.py).
+    Process pool and isolated workers load the same wrapper, with the full
+    variant loaded at worker startup instead of on the first table page.
+
+    With EXAMPAPER_OCR_ISOLATED=1 the pipeline is a single supervised worker
+    process (OcrProcessPool in isolated mode): predict calls that miss
+    EXAMPAPER_OCR_PREDICT_DEADLINE_S kill and re-warm the worker instead of
+    hanging the web process.
+
+    With EXAMPAPER_OCR_WORKER_ADDRESS set (manage.py with
+    EXAMPAPER_OCR_WARM_WORKER=1) the pipeline is a client of the pre-forked
+    warm worker server, which survives web-process restarts and reloads.
+
+    Warmup predicts on a real cached page (see warmup.py); the startup report
+    (import / construct / first predict) is part of get_status().
+
     Usage:
         provider = PPStructureProvider.get_instance()
         await provider.warmup()
@@ -46,6 +84,9 @@ class PPStructureProvider:
     _gpu_semaphore: Optional[threading.Semaphore] = None
     _gpu_semaphore_lock = threading.Lock()
 
+    # Fair cross-task page scheduler (process-level, alternative to the semaphore)
+    _page_scheduler: Optional[PageScheduler] = None
+
     # Lock for lazy initialization of GPU executor (instance-level)
     _gpu_executor_lock = threading.Lock()
 
@@ -72,6 +113,7 @@ class PPStructureProvider:
         self._warmup_error: Optional[str] = None
         self._warmup_started_at: Optional[datetime] = None
         self._warmup_ended_at: Optional[datetime] = None
+        self._startup_report: Optional[Dict[str, Any]] = None
 
         # Initialize shared GPU semaphore if not already done
         self._init_gpu_semaphore()
@@ -90,12 +132,15 @@ class PPStructureProvider:
         """Reset the singleton instance (for testing)."""
         with cls._instance_lock:
             if cls._instance is not None:
+                close_predict_batchers(cls._instance._pipeline, cls._instance._pipeline_wrapped)
                 executor = getattr(cls._instance, "_gpu_executor", None)
                 if executor is not None:
                     try:
                         executor.shutdown(wait=False, cancel_futures=True)
                     except Exception:
                         pass
+                if isinstance(cls._instance._pipeline, OcrProcessPool):
+                    cls._instance._pipeline.close()
                 cls._instance._pipeline = None
                 cls._instance._pipeline_wrapped = None
                 cls._instance._gpu_executor = None
@@ -111,12 +156,20 @@ class PPStructureProvider:
         """
         if not self._thread_bound_predict:
             return False
+        # Process pool workers are separate processes; no thread affinity to preserve
+        if self._ocr_out_of_process():
+            return False
         try:
             gpu_concurrency = int(os.getenv("EXAMPAPER_GPU_CONCURRENCY", "1") or "1")
         except (TypeError, ValueError):
             gpu_concurrency = 1
         return gpu_concurrency <= 1
 
+    @staticmethod
+    def _ocr_out_of_process() -> bool:
+        """Whether predict runs in other processes (warm worker, CPU pool or isolated worker)."""
+        return bool(ocr_warm_worker_address()) or ocr_process_pool_enabled() or ocr_isolated_worker_enabled()
+
     def _ensure_gpu_executor(self) -> ThreadPoolExecutor:
         """
         Ensure GPU executor is created (thread-safe lazy initialization).
@@ -193,6 +246,15 @@ class PPStructureProvider:
                 self._warmup_ended_at.isoformat() if self._warmup_ended_at else None
             ),
             "pipeline_loaded": self._pipeline is not None,
+            "ocr_process_pool": (
+                self._pipeline.stats() if isinstance(self._pipeline, OcrProcessPool) else None
+            ),
+            "table_pass": (
+                self._pipeline.stats()
+                if isinstance(self._pipeline, ConditionalTablePipeline)
+                else None
+            ),
+            "startup": self._startup_report,
         }
 
     async def warmup(self, force: bool = False) -> bool:
@@ -211,32 +273,60 @@ class PPStructureProvider:
 
             self._warmup_started_at = datetime.now()
             self._warmup_error = None
+            # Predict batchers keep their pipeline alive; close them once it is swapped out
+            old_pipelines = (self._pipeline, self._pipeline_wrapped)
 
             try:
-                # Import and initialize PP-StructureV3
-                from ...common.ocr_models import get_ppstructure, warmup_ppstructure
+                t_start = time.perf_counter()
+                if self._ocr_out_of_process():
+                    # Warm worker: connect to the pre-forked server (model already loaded
+                    # unless it is still starting); CPU-only: N worker processes, each with
+                    # its own model instance; isolated: one supervised worker on the
+                    # configured device
+                    old_pipeline = self._pipeline
+                    if ocr_warm_worker_address():
+                        start = connect_warm_ocr_worker
+                    elif ocr_process_pool_enabled():
+                        start = start_ocr_process_pool
+                    else:
+                        start = start_isolated_ocr_worker
+                    self._pipeline = await asyncio.to_thread(start)
+                    await asyncio.to_thread(
+                        close_predict_batchers, *(p for p in old_pipelines if p is not self._pipeline)
+                    )
+                    if isinstance(old_pipeline, OcrProcessPool):
+                        await asyncio.to_thread(old_pipeline.close)
+                    self._pipeline_wrapped = None
+                    self._gpu_thread_ident = None
+                    self._record_startup(self._pipeline, None, time.perf_counter() - t_start)
+                    self._ready = True
+                    self._warmup_ended_at = datetime.now()
+                    return True
 
                 # IMPORTANT:
-                # Keep get_ppstructure() + warmup_ppstructure() on the SAME OS thread.
+                # Keep model construction + warmup predict on the SAME OS thread.
                 # Two separate asyncio.to_thread() calls are not guaranteed to reuse the same thread.
-                def _load_and_warmup() -> tuple[Any, int]:
-                    pipeline = get_ppstructure()
-                    warmup_ppstructure()
-                    return pipeline, threading.get_ident()
+                def _load_and_warmup() -> tuple[Any, Dict[str, Any], int]:
+                    pipeline, report = load_warm_pipeline()
+                    return pipeline, report, threading.get_ident()
 
                 if self._thread_bound_enabled():
                     loop = asyncio.get_running_loop()
                     executor = self._ensure_gpu_executor()
-                    pipeline, tid = await loop.run_in_executor(executor, _load_and_warmup)
+                    pipeline, report, tid = await loop.run_in_executor(executor, _load_and_warmup)
                     self._pipeline = pipeline
                     self._gpu_thread_ident = tid
                 else:
-                    pipeline, _tid = await asyncio.to_thread(_load_and_warmup)
+                    pipeline, report, _tid = await asyncio.to_thread(_load_and_warmup)
                     self._pipeline = pipeline
                     self._gpu_thread_ident = None
+                self._record_startup(pipeline, report, time.perf_counter() - t_start)
 
                 # Reset wrapped pipeline (lazy recreate with current settings)
                 self._pipeline_wrapped = None
+                await asyncio.to_thread(
+                    close_predict_batchers, *(p for p in old_pipelines if p is not self._pipeline)
+                )
 
                 self._ready = True
                 self._warmup_ended_at = datetime.now()
@@ -248,6 +338,27 @@ class PPStructureProvider:
                 self._warmup_ended_at = datetime.now()
                 return False
 
+    def _record_startup(self, pipeline: Any, report: Optional[Dict[str, Any]], wall_s: float) -> None:
+        """Keep and log the startup report (per-phase timings from the process that loaded the model)."""
+        if isinstance(pipeline, RemoteOcrWorker):
+            mode, workers = "warm_worker", [pipeline.startup_report()]
+        elif isinstance(pipeline, OcrProcessPool):
+            stats = pipeline.stats()
+            mode, workers = stats["mode"], stats["startup"]
+        else:
+            mode, workers = "in_process", [report]
+        self._startup_report = {
+            "mode": mode,
+            "wall_s": round(wall_s, 3),
+            "workers": [w for w in workers if w],
+        }
+        for worker_report in self._startup_report["workers"]:
+            logger.info(
+                "PP-StructureV3 startup %s",
+                format_startup_report(dict(worker_report, mode=mode)),
+            )
+        logger.info("PP-StructureV3 ready in %.1fs (%s)", wall_s, mode)
+
     async def ensure_ready(self) -> None:
         """
         Ensure the model is ready, warming up if necessary.
@@ -315,6 +426,38 @@ class PPStructureProvider:
         """
         return self._get_pipeline_for_inference()
 
+    def get_accurate_pipeline(self) -> Any:
+        """
+        Get the high-accuracy pipeline variant used to re-OCR suspicious pages.
+
+        The variant is loaded on first use (it is slower and only runs on the
+        few pages the quality pass flags). With thread-bound predict enabled it
+        runs on the same dedicated GPU thread as the default pipeline. With the
+        process pool or isolated worker it is loaded inside the workers.
+
+        Returns:
+            The accurate PP-StructureV3 pipeline (possibly thread-bound)
+        """
+        from ...common.ocr_models import PIPELINE_VARIANT_ACCURATE, get_ppstructure_variant
+
+        if isinstance(self._pipeline, OcrProcessPool):
+            return self._pipeline.variant(PIPELINE_VARIANT_ACCURATE)
+        if not self._thread_bound_enabled():
+            return get_ppstructure_variant(PIPELINE_VARIANT_ACCURATE)
+
+        executor = self._ensure_gpu_executor()
+        pipeline = executor.submit(get_ppstructure_variant, PIPELINE_VARIANT_ACCURATE).result()
+        if self._gpu_thread_ident is None:
+            try:
+                self._gpu_thread_ident = executor.submit(threading.get_ident).result(timeout=5)
+            except Exception:
+                self._gpu_thread_ident = None
+        return _ThreadBoundPipeline(
+            pipeline=pipeline,
+            executor=executor,
+            executor_thread_ident=self._gpu_thread_ident,
+        )
+
     @classmethod
     def _init_gpu_semaphore(cls) -> None:
         """Initialize the shared GPU semaphore from environment variable."""
@@ -325,30 +468,85 @@ class PPStructureProvider:
             if cls._gpu_semaphore is not None:
                 return
 
-            # Parse GPU_CONCURRENCY from environment (default: 1)
-            try:
-                gpu_concurrency = int(os.getenv("EXAMPAPER_GPU_CONCURRENCY", "1"))
-                gpu_concurrency = max(1, min(gpu_concurrency, 8))  # Clamp to [1, 8]
-            except (ValueError, TypeError):
-                gpu_concurrency = 1
+            cls._gpu_semaphore = threading.Semaphore(cls._inference_slots())
 
-            cls._gpu_semaphore = threading.Semaphore(gpu_concurrency)
+    @staticmethod
+    def _inference_slots() -> int:
+        """
+        Number of pages that may run inference at once.
+
+        One per OCR worker process when the process pool is enabled, otherwise
+        EXAMPAPER_GPU_CONCURRENCY (default 1, clamped to [1, 8]).
+        """
+        if ocr_process_pool_enabled():
+            return get_ocr_pool_size()
+        try:
+            gpu_concurrency = int(os.getenv("EXAMPAPER_GPU_CONCURRENCY", "1"))
+            return max(1, min(gpu_concurrency, 8))  # Clamp to [1, 8]
+        except (ValueError, TypeError):
+            return 1
 
     @classmethod
-    def get_gpu_semaphore(cls) -> threading.Semaphore:
+    def get_gpu_semaphore(
+        cls, task_id: Optional[str] = None, lane: str = LANE_BULK, weight: float = 1.0
+    ) -> Any:
         """
-        Get the shared GPU semaphore.
+        Get the inference slot handle for a task.
 
-        This semaphore should be passed to ParallelPageProcessor to
+        This handle should be passed to ParallelPageProcessor to
         ensure proper GPU concurrency control across multiple tasks.
 
+        With EXAMPAPER_PAGE_SCHEDULER=1 the page scheduler owns the inference
+        slots and this returns its TaskSlot for the task, so callers never
+        hold a second, independent limit next to it.
+
+        Args:
+            task_id: Owning task (scheduler only; untagged callers share one entry)
+            lane: LANE_INTERACTIVE or LANE_BULK (scheduler only)
+            weight: Weighted-fair share of the task within its lane (scheduler only)
+
         Returns:
-            The shared GPU semaphore instance
+            A TaskSlot of the shared page scheduler, or the shared GPU semaphore
         """
+        if cls.page_scheduler_enabled():
+            return cls.get_page_scheduler().slot(task_id or SHARED_TASK_ID, lane=lane, weight=weight)
         if cls._gpu_semaphore is None:
             cls._init_gpu_semaphore()
         return cls._gpu_semaphore
 
+    @staticmethod
+    def page_scheduler_enabled() -> bool:
+        """Whether OCR slots are granted by the fair page scheduler (EXAMPAPER_PAGE_SCHEDULER=1)."""
+        return (os.getenv("EXAMPAPER_PAGE_SCHEDULER", "0") or "").strip() == "1"
+
+    @classmethod
+    def get_page_scheduler(cls) -> PageScheduler:
+        """
+        Get the shared page scheduler.
+
+        Owns the inference slots (see _inference_slots) and grants them across
+        all active tasks (policy from EXAMPAPER_PAGE_SCHEDULER_POLICY:
+        'weighted' or 'round_robin').
+
+        Returns:
+            The shared PageScheduler instance
+        """
+        if cls._page_scheduler is None:
+            with cls._gpu_semaphore_lock:
+                if cls._page_scheduler is None:
+                    slots = cls._inference_slots()
+                    policy = (os.getenv("EXAMPAPER_PAGE_SCHEDULER_POLICY", "") or "").strip().lower()
+                    if policy not in POLICIES:
+                        policy = POLICY_WEIGHTED
+                    cls._page_scheduler = PageScheduler(slots=slots, policy=policy)
+        return cls._page_scheduler
+
+    @classmethod
+    def get_page_scheduler_stats(cls) -> Optional[dict]:
+        """Scheduler stats, or None if the scheduler has not been used."""
+        scheduler = cls._page_scheduler
+        return scheduler.stats() if scheduler is not None else None
+
     async def shutdown(self) -> None:
         """
         Shutdown the model and release resources.
@@ -356,6 +554,9 @@ class PPStructureProvider:
         Should be called on application shutdown.
         """
         async with self._warmup_lock:
+            await asyncio.to_thread(close_predict_batchers, self._pipeline, self._pipeline_wrapped)
+            if isinstance(self._pipeline, OcrProcessPool):
+                await asyncio.to_thread(self._pipeline.close)
             self._pipeline = None
             self._pipeline_wrapped = None
             self._ready = False
@@ -0,0 +1,535 @@
+"""
+Multi-process PP-StructureV3 pool for CPU-only deployments.
+
+get_ppstructure() holds one model instance per process and _ThreadBoundPipeline
+funnels every predict through one thread, so a 32-core CPU node runs a single
+page at a time. OcrProcessPool runs N worker processes, each with its own model
+instance limited to a slice of the cores:
+
+- Page images go to workers through shared memory (decoded pixels, no re-encode)
+- Workers return normalized layout blocks (plain dicts, cheap to pickle)
+- Pool size is derived from core count and available RAM unless configured
+- A worker that crashes, or misses its per-call deadline, is killed and
+  restarted (model re-loaded and warmed) and the page retried on the fresh worker
+
+The pool exposes predict(input) -> [doc] like the PP-StructureV3 pipeline, so it
+drops in behind PPStructureProvider (ExtractQuestionsStep is unchanged).
+
+Isolated mode (EXAMPAPER_OCR_ISOLATED=1) runs the same machinery with a single
+persistent, pre-warmed worker that keeps the configured device (GPU included).
+A hung Paddle call then only stalls that child process: the supervisor kills it
+when the deadline passes, so the GPU semaphore held by _GpuLockedPipeline is
+released instead of blocking every task until the web process restarts. This
+replaces the cold EXAMPAPER_STEP1_FALLBACK_SUBPROCESS fallback for step 1 with a
+warm worker behind the same IPC boundary.
+
+Configuration:
+- EXAMPAPER_OCR_PROCESS_POOL: "1" on, "auto" on when EXAMPAPER_USE_GPU=0, "0" off (default)
+- EXAMPAPER_OCR_ISOLATED: "1" runs OCR in one supervised child process (default off;
+  ignored when the CPU pool is enabled)
+- EXAMPAPER_OCR_POOL_WORKERS: fixed worker count (default: auto)
+- EXAMPAPER_OCR_POOL_THREADS: CPU threads per worker (default 4)
+- EXAMPAPER_OCR_POOL_WORKER_MB: RAM budget per worker for auto sizing (default 2500)
+- EXAMPAPER_OCR_POOL_START_TIMEOUT_S: model load timeout per worker, also applied when a
+  worker loads another variant (default 300)
+- EXAMPAPER_OCR_PREDICT_DEADLINE_S: per-page predict deadline (default 0 = none)
+- EXAMPAPER_OCR_PREDICT_RETRIES: retries on a fresh worker after a crash/timeout (default 1)
+"""
+
+from __future__ import annotations
+
+import logging
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from ...common import parse_int_env
+from ...common.perf import perf_enabled, perf_event
+
+logger = logging.getLogger(__name__)
+
+# RAM kept free for the web process, caches and page rendering when auto-sizing
+_RESERVED_RAM_MB = 2048
+_MAX_AUTO_WORKERS = 16
+
+
+def _start_timeout_s() -> float:
+    """Model load timeout per worker (startup, restart, loading another variant)."""
+    return float(parse_int_env("EXAMPAPER_OCR_POOL_START_TIMEOUT_S", 300, 10, 3600))
+
+
+def ocr_process_pool_enabled() -> bool:
+    """Whether OCR runs in the process pool (EXAMPAPER_OCR_PROCESS_POOL=1|auto)."""
+    mode = (os.getenv("EXAMPAPER_OCR_PROCESS_POOL", "0") or "").strip().lower()
+    if mode == "auto":
+        return (os.getenv("EXAMPAPER_USE_GPU", "1") or "").strip() == "0"
+    return mode == "1"
+
+
+def ocr_isolated_worker_enabled() -> bool:
+    """Whether OCR runs in a single supervised child process (EXAMPAPER_OCR_ISOLATED=1)."""
+    if ocr_process_pool_enabled():
+        return False
+    return (os.getenv("EXAMPAPER_OCR_ISOLATED", "0") or "").strip() == "1"
+
+
+def get_predict_deadline_s() -> int:
+    """Per-page predict deadline in seconds (0 = wait forever)."""
+    return parse_int_env("EXAMPAPER_OCR_PREDICT_DEADLINE_S", 0, 0, 24 * 60 * 60)
+
+
+def get_predict_retries() -> int:
+    """How many times a page is retried on a fresh worker after a crash or timeout."""
+    return parse_int_env("EXAMPAPER_OCR_PREDICT_RETRIES", 1, 0, 5)
+
+
+def _available_ram_mb() -> Optional[int]:
+    try:
+        import psutil
+
+        return int(psutil.virtual_memory().available / (1024 * 1024))
+    except Exception:
+        pass
+    try:
+        return int(os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") / (1024 * 1024))
+    except (AttributeError, ValueError, OSError):
+        return None
+
+
+def get_ocr_pool_threads() -> int:
+    """CPU threads per worker process."""
+    return parse_int_env("EXAMPAPER_OCR_POOL_THREADS", 4, 1, 64)
+
+
+def get_ocr_pool_size() -> int:
+    """
+    Number of worker processes.
+
+    EXAMPAPER_OCR_POOL_WORKERS wins; otherwise min(cores / threads per worker,
+    (available RAM - reserve) / per-worker budget), capped at 16.
+    """
+    fixed = parse_int_env("EXAMPAPER_OCR_POOL_WORKERS", 0, 0, 64)
+    if fixed > 0:
+        return fixed
+
+    cores = os.cpu_count() or 4
+    by_cpu = max(1, cores // get_ocr_pool_threads())
+
+    per_worker_mb = parse_int_env("EXAMPAPER_OCR_POOL_WORKER_MB", 2500, 256, 65536)
+    ram_mb = _available_ram_mb()
+    by_ram = by_cpu if ram_mb is None else max(1, (ram_mb - _RESERVED_RAM_MB) // per_worker_mb)
+
+    return max(1, min(by_cpu, by_ram, _MAX_AUTO_WORKERS))
+
+
+def _plain(value: Any) -> Any:
+    """numpy scalars -> Python numbers (keeps results picklable without numpy types)."""
+    return value.item() if hasattr(value, "item") else value
+
+
+def _load_worker_pipeline() -> Tuple[Any, Dict[str, Any]]:
+    """
+    The pipeline PPStructureProvider would serve in-process, warmed up, plus its startup report.
+
+    With the conditional table pass, the full variant is loaded here too: loaded
+    lazily it would be built inside the first table page's predict deadline.
+    """
+    from .warmup import load_warm_pipeline
+
+    pipeline, report = load_warm_pipeline()
+    load_full = getattr(pipeline, "load_full", None)
+    if load_full is not None:
+        t0 = time.perf_counter()
+        load_full()
+        phases = report.setdefault("phases_s", {})
+        phases["full_variant"] = round(time.perf_counter() - t0, 3)
+        report["total_s"] = round(sum(phases.values()), 3)
+    return pipeline, report
+
+
+def _serve_requests(conn: Any, pipeline: Any) -> None:
+    """Answer predict requests on conn until the parent closes it or sends None."""
+    from ...common.ocr_models import get_ppstructure_variant, layout_blocks_from_doc
+
+    while True:
+        try:
+            msg = conn.recv()
+        except (EOFError, OSError):
+            return
+        if msg is None:
+            return
+        kind, payload, variant = msg
+        try:
+            if kind == "load":
+                # Load a variant outside any predict deadline (see _Worker.ensure_variant)
+                get_ppstructure_variant(variant)
+                conn.send(("ok", []))
+                continue
+            if kind == "shm":
+                from multiprocessing import shared_memory
+
+                import numpy as np
+
+                name, shape, dtype = payload
+                shm = shared_memory.SharedMemory(name=name)
+                try:
+                    image: Any = np.ndarray(shape, dtype=dtype, buffer=shm.buf).copy()
+                finally:
+                    shm.close()
+            else:
+                image = payload
+            # Other pipeline variants (e.g. the accurate re-OCR pass) were loaded by a "load" message
+            target = pipeline if variant is None else get_ppstructure_variant(variant)
+            doc = target.predict(image)[0]
+            blocks = layout_blocks_from_doc(doc)
+            for blk in blocks:
+                blk["bbox"] = [_plain(v) for v in blk["bbox"]]
+                blk["index"] = _plain(blk["index"])
+            conn.send(("ok", blocks))
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+def _worker_main(conn: Any, worker_id: int, env: Dict[str, str]) -> None:
+    """Worker process: load one model, then serve predict requests until told to stop."""
+    os.environ.update(env)
+    try:
+        pipeline, report = _load_worker_pipeline()
+    except BaseException as e:
+        conn.send(("error", f"{type(e).__name__}: {e}"))
+        return
+    conn.send(("ready", report))
+    _serve_requests(conn, pipeline)
+
+
+class WorkerCrashed(RuntimeError):
+    """An OCR worker process died while handling a page."""
+
+    pass
+
+
+class WorkerTimeout(TimeoutError):
+    """An OCR worker did not answer within the predict deadline."""
+
+    pass
+
+
+class _Worker:
+    """Parent-side handle of one worker process."""
+
+    def __init__(self, ctx: Any, worker_id: int, env: Dict[str, str]) -> None:
+        self.worker_id = worker_id
+        self._ctx = ctx
+        self._env = env
+        self.process: Any = None
+        self.conn: Any = None
+        self.pages = 0
+        self.startup: Optional[Dict[str, Any]] = None
+        self.variants: Set[str] = set()
+
+    def spawn(self) -> None:
+        parent_conn, child_conn = self._ctx.Pipe()
+        self.process = self._ctx.Process(
+            target=_worker_main,
+            args=(child_conn, self.worker_id, self._env),
+            name=f"ocr-worker-{self.worker_id}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        self.conn = parent_conn
+
+    def wait_ready(self, timeout: float) -> None:
+        if not self.conn.poll(timeout):
+            self.kill()
+            raise TimeoutError(f"OCR worker {self.worker_id} did not load the model within {timeout:.0f}s")
+        try:
+            status, detail = self.conn.recv()
+        except (EOFError, OSError):
+            raise WorkerCrashed(f"OCR worker {self.worker_id} exited while loading the model")
+        if status != "ready":
+            self.kill()
+            raise RuntimeError(f"OCR worker {self.worker_id} failed to load the model: {detail}")
+        self.startup = detail if isinstance(detail, dict) else None
+
+    def ensure_variant(self, variant: Optional[str], timeout: float) -> None:
+        """Load a pipeline variant in the worker (model-load timeout, not the predict deadline)."""
+        if variant is None or variant in self.variants:
+            return
+        self.call(("load", None, variant), timeout=timeout)
+        self.variants.add(variant)
+
+    def call(self, msg: Tuple[str, Any, Optional[str]], timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        try:
+            self.conn.send(msg)
+            answered = timeout is None or self.conn.poll(timeout)
+            if answered:
+                status, payload = self.conn.recv()
+        except (EOFError, OSError, BrokenPipeError) as e:
+            raise WorkerCrashed(f"OCR worker {self.worker_id} crashed: {type(e).__name__}") from e
+        if not answered:
+            raise WorkerTimeout(f"OCR worker {self.worker_id} did not answer within {timeout:.0f}s")
+        if status != "ok":
+            raise RuntimeError(payload)
+        if msg[0] != "load":
+            self.pages += 1
+        return payload
+
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def stop(self, timeout: float = 5.0) -> None:
+        if self.process is None:
+            return
+        try:
+            self.conn.send(None)
+        except (OSError, BrokenPipeError):
+            pass
+        self.process.join(timeout)
+        if self.process.is_alive():
+            self.kill()
+        self._close_conn()
+
+    def kill(self) -> None:
+        if self.process is not None and self.process.is_alive():
+            self.process.kill()
+            self.process.join(5)
+        self._close_conn()
+
+    def _close_conn(self) -> None:
+        try:
+            if self.conn is not None:
+                self.conn.close()
+        except OSError:
+            pass
+
+
+class OcrProcessPool:
+    """
+    Pool of PP-StructureV3 worker processes with a pipeline-like predict().
+
+    Thread-safe: each call borrows an idle worker for the duration of one page.
+    """
+
+    def __init__(
+        self,
+        n_workers: int,
+        threads_per_worker: int = 4,
+        env: Optional[Dict[str, str]] = None,
+        deadline_s: Optional[float] = None,
+        retries: Optional[int] = None,
+        mode: str = "pool",
+    ) -> None:
+        """
+        Args:
+            n_workers: Number of worker processes
+            threads_per_worker: CPU threads per worker (CPU pool only)
+            env: Environment overrides for the workers (default: CPU-only pool settings)
+            deadline_s: Per-page predict deadline (None: EXAMPAPER_OCR_PREDICT_DEADLINE_S; 0: none)
+            retries: Retries on a fresh worker (None: EXAMPAPER_OCR_PREDICT_RETRIES)
+            mode: "pool" or "isolated" (reported in stats)
+        """
+        self._ctx = mp.get_context("spawn")
+        self._n = max(1, n_workers)
+        if env is None:
+            env = {
+                "EXAMPAPER_USE_GPU": "0",
+                "EXAMPAPER_CPU_THREADS": str(threads_per_worker),
+                "OMP_NUM_THREADS": str(threads_per_worker),
+                "MKL_NUM_THREADS": str(threads_per_worker),
+            }
+        # Workers never start pools of their own
+        self._env = dict(env, EXAMPAPER_OCR_PROCESS_POOL="0", EXAMPAPER_OCR_ISOLATED="0")
+        self._threads = threads_per_worker
+        self._deadline_s = float(get_predict_deadline_s() if deadline_s is None else deadline_s)
+        self._retries = get_predict_retries() if retries is None else max(0, retries)
+        self._mode = mode
+        self._workers: List[_Worker] = []
+        self._idle: "queue.Queue[_Worker]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._restarts = 0
+        self._timeouts = 0
+        self._closed = False
+
+    @property
+    def size(self) -> int:
+        return self._n
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        """Spawn all workers in parallel and wait until their models are loaded."""
+        if timeout is None:
+            timeout = _start_timeout_s()
+        workers = [_Worker(self._ctx, i, self._env) for i in range(self._n)]
+        for w in workers:
+            w.spawn()
+        deadline = time.monotonic() + timeout
+        errors: List[str] = []
+        for w in workers:
+            try:
+                w.wait_ready(max(1.0, deadline - time.monotonic()))
+            except Exception as e:
+                errors.append(str(e))
+                continue
+            self._workers.append(w)
+            self._idle.put(w)
+        if not self._workers:
+            raise RuntimeError(f"No OCR worker started: {'; '.join(errors)}")
+        if errors:
+            logger.warning("OCR pool started with %d/%d workers: %s", len(self._workers), self._n, errors)
+        self._n = len(self._workers)
+        logger.info("OCR process pool ready: %d workers x %d threads", self._n, self._threads)
+
+    def _restart(self, worker: _Worker, reason: str = "crashed") -> _Worker:
+        """Replace a crashed or hung worker (same slot id) and wait for its model."""
+        worker.kill()
+        fresh = _Worker(self._ctx, worker.worker_id, self._env)
+        fresh.spawn()
+        fresh.wait_ready(_start_timeout_s())
+        with self._lock:
+            self._restarts += 1
+            self._workers = [fresh if w is worker else w for w in self._workers]
+        logger.warning("OCR worker %d %s and was restarted", worker.worker_id, reason)
+        return fresh
+
+    @staticmethod
+    def _to_message(image: Any, variant: Optional[str] = None) -> Tuple[Tuple[str, Any, Optional[str]], Any]:
+        """Build the request; decoded pixels travel through shared memory."""
+        try:
+            import numpy as np
+            from multiprocessing import shared_memory
+        except ImportError:
+            return ("input", str(image) if isinstance(image, Path) else image, variant), None
+
+        if isinstance(image, (str, Path)):
+            from PIL import Image
+
+            with Image.open(image) as img:
+                # PP-StructureV3 treats ndarray input as BGR (cv2 convention)
+                image = np.asarray(img.convert("RGB"))[:, :, ::-1]
+        if not isinstance(image, np.ndarray):
+            return ("input", image, variant), None
+
+        arr = np.ascontiguousarray(image)
+        shm = shared_memory.SharedMemory(create=True, size=max(1, arr.nbytes))
+        np.ndarray(arr.shape, dtype=arr.dtype, buffer=shm.buf)[...] = arr
+        return ("shm", (shm.name, arr.shape, arr.dtype.str), variant), shm
+
+    def _predict_one(self, image: Any, variant: Optional[str] = None) -> Dict[str, Any]:
+        if self._closed:
+            raise RuntimeError("OCR process pool is closed")
+        msg, shm = self._to_message(image, variant)
+        try:
+            blocks = self.call(msg)
+        finally:
+            if shm is not None:
+                shm.close()
+                shm.unlink()
+        return {"parsing_res_list": blocks}
+
+    def call(self, msg: Tuple[str, Any, Optional[str]]) -> List[Dict[str, Any]]:
+        """Run one request message on an idle worker (deadline, restart and retries applied)."""
+        timeout = self._deadline_s if self._deadline_s > 0 else None
+        worker = self._idle.get()
+        try:
+            if not worker.alive():
+                # An earlier restart of this slot failed: bring it back before use
+                worker = self._restart(worker, "was down")
+            attempt = 0
+            while True:
+                try:
+                    worker.ensure_variant(msg[2], _start_timeout_s())
+                    blocks = worker.call(msg, timeout=timeout)
+                    break
+                except (WorkerCrashed, WorkerTimeout) as e:
+                    hung = isinstance(e, WorkerTimeout)
+                    if hung:
+                        with self._lock:
+                            self._timeouts += 1
+                    if perf_enabled():
+                        perf_event(
+                            "ocr.worker.recycle",
+                            worker=worker.worker_id,
+                            reason="timeout" if hung else "crash",
+                            attempt=attempt,
+                            deadline_s=self._deadline_s,
+                        )
+                    # Kill the hung/dead process and re-warm a fresh one; the
+                    # replacement stays in the pool even when the page gives up.
+                    # If the restart itself fails, the killed handle goes back to
+                    # the idle queue and the next call revives the slot.
+                    worker = self._restart(worker, "missed its deadline" if hung else "crashed")
+                    if attempt >= self._retries:
+                        raise
+                    attempt += 1
+        finally:
+            self._idle.put(worker)
+        return blocks
+
+    def predict(self, input: Any, variant: Optional[str] = None, **kwargs: Any) -> List[Dict[str, Any]]:
+        """Same shape as PPStructureV3.predict: a list with one doc per input page."""
+        if isinstance(input, list):
+            return [self._predict_one(item, variant) for item in input]
+        return [self._predict_one(input, variant)]
+
+    def variant(self, name: str) -> "_PoolVariant":
+        """Pipeline-like view running predict() on another model variant in the workers."""
+        return _PoolVariant(self, name)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            workers = list(self._workers)
+            restarts = self._restarts
+            timeouts = self._timeouts
+        return {
+            "mode": self._mode,
+            "workers": len(workers),
+            "alive": sum(1 for w in workers if w.alive()),
+            "idle": self._idle.qsize(),
+            "threads_per_worker": self._threads,
+            "deadline_s": self._deadline_s,
+            "restarts": restarts,
+            "timeouts": timeouts,
+            "pages": sum(w.pages for w in workers),
+            "startup": [w.startup for w in workers],
+        }
+
+    def close(self) -> None:
+        self._closed = True
+        with self._lock:
+            workers = list(self._workers)
+        for w in workers:
+            w.stop()
+
+
+class _PoolVariant:
+    """predict() on a named pipeline variant of an OcrProcessPool."""
+
+    def __init__(self, pool: OcrProcessPool, name: str) -> None:
+        self._pool = pool
+        self._name = name
+
+    def predict(self, input: Any, **kwargs: Any) -> List[Dict[str, Any]]:
+        return self._pool.predict(input, variant=self._name)
+
+
+def start_ocr_process_pool() -> OcrProcessPool:
+    """Create and start a pool sized from the environment / hardware."""
+    pool = OcrProcessPool(get_ocr_pool_size(), get_ocr_pool_threads())
+    pool.start()
+    return pool
+
+
+def start_isolated_ocr_worker() -> OcrProcessPool:
+    """
+    Start one supervised, pre-warmed OCR worker on the configured device.
+
+    The worker inherits the web process environment (GPU id, batch sizes,
+    table pass); only the per-process pool switches are turned off.
+    """
+    pool = OcrProcessPool(1, env={}, mode="isolated")
+    pool.start()
+    return pool
@@ -0,0 +1,474 @@
+"""
+Pre-forked warm OCR worker that outlives the web process.
+
+The isolated worker and the CPU pool are children of the web process, so every
+`manage.py web` restart (and every uvicorn reload) pays the full PP-StructureV3
+import, construction and first predict again. With EXAMPAPER_OCR_WARM_WORKER=1,
+manage.py instead starts one detached server process that owns a supervised,
+pre-warmed OcrProcessPool (isolated mode: deadline, kill, re-warm and retry all
+apply) and listens on a local authenticated socket. Web processes connect to it
+and send the same request messages they would send to a child worker; page
+pixels still travel through shared memory.
+
+The server is recorded in data/ocr_worker.json (address, auth key, pid and the
+PP-StructureV3 configuration fingerprint). The next `manage.py web` reuses it
+when it is alive and the fingerprint still matches, otherwise it is replaced.
+`python manage.py ocr-worker stop` shuts it down.
+
+Configuration:
+- EXAMPAPER_OCR_WARM_WORKER: "1" makes manage.py web start or reuse the server (default off)
+- EXAMPAPER_OCR_WORKER_ADDRESS / EXAMPAPER_OCR_WORKER_AUTHKEY: set by manage.py;
+  the web process connects to this server instead of starting its own workers
+- EXAMPAPER_OCR_WORKER_TIMEOUT_S: how long a web process waits for one reply
+  (default 0 = derived from the predict deadline, retries and model load timeout)
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from ...common import parse_int_env
+from .ocr_process_pool import (
+    OcrProcessPool,
+    WorkerCrashed,
+    WorkerTimeout,
+    get_predict_deadline_s,
+    get_predict_retries,
+)
+
+logger = logging.getLogger(__name__)
+
+STATE_FILENAME = "ocr_worker.json"
+
+Address = Union[Tuple[str, int], str]
+
+
+def ocr_warm_worker_requested() -> bool:
+    """Whether manage.py should start or reuse the warm worker (EXAMPAPER_OCR_WARM_WORKER=1)."""
+    return (os.getenv("EXAMPAPER_OCR_WARM_WORKER", "0") or "").strip() == "1"
+
+
+def ocr_warm_worker_address() -> Optional[str]:
+    """Address of the warm worker this process should use (EXAMPAPER_OCR_WORKER_ADDRESS)."""
+    return (os.getenv("EXAMPAPER_OCR_WORKER_ADDRESS", "") or "").strip() or None
+
+
+def _authkey_from_env() -> bytes:
+    key = (os.getenv("EXAMPAPER_OCR_WORKER_AUTHKEY", "") or "").strip()
+    if not key:
+        raise RuntimeError("EXAMPAPER_OCR_WORKER_AUTHKEY is required for the warm OCR worker")
+    return key.encode("utf-8")
+
+
+def parse_address(address: str) -> Address:
+    """"host:port" -> (host, port); anything else is a Unix socket / named pipe path."""
+    host, sep, port = address.rpartition(":")
+    if sep and port.isdigit():
+        return (host or "127.0.0.1", int(port))
+    return address
+
+
+def _start_timeout() -> float:
+    return float(parse_int_env("EXAMPAPER_OCR_POOL_START_TIMEOUT_S", 300, 10, 3600))
+
+
+def _request_timeout() -> float:
+    """
+    Client-side wait for one reply (EXAMPAPER_OCR_WORKER_TIMEOUT_S).
+
+    The default covers every attempt the server may make for a page: the predict
+    deadline (the model load timeout when there is none) plus a re-warm, per retry.
+    """
+    configured = parse_int_env("EXAMPAPER_OCR_WORKER_TIMEOUT_S", 0, 0, 24 * 60 * 60)
+    if configured > 0:
+        return float(configured)
+    per_attempt = float(get_predict_deadline_s()) or _start_timeout()
+    return (per_attempt + _start_timeout()) * (get_predict_retries() + 1)
+
+
+# =============================================================================
+# Server
+# =============================================================================
+
+
+class _WarmWorkerServer:
+    """Accepts web-process connections and forwards their requests to the warm pool."""
+
+    def __init__(self, address: str, authkey: bytes) -> None:
+        self._listener = Listener(parse_address(address), authkey=authkey)
+        self._pool = OcrProcessPool(1, env={}, mode="warm_worker")
+        self._ready = threading.Event()
+        self._error: Optional[str] = None
+        self._started = time.time()
+        self._clients = 0
+
+    def _start_pool(self) -> None:
+        try:
+            self._pool.start()
+        except Exception as e:
+            self._error = f"{type(e).__name__}: {e}"
+            logger.error("Warm OCR worker failed to start: %s", self._error)
+        self._ready.set()
+
+    def _info(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self._started, 3),
+            "clients": self._clients,
+            "pool": self._pool.stats(),
+        }
+
+    def _handle(self, conn: Any) -> None:
+        """One web process: ready handshake, then request/response until it disconnects."""
+        try:
+            self._ready.wait()
+            if self._error is not None:
+                conn.send(("error", self._error))
+                return
+            conn.send(("ready", self._info()))
+            while True:
+                try:
+                    msg = conn.recv()
+                except (EOFError, OSError):
+                    return
+                if msg is None:
+                    return
+                if msg[0] == "stats":
+                    conn.send(("ok", self._info()))
+                    continue
+                try:
+                    conn.send(("ok", self._pool.call(msg)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+        except (EOFError, OSError):
+            pass
+        finally:
+            conn.close()
+
+    def serve_forever(self) -> None:
+        threading.Thread(target=self._start_pool, name="warm-worker-start", daemon=True).start()
+        try:
+            while True:
+                try:
+                    conn = self._listener.accept()
+                except (AuthenticationError, OSError, EOFError) as e:
+                    # Failed authentication or a client that went away mid-handshake
+                    logger.warning("Rejected warm OCR worker connection: %s", e)
+                    continue
+                self._clients += 1
+                threading.Thread(target=self._handle, args=(conn,), name="warm-worker-client", daemon=True).start()
+        finally:
+            self._listener.close()
+            self._pool.close()
+
+
+def serve_warm_ocr_worker(address: str) -> None:
+    """Run the warm worker server in this process until it is terminated."""
+
+    def _terminate(signum: int, frame: Any) -> None:
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, _terminate)
+    server = _WarmWorkerServer(address, _authkey_from_env())
+    logger.info("Warm OCR worker listening on %s", address)
+    server.serve_forever()
+
+
+# =============================================================================
+# Client (web process)
+# =============================================================================
+
+
+class RemoteOcrWorker(OcrProcessPool):
+    """
+    OcrProcessPool-compatible client of the warm worker server.
+
+    The server applies the predict deadline, restarts and retries. This side
+    keeps a small pool of connections: each request borrows one (opening a new
+    one when none is idle), so concurrent pages do not wait for each other's
+    round trip, and gives up after _request_timeout(). A connection that fails
+    or times out is dropped. close() disconnects and leaves the server running.
+    """
+
+    def __init__(self, address: str, authkey: Optional[bytes] = None) -> None:
+        super().__init__(1, env={}, deadline_s=0, retries=0, mode="warm_worker")
+        self._address = address
+        self._authkey = authkey if authkey is not None else _authkey_from_env()
+        # Idle connections; the lock only guards this list, never a round trip
+        self._idle_conns: List[Any] = []
+        self._conn_lock = threading.Lock()
+        self._server_info: Optional[Dict[str, Any]] = None
+        self._pages = 0
+        self._connections = 0
+        self._dropped = 0
+
+    def _connect(self, timeout: float) -> Any:
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                conn = Client(parse_address(self._address), authkey=self._authkey)
+                break
+            except (ConnectionRefusedError, FileNotFoundError):
+                # Server still starting (manage.py just forked it)
+                if time.monotonic() >= deadline:
+                    raise RuntimeError(f"Warm OCR worker at {self._address} is not reachable")
+                time.sleep(0.5)
+        # The server answers once its model is loaded and warmed
+        if not conn.poll(max(1.0, deadline - time.monotonic())):
+            conn.close()
+            raise TimeoutError(f"Warm OCR worker at {self._address} did not become ready within {timeout:.0f}s")
+        status, detail = conn.recv()
+        if status != "ready":
+            conn.close()
+            raise RuntimeError(f"Warm OCR worker failed to load the model: {detail}")
+        with self._conn_lock:
+            self._connections += 1
+            self._server_info = detail
+        return conn
+
+    def start(self, timeout: Optional[float] = None) -> None:
+        conn = self._connect(_start_timeout() if timeout is None else timeout)
+        self._release(conn)
+        logger.info("Connected to warm OCR worker at %s (pid %s)", self._address, self._server_info.get("pid"))
+
+    def _borrow(self) -> Any:
+        with self._conn_lock:
+            if self._closed:
+                raise RuntimeError("OCR process pool is closed")
+            if self._idle_conns:
+                return self._idle_conns.pop()
+        return self._connect(_start_timeout())
+
+    def _release(self, conn: Any) -> None:
+        with self._conn_lock:
+            if not self._closed:
+                self._idle_conns.append(conn)
+                return
+        self._disconnect(conn)
+
+    @staticmethod
+    def _disconnect(conn: Any) -> None:
+        try:
+            conn.send(None)
+        except OSError:
+            pass
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+    def _request(self, msg: Tuple[str, Any, Optional[str]]) -> Any:
+        conn = self._borrow()
+        timeout = _request_timeout()
+        try:
+            conn.send(msg)
+            if not conn.poll(timeout):
+                raise WorkerTimeout(f"Warm OCR worker did not answer within {timeout:.0f}s")
+            status, payload = conn.recv()
+        except BaseException as e:
+            # The reply (if any) would arrive on a connection nobody reads: drop it
+            with self._conn_lock:
+                self._dropped += 1
+            try:
+                conn.close()
+            except OSError:
+                pass
+            if isinstance(e, (EOFError, OSError)) and not isinstance(e, WorkerTimeout):
+                raise WorkerCrashed(f"Warm OCR worker connection lost: {type(e).__name__}") from e
+            raise
+        self._release(conn)
+        if status != "ok":
+            raise RuntimeError(payload)
+        return payload
+
+    def call(self, msg: Tuple[str, Any, Optional[str]]) -> List[Dict[str, Any]]:
+        blocks = self._request(msg)
+        self._pages += 1
+        return blocks
+
+    def stats(self) -> Dict[str, Any]:
+        try:
+            server = self._request(("stats", None, None))
+        except Exception as e:
+            server = {"error": f"{type(e).__name__}: {e}"}
+        return {
+            "mode": self._mode,
+            "address": self._address,
+            "pages": self._pages,
+            "connections_opened": self._connections,
+            "connections_idle": len(self._idle_conns),
+            "connections_dropped": self._dropped,
+            "server": server,
+        }
+
+    def startup_report(self) -> Optional[Dict[str, Any]]:
+        """Startup report of the server's worker as of the connect handshake."""
+        if not self._server_info:
+            return None
+        reports = (self._server_info.get("pool") or {}).get("startup") or []
+        return reports[0] if reports else None
+
+    def close(self) -> None:
+        with self._conn_lock:
+            self._closed = True
+            conns, self._idle_conns = self._idle_conns, []
+        for conn in conns:
+            self._disconnect(conn)
+
+
+def connect_warm_ocr_worker() -> RemoteOcrWorker:
+    """Connect to the server named by EXAMPAPER_OCR_WORKER_ADDRESS (waits for its model)."""
+    address = ocr_warm_worker_address()
+    if address is None:
+        raise RuntimeError("EXAMPAPER_OCR_WORKER_ADDRESS is not set")
+    worker = RemoteOcrWorker(address)
+    worker.start()
+    return worker
+
+
+# =============================================================================
+# Lifecycle (manage.py)
+# =============================================================================
+
+
+def _state_path(data_dir: Path) -> Path:
+    return Path(data_dir) / STATE_FILENAME
+
+
+def read_worker_state(data_dir: Path) -> Optional[Dict[str, Any]]:
+    try:
+        with _state_path(data_dir).open("r", encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return state if isinstance(state, dict) else None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        import psutil
+
+        return psutil.pid_exists(pid)
+    except ImportError:
+        pass
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+    return True
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def stop_warm_ocr_worker(data_dir: Path) -> bool:
+    """Terminate the recorded server; returns False if none was running."""
+    state = read_worker_state(data_dir)
+    try:
+        _state_path(data_dir).unlink()
+    except OSError:
+        pass
+    if not state or not _pid_alive(int(state.get("pid", 0))):
+        return False
+    pid = int(state["pid"])
+    try:
+        if sys.platform == "win32":
+            subprocess.run(["taskkill", "/F", "/T", "/PID", str(pid)], capture_output=True, timeout=10)
+        else:
+            os.kill(pid, signal.SIGTERM)
+    except (OSError, subprocess.TimeoutExpired):
+        return False
+    return True
+
+
+def ensure_warm_ocr_worker(project_root: Path, data_dir: Path) -> Tuple[Dict[str, Any], bool]:
+    """
+    Reuse the recorded warm worker or start a new detached one.
+
+    Call after the environment is configured: the server inherits it, and the
+    configuration fingerprint decides whether a running server can be reused.
+
+    Returns:
+        (state, reused): state holds address / authkey / pid
+    """
+    import secrets
+
+    from ...common.ocr_models import get_ppstructure_fingerprint
+
+    fingerprint = get_ppstructure_fingerprint()
+    state = read_worker_state(data_dir)
+    if state and _pid_alive(int(state.get("pid", 0))):
+        if state.get("fingerprint") == fingerprint:
+            return state, True
+        logger.info("OCR configuration changed; replacing the warm OCR worker")
+        stop_warm_ocr_worker(data_dir)
+
+    data_dir = Path(data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    address = f"127.0.0.1:{_free_port()}"
+    authkey = secrets.token_hex(16)
+    env = dict(os.environ, EXAMPAPER_OCR_WORKER_AUTHKEY=authkey)
+    # The server owns the pool; it must not try to connect to itself
+    env.pop("EXAMPAPER_OCR_WORKER_ADDRESS", None)
+
+    popen_kwargs: Dict[str, Any] = {}
+    if sys.platform == "win32":
+        popen_kwargs["creationflags"] = subprocess.CREATE_NEW_PROCESS_GROUP | subprocess.DETACHED_PROCESS
+    else:
+        popen_kwargs["start_new_session"] = True
+    log_file = (data_dir / "ocr_worker.log").open("ab")
+    try:
+        proc = subprocess.Popen(
+            [sys.executable, "-m", "backend.src.services.models.ocr_warm_worker", "--address", address],
+            cwd=str(project_root),
+            env=env,
+            stdin=subprocess.DEVNULL,
+            stdout=log_file,
+            stderr=subprocess.STDOUT,
+            **popen_kwargs,
+        )
+    finally:
+        log_file.close()
+
+    state = {
+        "address": address,
+        "authkey": authkey,
+        "pid": proc.pid,
+        "fingerprint": fingerprint,
+        "started_at": time.time(),
+    }
+    path = _state_path(data_dir)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp, path)
+    return state, False
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Warm OCR worker server")
+    parser.add_argument("--address", required=True, help="host:port or socket path to listen on")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+    serve_warm_ocr_worker(args.address)
+
+
+if __name__ == "__main__":
+    main()
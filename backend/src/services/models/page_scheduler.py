@@ -0,0 +1,309 @@
+"""
+Process-wide page scheduler for OCR inference slots.
+
+Each ExtractQuestionsStep runs its own ParallelPageProcessor thread pool. With a
+plain shared semaphore, concurrent tasks race for the inference slot in no
+particular order, so a 200-page import can starve a 3-page manual re-run.
+
+The scheduler owns the inference slot(s) and grants them across all active
+tasks:
+- Lanes: "interactive" (manual mode) is always served before "bulk"
+- Within a lane: round-robin (least recently served task first) or weighted-fair
+  (smallest served/weight first)
+- Per-task queue depth, in-flight and served counters for diagnostics
+
+Workers keep using the semaphore protocol via TaskSlot, so _GpuLockedPipeline
+works unchanged. When the predict batcher runs pages of several tasks on one
+grant, it picks them in grant order (PageScheduler.plan) and each page is
+charged to its own task (PageScheduler.charge).
+
+Usage:
+    scheduler = PPStructureProvider.get_page_scheduler()
+    slot = scheduler.slot(task_id, lane="interactive")
+    with slot:
+        result = pipeline.predict(image)
+    scheduler.finish_task(task_id)
+"""
+
+from __future__ import annotations
+
+import itertools
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+LANE_INTERACTIVE = "interactive"
+LANE_BULK = "bulk"
+
+# Highest priority first
+LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+POLICY_ROUND_ROBIN = "round_robin"
+POLICY_WEIGHTED = "weighted"
+POLICIES = (POLICY_ROUND_ROBIN, POLICY_WEIGHTED)
+
+
+class _TaskState:
+    """Scheduling state of one task."""
+
+    __slots__ = ("task_id", "lane", "weight", "waiters", "in_flight", "served", "vtime", "last_grant")
+
+    def __init__(self, task_id: str, lane: str, weight: float) -> None:
+        self.task_id = task_id
+        self.lane = lane
+        self.weight = weight
+        self.waiters: Deque[object] = deque()
+        self.in_flight = 0
+        self.served = 0
+        # Weighted-fair virtual time: advances by 1/weight per granted page
+        self.vtime = 0.0
+        # Grant sequence number of the last page served (round-robin order)
+        self.last_grant = 0
+
+
+class PageScheduler:
+    """
+    Fair scheduler for a fixed number of inference slots shared by all tasks.
+
+    Thread-safe; acquire() blocks the calling page worker until the slot is
+    granted to it.
+    """
+
+    def __init__(self, slots: int = 1, policy: str = POLICY_WEIGHTED) -> None:
+        if policy not in POLICIES:
+            raise ValueError(f"Unknown scheduling policy: {policy}")
+        self._slots = max(1, int(slots))
+        self._free = self._slots
+        self._policy = policy
+        self._cond = threading.Condition()
+        self._tasks: Dict[str, _TaskState] = {}
+        self._grant_seq = itertools.count(1)
+        self._granted_total = 0
+
+    @property
+    def policy(self) -> str:
+        return self._policy
+
+    def _task(self, task_id: str, lane: str, weight: float) -> _TaskState:
+        """Get or register a task (caller holds the lock)."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown scheduling lane: {lane}")
+        state = self._tasks.get(task_id)
+        if state is None:
+            state = _TaskState(task_id, lane, max(0.01, float(weight)))
+            # Start newcomers at the lane's current virtual time so they get
+            # their fair share from now on instead of a catch-up burst
+            peers = [t.vtime for t in self._tasks.values() if t.lane == lane]
+            state.vtime = min(peers) if peers else 0.0
+            self._tasks[task_id] = state
+        else:
+            state.lane = lane
+            state.weight = max(0.01, float(weight))
+        return state
+
+    def _order_key(self, vtime: float, last_grant: int) -> Tuple[float, int]:
+        """Within-lane grant order of a task: smallest key first."""
+        if self._policy == POLICY_ROUND_ROBIN:
+            return (0.0, last_grant)
+        return (vtime, last_grant)
+
+    def _pick(self) -> Optional[_TaskState]:
+        """Task whose head waiter gets the next free slot (caller holds the lock)."""
+        for lane in LANES:
+            candidates = [t for t in self._tasks.values() if t.lane == lane and t.waiters]
+            if candidates:
+                return min(candidates, key=lambda t: self._order_key(t.vtime, t.last_grant))
+        return None
+
+    def plan(self, slots: Sequence["TaskSlot"]) -> List[int]:
+        """
+        Order in which the scheduler would grant one page to each handle.
+
+        Simulates successive grants (lane first, then the policy's order, with
+        vtime and last grant advancing per page) without touching any state.
+        Handles of the same task keep their relative order. The predict batcher
+        uses this to fill a batch with the pages the scheduler would serve next.
+
+        Returns:
+            Indices into slots, first grant first
+        """
+        pending: Dict[str, List[Any]] = {}
+        with self._cond:
+            tick = max((t.last_grant for t in self._tasks.values()), default=0)
+            for i, slot in enumerate(slots):
+                entry = pending.get(slot.task_id)
+                if entry is None:
+                    state = self._tasks.get(slot.task_id)
+                    if state is not None:
+                        vtime, last = state.vtime, state.last_grant
+                    else:
+                        # Same starting point _task() would give a newcomer
+                        peers = [t.vtime for t in self._tasks.values() if t.lane == slot.lane]
+                        vtime, last = (min(peers) if peers else 0.0), 0
+                    # [lane, weight, vtime, last_grant, indices]
+                    entry = [slot.lane, max(0.01, float(slot.weight)), vtime, last, deque()]
+                    pending[slot.task_id] = entry
+                entry[4].append(i)
+
+        order: List[int] = []
+        while len(order) < len(slots):
+            for lane in LANES:
+                candidates = [e for e in pending.values() if e[0] == lane and e[4]]
+                if candidates:
+                    break
+            entry = min(candidates, key=lambda e: self._order_key(e[2], e[3]))
+            order.append(entry[4].popleft())
+            entry[2] += 1.0 / entry[1]
+            tick += 1
+            entry[3] = tick
+        return order
+
+    def acquire(
+        self,
+        task_id: str,
+        lane: str = LANE_BULK,
+        weight: float = 1.0,
+        timeout: Optional[float] = None,
+    ) -> bool:
+        """
+        Block until an inference slot is granted to this task.
+
+        Args:
+            task_id: Owning task
+            lane: LANE_INTERACTIVE or LANE_BULK
+            weight: Relative share within the lane (weighted policy)
+            timeout: Seconds to wait (None waits forever)
+
+        Returns:
+            True if the slot was granted, False on timeout
+        """
+        ticket = object()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            state = self._task(task_id, lane, weight)
+            state.waiters.append(ticket)
+            while True:
+                if self._free > 0:
+                    chosen = self._pick()
+                    if chosen is state and state.waiters[0] is ticket:
+                        break
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    state.waiters.remove(ticket)
+                    # Our ticket may have been the one blocking others
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(remaining)
+
+            state.waiters.popleft()
+            self._free -= 1
+            state.in_flight += 1
+            state.served += 1
+            state.vtime += 1.0 / state.weight
+            state.last_grant = next(self._grant_seq)
+            self._granted_total += 1
+            if self._free > 0:
+                self._cond.notify_all()
+            return True
+
+    def release(self, task_id: str) -> None:
+        """Return the slot held by a page of this task."""
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is not None and state.in_flight > 0:
+                state.in_flight -= 1
+            self._free = min(self._slots, self._free + 1)
+            self._cond.notify_all()
+
+    def charge(self, task_id: str, pages: int = 1, lane: str = LANE_BULK, weight: float = 1.0) -> None:
+        """
+        Count pages against a task without taking a slot.
+
+        Cross-page batching runs several pages on one granted slot; the pages
+        that rode along on another page's grant are charged here so fairness
+        follows pages served, not grants.
+        """
+        if pages <= 0:
+            return
+        with self._cond:
+            state = self._task(task_id, lane, weight)
+            state.served += pages
+            state.vtime += pages / state.weight
+            state.last_grant = next(self._grant_seq)
+
+    def finish_task(self, task_id: str) -> None:
+        """Forget an idle task (called when its extraction step ends)."""
+        with self._cond:
+            state = self._tasks.get(task_id)
+            if state is not None and not state.waiters and state.in_flight == 0:
+                del self._tasks[task_id]
+
+    def slot(self, task_id: str, lane: str = LANE_BULK, weight: float = 1.0) -> "TaskSlot":
+        """Semaphore-compatible handle bound to one task."""
+        if lane not in LANES:
+            raise ValueError(f"Unknown scheduling lane: {lane}")
+        return TaskSlot(self, task_id, lane, weight)
+
+    def stats(self) -> Dict[str, Any]:
+        """Slot usage and per-task queue depth."""
+        with self._cond:
+            tasks: List[Dict[str, Any]] = [
+                {
+                    "task_id": t.task_id,
+                    "lane": t.lane,
+                    "weight": t.weight,
+                    "queued": len(t.waiters),
+                    "in_flight": t.in_flight,
+                    "served": t.served,
+                }
+                for t in self._tasks.values()
+            ]
+            return {
+                "policy": self._policy,
+                "slots": self._slots,
+                "free": self._free,
+                "granted_total": self._granted_total,
+                "queued": {lane: sum(t["queued"] for t in tasks if t["lane"] == lane) for lane in LANES},
+                "tasks": tasks,
+            }
+
+
+class TaskSlot:
+    """
+    threading.Semaphore-like view of the scheduler for a single task.
+
+    Passed to ParallelPageProcessor as its gpu_semaphore.
+    """
+
+    __slots__ = ("_scheduler", "task_id", "lane", "weight")
+
+    def __init__(self, scheduler: PageScheduler, task_id: str, lane: str, weight: float) -> None:
+        self._scheduler = scheduler
+        self.task_id = task_id
+        self.lane = lane
+        self.weight = weight
+
+    @property
+    def pool(self) -> PageScheduler:
+        """The scheduler whose slots this handle draws from."""
+        return self._scheduler
+
+    def charge(self, pages: int = 1) -> None:
+        """Count pages served on another handle's grant (see PageScheduler.charge)."""
+        self._scheduler.charge(self.task_id, pages, self.lane, self.weight)
+
+    def acquire(self, blocking: bool = True, timeout: Optional[float] = None) -> bool:
+        if not blocking:
+            timeout = 0.0
+        return self._scheduler.acquire(self.task_id, self.lane, self.weight, timeout=timeout)
+
+    def release(self) -> None:
+        self._scheduler.release(self.task_id)
+
+    def __enter__(self) -> "TaskSlot":
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.release()
@@ -0,0 +1,132 @@
+"""
+Conditional table recognition for PP-StructureV3.
+
+The table branch (use_table_recognition) is the heaviest part of a page
+predict, but only data-analysis pages need table structure. With
+EXAMPAPER_TABLE_PASS=conditional the provider serves a ConditionalTablePipeline:
+
+- Every page gets the light pass (table branch off)
+- The full pass (table branch on) re-runs a page only when its light layout
+  reports a table region
+
+Layout detection is identical in both variants; the full pass only adds
+table structure to table regions, so pages without table regions lose
+nothing by skipping it. That holds inside the data-analysis section too:
+its pages without a table region come out the same either way, so the
+section itself is not a reason to re-run a page.
+
+The full-variant instance is created on first use, so exams without tables
+never load the table models.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+from ...common.perf import perf_enabled, perf_event
+
+TABLE_LABELS = frozenset({"table"})
+
+
+def needs_table_pass(doc: Any) -> Optional[str]:
+    """
+    Whether a light-pass result should be re-run with table recognition.
+
+    Returns:
+        "table" (the reason) if the light layout has a table region, else None
+    """
+    from ...common import layout_blocks_from_doc
+
+    blocks = layout_blocks_from_doc(doc)
+    if any(blk.get("label") in TABLE_LABELS for blk in blocks):
+        return "table"
+    return None
+
+
+class ConditionalTablePipeline:
+    """
+    Pipeline-like wrapper running the light variant on every page and the
+    full variant only where tables matter.
+
+    predict() accepts the same single input or list of inputs as
+    PPStructureV3.predict and returns a list of results in input order.
+    """
+
+    def __init__(self, light: Any, full_factory: Callable[[], Any]) -> None:
+        self._light = light
+        self._full_factory = full_factory
+        self._full: Optional[Any] = None
+        self._full_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._light_pages = 0
+        self._full_pages = 0
+        self._full_reasons: Dict[str, int] = {}
+
+    @property
+    def light(self) -> Any:
+        return self._light
+
+    def _get_full(self) -> Any:
+        if self._full is None:
+            with self._full_lock:
+                if self._full is None:
+                    self._full = self._full_factory()
+        return self._full
+
+    def load_full(self) -> None:
+        """Load the full variant now instead of on the first table page."""
+        self._get_full()
+
+    def predict(self, input: Any, *args: Any, **kwargs: Any) -> List[Any]:
+        inputs = list(input) if isinstance(input, (list, tuple)) else [input]
+        results = list(self._light.predict(input, *args, **kwargs))
+
+        rerun: List[int] = []
+        reasons: List[str] = []
+        for i, doc in enumerate(results[: len(inputs)]):
+            reason = needs_table_pass(doc)
+            if reason is not None:
+                rerun.append(i)
+                reasons.append(reason)
+
+        full_ms = 0.0
+        if rerun:
+            t0 = time.perf_counter()
+            full = self._get_full()
+            if len(rerun) == 1:
+                redo = list(full.predict(inputs[rerun[0]], *args, **kwargs))
+            else:
+                redo = list(full.predict([inputs[i] for i in rerun], *args, **kwargs))
+            for i, doc in zip(rerun, redo):
+                results[i] = doc
+            full_ms = (time.perf_counter() - t0) * 1000.0
+
+        with self._stats_lock:
+            self._light_pages += len(inputs)
+            self._full_pages += len(rerun)
+            for reason in reasons:
+                self._full_reasons[reason] = self._full_reasons.get(reason, 0) + 1
+
+        if perf_enabled():
+            perf_event(
+                "ocr.table_pass",
+                pages=len(inputs),
+                full_pages=len(rerun),
+                reasons=reasons,
+                full_ms=round(full_ms, 3),
+            )
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._stats_lock:
+            return {
+                "light_pages": self._light_pages,
+                "full_pages": self._full_pages,
+                "full_reasons": dict(self._full_reasons),
+                "full_loaded": self._full is not None,
+            }
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._light, name)
@@ -0,0 +1,192 @@
+"""
+Model warmup on a real page, with a per-phase startup report.
+
+warmup_ppstructure() predicts on a synthetic 800x1100 drawing, so the first
+real 300 DPI page still pays lazy initialization for its input shape (kernel
+selection, memory pools sized to the warmup image). load_warm_pipeline()
+replays a page from the OCR cache instead, at production resolution: the same
+decode and OCR input transform (EXAMPAPER_OCR_DPI / EXAMPAPER_OCR_TRIM) a real
+page goes through.
+
+The sample is the page with the most layout blocks in the most recently
+processed exam under pdf_images/. Without cached exams the synthetic page is
+used.
+
+Each load reports how long its phases took (import, construct, first predict);
+the report is logged and served by /api/health/models/ppstructure.
+
+Configuration:
+- EXAMPAPER_WARMUP_SAMPLE: "auto" (default: real cached page, synthetic fallback),
+  "synthetic", or a path to a page image
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_AUTO = "auto"
+SAMPLE_SYNTHETIC = "synthetic"
+
+# Most recently modified exam directories searched for a cached page
+_MAX_SCANNED_EXAMS = 10
+
+
+def get_warmup_sample_setting() -> str:
+    """EXAMPAPER_WARMUP_SAMPLE: "auto", "synthetic" or a page image path."""
+    return (os.getenv("EXAMPAPER_WARMUP_SAMPLE", SAMPLE_AUTO) or "").strip() or SAMPLE_AUTO
+
+
+def find_warmup_page(base_dir: Optional[Path] = None) -> Optional[Path]:
+    """
+    Pick a representative page image that already has an OCR cache.
+
+    Scans the most recently modified exam directories and returns the cached
+    page with the most layout blocks (skipped pages excluded) of the first exam
+    that has one.
+
+    Args:
+        base_dir: Directory holding exam directories (default: pdf_images/)
+
+    Returns:
+        Path of the page image, or None if no exam has a usable cached page
+    """
+    from ...common import LEGACY_PDF_IMAGES_DIR, page_image_exists
+    from ..pipeline.impl.ocr_cache import open_ocr_caches
+
+    base = Path(base_dir) if base_dir is not None else LEGACY_PDF_IMAGES_DIR
+    try:
+        exams = [d for d in base.iterdir() if d.is_dir() and (d / "ocr").is_dir()]
+    except OSError:
+        return None
+    exams.sort(key=lambda d: d.stat().st_mtime, reverse=True)
+
+    for exam_dir in exams[:_MAX_SCANNED_EXAMS]:
+        try:
+            with open_ocr_caches(exam_dir) as caches:
+                ranked = sorted(
+                    (
+                        (len(data.get("blocks", [])), page_name)
+                        for page_name, data in caches.items()
+                        if not data.get("skip_reason")
+                    ),
+                    reverse=True,
+                )
+        except Exception as e:
+            logger.debug("Skipping %s for warmup: %s", exam_dir, e)
+            continue
+        for n_blocks, page_name in ranked:
+            if n_blocks == 0:
+                break
+            img_path = exam_dir / f"{page_name}.png"
+            if page_image_exists(img_path):
+                return img_path
+    return None
+
+
+def load_warmup_sample() -> Tuple[Optional[Any], Dict[str, Any]]:
+    """
+    Model input for the warmup predict, prepared like a real page.
+
+    Returns:
+        (input, info): input is None when the synthetic page should be used;
+        info describes the chosen sample for the startup report
+    """
+    from ...common import decode_page_image
+    from ..pipeline.impl.ocr_preprocess import OcrInputTransform, ocr_input_needs_pixels
+
+    setting = get_warmup_sample_setting()
+    if setting == SAMPLE_SYNTHETIC:
+        return None, {"source": SAMPLE_SYNTHETIC}
+
+    if setting == SAMPLE_AUTO:
+        img_path = find_warmup_page()
+        source = "ocr_cache"
+    else:
+        img_path = Path(setting)
+        source = "configured"
+    if img_path is None:
+        return None, {"source": SAMPLE_SYNTHETIC, "reason": "no cached page"}
+
+    try:
+        page = decode_page_image(img_path)
+        if ocr_input_needs_pixels():
+            page = OcrInputTransform.for_decoded_page(page).prepare(page)
+    except Exception as e:
+        logger.warning("Cannot load warmup page %s (%s); using the synthetic page", img_path, e)
+        return None, {"source": SAMPLE_SYNTHETIC, "reason": f"{type(e).__name__}: {e}"}
+    return page.model_input(), {"source": source, "page": str(img_path), "size": [page.width, page.height]}
+
+
+def load_warm_pipeline() -> Tuple[Any, Dict[str, Any]]:
+    """
+    Construct the pipeline PPStructureProvider serves in-process and warm it up.
+
+    Must run on the thread that will call predict() when thread-bound predict
+    is enabled.
+
+    Returns:
+        (pipeline, report): report holds per-phase seconds and the warmup sample
+    """
+    phases: Dict[str, float] = {}
+    t0 = time.perf_counter()
+    import paddleocr  # noqa: F401  (import cost reported separately from construction)
+
+    phases["import"] = time.perf_counter() - t0
+
+    from ...common.ocr_models import (
+        PIPELINE_VARIANT_FULL,
+        PIPELINE_VARIANT_LIGHT,
+        conditional_table_pass_enabled,
+        get_ppstructure,
+        get_ppstructure_variant,
+        warmup_ppstructure,
+    )
+
+    t0 = time.perf_counter()
+    if conditional_table_pass_enabled():
+        import functools
+
+        from .table_pass import ConditionalTablePipeline
+
+        # Light variant for every page; the full variant loads on the first
+        # page that needs table recognition
+        light = get_ppstructure_variant(PIPELINE_VARIANT_LIGHT)
+        pipeline: Any = ConditionalTablePipeline(
+            light, functools.partial(get_ppstructure_variant, PIPELINE_VARIANT_FULL)
+        )
+        warm_target = light
+    else:
+        pipeline = get_ppstructure()
+        warm_target = pipeline
+    phases["construct"] = time.perf_counter() - t0
+
+    sample, sample_info = load_warmup_sample()
+    t0 = time.perf_counter()
+    warmup_ppstructure(warm_target, sample=sample)
+    phases["first_predict"] = time.perf_counter() - t0
+
+    report = {
+        "pid": os.getpid(),
+        "phases_s": {name: round(seconds, 3) for name, seconds in phases.items()},
+        "total_s": round(sum(phases.values()), 3),
+        "sample": sample_info,
+    }
+    return pipeline, report
+
+
+def format_startup_report(report: Dict[str, Any]) -> str:
+    """One-line summary of a startup report for the log."""
+    phases = report.get("phases_s") or {}
+    parts = [f"{name} {seconds:.1f}s" for name, seconds in phases.items()]
+    sample = report.get("sample") or {}
+    where = sample.get("page") or sample.get("source", "?")
+    line = f"{', '.join(parts) or 'no phases'} (sample: {where})"
+    if report.get("mode"):
+        line = f"[{report['mode']}] {line}"
+    return line
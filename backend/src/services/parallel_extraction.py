@@ -13,53 +13,29 @@ parallel_extraction.py - 页面级并发OCR处理模块
 """
 from __future__ import annotations
 
-import faulthandler
 import json
 import logging
 import os
-import sys
 import threading
 import time
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from queue import Full, Queue
 from threading import Semaphore
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
 
 logger = logging.getLogger(__name__)
 
+from ..common import parse_int_env
 from ..common.perf import perf_enabled, perf_event, perf_span
-
-
-def _parse_int_env(name: str, default: int, lo: int = 1, hi: int = 256) -> int:
-    """Parse integer environment variable with bounds checking."""
-    raw = (os.getenv(name, "") or "").strip()
-    if not raw:
-        return default
-    try:
-        v = int(raw)
-        if v < lo:
-            return lo
-        if v > hi:
-            return hi
-        return v
-    except ValueError:
-        return default
-
-
-def _try_enable_faulthandler() -> None:
-    """Best-effort enable faulthandler for diagnosing deadlocks/hangs."""
-    try:
-        faulthandler.enable(file=sys.stderr, all_threads=True)
-    except Exception:
-        # Some environments may deny enabling faulthandler; ignore.
-        return
+from ..common.page_store import raw_path_for
+from .predict_watchdog import PredictWatchdogConfig, get_predict_watchdog
 
 
 class _GpuLockedPipeline:
     """包装 pipeline，仅在 predict 调用时获取 GPU 锁。"""
 
-    __slots__ = ("_pipeline", "_sem", "_log", "_page")
+    __slots__ = ("_pipeline", "_sem", "_log", "_page", "_config")
 
     def __init__(
         self,
@@ -67,17 +43,38 @@ class _GpuLockedPipeline:
         sem: Semaphore,
         log_fn: Callable[[str], None],
         page_name: str,
+        config: Optional[PredictWatchdogConfig] = None,
     ) -> None:
         self._pipeline = pipeline
         self._sem = sem
         self._log = log_fn
         self._page = page_name
+        self._config = config or PredictWatchdogConfig.from_env()
 
     def predict(self, *args: Any, **kwargs: Any) -> Any:
         # Measure GPU lock wait time separately from inference time
-        gpu_lock_timeout_s = _parse_int_env(
-            "EXAMPAPER_GPU_LOCK_TIMEOUT_S", default=0, lo=0, hi=24 * 60 * 60
-        )
+        gpu_lock_timeout_s = self._config.gpu_lock_timeout_s
+
+        # 跨页微批：由批处理线程代为获取 GPU 锁，并与其他页面合并为一次 predict
+        if len(args) == 1 and not kwargs:
+            from .predict_batcher import get_predict_batcher
+
+            batcher = get_predict_batcher(self._pipeline)
+            if batcher is not None:
+                self._log(f"  [OCR] {self._page} (进入批量推理队列，K={batcher.max_batch})")
+                try:
+                    return batcher.predict(
+                        args[0],
+                        self._sem,
+                        timeout=float(gpu_lock_timeout_s) if gpu_lock_timeout_s > 0 else None,
+                        page=self._page,
+                    )
+                except TimeoutError:
+                    self._log(
+                        f"  [OCR] {self._page} (等待GPU锁超时 {gpu_lock_timeout_s}s，可能发生死锁/线程卡死)"
+                    )
+                    raise
+
         t_wait0 = time.perf_counter()
         if gpu_lock_timeout_s > 0:
             acquired = self._sem.acquire(timeout=float(gpu_lock_timeout_s))
@@ -90,36 +87,6 @@ class _GpuLockedPipeline:
             self._sem.acquire()
         wait_ms = (time.perf_counter() - t_wait0) * 1000.0
         try:
-            # If predict() hangs (common symptoms: stuck on first page for a long time),
-            # enable periodic stack dumps to locate the blocking frame (often inside pipeline.predict).
-            hang_dump_s = _parse_int_env(
-                "EXAMPAPER_OCR_PREDICT_HANG_DUMP_S", default=0, lo=0, hi=24 * 60 * 60
-            )
-            hang_dump_enabled = False
-            if hang_dump_s > 0:
-                _try_enable_faulthandler()
-                try:
-                    faulthandler.dump_traceback_later(
-                        float(hang_dump_s), repeat=True, file=sys.stderr
-                    )
-                    hang_dump_enabled = True
-                except Exception:
-                    hang_dump_enabled = False
-
-            warn_after_s = _parse_int_env(
-                "EXAMPAPER_OCR_PREDICT_WARN_AFTER_S", default=60, lo=0, hi=24 * 60 * 60
-            )
-            warn_timer: Optional[threading.Timer] = None
-            if warn_after_s > 0:
-                def _warn() -> None:
-                    self._log(
-                        f"  [OCR] {self._page} (GPU推理仍未返回，已超过 {warn_after_s}s；"
-                        f" 可能为显存不足/推理死锁/驱动卡死)"
-                    )
-                warn_timer = threading.Timer(float(warn_after_s), _warn)
-                warn_timer.daemon = True
-                warn_timer.start()
-
             input_kind = type(args[0]).__name__ if args else "unknown"
             if wait_ms >= 1000.0:
                 self._log(
@@ -127,20 +94,23 @@ class _GpuLockedPipeline:
                 )
             else:
                 self._log(f"  [OCR] {self._page} (GPU推理中... input={input_kind})")
+
+            # Slow-inference warning and hang stack dumps are driven by the shared
+            # watchdog thread (no per-call Timer thread)
+            def _warn(elapsed_s: float) -> None:
+                self._log(
+                    f"  [OCR] {self._page} (GPU推理仍未返回，已超过 {elapsed_s:.0f}s；"
+                    f" 可能为显存不足/推理死锁/驱动卡死)"
+                )
+
             t0 = time.perf_counter()
-            try:
+            with get_predict_watchdog().watching(
+                self._page,
+                warn_after_s=self._config.warn_after_s,
+                on_warn=_warn,
+                hang_dump_s=self._config.hang_dump_s,
+            ):
                 result = self._pipeline.predict(*args, **kwargs)
-            finally:
-                if warn_timer is not None:
-                    try:
-                        warn_timer.cancel()
-                    except Exception:
-                        pass
-                if hang_dump_enabled:
-                    try:
-                        faulthandler.cancel_dump_traceback_later()
-                    except Exception:
-                        pass
             pred_ms = (time.perf_counter() - t0) * 1000.0
 
             # Log detailed timing breakdown
@@ -159,6 +129,35 @@ class _GpuLockedPipeline:
         return getattr(self._pipeline, name)
 
 
+class _DecodeBudget:
+    """
+    预解码内存预算（字节）：已解码但尚未被 worker 处理完的页面总大小不超过上限。
+
+    单页超过预算时，在没有其他已解码页面时仍允许通过，避免永久阻塞。
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self._max = max_bytes
+        self._used = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, nbytes: int, stop_event: threading.Event) -> bool:
+        with self._cond:
+            while self._used > 0 and self._used + nbytes > self._max:
+                if stop_event.is_set():
+                    return False
+                self._cond.wait(0.2)
+            self._used += nbytes
+            return True
+
+    def release(self, nbytes: int) -> None:
+        if not nbytes:
+            return
+        with self._cond:
+            self._used = max(0, self._used - nbytes)
+            self._cond.notify_all()
+
+
 class ParallelPageProcessor:
     """页面级并发OCR处理器，支持GPU串行化。"""
 
@@ -180,9 +179,14 @@ class ParallelPageProcessor:
         self.pipeline = pipeline
 
         # GPU并发度可配置（默认1，可通过环境变量调整）
-        gpu_concurrency = _parse_int_env("EXAMPAPER_GPU_CONCURRENCY", default=1, lo=1, hi=8)
+        gpu_concurrency = parse_int_env("EXAMPAPER_GPU_CONCURRENCY", default=1, lo=1, hi=8)
         self._gpu_semaphore = gpu_semaphore or Semaphore(gpu_concurrency)
+        # 推理超时/告警配置：每个处理器读取一次
+        self._watchdog_config = PredictWatchdogConfig.from_env()
         self._prefetch_size = get_prefetch_size()
+        self._decode_ahead = decode_ahead_enabled()
+        self._decode_budget: Optional[_DecodeBudget] = None
+        self._decoder: Optional[ThreadPoolExecutor] = None
         self._extract_fn: Optional[Callable] = None
         self._save_fn: Optional[Callable] = None
         self._is_valid_meta_fn: Optional[Callable] = None
@@ -212,6 +216,7 @@ class ParallelPageProcessor:
         skip_existing: bool = False,
         progress_callback: Optional[Callable[[int, int, str, str], None]] = None,
         log: Optional[Callable[[str], None]] = None,
+        page_stream: Optional[Any] = None,
     ) -> List[Dict[str, Any]]:
         """
         并发处理多个页面图片。
@@ -222,6 +227,7 @@ class ParallelPageProcessor:
             skip_existing: 是否跳过已存在的有效结果
             progress_callback: 进度回调函数 (done, total, status, page_name)
             log: 日志输出函数
+            page_stream: 可选的 PageStream（流式模式，页面渲染完成即入队，忽略 img_paths）
 
         Returns:
             按页面顺序排列的处理结果列表
@@ -231,7 +237,13 @@ class ParallelPageProcessor:
         if self._extract_fn is None or self._save_fn is None:
             raise ValueError("extraction functions not set, call set_extraction_functions first")
 
-        total_pages = len(img_paths)
+        pages: Iterable[Tuple[int, Path]]
+        if page_stream is not None:
+            total_pages = page_stream.wait_total()
+            pages = page_stream
+        else:
+            total_pages = len(img_paths)
+            pages = enumerate(img_paths)
         if total_pages == 0:
             return []
 
@@ -243,16 +255,31 @@ class ParallelPageProcessor:
         results: List[Optional[Dict[str, Any]]] = [None] * total_pages
         completed = 0
 
-        logger_fn(f"[并发] 启动 {self.max_workers} 个worker处理 {total_pages} 页 (预取队列: {self._prefetch_size})")
+        if self._decode_ahead:
+            # 预解码：由内存预算（而非队列长度）限制提前量
+            budget_bytes = get_decode_ahead_bytes()
+            self._decode_budget = _DecodeBudget(budget_bytes)
+            self._decoder = ThreadPoolExecutor(
+                max_workers=get_decode_workers(), thread_name_prefix="page-decode"
+            )
+            queue: Queue[Any] = Queue()
+            logger_fn(
+                f"[并发] 启动 {self.max_workers} 个worker处理 {total_pages} 页 "
+                f"(预解码: {get_decode_workers()} 线程, 预算 {budget_bytes // (1024 * 1024)}MB)"
+            )
+        else:
+            queue = Queue(maxsize=self._prefetch_size)
+            logger_fn(f"[并发] 启动 {self.max_workers} 个worker处理 {total_pages} 页 (预取队列: {self._prefetch_size})")
 
         # 预取队列与生产者线程
-        queue: Queue[Any] = Queue(maxsize=self._prefetch_size)
         stop_event = threading.Event()
         sentinel = object()
+        producer_errors: List[BaseException] = []
 
         producer = threading.Thread(
             target=self._prefetch_producer,
-            args=(img_paths, queue, stop_event, logger_fn, sentinel),
+            args=(pages, queue, stop_event, logger_fn, sentinel, producer_errors),
+            kwargs={"base_output_dir": base_output_dir, "skip_existing": skip_existing},
             name="prefetch-producer",
             daemon=True,
         )
@@ -269,7 +296,11 @@ class ParallelPageProcessor:
                         return
 
                     # Extract enqueue timestamp and file size for performance tracking
-                    if isinstance(item, tuple) and len(item) == 4:
+                    decode_future = None
+                    decoded_bytes = 0
+                    if isinstance(item, tuple) and len(item) == 6:
+                        idx, img_path, enqueued_ts, file_size, decode_future, decoded_bytes = item
+                    elif isinstance(item, tuple) and len(item) == 4:
                         idx, img_path, enqueued_ts, file_size = item
                     else:
                         # Backward compatibility
@@ -286,6 +317,16 @@ class ParallelPageProcessor:
                         queue_wait_ms = (time.perf_counter() - float(enqueued_ts)) * 1000.0
 
                     try:
+                        image = None
+                        decode_wait_ms = None
+                        if decode_future is not None:
+                            t_dec = time.perf_counter()
+                            try:
+                                image = decode_future.result()
+                            except Exception as exc:
+                                logger_fn(f"[WARN] 预解码 {page_name} 失败，改为直接读取: {exc}")
+                            decode_wait_ms = (time.perf_counter() - t_dec) * 1000.0
+
                         # Wrap processing in performance span
                         with perf_span(
                             "page.worker",
@@ -293,6 +334,8 @@ class ParallelPageProcessor:
                             idx=idx,
                             input_bytes=file_size,
                             queue_wait_ms=round(queue_wait_ms, 3) if queue_wait_ms is not None else None,
+                            decoded=image is not None,
+                            decode_wait_ms=round(decode_wait_ms, 3) if decode_wait_ms is not None else None,
                         ):
                             result = self._process_single_page(
                                 idx,
@@ -301,7 +344,9 @@ class ParallelPageProcessor:
                                 skip_existing,
                                 logger_fn,
                                 base_output_dir,
+                                image=image,
                             )
+                        image = None
                         status = result.get("status", "unknown")
                     except Exception as exc:
                         logger.exception("页面 %s 处理异常: %s", page_name, exc)
@@ -313,6 +358,8 @@ class ParallelPageProcessor:
                         }
                         status = "error"
                     finally:
+                        if self._decode_budget is not None:
+                            self._decode_budget.release(decoded_bytes)
                         # Log completion with total time
                         total_ms = (time.perf_counter() - t_page_start) * 1000.0
                         if perf_enabled():
@@ -347,6 +394,15 @@ class ParallelPageProcessor:
             stop_event.set()
             producer.join(timeout=5)
 
+        if self._decoder is not None:
+            self._decoder.shutdown(wait=False, cancel_futures=True)
+            self._decoder = None
+            self._decode_budget = None
+
+        if producer_errors:
+            # e.g. PageStreamError: PDF rendering failed while pages were streaming in
+            raise producer_errors[0]
+
         logger_fn(f"[并发] 完成 {completed}/{total_pages} 页处理")
 
         # 过滤None并按页面顺序返回
@@ -360,6 +416,7 @@ class ParallelPageProcessor:
         skip_existing: bool,
         log: Callable[[str], None],
         workdir: Optional[Path] = None,
+        image: Optional[Any] = None,
     ) -> Dict[str, Any]:
         """
         处理单个页面（带GPU串行化）。
@@ -370,6 +427,7 @@ class ParallelPageProcessor:
             base_output_dir: 输出目录
             skip_existing: 是否跳过已存在的有效结果
             log: 日志输出函数
+            image: 预解码阶段得到的 DecodedPage（可选）
 
         Returns:
             处理结果字典
@@ -397,9 +455,12 @@ class ParallelPageProcessor:
             # 使用包装器将 GPU 临界区缩小到 predict 调用
             # 图片加载/预处理可在等待 GPU 锁时并行执行
             wrapped_pipeline = _GpuLockedPipeline(
-                self.pipeline, self._gpu_semaphore, log, page_name
+                self.pipeline, self._gpu_semaphore, log, page_name, self._watchdog_config
             )
-            questions = self._extract_fn(img_path, wrapped_pipeline, workdir=workdir)
+            if image is not None:
+                questions = self._extract_fn(img_path, wrapped_pipeline, workdir=workdir, image=image)
+            else:
+                questions = self._extract_fn(img_path, wrapped_pipeline, workdir=workdir)
 
             # CPU后处理（可并发）
             if not questions:
@@ -430,44 +491,97 @@ class ParallelPageProcessor:
 
     def _prefetch_producer(
         self,
-        img_paths: List[Path],
+        pages: Iterable[Tuple[int, Path]],
         queue: Queue[Any],
         stop_event: threading.Event,
         log: Callable[[str], None],
         sentinel: Any,
+        errors: Optional[List[BaseException]] = None,
+        base_output_dir: Optional[Path] = None,
+        skip_existing: bool = False,
     ) -> None:
         """
         生产者：预取图片触发文件系统缓存，减少 GPU 等待时间。
 
+        pages 为 (idx, img_path) 序列；流式模式下为 PageStream，会阻塞等待下一页渲染完成。
         将 (idx, img_path, enqueue_ts, file_size) 放入有界队列，末尾发送 sentinel 终止信号。
+
+        启用预解码时，需要 OCR 的页面在预算允许时提交到解码线程池，入队
+        (idx, img_path, enqueue_ts, file_size, future, reserved_bytes)；
+        worker 取到的是已解码数组，GPU 槽位不会在 PNG 解压期间被占用。
         """
         try:
             prefetch_bytes = get_prefetch_bytes()
-            for idx, img_path in enumerate(img_paths):
+            for idx, img_path in pages:
                 if stop_event.is_set():
                     break
+
+                # Raw page store: the PNG is encoded later, read the raw pixels instead
+                src_path = img_path
+                if not img_path.exists():
+                    src_path = raw_path_for(img_path)
+
+                # Get file size for performance tracking
+                try:
+                    file_size = src_path.stat().st_size
+                except OSError:
+                    file_size = None
+
+                if self._decoder is not None and self._decode_budget is not None:
+                    future = None
+                    reserved = 0
+                    if self._needs_ocr(img_path, base_output_dir, skip_existing):
+                        try:
+                            from ..common.image import decode_page_image, estimate_decoded_bytes
+
+                            reserved = estimate_decoded_bytes(img_path)
+                        except Exception as exc:
+                            log(f"[WARN] 读取 {img_path.name} 尺寸失败: {exc}")
+                            reserved = 0
+                        if reserved:
+                            if not self._decode_budget.acquire(reserved, stop_event):
+                                break
+                            future = self._decoder.submit(decode_page_image, img_path)
+                    queue.put((idx, img_path, time.perf_counter(), file_size, future, reserved))
+                    continue
+
                 try:
                     # Prefetch: read bytes to trigger filesystem cache
                     if prefetch_bytes > 0:
-                        with img_path.open("rb") as f:
+                        with src_path.open("rb") as f:
                             f.read(prefetch_bytes)
                 except Exception as exc:
                     log(f"[WARN] 预取 {img_path.name} 时出错: {exc}")
 
-                # Get file size for performance tracking
-                try:
-                    file_size = img_path.stat().st_size
-                except OSError:
-                    file_size = None
-
                 # Enqueue with timestamp for queue wait time calculation
                 queue.put((idx, img_path, time.perf_counter(), file_size))
+        except Exception as exc:
+            log(f"[WARN] 页面生产者异常: {exc}")
+            if errors is not None:
+                errors.append(exc)
         finally:
             # Send sentinel to terminate workers
             for _ in range(self.max_workers):
                 queue.put(sentinel)
 
 
+    def _needs_ocr(self, img_path: Path, base_output_dir: Optional[Path], skip_existing: bool) -> bool:
+        """页面是否会真正进入 OCR（已有有效结果或 OCR 缓存的页面不预解码）。"""
+        if base_output_dir is None:
+            return True
+        page_name = img_path.stem
+        if skip_existing and self._is_valid_meta_fn is not None:
+            meta_path = base_output_dir / f"questions_{page_name}" / "meta.json"
+            if self._is_valid_meta_fn(meta_path):
+                return False
+        try:
+            from .pipeline.impl.ocr_cache import has_ocr_cache
+
+            return not has_ocr_cache(base_output_dir, page_name)
+        except Exception:
+            return True
+
+
 def get_default_max_workers() -> int:
     """
     获取默认的worker数量。
@@ -518,6 +632,21 @@ def get_prefetch_bytes() -> int:
         return 4096
 
 
+def decode_ahead_enabled() -> bool:
+    """是否启用预解码阶段（EXAMPAPER_DECODE_AHEAD=1）。"""
+    return (os.getenv("EXAMPAPER_DECODE_AHEAD", "0") or "").strip() == "1"
+
+
+def get_decode_ahead_bytes() -> int:
+    """预解码内存预算（EXAMPAPER_DECODE_AHEAD_MB，默认 256MB）。"""
+    return parse_int_env("EXAMPAPER_DECODE_AHEAD_MB", default=256, lo=16, hi=16384) * 1024 * 1024
+
+
+def get_decode_workers() -> int:
+    """预解码线程数（EXAMPAPER_DECODE_WORKERS，默认 2）。"""
+    return parse_int_env("EXAMPAPER_DECODE_WORKERS", default=2, lo=1, hi=16)
+
+
 def is_parallel_extraction_enabled() -> bool:
     """检查是否启用并发提取。"""
     return os.getenv("EXAMPAPER_PARALLEL_EXTRACTION", "0") == "1"
@@ -3,10 +3,19 @@ Pipeline implementation modules.
 
 This package contains the core processing logic for each pipeline step:
 - ocr_cache: OCR result caching to avoid redundant PP-StructureV3 calls
+- ocr_binary: Compact binary per-page OCR cache format with lazy block decoding
+- ocr_mem_cache: Byte-budgeted in-process LRU of OCR results with hit/miss stats
+- ocr_writer: Write-behind persistence of OCR cache records (bounded queue + background thread)
+- ocr_pack: Single-file per-exam OCR store (index header + append-only page records)
+- ocr_global_cache: Cross-exam OCR cache keyed by page pixels + model fingerprint
 - structure_detection: Document structure detection and question graph building
+- incremental_structure: Structure doc built page by page while OCR is still running
 - crop_and_stitch: Image cropping and stitching based on structure
+- crop_planner: All output crop regions planned from structure.json (one decode per page, one encode per image)
 - extract_questions: Question extraction from page images using PP-StructureV3
 - compose_long_image: Cross-page question segment composition
+- text_layer: Layout blocks from the PDF text layer (OCR fast path for born-digital PDFs)
+- ocr_quality: Re-OCR of suspicious pages (qno gaps, no/short text) with a high-accuracy configuration
 """
 
 from .ocr_cache import (
@@ -14,8 +23,11 @@ from .ocr_cache import (
     load_ocr_cache,
     save_ocr_cache,
     load_all_ocr_caches,
+    open_ocr_caches,
+    close_ocr_caches,
     is_ocr_complete,
     has_ocr_cache,
+    migrate_ocr_caches,
 )
 
 from .structure_detection import (
@@ -42,6 +54,7 @@ from .extract_questions import (
     save_questions_for_page,
 )
 from .compose_long_image import process_meta_file
+from .text_layer import extract_text_layer_blocks, text_layer_enabled
 
 __all__ = [
     # ocr_cache
@@ -49,8 +62,11 @@ __all__ = [
     "load_ocr_cache",
     "save_ocr_cache",
     "load_all_ocr_caches",
+    "open_ocr_caches",
+    "close_ocr_caches",
     "is_ocr_complete",
     "has_ocr_cache",
+    "migrate_ocr_caches",
     # structure_detection
     "StructureDoc",
     "QuestionNode",
@@ -71,4 +87,7 @@ __all__ = [
     "save_questions_for_page",
     # compose_long_image
     "process_meta_file",
+    # text_layer
+    "extract_text_layer_blocks",
+    "text_layer_enabled",
 ]
@@ -0,0 +1,232 @@
+"""
+block_table.py - 整卷版面块的列式表（结构检测用）
+
+build_structure_doc 逐块遍历 dict，对每个块分别调用 is_noise_block、
+is_exam_end_block、extract_question_number 与 is_section_boundary_block，
+每次调用都重新规范化同一段文本并跑一遍关键字 / 正则（部分标题判断每块要跑
+三个正则、十几个关键字，是其中最耗时的一项）。
+
+BlockTable 把一份试卷的所有版面块（按页码、块顺序）展开为列：
+
+- page / page_no: 所在页的位置（pages 下标）与页码（page_index）
+- label: 标签编码（labels 为编码表）
+- bbox / has_bbox: int64 (n, 4) 坐标与有效标记
+- text / raw: 原文与去首尾空白的文本（只规范化一次）
+
+关键字与正则不再逐块匹配：所有 raw 文本以 "\x00" 连接成一个字符串（紧凑视图
+在整串上一次性去除空白），每个关键字 / 正则在整串上查找一次，命中位置经
+np.searchsorted 映射回行号。噪声、试卷结束、题号、部分标题由此各得到一整列。
+噪声过滤、材料区域的 bbox 选择、页面范围计算在 structure_detection 中
+以数组运算完成。
+
+配置：
+- EXAMPAPER_BLOCK_TABLE: 1 启用（默认关闭，关闭时使用逐块遍历的实现）
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from ....common import (
+    DATA_INTRO_KEYWORDS,
+    EXAM_END_KEYWORDS,
+    NOISE_TEXT_KEYWORDS,
+    QUESTION_RANGE_PATTERN,
+    SECTION_HEAD_KEYWORDS,
+    SECTION_INTRO_KEYWORDS,
+    SECTION_PART_PATTERN,
+    SECTION_TITLE_PATTERN,
+    page_index,
+)
+
+# 与 is_noise_block 相同的噪声标签
+NOISE_LABELS = ("footer", "header", "number")
+
+# 行分隔符（关键字与题号都不含该字符，匹配不会跨行）
+_SEP = "\x00"
+
+# 与 is_exam_end_block 相同：结束标识为短文本，关键词位于开头附近
+_EXAM_END_MAX_CHARS = 50
+_EXAM_END_MAX_OFFSET = 10
+
+# QUESTION_HEAD_PATTERN.match(raw) 在连接串上的等价形式：raw 已去首尾空白，
+# 行首只可能是题号本身或 "。" 后接题号
+_QNO_AT_ROW_START = re.compile(_SEP + r"(?:。\s*)?(\d{1,3})[\.．、]")
+
+# SECTION_TITLE_PATTERN 以 ^ 锚定行首，在连接串上改为锚定分隔符
+_SECTION_TITLE_AT_ROW_START = re.compile(_SEP + SECTION_TITLE_PATTERN.pattern.lstrip("^"))
+
+_WHITESPACE_RE = re.compile(r"\s+")
+
+NO_QNO = -1
+
+
+def _row_starts(joined: str) -> np.ndarray:
+    """以分隔符开头的连接串中各行的起点（分隔符之后的位置）。"""
+    codes = np.frombuffer(joined.encode("utf-32-le"), dtype="<u4")
+    return np.flatnonzero(codes == ord(_SEP)) + 1
+
+
+def block_table_enabled() -> bool:
+    """结构检测是否使用列式块表（EXAMPAPER_BLOCK_TABLE=1）。"""
+    return (os.getenv("EXAMPAPER_BLOCK_TABLE", "0") or "").strip() == "1"
+
+
+class BlockTable:
+    """一份试卷的版面块列式表（行按页码、块顺序排列）。"""
+
+    def __init__(
+        self,
+        pages: List[str],
+        page: np.ndarray,
+        label: np.ndarray,
+        labels: List[str],
+        bbox: np.ndarray,
+        has_bbox: np.ndarray,
+        text: List[str],
+    ) -> None:
+        self.pages = pages
+        self.page_no = np.array([page_index(p) for p in pages], dtype=np.int64)
+        self.page = page
+        self.label = label
+        self.labels = labels
+        self.bbox = bbox
+        self.has_bbox = has_bbox
+        self.text = text
+        self.raw = [t.strip() for t in text]
+
+        # 所有行连接为一个字符串；_starts[i] 为第 i 行在连接串中的起点
+        self._joined = _SEP + _SEP.join(self.raw)
+        if self._joined.count(_SEP) != len(text):
+            # 文本自身含分隔符（OCR 中几乎不会出现）时替换掉，保证行号映射正确
+            self._joined = _SEP + _SEP.join(r.replace(_SEP, " ") for r in self.raw)
+        self._starts = _row_starts(self._joined)
+        lengths = np.diff(np.append(self._starts, len(self._joined) + 1)) - 1
+
+        noise_codes = [i for i, name in enumerate(labels) if name in NOISE_LABELS]
+        self.noise_label = np.isin(label, noise_codes)
+        self.noise = self.noise_label | self.rows_containing(NOISE_TEXT_KEYWORDS)
+        self.exam_end = self.rows_containing(EXAM_END_KEYWORDS, max_offset=_EXAM_END_MAX_OFFSET) & (
+            (lengths > 0) & (lengths <= _EXAM_END_MAX_CHARS)
+        )
+        self.qno = np.full(len(text), NO_QNO, dtype=np.int64)
+        for match in _QNO_AT_ROW_START.finditer(self._joined):
+            self.qno[self._row_at(match.start() + 1)] = int(match.group(1))
+        self.section_boundary = self._section_boundary_column()
+
+    @classmethod
+    def from_ocr_caches(cls, ocr_caches: Dict[str, Dict[str, Any]]) -> "BlockTable":
+        """由 {page_name: ocr_cache_data} 建表（页面按页码排序）。"""
+        pages = sorted(ocr_caches.keys(), key=page_index)
+        blocks = [ocr_caches[page_name].get("blocks", []) for page_name in pages]
+        flat = [block for page_blocks in blocks for block in page_blocks]
+        page_col = np.repeat(np.arange(len(pages), dtype=np.int64), [len(b) for b in blocks])
+
+        label_names = [block.get("label", "") for block in flat]
+        labels = list(dict.fromkeys(label_names))
+        label_codes = {name: code for code, name in enumerate(labels)}
+        text = [block.get("content", "") for block in flat]
+        text = [t if isinstance(t, str) else str(t) for t in text]
+
+        # 无 bbox 或格式不对的块以全 0 占位（has_bbox 为假）
+        raw_boxes = [block.get("bbox") for block in flat]
+        has_bbox = np.fromiter((bool(b) and len(b) == 4 for b in raw_boxes), dtype=bool, count=len(flat))
+        boxes = [b if ok else (0, 0, 0, 0) for b, ok in zip(raw_boxes, has_bbox.tolist())]
+        # 与 int(x) 相同：浮点坐标向零取整
+        bbox = np.array(boxes, dtype=np.float64).reshape(-1, 4).astype(np.int64)
+
+        return cls(
+            pages=pages,
+            page=page_col,
+            label=np.array([label_codes[name] for name in label_names], dtype=np.int16),
+            labels=labels,
+            bbox=bbox,
+            has_bbox=has_bbox,
+            text=text,
+        )
+
+    def __len__(self) -> int:
+        return len(self.text)
+
+    def _row_at(self, pos: Any) -> Any:
+        """连接串中的位置 -> 行号（标量或数组）。"""
+        return np.searchsorted(self._starts, pos, side="right") - 1
+
+    def rows_containing(
+        self,
+        keywords: Iterable[str],
+        max_offset: Optional[int] = None,
+        text: Optional[str] = None,
+        starts: Optional[np.ndarray] = None,
+    ) -> np.ndarray:
+        """
+        raw 文本包含任一关键字的行（每个关键字在整个连接串上查找一次）。
+
+        Args:
+            keywords: 关键字（不含空白与分隔符）
+            max_offset: 只计入行内起始位置不超过该值的出现
+            text / starts: 在另一个连接串（如紧凑视图）上查找时传入，默认 raw 连接串
+        """
+        hits: List[int] = []
+        joined = self._joined if text is None else text
+        starts = self._starts if starts is None else starts
+        for kw in keywords:
+            pos = joined.find(kw)
+            while pos >= 0:
+                hits.append(pos)
+                pos = joined.find(kw, pos + 1)
+        mask = np.zeros(len(self.text), dtype=bool)
+        if hits:
+            positions = np.array(hits, dtype=np.int64)
+            rows = np.searchsorted(starts, positions, side="right") - 1
+            if max_offset is not None:
+                rows = rows[positions - starts[rows] <= max_offset]
+            mask[rows] = True
+        return mask
+
+    def _section_boundary_column(self) -> np.ndarray:
+        """
+        部分标题/说明（与 is_section_boundary_block 相同）。
+
+        is_section_boundary_block 分别在原文与紧凑（去全部空白）视图上匹配。
+        关键字与正则（\\s* 可匹配空串）在原文上的匹配去掉空白后仍是紧凑视图上的
+        匹配，所以只在紧凑视图上查找即可得到相同结果。
+        """
+        compact = _WHITESPACE_RE.sub("", self._joined)
+        starts = _row_starts(compact)
+
+        def rows_matching(pattern: re.Pattern, offset: int = 0) -> np.ndarray:
+            hits = [m.start() + offset for m in pattern.finditer(compact)]
+            mask = np.zeros(len(self.text), dtype=bool)
+            if hits:
+                mask[np.searchsorted(starts, hits, side="right") - 1] = True
+            return mask
+
+        boundary = (
+            rows_matching(_SECTION_TITLE_AT_ROW_START, offset=1)
+            | rows_matching(SECTION_PART_PATTERN)
+            | (
+                self.rows_containing(SECTION_HEAD_KEYWORDS, text=compact, starts=starts)
+                & self.rows_containing(SECTION_INTRO_KEYWORDS, text=compact, starts=starts)
+            )
+            | self.rows_containing(DATA_INTRO_KEYWORDS, text=compact, starts=starts)
+            | rows_matching(QUESTION_RANGE_PATTERN)
+        )
+        return boundary & ~self.noise_label
+
+    def first_row(self, mask: np.ndarray) -> Optional[int]:
+        """mask 为真的第一行，没有时返回 None。"""
+        rows = np.flatnonzero(mask)
+        return int(rows[0]) if rows.size else None
+
+    def labels_equal(self, name: str) -> np.ndarray:
+        """label == name 的行。"""
+        try:
+            code = self.labels.index(name)
+        except ValueError:
+            return np.zeros(len(self), dtype=bool)
+        return self.label == code
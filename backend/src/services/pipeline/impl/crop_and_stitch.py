@@ -2,7 +2,8 @@
 crop_and_stitch.py - 裁剪拼接核心逻辑
 
 根据 structure.json 裁剪题目图片，生成最终的输出图片。
-支持图片缓存和并行裁剪以提升性能。
+支持图片缓存和并行裁剪以提升性能；EXAMPAPER_CROP_PLANNER=1 时改用
+crop_planner（每页只解码一次）。
 """
 
 from __future__ import annotations
@@ -13,11 +14,13 @@ import shutil
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from pathlib import Path
 from threading import Lock
-from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
 
 from PIL import Image
 
-from ....common import page_index, compose_vertical
+from ....common import page_index, compose_vertical, open_page_for_crops, page_image_exists
+from ....common.page_store import RawPage
+from .crop_planner import crop_planner_enabled, plan_crops, run_crop_plan
 from .structure_detection import (
     StructureDoc,
     QuestionNode,
@@ -31,16 +34,18 @@ class PageImageCache:
     """
     页面图片缓存，避免重复打开同一页面图片。
     使用单槽缓存策略，适合按页面顺序处理的场景。
+
+    有 raw 页面时缓存的是映射（RawPage），裁剪只复制所需区域。
     """
 
     def __init__(self, workdir: Path, max_cache: int = 3):
         self._workdir = workdir
         self._max_cache = max_cache
-        self._cache: Dict[str, Image.Image] = {}
+        self._cache: Dict[str, Union[RawPage, Image.Image]] = {}
         self._access_order: List[str] = []
         self._lock = Lock()
 
-    def get(self, page_name: str) -> Optional[Image.Image]:
+    def get(self, page_name: str) -> Optional[Union[RawPage, Image.Image]]:
         """获取页面图片，优先从缓存读取。"""
         with self._lock:
             if page_name in self._cache:
@@ -49,11 +54,13 @@ class PageImageCache:
                 return self._cache[page_name]
 
             page_path = self._workdir / f"{page_name}.png"
-            if not page_path.is_file():
+            if not page_image_exists(page_path):
                 return None
 
-            img = Image.open(page_path)
-            img.load()
+            img = open_page_for_crops(page_path)
+            if isinstance(img, Image.Image):
+                # 多个线程共用同一张 PNG，先在锁内解码
+                img.load()
 
             if len(self._cache) >= self._max_cache:
                 oldest = self._access_order.pop(0)
@@ -112,18 +119,16 @@ def crop_question_image(
             min_y = min(b.y1 for b in page_bboxes)
             max_y = max(b.y2 for b in page_bboxes)
             crop_box = (0, min_y, page_img.width, max_y)
-            cropped = page_img.crop(crop_box)
-            images.append(cropped.copy())
+            images.append(page_img.crop(crop_box))
         else:
             page_image_path = workdir / f"{page_name}.png"
-            if not page_image_path.is_file():
+            if not page_image_exists(page_image_path):
                 continue
-            with Image.open(page_image_path) as page_img:
+            with open_page_for_crops(page_image_path) as page_img:
                 min_y = min(b.y1 for b in page_bboxes)
                 max_y = max(b.y2 for b in page_bboxes)
                 crop_box = (0, min_y, page_img.width, max_y)
-                cropped = page_img.crop(crop_box)
-                images.append(cropped.copy())
+                images.append(page_img.crop(crop_box))
 
     if not images:
         return None
@@ -179,18 +184,16 @@ def crop_big_question_image(
             min_y = min(b.y1 for b in page_bboxes)
             max_y = max(b.y2 for b in page_bboxes)
             crop_box = (0, min_y, page_img.width, max_y)
-            cropped = page_img.crop(crop_box)
-            images.append(cropped.copy())
+            images.append(page_img.crop(crop_box))
         else:
             page_image_path = workdir / f"{page_name}.png"
-            if not page_image_path.is_file():
+            if not page_image_exists(page_image_path):
                 continue
-            with Image.open(page_image_path) as page_img:
+            with open_page_for_crops(page_image_path) as page_img:
                 min_y = min(b.y1 for b in page_bboxes)
                 max_y = max(b.y2 for b in page_bboxes)
                 crop_box = (0, min_y, page_img.width, max_y)
-                cropped = page_img.crop(crop_box)
-                images.append(cropped.copy())
+                images.append(page_img.crop(crop_box))
 
     if not images:
         return None
@@ -225,16 +228,14 @@ def crop_from_page_span(
             if page_img is None:
                 continue
             crop_box = (0, margin_top, page_img.width, page_img.height - margin_bottom)
-            cropped = page_img.crop(crop_box)
-            images.append(cropped.copy())
+            images.append(page_img.crop(crop_box))
         else:
             page_image_path = workdir / f"{page_name}.png"
-            if not page_image_path.is_file():
+            if not page_image_exists(page_image_path):
                 continue
-            with Image.open(page_image_path) as page_img:
+            with open_page_for_crops(page_image_path) as page_img:
                 crop_box = (0, margin_top, page_img.width, page_img.height - margin_bottom)
-                cropped = page_img.crop(crop_box)
-                images.append(cropped.copy())
+                images.append(page_img.crop(crop_box))
 
     if not images:
         return None
@@ -312,6 +313,9 @@ def process_structure_to_images(
                 except (ValueError, OSError):
                     pass
     
+    if crop_planner_enabled():
+        return run_crop_plan(workdir, plan_crops(structure_doc), output_dir, log=log_fn, max_workers=max_workers)
+
     all_questions: Dict[str, QuestionNode] = {
         q.id: q for q in structure_doc.questions
     }
@@ -0,0 +1,248 @@
+"""
+crop_planner.py - 裁剪计划：每页只解码一次，每张图片只编码一次
+
+同一道题原来要裁剪、PNG 编码三次：
+1. 题目提取步骤 save_questions_for_page 写 questions_page_*/qN.png
+2. add_cross_page_segments 再写跨页续接的 qN_partK.png
+3. 裁剪拼接步骤 process_structure_to_images 根据 structure.json 写 all_questions/
+   （PageImageCache 只保留 5 页，并行裁剪乱序访问页面时同一页会被反复解码）
+
+最终输出只有第 3 步的 all_questions/，前两步的图片是中间产物（meta.json 中的
+crop_box / segments 等坐标信息才是后续步骤需要的）。
+
+本模块由 structure.json 一次性算出所有输出图片需要的页面区域（CropJob），
+然后按页码顺序逐页解码：每页解码一次，裁出落在该页的全部区域后立即释放；
+某张输出图片的最后一页处理完即拼接并交给线程池编码。区域完全相同的输出图片
+只编码一次，其余复制文件。输出与 process_structure_to_images 逐字节相同。
+
+配置：
+- EXAMPAPER_CROP_PLANNER: 1 裁剪拼接步骤使用裁剪计划（默认关闭）
+- EXAMPAPER_PER_PAGE_CROPS: 0 题目提取步骤不再裁剪编码 questions_page_*/ 下的
+  题目图片与跨页续接图片，meta.json 照常写出（image 字段为 null）；默认 1
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+
+from PIL import Image
+
+from ....common import compose_vertical, open_page_for_crops, page_image_exists, page_index
+from .structure_detection import BBox, BigQuestion, QuestionNode, StructureDoc
+
+# 与 crop_from_page_span 相同：没有精确 bbox 时整页裁剪去掉的上下边距
+SPAN_MARGIN_TOP = 100
+SPAN_MARGIN_BOTTOM = 150
+
+
+def crop_planner_enabled() -> bool:
+    """裁剪拼接步骤是否使用裁剪计划（EXAMPAPER_CROP_PLANNER=1）。"""
+    return (os.getenv("EXAMPAPER_CROP_PLANNER", "0") or "").strip() == "1"
+
+
+def per_page_crops_enabled() -> bool:
+    """题目提取步骤是否写出每页的题目图片（EXAMPAPER_PER_PAGE_CROPS，默认 1）。"""
+    return (os.getenv("EXAMPAPER_PER_PAGE_CROPS", "1") or "").strip() != "0"
+
+
+@dataclass(frozen=True)
+class CropPiece:
+    """一页上的一个裁剪区域（整页宽度）；y1/y2 为 None 时按页面范围去掉上下边距。"""
+    page: str
+    y1: Optional[int] = None
+    y2: Optional[int] = None
+
+    def box(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        if self.y1 is None or self.y2 is None:
+            return (0, SPAN_MARGIN_TOP, width, height - SPAN_MARGIN_BOTTOM)
+        return (0, self.y1, width, self.y2)
+
+
+@dataclass(frozen=True)
+class CropJob:
+    """一张输出图片：各页区域按页码顺序竖直拼接。"""
+    name: str
+    label: str  # 日志中的题目名称（q12 / data_analysis_1）
+    kind: str  # "normal" | "big"
+    pieces: Tuple[CropPiece, ...]
+
+
+def _pieces_from_bboxes(bboxes: List[BBox]) -> Tuple[CropPiece, ...]:
+    """每页取所有 bbox 的纵向范围（与 crop_question_image 相同）。"""
+    page_to_bboxes: Dict[str, List[BBox]] = {}
+    for bbox in bboxes:
+        page_to_bboxes.setdefault(bbox.page, []).append(bbox)
+    return tuple(
+        CropPiece(
+            page=page_name,
+            y1=min(b.y1 for b in page_to_bboxes[page_name]),
+            y2=max(b.y2 for b in page_to_bboxes[page_name]),
+        )
+        for page_name in sorted(page_to_bboxes, key=page_index)
+    )
+
+
+def _big_question_pieces(
+    big_question: BigQuestion, all_questions: Dict[str, QuestionNode]
+) -> Tuple[CropPiece, ...]:
+    """资料分析大题：材料区域 + 所有子题（与 crop_big_question_image 相同）。"""
+    bboxes: List[BBox] = list(big_question.material_bboxes)
+    for sub_id in big_question.sub_question_ids:
+        sub_q = all_questions.get(sub_id)
+        if sub_q:
+            bboxes.extend(sub_q.bboxes)
+    if not bboxes:
+        # 备选：页面范围（crop_from_page_span）
+        return tuple(CropPiece(page=p) for p in sorted(big_question.page_span, key=page_index))
+    return _pieces_from_bboxes(bboxes)
+
+
+def plan_crops(structure_doc: StructureDoc) -> List[CropJob]:
+    """由结构文档计算所有输出图片（普通题在前，资料分析大题在后）。"""
+    da_qnos = structure_doc.get_data_analysis_qnos()
+    all_questions = {q.id: q for q in structure_doc.questions}
+
+    jobs: List[CropJob] = []
+    for q in structure_doc.questions:
+        if q.kind != "normal" or q.qno in da_qnos or q.qno is None:
+            continue
+        jobs.append(CropJob(
+            name=f"q{q.qno}.png",
+            label=f"q{q.qno}",
+            kind="normal",
+            pieces=_pieces_from_bboxes(q.bboxes),
+        ))
+    for big_q in structure_doc.big_questions:
+        jobs.append(CropJob(
+            name=f"{big_q.id}.png",
+            label=big_q.id,
+            kind="big",
+            pieces=_big_question_pieces(big_q, all_questions),
+        ))
+    return jobs
+
+
+def _encode(image: Image.Image, out_path: Path, copies: List[Path]) -> None:
+    image.save(out_path)
+    image.close()
+    for copy_path in copies:
+        shutil.copyfile(out_path, copy_path)
+
+
+def run_crop_plan(
+    workdir: Path,
+    jobs: List[CropJob],
+    output_dir: Path,
+    log: Optional[Callable[[str], None]] = None,
+    max_workers: int = 0,
+) -> Tuple[List[str], List[str]]:
+    """
+    执行裁剪计划。
+
+    Returns:
+        (normal_paths, big_paths): 与 process_structure_to_images 相同（按计划顺序）
+    """
+    log_fn = log or (lambda m: None)
+
+    # 区域完全相同的输出图片只编码一次
+    primary_of: Dict[Tuple[CropPiece, ...], CropJob] = {}
+    copies: Dict[str, List[Path]] = {}
+    for job in jobs:
+        if job.pieces and job.pieces in primary_of:
+            copies[primary_of[job.pieces].name].append(output_dir / job.name)
+        else:
+            primary_of.setdefault(job.pieces, job)
+            copies[job.name] = []
+    primaries = [job for job in jobs if job.name in copies]
+
+    # 每页需要裁剪的区域、每个区域被几张图片使用，以及每张图片的最后一页
+    pieces_by_page: Dict[str, List[CropPiece]] = {}
+    refs: Dict[CropPiece, int] = {}
+    last_page_jobs: Dict[str, List[CropJob]] = {}
+    for job in primaries:
+        for piece in job.pieces:
+            if piece not in refs:
+                pieces_by_page.setdefault(piece.page, []).append(piece)
+            refs[piece] = refs.get(piece, 0) + 1
+        if job.pieces:
+            last_page = max((p.page for p in job.pieces), key=page_index)
+            last_page_jobs.setdefault(last_page, []).append(job)
+
+    workers = max_workers if max_workers > 0 else min(os.cpu_count() or 4, 6)
+    log_fn(
+        f"裁剪计划: {sum(j.kind == 'normal' for j in jobs)} 道普通题 + "
+        f"{sum(j.kind == 'big' for j in jobs)} 个大题, {len(pieces_by_page)} 页各解码一次, "
+        f"{len(primaries)} 张图片编码 (workers={workers})"
+    )
+
+    # 已裁出、仍有图片要用的区域；页面图片不存在时为 None（与逐题裁剪一样跳过该页）
+    crops: Dict[CropPiece, Optional[Image.Image]] = {}
+    encoded: Dict[str, Future] = {}
+    # 等待编码的图片数有上限，裁剪不会远远跑在编码前面占满内存
+    pending: Deque[Future] = deque()
+
+    def _release(piece: CropPiece) -> Optional[Image.Image]:
+        """图片用完一个区域；最后一个使用者拿走该区域（返回它），否则返回 None。"""
+        refs[piece] -= 1
+        if refs[piece] == 0:
+            return crops.pop(piece)
+        return None
+
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for page_name in sorted(pieces_by_page, key=page_index):
+                page_path = workdir / f"{page_name}.png"
+                if page_image_exists(page_path):
+                    with open_page_for_crops(page_path) as page_img:
+                        for piece in pieces_by_page[page_name]:
+                            crops[piece] = page_img.crop(piece.box(page_img.width, page_img.height))
+                else:
+                    for piece in pieces_by_page[page_name]:
+                        crops[piece] = None
+
+                for job in last_page_jobs.get(page_name, []):
+                    images = [crops[p] for p in job.pieces if crops[p] is not None]
+                    image: Optional[Image.Image] = None
+                    if len(images) > 1:
+                        image = compose_vertical(images)
+                    for piece in job.pieces:
+                        owned = _release(piece)
+                        if owned is None:
+                            continue
+                        if len(images) == 1 and owned is images[0]:
+                            # 单个区域的最后一个使用者直接拿去编码
+                            image = owned
+                        else:
+                            owned.close()
+                    if not images:
+                        continue
+                    if image is None:
+                        # 单个区域还有其他图片要用：编码副本
+                        image = images[0].copy()
+                    future = executor.submit(_encode, image, output_dir / job.name, copies[job.name])
+                    encoded[job.name] = future
+                    pending.append(future)
+                    while len(pending) > workers * 2:
+                        pending.popleft().result()
+            for future in encoded.values():
+                future.result()
+    finally:
+        for crop in crops.values():
+            if crop is not None:
+                crop.close()
+
+    normal_paths: List[str] = []
+    big_paths: List[str] = []
+    for job in jobs:
+        if primary_of.get(job.pieces, job).name in encoded:
+            paths = normal_paths if job.kind == "normal" else big_paths
+            paths.append(str(output_dir / job.name))
+        else:
+            log_fn(f"  警告: 无法裁剪 {job.label}")
+    return normal_paths, big_paths
@@ -7,17 +7,19 @@ extract_questions.py - 题目提取核心逻辑
 
 from __future__ import annotations
 
+import functools
 import json
 import os
 import re
+import shutil
 import time
+from contextlib import nullcontext
 from pathlib import Path
 from typing import Any, Callable, Dict, List, Optional, Set, Tuple
 
-from PIL import Image
-
 from ....common import (
     QUESTION_HEAD_PATTERN,
+    KeywordMatcher,
     load_meta,
     save_meta,
     layout_blocks_from_doc,
@@ -25,16 +27,23 @@ from ....common import (
     detect_section_boundaries,
     detect_continuation_blocks,
     compute_smart_crop_box,
+    decode_page_image,
+    open_page_for_crops,
+    page_image_size,
+    page_index,
 )
 from ....common.perf import perf_enabled, perf_event, perf_span
 
 
 # 资料分析开头提示模式
+INTRO_KEYWORDS = ["资料分析"]
 INTRO_PATTERNS = [
-    re.compile(r"资料分析"),
     re.compile(r"(根据|依据).{0,12}(资料|材料|图表)"),
     re.compile(r"回答\s*\d+\s*[-~－—]\s*\d+\s*题"),
 ]
+_INTRO_MATCHER = KeywordMatcher(
+    keywords={"intro": INTRO_KEYWORDS}, patterns={"intro": INTRO_PATTERNS}, compact_patterns=True
+)
 
 
 def find_question_spans(
@@ -83,6 +92,8 @@ def extract_questions_from_page(
     pipeline: Any,
     workdir: Optional[Path] = None,
     use_cache: bool = True,
+    image: Optional[Any] = None,
+    page_overrides: Optional[Dict[str, str]] = None,
 ) -> List[Dict[str, Any]]:
     """
     Run PP-StructureV3 on a single page image and return a list of question structures.
@@ -92,11 +103,14 @@ def extract_questions_from_page(
         pipeline: PP-StructureV3 pipeline instance
         workdir: Working directory for OCR cache (if None, no caching)
         use_cache: Whether to use/save OCR cache
+        image: Optional pre-decoded page (DecodedPage) from the decode-ahead stage
+        page_overrides: Per-exam page overrides loaded once per run (see page_classifier)
 
     Returns:
         List of question dictionaries with crop boxes, text/table blocks
     """
     from .ocr_cache import run_ocr_with_cache, save_ocr_cache
+    from .ocr_preprocess import OcrInputTransform, ocr_input_needs_pixels
 
     page_name = img_path.stem
     try:
@@ -107,27 +121,39 @@ def extract_questions_from_page(
     # Use OCR cache if workdir is provided
     if workdir and use_cache:
         with perf_span("page.ocr", page=page_name, input_bytes=input_bytes):
-            blocks, image_size = run_ocr_with_cache(pipeline, img_path, workdir)
+            blocks, image_size = run_ocr_with_cache(
+                pipeline, img_path, workdir, image=image, page_overrides=page_overrides
+            )
     else:
+        transform = None
+        model_input: Any = str(img_path)
+        if image is None and ocr_input_needs_pixels():
+            image = decode_page_image(img_path)
+        if image is not None:
+            transform = OcrInputTransform.for_decoded_page(image)
+            model_input = transform.prepare(image).model_input()
         with perf_span("page.predict", page=page_name, input_bytes=input_bytes):
-            doc = pipeline.predict(str(img_path))[0]
+            doc = pipeline.predict(model_input)[0]
         with perf_span("page.blocks.normalize", page=page_name):
             blocks = layout_blocks_from_doc(doc)
+            if transform is not None:
+                transform.to_page_blocks(blocks)
         # Save to cache if workdir provided
         if workdir:
             # Need page_size for save_ocr_cache, load image to get it
-            with Image.open(img_path) as im:
-                page_size = (im.width, im.height)
+            if image is not None:
+                page_size = (image.width, image.height)
+            else:
+                page_size = page_image_size(img_path)
             save_ocr_cache(workdir, img_path.stem, blocks, page_size)
 
-        image_size = (0, 0)
+        image_size = (image.width, image.height) if image is not None else (0, 0)
 
     # page_size: prefer cached size to avoid reopening image
     page_size = image_size
     if not page_size or page_size == (0, 0):
         with perf_span("page.image.open_fallback", page=page_name):
-            with Image.open(img_path) as im:
-                page_size = (im.width, im.height)
+            page_size = page_image_size(img_path)
 
     with perf_span("page.section_boundaries", page=page_name, blocks=len(blocks)):
         section_boundaries = detect_section_boundaries(blocks)
@@ -238,7 +264,7 @@ def looks_like_new_section_intro(blocks: List[Dict[str, Any]]) -> bool:
         return False
     blob = "".join(texts).replace("\n", "")
     blob_compact = "".join(blob.split())
-    return any((p.search(blob) is not None) or (p.search(blob_compact) is not None) for p in INTRO_PATTERNS)
+    return bool(_INTRO_MATCHER.match_views(blob, blob_compact))
 
 
 def save_questions_for_page(
@@ -255,6 +281,8 @@ def save_questions_for_page(
     Returns:
         Page summary dictionary
     """
+    from .crop_planner import per_page_crops_enabled
+
     page_name = img_path.stem
     pretty = (os.getenv("EXAMPAPER_META_PRETTY", "0") or "").strip() == "1"
     png_optimize = (os.getenv("EXAMPAPER_PNG_OPTIMIZE", "0") or "").strip() == "1"
@@ -276,32 +304,35 @@ def save_questions_for_page(
     }
 
     crop_total_ms = 0.0
-    with perf_span("page.save.crops", page=page_name, crop_count=len(questions)):
-        # Open image once and keep it loaded for all crops
-        with Image.open(img_path) as img:
-            img.load()  # Force load into memory
+    # 关闭每页题目图片时不解码页面，最终图片由裁剪拼接步骤根据 structure.json 生成
+    write_crops = per_page_crops_enabled()
+    with perf_span("page.save.crops", page=page_name, crop_count=len(questions) if write_crops else 0):
+        # Open the page once for all crops (raw pages copy only each cropped region)
+        with (open_page_for_crops(img_path) if write_crops else nullcontext()) as img:
             for q in questions:
                 qno = q["qno"]
-                crop_box = q["crop_box_image"]
-                crop_img = img.crop(tuple(crop_box))
-                img_name = f"q{qno}.png"
-                out_img_path = page_out_dir / img_name
-
-                t0 = time.perf_counter()
-                if out_img_path.suffix.lower() == ".png":
-                    crop_img.save(out_img_path, optimize=png_optimize, compress_level=png_compress)
-                else:
-                    crop_img.save(out_img_path)
-                crop_total_ms += (time.perf_counter() - t0) * 1000.0
+                rel_path: Optional[Path] = None
+                if img is not None:
+                    crop_box = q["crop_box_image"]
+                    crop_img = img.crop(tuple(crop_box))
+                    img_name = f"q{qno}.png"
+                    out_img_path = page_out_dir / img_name
 
-                try:
-                    rel_path = out_img_path.relative_to(base_output_dir.parent)
-                except ValueError:
-                    rel_path = out_img_path
+                    t0 = time.perf_counter()
+                    if out_img_path.suffix.lower() == ".png":
+                        crop_img.save(out_img_path, optimize=png_optimize, compress_level=png_compress)
+                    else:
+                        crop_img.save(out_img_path)
+                    crop_total_ms += (time.perf_counter() - t0) * 1000.0
+
+                    try:
+                        rel_path = out_img_path.relative_to(base_output_dir.parent)
+                    except ValueError:
+                        rel_path = out_img_path
 
                 page_summary["questions"].append({
                     "qno": qno,
-                    "image": str(rel_path),
+                    "image": str(rel_path) if rel_path is not None else None,
                     "crop_box_image": q["crop_box_image"],
                     "crop_box_blocks": q["crop_box_blocks"],
                     "text_blocks": q["text_blocks"],
@@ -356,15 +387,19 @@ def add_cross_page_segments(
     pipeline: Any,
     base_output_dir: Path,
     log: Optional[Callable[[str], None]] = None,
+    page_overrides: Optional[Dict[str, str]] = None,
 ) -> None:
     """
     处理小题跨两页的续接情况。
 
     为上一道题裁剪续接图片并添加 segments 字段。
     """
+    from .crop_planner import per_page_crops_enabled
     from .ocr_cache import run_ocr_with_cache, has_ocr_cache
 
     log_fn = log or (lambda m: None)
+    # 关闭每页题目图片时只记录续接区域（segments 的 image 为 null），不解码页面
+    write_crops = per_page_crops_enabled()
 
     if not all_page_summaries:
         return
@@ -400,7 +435,9 @@ def add_cross_page_segments(
 
             # Use OCR cache
             try:
-                blocks, _ = run_ocr_with_cache(pipeline, img_path, base_output_dir)
+                blocks, _ = run_ocr_with_cache(
+                    pipeline, img_path, base_output_dir, page_overrides=page_overrides
+                )
             except Exception:
                 blocks = []
             section_boundaries = detect_section_boundaries(blocks)
@@ -410,8 +447,7 @@ def add_cross_page_segments(
             )
 
             if cand_blocks and confidence >= 0.5:
-                img = Image.open(img_path)
-                width, height = img.size
+                width, height = page_image_size(img_path)
                 page_size = (width, height)
 
                 footer_ys: List[int] = []
@@ -506,22 +542,26 @@ def add_cross_page_segments(
                     should_block = True
 
                 if not should_block and right > left and bottom > top:
-                    page_out_dir = base_output_dir / f"questions_{page_name}"
-                    page_out_dir.mkdir(parents=True, exist_ok=True)
-
                     qno = last_q_entry.get("qno")
                     segments: List[Dict[str, Any]] = last_q_entry.get("segments") or []
-                    next_part_idx = 2 if not segments else len(segments) + 1
-                    img_name = f"q{qno}_part{next_part_idx}.png"
-                    out_img_path = page_out_dir / img_name
+                    rel_path: Optional[Path] = None
 
-                    crop_img = img.crop(crop_box)
-                    crop_img.save(out_img_path)
+                    if write_crops:
+                        page_out_dir = base_output_dir / f"questions_{page_name}"
+                        page_out_dir.mkdir(parents=True, exist_ok=True)
 
-                    try:
-                        rel_path = out_img_path.relative_to(base_output_dir.parent)
-                    except ValueError:
-                        rel_path = out_img_path
+                        next_part_idx = 2 if not segments else len(segments) + 1
+                        img_name = f"q{qno}_part{next_part_idx}.png"
+                        out_img_path = page_out_dir / img_name
+
+                        with open_page_for_crops(img_path) as img:
+                            crop_img = img.crop(crop_box)
+                        crop_img.save(out_img_path)
+
+                        try:
+                            rel_path = out_img_path.relative_to(base_output_dir.parent)
+                        except ValueError:
+                            rel_path = out_img_path
 
                     if not segments:
                         segments.append({
@@ -531,7 +571,7 @@ def add_cross_page_segments(
                         })
                     segments.append({
                         "page": page_name,
-                        "image": str(rel_path),
+                        "image": str(rel_path) if rel_path is not None else None,
                         "box": list(crop_box),
                         "confidence": confidence,
                     })
@@ -561,6 +601,8 @@ def run_extract_questions(
     max_workers: int = 4,
     progress_callback: Optional[Callable[[int, int, str, str], None]] = None,
     gpu_semaphore: Optional[Any] = None,
+    page_stream: Optional[Any] = None,
+    quality_pipeline_factory: Optional[Callable[[], Any]] = None,
 ) -> bool:
     """
     主入口：从页面图片中提取题目。
@@ -575,6 +617,9 @@ def run_extract_questions(
         max_workers: 并行 worker 数量
         progress_callback: 进度回调 (done, total, status, page_name)
         gpu_semaphore: 可选的GPU信号量（用于跨任务GPU并发控制）
+        page_stream: 可选的 PageStream（与 PDF 渲染步骤融合时，边渲染边识别；忽略 pages）
+        quality_pipeline_factory: 返回高精度 pipeline 的函数；EXAMPAPER_OCR_QUALITY_PASS=1 时
+            用它重新识别可疑页面（见 ocr_quality）
 
     Returns:
         处理是否成功
@@ -585,14 +630,41 @@ def run_extract_questions(
     img_dir = Path(img_dir)
 
     # 收集页面图片
-    page_paths = sorted(img_dir.glob("page_*.png"))
-    if pages:
-        wanted = {str(p) for p in pages}
-        page_paths = [p for p in page_paths if p.stem in wanted or p.name in wanted]
+    if page_stream is not None:
+        page_paths: List[Path] = []
+        total = page_stream.wait_total()
+        if total == 0:
+            log_fn("PDF 没有任何页面")
+            return False
+    else:
+        page_paths = sorted(img_dir.glob("page_*.png"))
+        if pages:
+            wanted = {str(p) for p in pages}
+            page_paths = [p for p in page_paths if p.stem in wanted or p.name in wanted]
+
+        if not page_paths:
+            log_fn("未找到任何 page_*.png 图片")
+            return False
+        total = len(page_paths)
 
-    if not page_paths:
-        log_fn("未找到任何 page_*.png 图片")
-        return False
+    # 整卷提取时边识别边构建结构文档（见 incremental_structure）
+    from .incremental_structure import IncrementalStructureWriter, incremental_structure_enabled
+    from .structure_detection import has_structure_doc
+
+    structure_writer: Optional[IncrementalStructureWriter] = None
+    if incremental_structure_enabled() and (page_stream is not None or not pages) and not has_structure_doc(img_dir):
+        if page_stream is not None:
+            page_names = [f"page_{i}" for i in range(1, total + 1)]
+        else:
+            page_names = [p.stem for p in page_paths]
+        structure_writer = IncrementalStructureWriter(img_dir, page_names, log=log_fn)
+        progress_callback = structure_writer.wrap_progress(progress_callback)
+
+    # 人工覆盖每次运行只读取一次
+    from .page_classifier import load_page_overrides
+
+    page_overrides = load_page_overrides(img_dir)
+    extract_page = functools.partial(extract_questions_from_page, page_overrides=page_overrides)
 
     if parallel:
         processor = ParallelPageProcessor(
@@ -601,7 +673,7 @@ def run_extract_questions(
             gpu_semaphore=gpu_semaphore,  # Pass shared GPU semaphore
         )
         processor.set_extraction_functions(
-            extract_fn=extract_questions_from_page,
+            extract_fn=extract_page,
             save_fn=save_questions_for_page,
             is_valid_meta_fn=is_valid_meta,
         )
@@ -611,34 +683,38 @@ def run_extract_questions(
             skip_existing=skip_existing,
             progress_callback=progress_callback,
             log=log_fn,
+            page_stream=page_stream,
         )
         all_page_summaries = [r.get("summary") for r in results if r.get("summary")]
     else:
-        all_page_summaries: List[Dict[str, Any]] = []
-        total = len(page_paths)
+        # 流式模式下页面乱序到达，按页码收集后再排序
+        summaries_by_idx: Dict[int, Dict[str, Any]] = {}
+        page_iter = page_stream if page_stream is not None else enumerate(page_paths)
+        done = 0
 
-        for idx, img_path in enumerate(page_paths):
+        for idx, img_path in page_iter:
+            done += 1
             page_name = img_path.stem
             meta_path = img_dir / f"questions_{page_name}" / "meta.json"
 
             if skip_existing and is_valid_meta(meta_path):
                 log_fn(f"  [跳过] {page_name}")
                 if progress_callback:
-                    progress_callback(idx + 1, total, "skipped", page_name)
+                    progress_callback(done, total, "skipped", page_name)
                 try:
                     with meta_path.open("r", encoding="utf-8") as f:
-                        all_page_summaries.append(json.load(f))
+                        summaries_by_idx[idx] = json.load(f)
                 except Exception:
                     pass
                 continue
 
             log_fn(f"  [处理] {page_name}")
-            questions = extract_questions_from_page(img_path, pipeline, workdir=img_dir)
+            questions = extract_page(img_path, pipeline, workdir=img_dir)
 
             if not questions:
                 log_fn(f"    未检测到题目")
                 if progress_callback:
-                    progress_callback(idx + 1, total, "empty", page_name)
+                    progress_callback(done, total, "empty", page_name)
                 continue
 
             summary = save_questions_for_page(
@@ -646,10 +722,47 @@ def run_extract_questions(
                 questions=questions,
                 base_output_dir=img_dir,
             )
-            all_page_summaries.append(summary)
+            summaries_by_idx[idx] = summary
 
             if progress_callback:
-                progress_callback(idx + 1, total, "success", page_name)
+                progress_callback(done, total, "success", page_name)
+
+        all_page_summaries = [summaries_by_idx[i] for i in sorted(summaries_by_idx)]
+
+    if page_stream is not None:
+        page_paths = page_stream.paths()
+
+    # 可疑页面（缺号、无正文、内容过少）用高精度配置重新识别
+    from .ocr_quality import ocr_quality_pass_enabled, run_ocr_quality_pass
+
+    if quality_pipeline_factory is not None and ocr_quality_pass_enabled():
+        summaries_by_page = {s["page_name"]: s for s in all_page_summaries}
+
+        def _refresh_page(img_path: Path) -> None:
+            # 缓存已更新：从缓存重新切题并覆盖该页的题目图片与 meta.json
+            questions = extract_page(img_path, pipeline, workdir=img_dir)
+            if questions:
+                summaries_by_page[img_path.stem] = save_questions_for_page(
+                    img_path=img_path,
+                    questions=questions,
+                    base_output_dir=img_dir,
+                )
+            else:
+                # 新结果里没有题目：删除旧的题目输出，否则旧题目仍会进入结果
+                summaries_by_page.pop(img_path.stem, None)
+                shutil.rmtree(img_dir / f"questions_{img_path.stem}", ignore_errors=True)
+            if structure_writer is not None:
+                structure_writer.page_done(img_path.stem)
+
+        updated = run_ocr_quality_pass(
+            img_dir,
+            quality_pipeline_factory,
+            log=log_fn,
+            gpu_semaphore=gpu_semaphore,
+            on_page_updated=_refresh_page,
+        )
+        if updated:
+            all_page_summaries = sorted(summaries_by_page.values(), key=lambda s: page_index(s["page_name"]))
 
     # 处理跨页续接
     if all_page_summaries:
@@ -659,6 +772,23 @@ def run_extract_questions(
             pipeline=pipeline,
             base_output_dir=img_dir,
             log=log_fn,
+            page_overrides=page_overrides,
         )
 
+    # 后台写入的 OCR 缓存落盘后再返回：后续步骤（及其他进程）从磁盘读取
+    from .ocr_cache import failed_ocr_cache_writes, flush_ocr_cache_writes
+
+    if not flush_ocr_cache_writes(img_dir, timeout=120):
+        failed = failed_ocr_cache_writes(img_dir)
+        if failed:
+            for page_name, error in sorted(failed.items(), key=lambda kv: page_index(kv[0])):
+                log_fn(f"OCR 缓存写入失败 {page_name}: {error}")
+        else:
+            log_fn("OCR 缓存后台写入未在超时内完成")
+        return False
+
+    # 缓存已全部落盘，结构文档才可以写出
+    if structure_writer is not None:
+        structure_writer.commit()
+
     return True
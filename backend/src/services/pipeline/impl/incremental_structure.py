@@ -0,0 +1,127 @@
+"""
+incremental_structure.py - OCR 进行中增量构建结构文档
+
+AnalyzeDataStep 要等所有页面 OCR 完成（is_ocr_complete）后才开始，再用
+load_all_ocr_caches 把整卷重新读一遍，然后才构建结构文档。
+
+启用后，题目提取步骤每完成一页（识别、命中缓存或被分类器跳过）就把该页的
+OCR 结果交给 StructureBuilder；乱序完成的页面由构建器的重排缓冲区按页码排好。
+高精度重新识别替换某页缓存后，构建器重放该页，保证与从缓存重新构建的结果相同。
+
+整卷到齐后，题目提取在 OCR 缓存全部落盘（flush_ocr_cache_writes 成功）之后
+调用 commit() 写出 structure.json，AnalyzeDataStep 看到结构文档已存在直接跳过
+（手动模式仍会删除后重建）。有页面识别失败（没有缓存）或缓存落盘失败时不会
+写出结构文档，由 AnalyzeDataStep 照常处理：结构文档不会领先于磁盘上的缓存。
+
+配置：
+- EXAMPAPER_INCREMENTAL_STRUCTURE: 1 启用（默认关闭）
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Iterable, Optional
+
+from .ocr_cache import load_ocr_cache
+from .structure_detection import StructureBuilder, get_structure_path
+
+logger = logging.getLogger(__name__)
+
+
+def incremental_structure_enabled() -> bool:
+    """是否在 OCR 进行中增量构建结构文档（EXAMPAPER_INCREMENTAL_STRUCTURE=1）。"""
+    return (os.getenv("EXAMPAPER_INCREMENTAL_STRUCTURE", "0") or "").strip() == "1"
+
+
+class IncrementalStructureWriter:
+    """
+    接收题目提取的逐页完成通知，整卷到齐且缓存落盘后由 commit() 写出 structure.json。
+
+    进度回调来自多个 worker 线程，所有操作在锁内进行。任何异常只记录日志并停用
+    增量构建，不影响题目提取本身。
+    """
+
+    def __init__(
+        self,
+        workdir: Path,
+        page_names: Iterable[str],
+        log: Optional[Callable[[str], None]] = None,
+    ) -> None:
+        self._workdir = Path(workdir)
+        self._log = log or (lambda m: None)
+        self._builder = StructureBuilder(page_names, log=self._log)
+        self._lock = threading.Lock()
+        self._disabled = False
+        self._dirty = False
+        self._writes = 0
+
+    @property
+    def written(self) -> bool:
+        """structure.json 是否已由本次提取写出。"""
+        return self._writes > 0
+
+    def page_done(self, page_name: str) -> None:
+        """某页 OCR 缓存已就绪（或已被替换）：加入构建器。"""
+        with self._lock:
+            if self._disabled:
+                return
+            try:
+                data = load_ocr_cache(self._workdir, page_name)
+                if data is None:
+                    # 识别失败的页面：结构文档留给 AnalyzeDataStep
+                    return
+                self._builder.add_page(page_name, data)
+                self._dirty = True
+            except Exception as e:
+                self._disabled = True
+                logger.warning("增量结构构建失败（%s），改由结构检测步骤构建: %s", page_name, e)
+                self._log(f"[结构] 增量构建失败，改由结构检测步骤构建: {e}")
+
+    def commit(self) -> bool:
+        """
+        OCR 缓存已全部落盘后调用：整卷到齐时写出（或更新）structure.json。
+
+        Returns:
+            structure.json 是否已由本次提取写出
+        """
+        with self._lock:
+            if self._disabled or not self._dirty or not self._builder.complete:
+                return self.written
+            try:
+                self._write()
+                self._dirty = False
+            except Exception as e:
+                self._disabled = True
+                logger.warning("写出增量结构文档失败，改由结构检测步骤构建: %s", e)
+                self._log(f"[结构] 写出结构文档失败，改由结构检测步骤构建: {e}")
+            return self.written
+
+    def _write(self) -> None:
+        doc = self._builder.finish()
+        path = get_structure_path(self._workdir)
+        # 临时文件 + os.replace：不会留下写了一半、又被当作已完成的结构文档
+        tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+        doc.save(tmp_path)
+        os.replace(tmp_path, path)
+        self._writes += 1
+        normal_count = len(doc.get_normal_questions())
+        action = "已生成" if self._writes == 1 else "已更新"
+        self._log(
+            f"[结构] 全部 {doc.total_pages} 页识别完成，{action} structure.json: "
+            f"{normal_count} 道普通题, {len(doc.big_questions)} 个资料分析大题"
+        )
+
+    def wrap_progress(
+        self, progress_callback: Optional[Callable[[int, int, str, str], None]]
+    ) -> Callable[[int, int, str, str], None]:
+        """包装题目提取的进度回调 (done, total, status, page_name)：先通知本构建器。"""
+
+        def _callback(done: int, total: int, status: str, page_name: str) -> None:
+            self.page_done(page_name)
+            if progress_callback is not None:
+                progress_callback(done, total, status, page_name)
+
+        return _callback
@@ -0,0 +1,351 @@
+"""
+ocr_binary.py - 紧凑二进制 OCR 缓存格式（page_N.bin）
+
+JSON 缓存需要整体解析（包括超长的表格 HTML），而 build_structure_doc 只遍历
+label / bbox / 文本。二进制格式把定长字段放在数组里，字符串放在独立的
+blob 区，按需解码。读取时通过 mmap 映射文件：
+- 完整解码：解码后立即关闭映射
+- 按需解码（lazy）：blocks 直接引用映射，content / extra 首次访问时才解码；
+  映射由调用方持有，用完调用 close_lazy_pages（或 ocr_cache.open_ocr_caches），
+  在此之前不要改写这些缓存文件
+
+文件布局（小端）：
+    header   : magic "EXOC", version, image_w, image_h, n_blocks, n_labels,
+               labels_off, records_off, blob_off, meta_off
+    labels   : n_labels 个 (u16 长度 + UTF-8)，label / region_label 共用
+    records  : n_blocks 个定长记录
+               (index, label_code, region_code, flags, bbox[4] f64,
+                content_off, content_len, extra_off, extra_len)
+    blob     : content 与 extra(JSON) 字符串
+    meta     : 页级附加字段 JSON（page_name、source 等），直到文件末尾
+"""
+
+from __future__ import annotations
+
+import json
+import mmap
+import os
+import struct
+import threading
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+MAGIC = b"EXOC"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHIIIIIIII")
+_RECORD = struct.Struct("<iHHB3x4dIIII")
+_LABEL_LEN = struct.Struct("<H")
+
+_NO_LABEL = 0xFFFF
+_FLAG_BBOX_INT = 0x01
+
+# 定长字段之外的块字段（如 content_truncated）存入 extra
+_BLOCK_KEYS = ("index", "label", "region_label", "bbox", "content")
+
+
+class OcrBinaryError(ValueError):
+    """二进制缓存文件损坏或版本不兼容。"""
+
+    pass
+
+
+def encode_ocr_page(cache_data: Dict[str, Any]) -> bytes:
+    """
+    将单页缓存数据（与 JSON 缓存同结构）编码为二进制。
+
+    Args:
+        cache_data: {"page_name", "image_width", "image_height", "blocks", ...}
+    """
+    blocks: List[Dict[str, Any]] = list(cache_data.get("blocks") or [])
+
+    label_codes: Dict[str, int] = {}
+
+    def code_of(label: Any) -> int:
+        if label is None:
+            return _NO_LABEL
+        label = str(label)
+        if label not in label_codes:
+            label_codes[label] = len(label_codes)
+        return label_codes[label]
+
+    blob = bytearray()
+    records = bytearray()
+    for blk in blocks:
+        bbox = list(blk.get("bbox") or [0, 0, 0, 0])[:4]
+        bbox += [0] * (4 - len(bbox))
+        flags = _FLAG_BBOX_INT if all(isinstance(v, int) for v in bbox) else 0
+
+        content = blk.get("content", "")
+        content_b = (content if isinstance(content, str) else str(content)).encode("utf-8")
+        content_off = len(blob)
+        blob += content_b
+
+        extra = {k: v for k, v in blk.items() if k not in _BLOCK_KEYS}
+        extra_b = json.dumps(extra, ensure_ascii=False).encode("utf-8") if extra else b""
+        extra_off = len(blob)
+        blob += extra_b
+
+        records += _RECORD.pack(
+            int(blk.get("index", 0) or 0),
+            code_of(blk.get("label")),
+            code_of(blk.get("region_label")),
+            flags,
+            *(float(v) for v in bbox),
+            content_off,
+            len(content_b),
+            extra_off,
+            len(extra_b),
+        )
+
+    labels = bytearray()
+    for label in label_codes:
+        raw = label.encode("utf-8")
+        labels += _LABEL_LEN.pack(len(raw)) + raw
+
+    meta = {
+        k: v
+        for k, v in cache_data.items()
+        if k not in ("image_width", "image_height", "blocks")
+    }
+    meta_b = json.dumps(meta, ensure_ascii=False).encode("utf-8")
+
+    labels_off = _HEADER.size
+    records_off = labels_off + len(labels)
+    blob_off = records_off + len(records)
+    meta_off = blob_off + len(blob)
+
+    header = _HEADER.pack(
+        MAGIC,
+        VERSION,
+        0,
+        int(cache_data.get("image_width", 0) or 0),
+        int(cache_data.get("image_height", 0) or 0),
+        len(blocks),
+        len(label_codes),
+        labels_off,
+        records_off,
+        blob_off,
+        meta_off,
+    )
+    return b"".join((header, bytes(labels), bytes(records), bytes(blob), meta_b))
+
+
+def write_ocr_page(path: Path, cache_data: Dict[str, Any]) -> int:
+    """原子写入二进制缓存文件，返回写入字节数。"""
+    raw = encode_ocr_page(cache_data)
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    tmp.write_bytes(raw)
+    os.replace(tmp, path)
+    return len(raw)
+
+
+class LazyBlock(Mapping):
+    """
+    只读版面块视图：定长字段在构造时解码，content / extra 首次访问时才解码。
+
+    支持 block.get("label") / block["bbox"] 等 Mapping 用法；
+    需要普通 dict 时调用 to_dict()。
+    """
+
+    __slots__ = ("_page", "_fields", "_content_span", "_extra_span", "_content", "_extra")
+
+    def __init__(
+        self,
+        page: "OcrBinaryPage",
+        fields: Dict[str, Any],
+        content_span: Tuple[int, int],
+        extra_span: Tuple[int, int],
+    ) -> None:
+        self._page = page
+        self._fields = fields
+        self._content_span = content_span
+        self._extra_span = extra_span
+        self._content: Optional[str] = None
+        self._extra: Optional[Dict[str, Any]] = None
+
+    def _get_extra(self) -> Dict[str, Any]:
+        if self._extra is None:
+            raw = self._page._blob_str(*self._extra_span)
+            self._extra = json.loads(raw) if raw else {}
+        return self._extra
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "content":
+            if self._content is None:
+                self._content = self._page._blob_str(*self._content_span)
+            return self._content
+        if key in self._fields:
+            return self._fields[key]
+        if self._extra_span[1]:
+            return self._get_extra()[key]
+        raise KeyError(key)
+
+    def __iter__(self) -> Iterator[str]:
+        yield from _BLOCK_KEYS
+        if self._extra_span[1]:
+            yield from self._get_extra()
+
+    def __len__(self) -> int:
+        return len(_BLOCK_KEYS) + (len(self._get_extra()) if self._extra_span[1] else 0)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {k: self[k] for k in self}
+
+
+class OcrBinaryPage:
+    """
+    读取 page_N.bin（默认 mmap 映射，用完调用 close() 或使用 with 语句）。
+
+    header、label 表与定长记录在打开时解析；字符串按需从 blob 区解码，因此关闭
+    映射后不能再访问尚未解码的 content / extra。use_mmap=False 时整个文件读入
+    内存，无需关闭。
+    也可以通过 from_buffer 解析更大缓冲区中的一段（如 pages.pack 中的单页记录）。
+    """
+
+    def __init__(self, path: Path, use_mmap: bool = True) -> None:
+        self.path = Path(path)
+        self._mmap: Optional[mmap.mmap] = None
+        with self.path.open("rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < _HEADER.size:
+                raise OcrBinaryError(f"truncated OCR cache: {self.path}")
+            buf: Any
+            if use_mmap:
+                buf = self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                buf = f.read()
+        try:
+            self._parse(buf, 0, size)
+        except BaseException:
+            self.close()
+            raise
+
+    @classmethod
+    def from_buffer(cls, buf: Any, offset: int, length: int, name: str = "<buffer>") -> "OcrBinaryPage":
+        """解析 buf[offset:offset+length]（不复制数据，缓冲区由调用方管理）。"""
+        page = cls.__new__(cls)
+        page.path = Path(name)
+        page._mmap = None
+        if length < _HEADER.size or offset + length > len(buf):
+            raise OcrBinaryError(f"truncated OCR cache: {name}")
+        page._parse(buf, offset, length)
+        return page
+
+    def close(self) -> None:
+        """关闭自己打开的 mmap（from_buffer / use_mmap=False 时无操作）。"""
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+    def __enter__(self) -> "OcrBinaryPage":
+        return self
+
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+
+    def _parse(self, buf: Any, base: int, size: int) -> None:
+        self._mm = buf
+        self._base = base
+        (
+            magic,
+            version,
+            _reserved,
+            self.image_width,
+            self.image_height,
+            n_blocks,
+            n_labels,
+            labels_off,
+            records_off,
+            self._blob_off,
+            meta_off,
+        ) = _HEADER.unpack_from(buf, base)
+        if magic != MAGIC:
+            raise OcrBinaryError(f"not an OCR cache file: {self.path}")
+        if version != VERSION:
+            raise OcrBinaryError(f"unsupported OCR cache version {version}: {self.path}")
+        if meta_off > size or records_off + n_blocks * _RECORD.size > size:
+            raise OcrBinaryError(f"truncated OCR cache: {self.path}")
+        self._blob_off += base
+
+        labels: List[str] = []
+        pos = base + labels_off
+        for _ in range(n_labels):
+            (n,) = _LABEL_LEN.unpack_from(buf, pos)
+            pos += _LABEL_LEN.size
+            labels.append(bytes(buf[pos : pos + n]).decode("utf-8"))
+            pos += n
+
+        self.blocks: List[LazyBlock] = []
+        for i in range(n_blocks):
+            (
+                index,
+                label_code,
+                region_code,
+                flags,
+                x0,
+                y0,
+                x1,
+                y1,
+                content_off,
+                content_len,
+                extra_off,
+                extra_len,
+            ) = _RECORD.unpack_from(buf, base + records_off + i * _RECORD.size)
+            bbox: List[Any] = [x0, y0, x1, y1]
+            if flags & _FLAG_BBOX_INT:
+                bbox = [int(v) for v in bbox]
+            fields = {
+                "index": index,
+                "label": labels[label_code] if label_code != _NO_LABEL else None,
+                "region_label": labels[region_code] if region_code != _NO_LABEL else None,
+                "bbox": bbox,
+            }
+            self.blocks.append(
+                LazyBlock(self, fields, (content_off, content_len), (extra_off, extra_len))
+            )
+
+        meta_raw = bytes(buf[base + meta_off : base + size]).decode("utf-8")
+        self.meta: Dict[str, Any] = json.loads(meta_raw) if meta_raw else {}
+
+    def _blob_str(self, offset: int, length: int) -> str:
+        if not length:
+            return ""
+        start = self._blob_off + offset
+        return bytes(self._mm[start : start + length]).decode("utf-8")
+
+    def as_cache_data(self, lazy: bool = True) -> Dict[str, Any]:
+        """
+        转换为与 JSON 缓存同结构的字典。
+
+        Args:
+            lazy: True 时 blocks 为 LazyBlock 列表；False 时为普通 dict（完整解码）
+        """
+        data: Dict[str, Any] = dict(self.meta)
+        data["image_width"] = self.image_width
+        data["image_height"] = self.image_height
+        data["blocks"] = self.blocks if lazy else [b.to_dict() for b in self.blocks]
+        return data
+
+
+def read_ocr_page(path: Path, lazy: bool = False) -> Dict[str, Any]:
+    """
+    读取二进制缓存为字典。
+
+    Args:
+        lazy: False 时完整解码（可安全修改/序列化）；True 时 blocks 为映射在文件上的
+            LazyBlock，用完调用 close_lazy_pages 关闭映射
+    """
+    if lazy:
+        return OcrBinaryPage(path).as_cache_data(lazy=True)
+    with OcrBinaryPage(path) as page:
+        return page.as_cache_data(lazy=False)
+
+
+def close_lazy_pages(pages: Iterable[Dict[str, Any]]) -> None:
+    """关闭 lazy 读取的页面映射（之后不能再访问尚未解码的 content / extra）。"""
+    for data in pages:
+        blocks = data.get("blocks") or ()
+        if blocks and isinstance(blocks[0], LazyBlock):
+            blocks[0]._page.close()
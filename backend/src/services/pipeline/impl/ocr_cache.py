@@ -2,7 +2,13 @@
 ocr_cache.py - OCR 结果缓存模块
 
 提供 PP-StructureV3 OCR 结果的持久化缓存，避免重复调用 OCR。
-包含内存缓存和性能优化功能。
+包含内存缓存和性能优化功能；未命中时还会查询跨试卷的全局缓存（ocr_global_cache）。
+
+磁盘格式由 EXAMPAPER_OCR_CACHE_FORMAT 决定：
+- json: ocr/page_N.json（默认）
+- bin:  ocr/page_N.bin（紧凑二进制，见 ocr_binary）
+- pack: ocr/pages.pack（整卷单文件，见 ocr_pack）
+读取时所有格式都支持（优先当前格式）。
 """
 
 from __future__ import annotations
@@ -10,67 +16,61 @@ from __future__ import annotations
 import json
 import os
 import threading
-from collections import OrderedDict
+from contextlib import contextmanager
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Tuple
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
 
-from ....common import layout_blocks_from_doc
+from ....common import decode_page_image, layout_blocks_from_doc
+from ....common.page_store import page_image_size, raw_path_for
+from ....common.paths import page_index
 from ....common.perf import perf_enabled, perf_event, perf_span
-
-# In-memory LRU cache for OCR results (avoid re-loading large JSON files)
-_mem_lock = threading.Lock()
-_mem_cache: "OrderedDict[str, Tuple[List[Dict[str, Any]], Tuple[int, int]]]" = OrderedDict()
-
-
-def _mem_cache_enabled() -> bool:
-    """Check if in-memory cache is enabled."""
-    return (os.getenv("EXAMPAPER_OCR_MEM_CACHE", "0") or "").strip() == "1"
-
-
-def _mem_cache_max_pages() -> int:
-    """Get maximum pages to keep in memory cache."""
-    raw = (os.getenv("EXAMPAPER_OCR_MEM_CACHE_MAX_PAGES", "") or "").strip()
-    if not raw:
-        return 64
-    try:
-        v = int(raw)
-        if v <= 0:
-            return 64
-        return min(v, 512)
-    except ValueError:
-        return 64
-
-
-def _mem_key(workdir: Path, page_name: str) -> str:
-    """Generate memory cache key."""
-    return f"{str(workdir)}::{page_name}"
+from .ocr_binary import (
+    OcrBinaryError,
+    close_lazy_pages,
+    encode_ocr_page,
+    read_ocr_page,
+    write_ocr_page,
+)
+from .ocr_mem_cache import get_ocr_mem_cache, mem_cache_enabled
+from .ocr_writer import get_ocr_writer, peek_ocr_writer, write_behind_enabled
+from .ocr_global_cache import (
+    global_cache_enabled,
+    global_cache_get,
+    global_cache_key,
+    global_cache_put,
+    decoded_page_hash,
+    page_pixel_hash,
+)
+from .ocr_preprocess import OcrInputTransform, ocr_input_needs_pixels
+from .page_classifier import (
+    OVERRIDE_OCR,
+    OVERRIDE_SKIP,
+    classify_page_pixels,
+    load_page_overrides,
+    page_classifier_enabled,
+)
+from .ocr_pack import (
+    get_pack_path,
+    pack_load_all,
+    pack_load_page,
+    pack_remove_page,
+    pack_set_expected_pages,
+    pack_write_page,
+    read_pack_index,
+)
+
+def _mem_get(workdir: Path, page_name: str) -> Optional[Dict[str, Any]]:
+    """Get a page record from the shared byte-budgeted memory cache."""
+    if not mem_cache_enabled():
+        return None
+    return get_ocr_mem_cache().get(workdir, page_name)
 
 
-def _mem_get(workdir: Path, page_name: str) -> Optional[Tuple[List[Dict[str, Any]], Tuple[int, int]]]:
-    """Get from memory cache (LRU)."""
-    if not _mem_cache_enabled():
-        return None
-    key = _mem_key(workdir, page_name)
-    with _mem_lock:
-        val = _mem_cache.get(key)
-        if val is None:
-            return None
-        # Move to end (LRU)
-        _mem_cache.move_to_end(key)
-        return val
-
-
-def _mem_put(workdir: Path, page_name: str, blocks: List[Dict[str, Any]], image_size: Tuple[int, int]) -> None:
-    """Put into memory cache (LRU eviction)."""
-    if not _mem_cache_enabled():
+def _mem_put(workdir: Path, page_name: str, cache_data: Dict[str, Any]) -> None:
+    """Put a whole page record into the shared memory cache (evicts LRU pages beyond the byte budget)."""
+    if not mem_cache_enabled():
         return
-    key = _mem_key(workdir, page_name)
-    with _mem_lock:
-        _mem_cache[key] = (blocks, image_size)
-        _mem_cache.move_to_end(key)
-        # Evict oldest entries if over limit
-        while len(_mem_cache) > _mem_cache_max_pages():
-            _mem_cache.popitem(last=False)
+    get_ocr_mem_cache().put(workdir, page_name, cache_data)
 
 
 def _json_dump_kwargs(pretty: bool) -> Dict[str, Any]:
@@ -124,30 +124,186 @@ def _ocr_cache_dir_path(workdir: Path) -> Path:
     return workdir / "ocr"
 
 
+# 单页文件格式；"pack" 为整卷单文件格式（ocr/pages.pack，见 ocr_pack）
+_CACHE_SUFFIXES = {"json": ".json", "bin": ".bin"}
+_CACHE_FORMATS = ("json", "bin", "pack")
+
+
+def _cache_format() -> str:
+    """当前写入格式（EXAMPAPER_OCR_CACHE_FORMAT=json|bin|pack）。"""
+    fmt = (os.getenv("EXAMPAPER_OCR_CACHE_FORMAT", "json") or "").strip().lower()
+    return fmt if fmt in _CACHE_FORMATS else "json"
+
+
+def _read_order() -> List[str]:
+    """读取顺序：当前格式优先，其余格式兜底（兼容旧缓存）。"""
+    fmt = _cache_format()
+    return [fmt] + [f for f in _CACHE_FORMATS if f != fmt]
+
+
 def get_ocr_cache_path(workdir: Path, page_name: str) -> Path:
-    """获取单页 OCR 缓存文件路径（只读场景，不创建目录）。"""
-    return _ocr_cache_dir_path(workdir) / f"{page_name}.json"
+    """获取 OCR 缓存文件路径（当前写入格式；pack 格式为整卷文件；只读场景，不创建目录）。"""
+    fmt = _cache_format()
+    if fmt == "pack":
+        return get_pack_path(workdir)
+    return _ocr_cache_dir_path(workdir) / f"{page_name}{_CACHE_SUFFIXES[fmt]}"
 
 
 def has_ocr_cache(workdir: Path, page_name: str) -> bool:
-    """检查是否存在 OCR 缓存（只读操作，不创建目录）。"""
-    cache_path = _ocr_cache_dir_path(workdir) / f"{page_name}.json"
-    return cache_path.is_file()
+    """检查是否存在 OCR 缓存（任一格式，含尚未落盘的记录；只读操作，不创建目录）。"""
+    if _pending_get(workdir, page_name) is not None:
+        return True
+    cache_dir = _ocr_cache_dir_path(workdir)
+    for fmt in _read_order():
+        if fmt == "pack":
+            index = read_pack_index(workdir)
+            if index is not None and page_index(page_name) in index.slots:
+                return True
+        elif (cache_dir / f"{page_name}{_CACHE_SUFFIXES[fmt]}").is_file():
+            return True
+    return False
+
+
+def list_cached_pages(workdir: Path) -> Set[str]:
+    """已有 OCR 缓存的页面名集合（一次目录列举 + 一次 pack 索引读取 + 未落盘记录）。"""
+    names: Set[str] = set()
+    writer = peek_ocr_writer()
+    if writer is not None:
+        names.update(writer.pending_pages(workdir))
+    cache_dir = _ocr_cache_dir_path(workdir)
+    if not cache_dir.is_dir():
+        return names
+    for suffix in _CACHE_SUFFIXES.values():
+        names.update(c.stem for c in cache_dir.glob(f"page_*{suffix}"))
+    index = read_pack_index(workdir)
+    if index is not None:
+        names.update(index.done_pages())
+    return names
+
+
+def _read_cache_file(path: Path, lazy: bool = False) -> Dict[str, Any]:
+    if path.suffix == ".bin":
+        return read_ocr_page(path, lazy=lazy)
+    with path.open("r", encoding="utf-8") as f:
+        return json.load(f)
 
 
-def load_ocr_cache(workdir: Path, page_name: str) -> Optional[Dict[str, Any]]:
+def load_ocr_cache(workdir: Path, page_name: str, lazy: bool = False) -> Optional[Dict[str, Any]]:
     """
     加载 OCR 缓存（只读操作，不创建目录）。
 
+    Args:
+        lazy: 二进制缓存时返回按需解码的 blocks（只读 Mapping），JSON 缓存忽略此参数
+
     Returns:
         缓存的 OCR 结果，如果不存在返回 None
     """
-    cache_path = _ocr_cache_dir_path(workdir) / f"{page_name}.json"
-    if not cache_path.is_file():
+    pending = _pending_get(workdir, page_name)
+    if pending is not None:
+        return pending
+    cache_dir = _ocr_cache_dir_path(workdir)
+    for fmt in _read_order():
+        if fmt == "pack":
+            data = pack_load_page(workdir, page_name, lazy=lazy)
+            if data is not None:
+                return data
+            continue
+        cache_path = cache_dir / f"{page_name}{_CACHE_SUFFIXES[fmt]}"
+        if not cache_path.is_file():
+            continue
+        try:
+            return _read_cache_file(cache_path, lazy=lazy)
+        except OcrBinaryError:
+            # 损坏的二进制缓存视为未命中，回退到其他格式/重新 OCR
+            continue
+    return None
+
+
+def _write_cache_data(
+    workdir: Path,
+    page_name: str,
+    cache_data: Dict[str, Any],
+    pretty: bool = False,
+) -> Path:
+    """
+    按当前格式写入单页缓存。
+
+    单页格式会删除该页其他格式的旧数据（避免读到过期结果）；pack 格式在读取时
+    优先于单页文件，因此不逐页删除旧文件（避免额外的元数据往返），由迁移清理。
+    """
+    cache_dir = get_ocr_cache_dir(workdir)  # 确保目录存在
+    fmt = _cache_format()
+
+    if fmt == "pack":
+        pack_write_page(workdir, page_name, encode_ocr_page(cache_data))
+        return get_pack_path(workdir)
+
+    cache_path = cache_dir / f"{page_name}{_CACHE_SUFFIXES[fmt]}"
+    if fmt == "bin":
+        write_ocr_page(cache_path, cache_data)
+    else:
+        # 临时文件 + os.replace：崩溃时不会留下写了一半的缓存文件
+        tmp_path = cache_path.with_name(f"{cache_path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        with tmp_path.open("w", encoding="utf-8") as f:
+            json.dump(cache_data, f, **_json_dump_kwargs(pretty))
+        os.replace(tmp_path, cache_path)
+
+    for other, suffix in _CACHE_SUFFIXES.items():
+        if other == fmt:
+            continue
+        try:
+            (cache_dir / f"{page_name}{suffix}").unlink()
+        except FileNotFoundError:
+            pass
+        except OSError:
+            pass
+    pack_remove_page(workdir, page_name)
+
+    return cache_path
+
+
+def _pending_get(workdir: Path, page_name: str) -> Optional[Dict[str, Any]]:
+    """后台写入队列中尚未落盘的记录（read-your-writes 覆盖层）。"""
+    writer = peek_ocr_writer()
+    if writer is None:
         return None
+    return writer.pending_get(workdir, page_name)
 
-    with cache_path.open("r", encoding="utf-8") as f:
-        return json.load(f)
+
+def _persist_cache_data(
+    workdir: Path,
+    page_name: str,
+    cache_data: Dict[str, Any],
+    pretty: bool = False,
+) -> Optional[Path]:
+    """
+    持久化单页缓存：启用 write-behind 时交给后台线程（返回 None），否则同步写入。
+    """
+    if write_behind_enabled():
+        get_ocr_writer(_write_cache_data).submit(workdir, page_name, cache_data, pretty)
+        return None
+    return _write_cache_data(workdir, page_name, cache_data, pretty=pretty)
+
+
+def flush_ocr_cache_writes(workdir: Optional[Path] = None, timeout: Optional[float] = None) -> bool:
+    """
+    等待后台写入完成（步骤结束时调用）。未启用 write-behind 时立即返回 True。
+
+    Returns:
+        记录是否全部落盘（超时或有记录写入失败时为 False，见 failed_ocr_cache_writes）
+    """
+    writer = peek_ocr_writer()
+    if writer is None:
+        return True
+    return writer.flush(workdir, timeout=timeout)
+
+
+def failed_ocr_cache_writes(workdir: Optional[Path] = None) -> Dict[str, str]:
+    """后台写入重试后仍失败的页面：page_name -> 错误信息。"""
+    writer = peek_ocr_writer()
+    if writer is None:
+        return {}
+    return writer.failed_pages(workdir)
 
 
 def save_ocr_cache(
@@ -156,6 +312,8 @@ def save_ocr_cache(
     blocks: List[Dict[str, Any]],
     image_size: Tuple[int, int],
     pretty: bool = False,
+    source: Optional[str] = None,
+    skip_reason: Optional[str] = None,
 ) -> Path:
     """
     保存 OCR 结果到缓存（写入操作，会创建目录）。
@@ -165,25 +323,136 @@ def save_ocr_cache(
         page_name: 页面名称 (如 "page_1")
         blocks: PP-StructureV3 提取的版面块列表
         image_size: 图片尺寸 (width, height)
-        pretty: 是否使用pretty格式（默认False，使用紧凑格式）
+        pretty: 是否使用pretty格式（默认False，使用紧凑格式；仅 JSON 格式有效）
+        source: 版面块来源（如 "text_layer"），仅用于诊断，读取方不依赖此字段
+        skip_reason: 跳过 OCR 的原因（空白页/非题目页，blocks 为空）
 
     Returns:
         缓存文件路径
     """
-    cache_dir = get_ocr_cache_dir(workdir)  # 确保目录存在
-    cache_path = cache_dir / f"{page_name}.json"
+    cache_data = {
+        "page_name": page_name,
+        "image_width": image_size[0],
+        "image_height": image_size[1],
+        "blocks": blocks,
+    }
+    if source:
+        cache_data["source"] = source
+    if skip_reason:
+        cache_data["skip_reason"] = skip_reason
 
+    path = _write_cache_data(workdir, page_name, cache_data, pretty=pretty)
+    _mem_put(workdir, page_name, cache_data)
+    return path
+
+
+def set_ocr_expected_pages(workdir: Path, expected_pages: int) -> None:
+    """
+    记录试卷总页数（仅 pack 格式使用），使 is_ocr_complete 只需读取 pack header。
+    """
+    if _cache_format() == "pack" and expected_pages > 0:
+        get_ocr_cache_dir(workdir)
+        pack_set_expected_pages(workdir, expected_pages)
+
+
+def migrate_ocr_caches(workdir: Path, remove_old: bool = True) -> int:
+    """
+    将 ocr/ 下的缓存统一转换为当前写入格式（如 page_*.json -> page_*.bin / pages.pack）。
+
+    Returns:
+        转换的页面数
+    """
+    cache_dir = _ocr_cache_dir_path(workdir)
+    if not cache_dir.is_dir():
+        return 0
+
+    fmt = _cache_format()
+    converted = 0
+
+    # 旧数据：其他单页格式文件 + （目标不是 pack 时）pack 中的页面
+    sources: Dict[str, Dict[str, Any]] = {}
+    old_files: List[Path] = []
+    for other, suffix in _CACHE_SUFFIXES.items():
+        if other == fmt:
+            continue
+        for old_path in sorted(cache_dir.glob(f"page_*{suffix}")):
+            try:
+                sources.setdefault(old_path.stem, _read_cache_file(old_path, lazy=False))
+            except (OSError, ValueError):
+                continue
+            old_files.append(old_path)
+    if fmt != "pack":
+        for page_name, data in pack_load_all(workdir, lazy=False).items():
+            sources.setdefault(page_name, data)
+
+    for page_name, data in sorted(sources.items(), key=lambda kv: page_index(kv[0])):
+        if fmt == "pack":
+            pack_write_page(workdir, page_name, encode_ocr_page(data))
+        else:
+            new_path = cache_dir / f"{page_name}{_CACHE_SUFFIXES[fmt]}"
+            if fmt == "bin":
+                write_ocr_page(new_path, data)
+            else:
+                with new_path.open("w", encoding="utf-8") as f:
+                    json.dump(data, f, **_json_dump_kwargs(False))
+        converted += 1
+
+    if remove_old:
+        for old_path in old_files:
+            try:
+                old_path.unlink()
+            except OSError:
+                pass
+        if fmt != "pack":
+            try:
+                get_pack_path(workdir).unlink()
+            except OSError:
+                pass
+
+    return converted
+
+
+def _adopt_global_hit(
+    workdir: Path,
+    page_name: str,
+    hit: Tuple[List[Dict[str, Any]], Tuple[int, int]],
+) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+    """全局缓存命中：写入本试卷缓存与内存缓存。"""
+    blocks, image_size = hit
     cache_data = {
         "page_name": page_name,
         "image_width": image_size[0],
         "image_height": image_size[1],
         "blocks": blocks,
+        "source": "global_cache",
     }
+    _persist_cache_data(workdir, page_name, cache_data)
+    _mem_put(workdir, page_name, cache_data)
+    return blocks, image_size
 
-    with cache_path.open("w", encoding="utf-8") as f:
-        json.dump(cache_data, f, **_json_dump_kwargs(pretty))
 
-    return cache_path
+def _save_skipped_page(
+    workdir: Path,
+    page_name: str,
+    image_size: Tuple[int, int],
+    skip_reason: str,
+    **extra: Any,
+) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
+    """记录跳过 OCR 的页面（零版面块），与正常缓存一样计入 is_ocr_complete。"""
+    cache_data = {
+        "page_name": page_name,
+        "image_width": image_size[0],
+        "image_height": image_size[1],
+        "blocks": [],
+        "source": "page_classifier",
+        "skip_reason": skip_reason,
+        **extra,
+    }
+    _persist_cache_data(workdir, page_name, cache_data)
+    _mem_put(workdir, page_name, cache_data)
+    if perf_enabled():
+        perf_event("ocr.page.skipped", page=page_name, reason=skip_reason, **extra)
+    return [], image_size
 
 
 def run_ocr_with_cache(
@@ -191,6 +460,8 @@ def run_ocr_with_cache(
     page_image_path: Path,
     workdir: Path,
     force: bool = False,
+    image: Optional[Any] = None,
+    page_overrides: Optional[Dict[str, str]] = None,
 ) -> Tuple[List[Dict[str, Any]], Tuple[int, int]]:
     """
     运行 OCR 并缓存结果，如果已有缓存则直接返回。
@@ -200,6 +471,8 @@ def run_ocr_with_cache(
         page_image_path: 页面图片路径
         workdir: 工作目录
         force: 是否强制重新运行 OCR
+        image: 可选的已解码页面（DecodedPage，来自预解码阶段）；提供时不再打开/解码 PNG
+        page_overrides: 调用方已读取的人工覆盖（load_page_overrides）；为 None 时从 workdir 读取
 
     Returns:
         (blocks, image_size): 版面块列表和图片尺寸
@@ -213,10 +486,25 @@ def run_ocr_with_cache(
     except OSError:
         pass
 
+    # Per-exam manual decision for pages the classifier got wrong
+    if page_overrides is None:
+        page_overrides = load_page_overrides(workdir)
+    override = page_overrides.get(page_name)
+    if override == OVERRIDE_SKIP:
+        cached = load_ocr_cache(workdir, page_name)
+        if cached is not None and cached.get("skip_reason"):
+            return [], (cached.get("image_width", 0), cached.get("image_height", 0))
+        return _save_skipped_page(workdir, page_name, page_image_size(page_image_path), "manual")
+    if override == OVERRIDE_OCR and not force:
+        cached = load_ocr_cache(workdir, page_name)
+        force = cached is not None and bool(cached.get("skip_reason"))
+    classify = page_classifier_enabled() and override != OVERRIDE_OCR
+
     # Check in-memory cache first (fastest)
     mem = _mem_get(workdir, page_name)
     if mem is not None and not force:
-        blocks, image_size = mem
+        blocks = mem.get("blocks", [])
+        image_size = (mem.get("image_width", 0), mem.get("image_height", 0))
         if perf_enabled():
             perf_event(
                 "ocr.cache.mem_hit",
@@ -236,7 +524,7 @@ def run_ocr_with_cache(
             blocks = cached.get("blocks", [])
             image_size = (cached.get("image_width", 0), cached.get("image_height", 0))
             # Update memory cache
-            _mem_put(workdir, page_name, blocks, image_size)
+            _mem_put(workdir, page_name, cached)
             if perf_enabled():
                 perf_event(
                     "ocr.cache.hit",
@@ -252,19 +540,71 @@ def run_ocr_with_cache(
     # Pre-load image size and optionally decode to array (move I/O out of GPU lock)
     image_size = (0, 0)
     img_input: Any = str(page_image_path)
-
-    with perf_span("ocr.image.open", page=page_name, input_bytes=input_bytes):
-        with Image.open(page_image_path) as img:
-            image_size = (img.width, img.height)
-            # Optional: pass ndarray to predict() to avoid I/O inside GPU lock
-            if (os.getenv("EXAMPAPER_OCR_PASS_IMAGE", "0") or "").strip() == "1":
-                try:
-                    import numpy as np  # type: ignore
-                    img.load()
-                    img_input = np.array(img)
-                except Exception:
-                    # Fallback to path if numpy not available or conversion fails
-                    img_input = str(page_image_path)
+    global_key: Optional[str] = None
+    transform = OcrInputTransform.identity(image_size)
+
+    if image is None and (ocr_input_needs_pixels() or classify or raw_path_for(page_image_path).is_file()):
+        # Raw page store: map the rendered pixels instead of decoding a PNG;
+        # reduced-DPI OCR, margin trimming and the page classifier need the pixels
+        with perf_span("ocr.image.decode", page=page_name, input_bytes=input_bytes):
+            image = decode_page_image(page_image_path)
+
+    if image is not None:
+        # Already decoded by the decode-ahead stage: hand the array straight to predict()
+        image_size = (image.width, image.height)
+        if classify:
+            with perf_span("ocr.page.classify", page=page_name):
+                verdict = classify_page_pixels(image)
+            if verdict.skip_reason is not None:
+                return _save_skipped_page(
+                    workdir,
+                    page_name,
+                    image_size,
+                    verdict.skip_reason,
+                    ink_ratio=round(verdict.ink_ratio, 5),
+                    ink_bands=verdict.ink_bands,
+                )
+        with perf_span("ocr.image.content_box", page=page_name):
+            transform = OcrInputTransform.for_decoded_page(image)
+        if global_cache_enabled():
+            # force: skip the lookup but keep the key, so the fresh result replaces the entry
+            with perf_span("ocr.global_cache.lookup", page=page_name):
+                global_key = global_cache_key(decoded_page_hash(image), transform.cache_variant)
+                hit = None if force else global_cache_get(global_key)
+            if hit is not None:
+                return _adopt_global_hit(workdir, page_name, hit)
+        if transform.is_identity:
+            img_input = image.model_input()
+        else:
+            with perf_span(
+                "ocr.image.prepare",
+                page=page_name,
+                ocr_w=transform.ocr_size[0],
+                ocr_h=transform.ocr_size[1],
+                cropped=transform.is_cropped,
+            ):
+                img_input = transform.prepare(image).model_input()
+    else:
+        with perf_span("ocr.image.open", page=page_name, input_bytes=input_bytes):
+            with Image.open(page_image_path) as img:
+                image_size = (img.width, img.height)
+                # Cross-exam cache keyed by page pixels + model config
+                if global_cache_enabled():
+                    with perf_span("ocr.global_cache.lookup", page=page_name):
+                        img.load()
+                        global_key = global_cache_key(page_pixel_hash(img))
+                        hit = None if force else global_cache_get(global_key)
+                    if hit is not None:
+                        return _adopt_global_hit(workdir, page_name, hit)
+                # Optional: pass ndarray to predict() to avoid I/O inside GPU lock
+                if (os.getenv("EXAMPAPER_OCR_PASS_IMAGE", "0") or "").strip() == "1":
+                    try:
+                        import numpy as np  # type: ignore
+                        img.load()
+                        img_input = np.array(img)
+                    except Exception:
+                        # Fallback to path if numpy not available or conversion fails
+                        img_input = str(page_image_path)
 
     # Run OCR (this will acquire GPU lock inside _GpuLockedPipeline.predict)
     with perf_span("ocr.predict.total", page=page_name, input_bytes=input_bytes, image_w=image_size[0], image_h=image_size[1]):
@@ -280,85 +620,145 @@ def run_ocr_with_cache(
                         error=f"{type(e).__name__}: {e}",
                     )
                 doc = pipeline.predict(str(page_image_path))[0]
+                # The full-resolution page was used after all
+                transform = OcrInputTransform.identity(image_size)
             else:
                 raise
 
     with perf_span("ocr.blocks.normalize", page=page_name):
         blocks = layout_blocks_from_doc(doc)
         _trim_non_text_content(blocks)
+        # bbox -> page coordinates (no-op for the untrimmed full-resolution page)
+        transform.to_page_blocks(blocks)
 
     # Save cache
     pretty = (os.getenv("EXAMPAPER_OCR_CACHE_PRETTY", "0") or "").strip() == "1"
     with perf_span("ocr.cache.save", page=page_name, blocks=len(blocks), pretty=pretty):
-        cache_path = get_ocr_cache_path(workdir, page_name)
         cache_data = {
             "page_name": page_name,
             "image_width": image_size[0],
             "image_height": image_size[1],
             "blocks": blocks,
+            **transform.cache_fields(),
         }
-        cache_path.parent.mkdir(parents=True, exist_ok=True)
-        with cache_path.open("w", encoding="utf-8") as f:
-            json.dump(cache_data, f, **_json_dump_kwargs(pretty))
-
-    try:
-        written = cache_path.stat().st_size
-    except OSError:
-        written = None
+        cache_path = _persist_cache_data(workdir, page_name, cache_data, pretty=pretty)
 
     if perf_enabled():
-        perf_event(
-            "ocr.cache.saved",
-            page=page_name,
-            blocks=len(blocks),
-            bytes_written=written,
-            pretty=pretty,
-        )
+        if cache_path is None:
+            # write-behind：序列化与写盘在后台线程完成
+            perf_event("ocr.cache.queued", page=page_name, blocks=len(blocks), pretty=pretty)
+        else:
+            try:
+                written = cache_path.stat().st_size
+            except OSError:
+                written = None
+            perf_event(
+                "ocr.cache.saved",
+                page=page_name,
+                blocks=len(blocks),
+                bytes_written=written,
+                pretty=pretty,
+            )
+
+    if global_key is not None:
+        global_cache_put(global_key, blocks, image_size)
 
     # Update memory cache
-    _mem_put(workdir, page_name, blocks, image_size)
+    _mem_put(workdir, page_name, cache_data)
 
     return blocks, image_size
 
 
-def load_all_ocr_caches(workdir: Path) -> Dict[str, Dict[str, Any]]:
+def load_all_ocr_caches(workdir: Path, lazy: bool = False) -> Dict[str, Dict[str, Any]]:
     """
     加载所有 OCR 缓存。
 
+    已在内存缓存中的页面直接复用；lazy=False 时从磁盘读取的页面会写入内存缓存。
+
+    Args:
+        lazy: 二进制缓存使用 mmap + 按需解码的 blocks（适合只遍历 label/bbox/文本的场景），
+            用完调用 close_ocr_caches，或直接使用 open_ocr_caches
+
     Returns:
         {page_name: cache_data} 字典
     """
+    caches: Dict[str, Dict[str, Any]] = {}
+    page_names = list_cached_pages(workdir)
+    for page_name in page_names:
+        pending = _pending_get(workdir, page_name)
+        if pending is not None:
+            caches[page_name] = pending
+            continue
+        mem = _mem_get(workdir, page_name)
+        if mem is not None:
+            caches[page_name] = dict(mem)
+    if len(caches) == len(page_names):
+        return caches
     cache_dir = _ocr_cache_dir_path(workdir)
     if not cache_dir.is_dir():
-        return {}
-
-    caches = {}
-    for cache_file in cache_dir.glob("page_*.json"):
-        page_name = cache_file.stem
-        with cache_file.open("r", encoding="utf-8") as f:
-            caches[page_name] = json.load(f)
+        return caches
+
+    # 同一页存在多种格式时，按读取顺序取第一个
+    for fmt in _read_order():
+        if fmt == "pack":
+            # 整卷一次顺序读取
+            loaded = pack_load_all(workdir, lazy=lazy)
+        else:
+            loaded = {}
+            for cache_file in cache_dir.glob(f"page_*{_CACHE_SUFFIXES[fmt]}"):
+                if cache_file.stem in caches:
+                    continue
+                try:
+                    loaded[cache_file.stem] = _read_cache_file(cache_file, lazy=lazy)
+                except OcrBinaryError:
+                    continue
+        for page_name, data in loaded.items():
+            if page_name in caches:
+                continue
+            caches[page_name] = data
+            if not lazy:
+                _mem_put(workdir, page_name, data)
 
     return caches
 
 
+def close_ocr_caches(caches: Dict[str, Dict[str, Any]]) -> None:
+    """关闭 load_all_ocr_caches(lazy=True) 打开的二进制缓存映射。"""
+    close_lazy_pages(caches.values())
+
+
+@contextmanager
+def open_ocr_caches(workdir: Path) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """按需解码地加载所有 OCR 缓存，退出时关闭映射。"""
+    caches = load_all_ocr_caches(workdir, lazy=True)
+    try:
+        yield caches
+    finally:
+        close_ocr_caches(caches)
+
+
 def is_ocr_complete(workdir: Path) -> bool:
     """
     检查所有页面的 OCR 是否完成。
 
-    通过比较 page_*.png 文件和 ocr/page_*.json 文件数量判断。
+    pack 格式且记录了总页数时只读取 header；否则比较 page_*.png 与已缓存页面。
+    被识别为空白/非题目页的页面以零版面块的缓存记录计入。
     """
+    if _cache_format() == "pack":
+        index = read_pack_index(workdir)
+        if index is not None and index.expected_pages > 0:
+            if set(index.slots) >= set(range(1, index.expected_pages + 1)):
+                return True
+
     page_images = list(workdir.glob("page_*.png"))
     if not page_images:
         return False
 
-    cache_dir = _ocr_cache_dir_path(workdir)
-    if not cache_dir.is_dir():
+    if not _ocr_cache_dir_path(workdir).is_dir():
         return False
 
-    cache_files = list(cache_dir.glob("page_*.json"))
-
     # 检查每个 page_*.png 是否有对应的缓存
     page_names = {p.stem for p in page_images}
-    cached_names = {c.stem for c in cache_files}
+    cached_names = list_cached_pages(workdir)
 
     return page_names == cached_names
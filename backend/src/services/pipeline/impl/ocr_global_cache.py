@@ -0,0 +1,222 @@
+"""
+ocr_global_cache.py - 跨试卷的内容寻址 OCR 缓存
+
+workdir/ocr/page_N.json 只对单份试卷有效：同一份试卷换个文件名重新上传，
+或与旧卷共享大部分页面的变体卷，都会从头跑一遍 OCR。
+
+全局缓存以「页面像素哈希 + PP-StructureV3 配置指纹」为键，存放在
+data/cache/ocr/<key[:2]>/<key>.json，run_ocr_with_cache 在调用 predict 前查询。
+
+- 像素哈希基于解码后的像素（与 PNG 编码参数无关）
+- 配置指纹见 get_ppstructure_fingerprint（device、批大小、表格开关、裁剪设置、版本）
+- 磁盘占用超过 EXAMPAPER_OCR_GLOBAL_CACHE_MAX_MB 时按 mtime 做 LRU 淘汰（命中时 touch）
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ....common.ocr_models import get_ppstructure_fingerprint
+from ....common.paths import get_data_dir
+from ....common.perf import perf_enabled, perf_event
+
+_lock = threading.Lock()
+# 已知的缓存总字节数（首次写入时扫描目录初始化）
+_total_bytes: Optional[int] = None
+
+# 淘汰后保留的比例，避免每次写入都触发扫描
+_EVICT_TARGET_RATIO = 0.9
+
+
+def global_cache_enabled() -> bool:
+    """是否启用全局 OCR 缓存（EXAMPAPER_OCR_GLOBAL_CACHE=1）。"""
+    return (os.getenv("EXAMPAPER_OCR_GLOBAL_CACHE", "0") or "").strip() == "1"
+
+
+def _max_bytes() -> int:
+    raw = (os.getenv("EXAMPAPER_OCR_GLOBAL_CACHE_MAX_MB", "") or "").strip()
+    try:
+        mb = int(raw) if raw else 1024
+    except ValueError:
+        mb = 1024
+    return max(1, mb) * 1024 * 1024
+
+
+def get_global_cache_dir() -> Path:
+    """全局缓存目录（EXAMPAPER_OCR_GLOBAL_CACHE_DIR 可覆盖）。"""
+    raw = (os.getenv("EXAMPAPER_OCR_GLOBAL_CACHE_DIR", "") or "").strip()
+    if raw:
+        return Path(raw)
+    return get_data_dir("cache") / "ocr"
+
+
+def page_pixel_hash(img: Any) -> str:
+    """
+    计算页面像素哈希。
+
+    Args:
+        img: 已打开的 PIL Image
+    """
+    return _pixel_hash(img.mode, img.width, img.height, img.tobytes())
+
+
+def decoded_page_hash(page: Any) -> str:
+    """
+    计算已解码页面（DecodedPage）的像素哈希，与 page_pixel_hash 结果一致。
+
+    np.array(img) 的内存布局与 img.tobytes() 相同，因此两者可共用缓存条目。
+    """
+    return _pixel_hash(page.mode, page.width, page.height, memoryview(page.array).cast("B"))
+
+
+def _pixel_hash(mode: str, width: int, height: int, data: Any) -> str:
+    h = hashlib.blake2b(digest_size=16)
+    h.update(f"{mode}:{width}x{height}:".encode("ascii"))
+    h.update(data)
+    return h.hexdigest()
+
+
+def global_cache_key(pixel_hash: str, variant: str = "") -> str:
+    """组合像素哈希与当前模型配置指纹（variant 区分 OCR 输入变换，如降分辨率）。"""
+    key = f"{pixel_hash}-{get_ppstructure_fingerprint()}"
+    return f"{key}-{variant}" if variant else key
+
+
+def _entry_path(key: str) -> Path:
+    return get_global_cache_dir() / key[:2] / f"{key}.json"
+
+
+def global_cache_get(key: str) -> Optional[Tuple[List[Dict[str, Any]], Tuple[int, int]]]:
+    """
+    查询全局缓存。
+
+    Returns:
+        (blocks, image_size)，未命中返回 None
+    """
+    path = _entry_path(key)
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError):
+        # 损坏的条目直接丢弃
+        _discard(path)
+        return None
+
+    # 命中时刷新 mtime，作为 LRU 依据
+    try:
+        os.utime(path, None)
+    except OSError:
+        pass
+
+    blocks = data.get("blocks", [])
+    image_size = (data.get("image_width", 0), data.get("image_height", 0))
+    if perf_enabled():
+        perf_event("ocr.global_cache.hit", key=key, blocks=len(blocks))
+    return blocks, image_size
+
+
+def global_cache_put(
+    key: str,
+    blocks: List[Dict[str, Any]],
+    image_size: Tuple[int, int],
+) -> None:
+    """写入全局缓存（原子替换），必要时触发 LRU 淘汰。"""
+    global _total_bytes
+
+    path = _entry_path(key)
+    data = {
+        "image_width": image_size[0],
+        "image_height": image_size[1],
+        "blocks": blocks,
+    }
+    raw = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(raw)
+    except OSError:
+        return
+
+    with _lock:
+        # 覆盖已有条目时先减去旧文件的大小
+        try:
+            old_size = path.stat().st_size
+        except OSError:
+            old_size = 0
+        try:
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                tmp.unlink()
+            except OSError:
+                pass
+            return
+        if _total_bytes is None:
+            _total_bytes = _scan_total_bytes()
+        else:
+            _total_bytes += len(raw) - old_size
+        if _total_bytes > _max_bytes():
+            _total_bytes = _evict_locked(int(_max_bytes() * _EVICT_TARGET_RATIO))
+
+
+def _iter_entries() -> List[Tuple[float, int, Path]]:
+    entries: List[Tuple[float, int, Path]] = []
+    root = get_global_cache_dir()
+    if not root.is_dir():
+        return entries
+    for path in root.glob("*/*.json"):
+        try:
+            st = path.stat()
+        except OSError:
+            continue
+        entries.append((st.st_mtime, st.st_size, path))
+    return entries
+
+
+def _scan_total_bytes() -> int:
+    return sum(size for _, size, _ in _iter_entries())
+
+
+def _evict_locked(target_bytes: int) -> int:
+    """按 mtime 从旧到新删除条目，直到总大小不超过 target_bytes。返回剩余字节数。"""
+    entries = _iter_entries()
+    total = sum(size for _, size, _ in entries)
+    evicted = 0
+    for _, size, path in sorted(entries, key=lambda e: e[0]):
+        if total <= target_bytes:
+            break
+        if _remove(path):
+            total -= size
+            evicted += 1
+    if perf_enabled():
+        perf_event("ocr.global_cache.evict", evicted=evicted, remaining_bytes=total)
+    return total
+
+
+def _discard(path: Path) -> None:
+    """删除单个条目并从总大小中扣除。"""
+    global _total_bytes
+
+    with _lock:
+        try:
+            size = path.stat().st_size
+        except OSError:
+            return
+        if _remove(path) and _total_bytes is not None:
+            _total_bytes = max(0, _total_bytes - size)
+
+
+def _remove(path: Path) -> bool:
+    try:
+        path.unlink()
+        return True
+    except OSError:
+        return False
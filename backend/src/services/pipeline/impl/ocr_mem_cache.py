@@ -0,0 +1,148 @@
+"""
+ocr_mem_cache.py - 按字节预算淘汰的进程内 OCR 结果缓存
+
+按页数限制的 LRU 无法防止 OOM：一页带大表格 HTML 的结果可能是普通页面的几十倍。
+这里按估算的内存占用（字节）限制容量，所有读取方共用同一个实例：
+extract_questions_from_page、add_cross_page_segments、load_all_ocr_caches。
+
+缓存的是完整的页面记录（与磁盘缓存同结构，包括 skip_reason、source、
+ocr_width/ocr_height/ocr_box 等字段），命中时与读取磁盘缓存的结果一致。
+
+统计信息（命中/未命中/淘汰/常驻字节）通过 /api/health/metrics 暴露。
+"""
+
+from __future__ import annotations
+
+import os
+import sys
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from ....common import parse_int_env
+
+# 单个 block 的固定开销估算（dict + bbox list + 若干小对象）
+_BLOCK_OVERHEAD = 600
+_ENTRY_OVERHEAD = 200
+
+
+def estimate_blocks_bytes(blocks: List[Dict[str, Any]]) -> int:
+    """估算版面块列表的内存占用（字节）。"""
+    total = _ENTRY_OVERHEAD
+    for blk in blocks:
+        total += _BLOCK_OVERHEAD
+        content = blk.get("content")
+        if isinstance(content, str):
+            total += sys.getsizeof(content)
+    return total
+
+
+class OcrMemoryCache:
+    """
+    线程安全的 LRU，容量按字节预算（可选再加页数上限）。
+
+    键为 (workdir, page_name)；值为页面记录（{"image_width", "image_height", "blocks", ...}），
+    调用方不应修改取出的记录。
+    """
+
+    def __init__(self, max_bytes: int, max_pages: int = 0) -> None:
+        self._lock = threading.Lock()
+        self._data: "OrderedDict[str, Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self._max_bytes = max_bytes
+        self._max_pages = max_pages
+        self._resident_bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._rejected = 0
+
+    @staticmethod
+    def _key(workdir: Path, page_name: str) -> str:
+        return f"{str(workdir)}::{page_name}"
+
+    def get(self, workdir: Path, page_name: str) -> Optional[Dict[str, Any]]:
+        key = self._key(workdir, page_name)
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            self._data.move_to_end(key)
+            self._hits += 1
+            return entry[0]
+
+    def put(self, workdir: Path, page_name: str, record: Dict[str, Any]) -> None:
+        size = estimate_blocks_bytes(record.get("blocks") or [])
+        key = self._key(workdir, page_name)
+        with self._lock:
+            old = self._data.pop(key, None)
+            if old is not None:
+                self._resident_bytes -= old[1]
+            # 单页超过总预算：不缓存，避免把其他页面全部挤出
+            if size > self._max_bytes:
+                self._rejected += 1
+                return
+            self._data[key] = (record, size)
+            self._resident_bytes += size
+            while self._data and (
+                self._resident_bytes > self._max_bytes
+                or (self._max_pages and len(self._data) > self._max_pages)
+            ):
+                _, (_, evicted_size) = self._data.popitem(last=False)
+                self._resident_bytes -= evicted_size
+                self._evictions += 1
+
+    def invalidate(self, workdir: Path, page_name: str) -> None:
+        with self._lock:
+            old = self._data.pop(self._key(workdir, page_name), None)
+            if old is not None:
+                self._resident_bytes -= old[1]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self._resident_bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "enabled": mem_cache_enabled(),
+                "entries": len(self._data),
+                "resident_bytes": self._resident_bytes,
+                "max_bytes": self._max_bytes,
+                "max_pages": self._max_pages or None,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else None,
+                "evictions": self._evictions,
+                "rejected": self._rejected,
+            }
+
+
+def mem_cache_enabled() -> bool:
+    """是否启用内存缓存（默认启用，EXAMPAPER_OCR_MEM_CACHE=0 关闭）。"""
+    return (os.getenv("EXAMPAPER_OCR_MEM_CACHE", "1") or "").strip() != "0"
+
+
+_instance: Optional[OcrMemoryCache] = None
+_instance_lock = threading.Lock()
+
+
+def get_ocr_mem_cache() -> OcrMemoryCache:
+    """进程级单例（首次使用时读取预算配置）。"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                max_mb = parse_int_env("EXAMPAPER_OCR_MEM_CACHE_MAX_MB", 256, 1, 65536)
+                # 兼容旧配置：显式设置页数上限时同时生效
+                max_pages = parse_int_env("EXAMPAPER_OCR_MEM_CACHE_MAX_PAGES", 0, 0, 100000)
+                _instance = OcrMemoryCache(max_mb * 1024 * 1024, max_pages)
+    return _instance
+
+
+def get_ocr_mem_cache_stats() -> Dict[str, Any]:
+    """内存缓存统计（供 health/metrics 使用）。"""
+    return get_ocr_mem_cache().stats()
@@ -0,0 +1,314 @@
+"""
+ocr_pack.py - 单文件的整卷 OCR 存储（ocr/pages.pack）
+
+每页一个缓存文件时，判断「哪些页已完成」需要 glob，整卷加载需要打开 N 个文件；
+在网络存储上每份试卷要付出数百次元数据往返。pages.pack 把整卷放进一个文件：
+
+    header : magic "EXPK", version, n_slots, expected_pages
+    index  : n_slots 个槽位 (offset u64, length u32, crc32 u32)，第 N 页对应槽位 N-1
+    records: 追加写入的页记录（ocr_binary 编码），同一页重写时旧记录成为死数据
+
+- 写入：持文件锁追加记录，再原地更新槽位（先数据后索引，crc 校验撕裂写）
+- 已完成页：只读 header + index 区
+- 整卷加载：一次顺序读取整个文件
+- 槽位不足或死数据过多时重建文件（临时文件 + os.replace）
+- 写入持互斥锁，读取持共享锁：读者之间互不阻塞，读取不会与重建的 os.replace
+  交错，读到的 index 与记录一定来自同一个文件
+"""
+
+from __future__ import annotations
+
+import os
+import struct
+import threading
+import zlib
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterator, Optional, Set, Tuple
+
+from ....common.paths import page_index
+from .ocr_binary import OcrBinaryError, OcrBinaryPage
+
+PACK_NAME = "pages.pack"
+MAGIC = b"EXPK"
+VERSION = 1
+
+_HEADER = struct.Struct("<4sHHII")
+_SLOT = struct.Struct("<QII")
+
+# 新建文件时的槽位数（超出时按需扩容）
+_DEFAULT_SLOTS = 256
+
+# 进程内按 pack 文件区分的锁（不同试卷互不阻塞）
+_thread_locks: Dict[str, threading.Lock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+class PackIndex:
+    """pages.pack 的 header + 槽位索引。"""
+
+    def __init__(self, n_slots: int, expected_pages: int, slots: Dict[int, Tuple[int, int, int]]) -> None:
+        self.n_slots = n_slots
+        self.expected_pages = expected_pages
+        # page_no (1-based) -> (offset, length, crc32)
+        self.slots = slots
+
+    def done_pages(self) -> Set[str]:
+        return {f"page_{n}" for n in self.slots}
+
+
+def get_pack_path(workdir: Path) -> Path:
+    return Path(workdir) / "ocr" / PACK_NAME
+
+
+def _thread_lock(pack_path: Path) -> threading.Lock:
+    key = os.path.abspath(pack_path)
+    with _thread_locks_guard:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = _thread_locks[key] = threading.Lock()
+        return lock
+
+
+@contextmanager
+def _file_lock(pack_path: Path) -> Iterator[None]:
+    """进程内 + 跨进程互斥（渲染进程与 OCR 线程可能同时写入）。"""
+    lock_path = pack_path.with_name(pack_path.name + ".lock")
+    # 首次写入时 ocr/ 目录可能还不存在（锁文件先于 pack 文件创建）
+    lock_path.parent.mkdir(parents=True, exist_ok=True)
+    with _thread_lock(pack_path):
+        with open(lock_path, "a+b") as f:
+            if os.name == "nt":
+                import msvcrt
+
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                try:
+                    yield
+                finally:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+@contextmanager
+def _read_lock(pack_path: Path) -> Iterator[None]:
+    """读取用的共享锁：读者之间互不阻塞，只与写入 / 重建互斥。
+
+    flock 按打开的文件描述区分，同一进程内的读线程各自打开锁文件即可，无需进程内锁。
+    锁文件不存在说明从未有写入经过锁（例如拷贝来的只读目录），此时不创建锁文件、直接读取；
+    每页记录仍由 crc 校验。Windows 的 msvcrt 没有共享锁，退化为互斥锁。
+    """
+    if os.name == "nt":
+        with _file_lock(pack_path):
+            yield
+        return
+    import fcntl
+
+    lock_path = pack_path.with_name(pack_path.name + ".lock")
+    try:
+        f = open(lock_path, "rb")
+    except FileNotFoundError:
+        yield
+        return
+    with f:
+        fcntl.flock(f.fileno(), fcntl.LOCK_SH)
+        try:
+            yield
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _parse_index(head: bytes, index_raw: bytes) -> PackIndex:
+    magic, version, _reserved, n_slots, expected = _HEADER.unpack_from(head, 0)
+    if magic != MAGIC:
+        raise OcrBinaryError("not an OCR pack file")
+    if version != VERSION:
+        raise OcrBinaryError(f"unsupported OCR pack version {version}")
+    if len(index_raw) < n_slots * _SLOT.size:
+        raise OcrBinaryError("truncated OCR pack index")
+    slots: Dict[int, Tuple[int, int, int]] = {}
+    for i in range(n_slots):
+        offset, length, crc = _SLOT.unpack_from(index_raw, i * _SLOT.size)
+        if length:
+            slots[i + 1] = (offset, length, crc)
+    return PackIndex(n_slots, expected, slots)
+
+
+def _read_index_from(f) -> PackIndex:
+    head = f.read(_HEADER.size)
+    if len(head) < _HEADER.size:
+        raise OcrBinaryError("truncated OCR pack header")
+    n_slots = _HEADER.unpack_from(head, 0)[3]
+    return _parse_index(head, f.read(n_slots * _SLOT.size))
+
+
+def read_pack_index(workdir: Path) -> Optional[PackIndex]:
+    """只读 header + 索引区；文件不存在或损坏时返回 None。"""
+    pack_path = get_pack_path(workdir)
+    if not pack_path.is_file():
+        return None
+    try:
+        with _read_lock(pack_path), pack_path.open("rb") as f:
+            return _read_index_from(f)
+    except (FileNotFoundError, OcrBinaryError):
+        return None
+
+
+def _data_start(n_slots: int) -> int:
+    return _HEADER.size + n_slots * _SLOT.size
+
+
+def _create(pack_path: Path, n_slots: int, expected_pages: int) -> None:
+    pack_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = pack_path.with_name(f"{pack_path.name}.{os.getpid()}.tmp")
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, n_slots, expected_pages))
+        f.write(b"\0" * (n_slots * _SLOT.size))
+    os.replace(tmp, pack_path)
+
+
+def _rebuild(pack_path: Path, index: PackIndex, n_slots: int) -> None:
+    """按新的槽位数重建文件，只保留每页的当前记录（同时清理死数据）。"""
+    with pack_path.open("rb") as f:
+        data = f.read()
+    tmp = pack_path.with_name(f"{pack_path.name}.{os.getpid()}.tmp")
+    slot_table = bytearray(n_slots * _SLOT.size)
+    records = bytearray()
+    pos = _data_start(n_slots)
+    for page_no, (offset, length, crc) in sorted(index.slots.items()):
+        if page_no > n_slots:
+            continue
+        _SLOT.pack_into(slot_table, (page_no - 1) * _SLOT.size, pos + len(records), length, crc)
+        records += data[offset : offset + length]
+    with tmp.open("wb") as f:
+        f.write(_HEADER.pack(MAGIC, VERSION, 0, n_slots, index.expected_pages))
+        f.write(slot_table)
+        f.write(records)
+    os.replace(tmp, pack_path)
+
+
+def pack_write_page(workdir: Path, page_name: str, payload: bytes) -> None:
+    """追加写入一页记录（ocr_binary 编码），并原子更新其槽位。"""
+    page_no = page_index(page_name)
+    if page_no <= 0:
+        raise ValueError(f"invalid page name: {page_name}")
+    pack_path = get_pack_path(workdir)
+    crc = zlib.crc32(payload)
+
+    with _file_lock(pack_path):
+        if not pack_path.is_file():
+            _create(pack_path, max(_DEFAULT_SLOTS, page_no), 0)
+
+        with pack_path.open("rb") as f:
+            index = _read_index_from(f)
+            file_size = os.fstat(f.fileno()).st_size
+
+        live = sum(length for _, length, _ in index.slots.values())
+        dead = file_size - _data_start(index.n_slots) - live
+        if page_no > index.n_slots or dead > max(live, 1 << 20):
+            _rebuild(pack_path, index, max(index.n_slots, page_no * 2))
+            with pack_path.open("rb") as f:
+                index = _read_index_from(f)
+
+        with pack_path.open("r+b") as f:
+            f.seek(0, os.SEEK_END)
+            offset = f.tell()
+            f.write(payload)
+            f.flush()
+            # 先数据后索引：槽位指向的记录一定已完整写入
+            f.seek(_HEADER.size + (page_no - 1) * _SLOT.size)
+            f.write(_SLOT.pack(offset, len(payload), crc))
+            f.flush()
+
+
+def pack_remove_page(workdir: Path, page_name: str) -> None:
+    """清空某页槽位（该页改用单页缓存文件时调用）。"""
+    page_no = page_index(page_name)
+    pack_path = get_pack_path(workdir)
+    if page_no <= 0 or not pack_path.is_file():
+        return
+    with _file_lock(pack_path):
+        with pack_path.open("r+b") as f:
+            index = _read_index_from(f)
+            if page_no not in index.slots:
+                return
+            f.seek(_HEADER.size + (page_no - 1) * _SLOT.size)
+            f.write(_SLOT.pack(0, 0, 0))
+
+
+def pack_set_expected_pages(workdir: Path, expected_pages: int) -> None:
+    """记录试卷总页数，使「是否全部完成」只需读取 header。"""
+    pack_path = get_pack_path(workdir)
+    with _file_lock(pack_path):
+        if not pack_path.is_file():
+            _create(pack_path, max(_DEFAULT_SLOTS, expected_pages), expected_pages)
+            return
+        with pack_path.open("r+b") as f:
+            index = _read_index_from(f)
+            f.seek(0)
+            f.write(_HEADER.pack(MAGIC, VERSION, 0, index.n_slots, int(expected_pages)))
+
+
+def _decode(buf: bytes, page_no: int, slot: Tuple[int, int, int], lazy: bool) -> Optional[Dict]:
+    offset, length, crc = slot
+    if offset + length > len(buf) or zlib.crc32(buf[offset : offset + length]) != crc:
+        return None
+    try:
+        page = OcrBinaryPage.from_buffer(buf, offset, length, name=f"{PACK_NAME}#page_{page_no}")
+    except OcrBinaryError:
+        return None
+    return page.as_cache_data(lazy=lazy)
+
+
+def pack_load_page(workdir: Path, page_name: str, lazy: bool = False) -> Optional[Dict]:
+    """读取单页（header + 索引 + 该页记录）。"""
+    page_no = page_index(page_name)
+    pack_path = get_pack_path(workdir)
+    if not pack_path.is_file():
+        return None
+    try:
+        with _read_lock(pack_path), pack_path.open("rb") as f:
+            index = _read_index_from(f)
+            slot = index.slots.get(page_no)
+            if slot is None:
+                return None
+            offset, length, crc = slot
+            f.seek(offset)
+            raw = f.read(length)
+    except (FileNotFoundError, OcrBinaryError):
+        return None
+    return _decode(raw, page_no, (0, length, crc), lazy)
+
+
+def pack_load_all(workdir: Path, lazy: bool = False) -> Dict[str, Dict]:
+    """一次顺序读取整个文件，解码所有页面。损坏的记录视为缺失。"""
+    pack_path = get_pack_path(workdir)
+    if not pack_path.is_file():
+        return {}
+    try:
+        with _read_lock(pack_path), pack_path.open("rb") as f:
+            buf = f.read()
+    except FileNotFoundError:
+        return {}
+    if len(buf) < _HEADER.size:
+        return {}
+    try:
+        n_slots = _HEADER.unpack_from(buf, 0)[3]
+        index = _parse_index(buf[: _HEADER.size], buf[_HEADER.size : _data_start(n_slots)])
+    except (OcrBinaryError, struct.error):
+        return {}
+
+    caches: Dict[str, Dict] = {}
+    for page_no, slot in index.slots.items():
+        data = _decode(buf, page_no, slot, lazy)
+        if data is not None:
+            caches[f"page_{page_no}"] = data
+    return caches
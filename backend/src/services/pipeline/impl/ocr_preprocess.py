@@ -0,0 +1,218 @@
+"""
+ocr_preprocess.py - OCR 输入变换（降分辨率 / 裁掉空白边距）
+
+页面按 300 DPI 渲染是为了题目裁剪清晰；版面检测与题号匹配在更低分辨率下同样可靠。
+设置 EXAMPAPER_OCR_DPI（如 150）后，送入 PP-StructureV3 的是按比例缩小的页面。
+
+扫描页四周常有很宽的空白边距。设置 EXAMPAPER_OCR_TRIM=1 后，先按像素统计找出
+内容区域（含页眉页脚），只把该区域送入 predict。
+
+识别出的 bbox 再映射回页面坐标系：
+
+    内容区域    : content_box = (x1, y1, x2, y2)，页面坐标系（不裁剪时为整页）
+    OCR 坐标系  : ocr_size    = round(content_size * ocr_dpi / render_dpi)
+    页面坐标    : x_page = x1 + x_ocr * content_w / ocr_w
+
+OCR 缓存、结构检测、题目裁剪等下游阶段始终在页面坐标系中工作；缓存记录中的
+ocr_width / ocr_height / ocr_box 声明该页 OCR 实际运行的坐标系。
+"""
+
+from __future__ import annotations
+
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from ....common import DecodedPage, parse_int_env, scale_box
+
+# PdfToImagesStep 的默认渲染分辨率
+RENDER_DPI = 300
+
+# 内容区域检测：降采样步长、墨迹灰度阈值、每行/列至少的墨迹占比
+_TRIM_SAMPLE_STEP = 4
+_TRIM_INK_LEVEL = 200
+_TRIM_MIN_INK = 0.002
+# 内容区域四周保留的边距（占页面尺寸的比例）
+_TRIM_PAD_RATIO = 0.01
+# 裁剪后面积仍超过整页的该比例时不裁剪（收益太小）
+_TRIM_MAX_AREA = 0.9
+
+
+def get_ocr_dpi() -> int:
+    """OCR 输入分辨率（EXAMPAPER_OCR_DPI，默认 0 = 与渲染分辨率相同）。"""
+    return parse_int_env("EXAMPAPER_OCR_DPI", 0, 0, 1200)
+
+
+def ocr_trim_enabled() -> bool:
+    """是否在 OCR 前裁掉空白边距（EXAMPAPER_OCR_TRIM=1）。"""
+    return (os.getenv("EXAMPAPER_OCR_TRIM", "0") or "").strip() == "1"
+
+
+def ocr_input_needs_pixels() -> bool:
+    """OCR 输入变换是否需要已解码的页面像素（降分辨率或裁边启用时）。"""
+    return get_ocr_dpi() > 0 or ocr_trim_enabled()
+
+
+def _ink_span(profile: Any, min_ink: float) -> Optional[Tuple[int, int]]:
+    """墨迹占比超过 min_ink 的首尾下标（左闭右开），全空时返回 None。"""
+    import numpy as np
+
+    idx = np.flatnonzero(profile > min_ink)
+    if idx.size == 0:
+        return None
+    return int(idx[0]), int(idx[-1]) + 1
+
+
+def find_content_box(page: DecodedPage) -> Optional[Tuple[int, int, int, int]]:
+    """
+    按像素统计找出页面内容区域（页面坐标系，含留白边距）。
+
+    在降采样页面上统计每行/每列的墨迹占比，取首尾超过阈值的行列。
+    页面空白、或裁剪收益太小时返回 None。
+    """
+    step = _TRIM_SAMPLE_STEP
+    arr = page.array[::step, ::step]
+    gray = arr.min(axis=2) if arr.ndim == 3 else arr
+    ink = gray < _TRIM_INK_LEVEL
+    rows = _ink_span(ink.mean(axis=1), _TRIM_MIN_INK)
+    cols = _ink_span(ink.mean(axis=0), _TRIM_MIN_INK)
+    if rows is None or cols is None:
+        return None
+
+    w, h = page.width, page.height
+    pad_x = max(16, int(w * _TRIM_PAD_RATIO))
+    pad_y = max(16, int(h * _TRIM_PAD_RATIO))
+    x1 = max(0, cols[0] * step - pad_x)
+    x2 = min(w, cols[1] * step + pad_x)
+    y1 = max(0, rows[0] * step - pad_y)
+    y2 = min(h, rows[1] * step + pad_y)
+    if x2 <= x1 or y2 <= y1:
+        return None
+    if (x2 - x1) * (y2 - y1) > _TRIM_MAX_AREA * w * h:
+        return None
+    return (x1, y1, x2, y2)
+
+
+class OcrInputTransform:
+    """页面坐标系与 OCR 输入坐标系之间的映射（裁剪 + 缩放）。"""
+
+    __slots__ = ("page_size", "content_box", "ocr_size")
+
+    def __init__(
+        self,
+        page_size: Tuple[int, int],
+        ocr_size: Tuple[int, int],
+        content_box: Optional[Tuple[int, int, int, int]] = None,
+    ) -> None:
+        self.page_size = (int(page_size[0]), int(page_size[1]))
+        if content_box is None:
+            content_box = (0, 0, self.page_size[0], self.page_size[1])
+        self.content_box = tuple(int(v) for v in content_box)
+        self.ocr_size = (int(ocr_size[0]), int(ocr_size[1]))
+
+    @classmethod
+    def identity(cls, page_size: Tuple[int, int]) -> "OcrInputTransform":
+        return cls(page_size, page_size)
+
+    @classmethod
+    def for_page(
+        cls,
+        page_size: Tuple[int, int],
+        ocr_dpi: Optional[int] = None,
+        render_dpi: int = RENDER_DPI,
+        content_box: Optional[Tuple[int, int, int, int]] = None,
+    ) -> "OcrInputTransform":
+        """
+        按 OCR 分辨率和内容区域构造变换。
+
+        Args:
+            page_size: 页面图片尺寸 (width, height)
+            ocr_dpi: OCR 分辨率，None 时读取 EXAMPAPER_OCR_DPI；0 或不低于 render_dpi 时不缩放
+            render_dpi: 页面渲染分辨率
+            content_box: 只识别的页面区域 (x1, y1, x2, y2)，None 表示整页
+        """
+        if not page_size[0] or not page_size[1]:
+            return cls.identity(page_size)
+        if content_box is None:
+            content_box = (0, 0, int(page_size[0]), int(page_size[1]))
+        content_w = content_box[2] - content_box[0]
+        content_h = content_box[3] - content_box[1]
+        dpi = get_ocr_dpi() if ocr_dpi is None else ocr_dpi
+        if dpi <= 0 or dpi >= render_dpi:
+            return cls(page_size, (content_w, content_h), content_box)
+        scale = dpi / render_dpi
+        ocr_size = (max(1, round(content_w * scale)), max(1, round(content_h * scale)))
+        return cls(page_size, ocr_size, content_box)
+
+    @classmethod
+    def for_decoded_page(cls, page: DecodedPage, ocr_dpi: Optional[int] = None) -> "OcrInputTransform":
+        """按当前配置（EXAMPAPER_OCR_DPI / EXAMPAPER_OCR_TRIM）为已解码页面构造变换。"""
+        content_box = find_content_box(page) if ocr_trim_enabled() else None
+        return cls.for_page((page.width, page.height), ocr_dpi, content_box=content_box)
+
+    @property
+    def content_size(self) -> Tuple[int, int]:
+        x1, y1, x2, y2 = self.content_box
+        return (x2 - x1, y2 - y1)
+
+    @property
+    def is_cropped(self) -> bool:
+        return self.content_box != (0, 0, self.page_size[0], self.page_size[1])
+
+    @property
+    def is_identity(self) -> bool:
+        return not self.is_cropped and self.ocr_size == self.page_size
+
+    @property
+    def cache_variant(self) -> str:
+        """区分全局缓存条目（同一页面在不同 OCR 输入下的结果不同）。"""
+        if self.is_identity:
+            return ""
+        parts = []
+        if self.is_cropped:
+            parts.append("box{}_{}_{}_{}".format(*self.content_box))
+        if self.ocr_size != self.content_size:
+            parts.append(f"ocr{self.ocr_size[0]}x{self.ocr_size[1]}")
+        return "-".join(parts)
+
+    def prepare(self, page: DecodedPage) -> DecodedPage:
+        """把页面像素裁剪并缩放到 OCR 坐标系（不变换时原样返回；只裁剪时为零拷贝视图）。"""
+        if self.is_identity:
+            return page
+        x1, y1, x2, y2 = self.content_box
+        arr = page.array[y1:y2, x1:x2] if self.is_cropped else page.array
+        w, h = self.content_size
+        if self.ocr_size == (w, h):
+            return DecodedPage(arr, page.mode, w, h)
+
+        import numpy as np
+        from PIL import Image
+
+        img = Image.fromarray(np.ascontiguousarray(arr), page.mode)
+        small = img.resize(self.ocr_size, Image.LANCZOS)
+        return DecodedPage(np.asarray(small), small.mode, small.width, small.height)
+
+    def to_page_box(self, box: Any) -> List[int]:
+        """OCR 坐标系中的 bbox -> 页面坐标系（向外取整）。"""
+        x1, y1, _x2, _y2 = self.content_box
+        bx1, by1, bx2, by2 = scale_box(box, self.ocr_size, self.content_size)
+        pw, ph = self.page_size
+        return [min(pw, bx1 + x1), min(ph, by1 + y1), min(pw, bx2 + x1), min(ph, by2 + y1)]
+
+    def to_page_blocks(self, blocks: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """把版面块的 bbox 映射到页面坐标系（原地修改并返回）。"""
+        if self.is_identity:
+            return blocks
+        for blk in blocks:
+            bbox = blk.get("bbox")
+            if isinstance(bbox, (list, tuple)) and len(bbox) == 4:
+                blk["bbox"] = self.to_page_box(bbox)
+        return blocks
+
+    def cache_fields(self) -> Dict[str, Any]:
+        """写入 OCR 缓存记录的坐标系声明（不变换时为空）。"""
+        if self.is_identity:
+            return {}
+        fields: Dict[str, Any] = {"ocr_width": self.ocr_size[0], "ocr_height": self.ocr_size[1]}
+        if self.is_cropped:
+            fields["ocr_box"] = list(self.content_box)
+        return fields
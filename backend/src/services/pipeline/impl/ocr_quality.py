@@ -0,0 +1,320 @@
+"""
+ocr_quality.py - 可疑页面的高精度重新识别
+
+所有页面只用默认配置识别一次。题号漏检时 build_structure_doc 只会得到缺失的题目。
+题目提取完成后，这里按 OCR 缓存找出可疑页面：
+
+- qno_gap: 相邻两个题号之间有缺号（缺失的题头落在这两个题号所在的页面范围内）
+- no_text: 没有任何正文块
+- short_content: 正文总字数过少
+
+只对这些页面用高精度配置（ocr_models 的 accurate 变体，整页 300 DPI 输入）重新识别。
+新结果的题号集合包含旧结果、且题号或正文更多时才替换缓存，并重新生成该页的题目图片。
+每页的判断与结果记录在试卷目录下的 ocr_quality.json，续跑时不会重复识别同一页。
+
+配置：
+- EXAMPAPER_OCR_QUALITY_PASS: 1 启用（默认关闭）
+- EXAMPAPER_OCR_QUALITY_MAX_PAGES: 每份试卷最多重新识别的页数（默认 8）
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+from ....common import (
+    decode_page_image,
+    layout_blocks_from_doc,
+    page_image_exists,
+    page_image_size,
+    parse_int_env,
+)
+from ....common.paths import page_index
+from ....common.perf import perf_enabled, perf_event, perf_span
+from .structure_detection import extract_question_number, is_exam_end_block, is_noise_block
+
+REASON_QNO_GAP = "qno_gap"
+REASON_NO_TEXT = "no_text"
+REASON_SHORT_CONTENT = "short_content"
+
+OCR_QUALITY_FILENAME = "ocr_quality.json"
+
+# 正文总字数低于该值视为内容过少
+_SHORT_CONTENT_CHARS = 40
+# 相邻题号差超过该值时视为换了编号体系（如新的部分重新编号），不算缺号
+_MAX_QNO_GAP = 5
+
+
+def ocr_quality_pass_enabled() -> bool:
+    """是否对可疑页面做高精度重新识别（EXAMPAPER_OCR_QUALITY_PASS=1）。"""
+    return (os.getenv("EXAMPAPER_OCR_QUALITY_PASS", "0") or "").strip() == "1"
+
+
+def get_quality_max_pages() -> int:
+    """每份试卷最多重新识别的页数（EXAMPAPER_OCR_QUALITY_MAX_PAGES，默认 8）。"""
+    return parse_int_env("EXAMPAPER_OCR_QUALITY_MAX_PAGES", 8, 0, 1000)
+
+
+def _page_text_stats(blocks: List[Dict[str, Any]]) -> Tuple[Set[int], int]:
+    """页面的题号集合与正文总字数（忽略页眉页脚等噪声块）。"""
+    qnos: Set[int] = set()
+    chars = 0
+    for block in blocks:
+        if is_noise_block(block):
+            continue
+        text = block.get("content", "")
+        if not isinstance(text, str):
+            text = str(text)
+        text = text.strip()
+        if not text:
+            continue
+        chars += len(text)
+        qno = extract_question_number(text)
+        if qno is not None:
+            qnos.add(qno)
+    return qnos, chars
+
+
+def find_suspicious_pages(ocr_caches: Dict[str, Dict[str, Any]]) -> Dict[str, List[str]]:
+    """
+    找出需要重新识别的页面。
+
+    跳过的页面（skip_reason）与试卷结束标识之后的页面不参与判断。
+
+    Args:
+        ocr_caches: {page_name: ocr_cache_data} 字典
+
+    Returns:
+        {page_name: [reason, ...]}，按页码排序
+    """
+    suspicious: Dict[str, List[str]] = {}
+    first_page_of: Dict[int, str] = {}
+    pages: List[str] = []
+
+    for page_name in sorted(ocr_caches, key=page_index):
+        cache = ocr_caches[page_name]
+        if cache.get("skip_reason"):
+            continue
+        blocks = cache.get("blocks", [])
+        if any(is_exam_end_block(b) for b in blocks):
+            break
+        pages.append(page_name)
+        qnos, chars = _page_text_stats(blocks)
+        if chars == 0:
+            suspicious.setdefault(page_name, []).append(REASON_NO_TEXT)
+        elif chars < _SHORT_CONTENT_CHARS:
+            suspicious.setdefault(page_name, []).append(REASON_SHORT_CONTENT)
+        for qno in qnos:
+            first_page_of.setdefault(qno, page_name)
+
+    # 缺号：缺失的题头位于前后两个题号所在页面之间（含两端）
+    position = {name: i for i, name in enumerate(pages)}
+    ordered = sorted(first_page_of.items())
+    for (prev_qno, prev_page), (qno, page) in zip(ordered, ordered[1:]):
+        if not 1 < qno - prev_qno <= _MAX_QNO_GAP:
+            continue
+        start, end = position[prev_page], position[page]
+        for name in pages[min(start, end) : max(start, end) + 1]:
+            reasons = suspicious.setdefault(name, [])
+            if REASON_QNO_GAP not in reasons:
+                reasons.append(REASON_QNO_GAP)
+
+    return {name: suspicious[name] for name in sorted(suspicious, key=page_index)}
+
+
+def is_better_result(old_blocks: List[Dict[str, Any]], new_blocks: List[Dict[str, Any]]) -> bool:
+    """新结果不丢失已有题号，且题号更多或正文明显更多（>10%）时才采用。"""
+    old_qnos, old_chars = _page_text_stats(old_blocks)
+    new_qnos, new_chars = _page_text_stats(new_blocks)
+    if not new_qnos >= old_qnos:
+        return False
+    return len(new_qnos) > len(old_qnos) or new_chars > old_chars * 1.1
+
+
+def load_quality_report(workdir: Path) -> Dict[str, Any]:
+    """读取 ocr_quality.json，不存在时返回空报告。"""
+    path = Path(workdir) / OCR_QUALITY_FILENAME
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"pages": {}}
+    if not isinstance(data, dict) or not isinstance(data.get("pages"), dict):
+        return {"pages": {}}
+    return data
+
+
+def _save_quality_report(workdir: Path, report: Dict[str, Any]) -> None:
+    path = Path(workdir) / OCR_QUALITY_FILENAME
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def reocr_page(pipeline: Any, img_path: Path, gpu_semaphore: Optional[Any] = None) -> List[Dict[str, Any]]:
+    """
+    用高精度 pipeline 以整页分辨率重新识别一页（不读写缓存）。
+
+    Args:
+        pipeline: 高精度 PP-StructureV3 实例
+        img_path: 页面图片路径
+        gpu_semaphore: 可选的 GPU 信号量 / 调度槽位（predict 期间持有）
+
+    Returns:
+        页面坐标系中的版面块列表
+    """
+    from .ocr_cache import _trim_non_text_content
+
+    img_input: Any = decode_page_image(img_path).model_input()
+    if gpu_semaphore is not None:
+        gpu_semaphore.acquire()
+    try:
+        try:
+            doc = pipeline.predict(img_input)[0]
+        except (TypeError, ValueError, NotImplementedError):
+            # 兼容只接受路径输入的 PPStructureV3 版本（对数组输入报类型错误）；
+            # 超时、显存不足等其他错误直接抛出，不再用同一页重试
+            doc = pipeline.predict(str(img_path))[0]
+    finally:
+        if gpu_semaphore is not None:
+            gpu_semaphore.release()
+    blocks = layout_blocks_from_doc(doc)
+    _trim_non_text_content(blocks)
+    return blocks
+
+
+def _reocr_suspicious_page(
+    img_dir: Path,
+    page_name: str,
+    reasons: List[str],
+    pipeline: Any,
+    gpu_semaphore: Optional[Any],
+    log_fn: Callable[[str], None],
+) -> Dict[str, Any]:
+    """
+    重新识别一个可疑页面，结果更好时写回 OCR 缓存。
+
+    Returns:
+        该页的报告条目（accepted 为 True 表示缓存已被替换）
+    """
+    from .ocr_cache import load_ocr_cache, save_ocr_cache
+
+    img_path = img_dir / f"{page_name}.png"
+    entry: Dict[str, Any] = {"reasons": reasons, "accepted": False}
+    if not page_image_exists(img_path):
+        entry["error"] = "page image missing"
+        return entry
+
+    cached = load_ocr_cache(img_dir, page_name) or {}
+    old_blocks = cached.get("blocks", [])
+    image_size = (cached.get("image_width", 0), cached.get("image_height", 0))
+    if not image_size[0] or not image_size[1]:
+        image_size = page_image_size(img_path)
+
+    t0 = time.perf_counter()
+    try:
+        new_blocks = reocr_page(pipeline, img_path, gpu_semaphore=gpu_semaphore)
+    except Exception as e:
+        entry["error"] = f"{type(e).__name__}: {e}"
+        log_fn(f"  [重新识别] {page_name} 失败: {e}")
+        return entry
+    elapsed_ms = (time.perf_counter() - t0) * 1000.0
+
+    old_qnos, old_chars = _page_text_stats(old_blocks)
+    new_qnos, new_chars = _page_text_stats(new_blocks)
+    accepted = is_better_result(old_blocks, new_blocks)
+    entry.update(
+        accepted=accepted,
+        qnos_before=sorted(old_qnos),
+        qnos_after=sorted(new_qnos),
+        chars_before=old_chars,
+        chars_after=new_chars,
+    )
+    if perf_enabled():
+        perf_event(
+            "ocr.quality.reocr",
+            page=page_name,
+            reasons=reasons,
+            accepted=accepted,
+            qnos_before=len(old_qnos),
+            qnos_after=len(new_qnos),
+            predict_ms=round(elapsed_ms, 3),
+        )
+
+    if not accepted:
+        log_fn(f"  [重新识别] {page_name} ({'/'.join(reasons)}): 结果未改善，保留原结果")
+        return entry
+
+    save_ocr_cache(img_dir, page_name, new_blocks, image_size, source="reocr")
+    return entry
+
+
+def run_ocr_quality_pass(
+    img_dir: Path,
+    pipeline_factory: Callable[[], Any],
+    log: Optional[Callable[[str], None]] = None,
+    gpu_semaphore: Optional[Any] = None,
+    on_page_updated: Optional[Callable[[Path], None]] = None,
+) -> List[str]:
+    """
+    对可疑页面做高精度重新识别，并把更好的结果写回 OCR 缓存。
+
+    Args:
+        img_dir: 试卷目录（包含 page_*.png 与 ocr/）
+        pipeline_factory: 返回高精度 pipeline 的函数（仅在有可疑页面时调用）
+        log: 日志回调函数
+        gpu_semaphore: 可选的 GPU 信号量 / 调度槽位
+        on_page_updated: 某页缓存被替换后的回调（用于重新生成该页题目）
+
+    Returns:
+        缓存被替换的页面名列表
+    """
+    from .ocr_cache import flush_ocr_cache_writes, open_ocr_caches
+
+    log_fn = log or (lambda m: None)
+    img_dir = Path(img_dir)
+    max_pages = get_quality_max_pages()
+    if max_pages <= 0:
+        return []
+
+    report = load_quality_report(img_dir)
+    done_pages: Dict[str, Any] = report["pages"]
+
+    # 后台写入的缓存先落盘，避免稍后覆盖重新识别的结果
+    flush_ocr_cache_writes(img_dir, timeout=120)
+    # 扫描结束即关闭映射：之后会改写被替换页面的缓存文件
+    with perf_span("ocr.quality.scan"), open_ocr_caches(img_dir) as ocr_caches:
+        suspicious = find_suspicious_pages(ocr_caches)
+    todo = [name for name in suspicious if name not in done_pages]
+    budget = max_pages - len(done_pages)
+    if not todo or budget <= 0:
+        return []
+    if len(todo) > budget:
+        log_fn(f"可疑页面 {len(todo)} 页，只重新识别前 {budget} 页")
+        todo = todo[:budget]
+
+    log_fn(f"高精度重新识别 {len(todo)} 个可疑页面: {', '.join(todo)}")
+    pipeline = pipeline_factory()
+    updated: List[str] = []
+
+    for page_name in todo:
+        img_path = img_dir / f"{page_name}.png"
+        reasons = suspicious[page_name]
+        entry = _reocr_suspicious_page(img_dir, page_name, reasons, pipeline, gpu_semaphore, log_fn)
+        # 每页完成即写报告：中途中断时，已处理的页面下次不会重复识别
+        done_pages[page_name] = entry
+        _save_quality_report(img_dir, report)
+        if not entry["accepted"]:
+            continue
+
+        updated.append(page_name)
+        added = sorted(set(entry["qnos_after"]) - set(entry["qnos_before"]))
+        log_fn(f"  [重新识别] {page_name} ({'/'.join(reasons)}): 新增题号 {added or '无'}，已更新缓存")
+        if on_page_updated is not None:
+            on_page_updated(img_path)
+
+    return updated
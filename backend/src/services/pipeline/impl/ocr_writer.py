@@ -0,0 +1,225 @@
+"""
+ocr_writer.py - OCR 缓存的后台写入（write-behind）
+
+run_ocr_with_cache 原本在页面 worker 线程里、GPU 推理之后同步序列化并写盘，
+拉长了每一页的关键路径。这里用一个有界队列 + 单个后台线程持久化缓存记录：
+
+- submit() 把记录放入 pending 覆盖层后入队；队列满时阻塞（背压，内存有上限）
+- 读取方先查 pending 覆盖层（read-your-writes），写盘完成后才从覆盖层移除
+- 写入失败时后台线程退避重试；仍失败的记录留在覆盖层（不会丢失），flush() 在
+  调用线程中再同步写一次，仍有记录未落盘时返回 False（failed_pages 给出原因）
+- flush() 等待队列清空，在步骤结束时调用；进程退出时 atexit 兜底
+- 实际写入由调用方提供的写函数完成（ocr_cache 中为临时文件 + os.replace 原子写）
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional, Set, Tuple
+
+from ....common import parse_int_env
+
+logger = logging.getLogger(__name__)
+
+WriteFn = Callable[[Path, str, Dict[str, Any], bool], Any]
+
+_STOP = object()
+
+# 后台线程写入失败后的重试间隔（秒）；共尝试 len + 1 次
+_RETRY_DELAYS = (0.2, 1.0)
+
+
+def write_behind_enabled() -> bool:
+    """是否启用后台写入（EXAMPAPER_OCR_WRITE_BEHIND=1）。"""
+    return (os.getenv("EXAMPAPER_OCR_WRITE_BEHIND", "0") or "").strip() == "1"
+
+
+class OcrCacheWriter:
+    """有界队列 + 单线程的缓存写入器。"""
+
+    def __init__(self, write_fn: WriteFn, max_pending: int = 32) -> None:
+        self._write_fn = write_fn
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_pending))
+        self._cond = threading.Condition()
+        # (workdir, page_name) -> cache_data，尚未落盘的记录
+        self._pending: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        # 后台重试后仍未写入的记录（仍在 _pending 中）：key -> (pretty, 错误信息)
+        self._failed: Dict[Tuple[str, str], Tuple[bool, str]] = {}
+        # 同一时刻只有一个线程调用写函数（后台线程 / flush 中的同步重写）
+        self._write_lock = threading.Lock()
+        self._written = 0
+        self._errors = 0
+        self._last_error: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, name="ocr-cache-writer", daemon=True)
+        self._thread.start()
+
+    @staticmethod
+    def _key(workdir: Path, page_name: str) -> Tuple[str, str]:
+        return (str(workdir), page_name)
+
+    def submit(self, workdir: Path, page_name: str, cache_data: Dict[str, Any], pretty: bool = False) -> None:
+        """登记记录并入队；队列满时阻塞直到后台线程腾出空间。"""
+        key = self._key(workdir, page_name)
+        with self._cond:
+            self._pending[key] = cache_data
+            self._failed.pop(key, None)
+        self._queue.put((Path(workdir), page_name, cache_data, pretty))
+
+    def pending_get(self, workdir: Path, page_name: str) -> Optional[Dict[str, Any]]:
+        """读取尚未落盘的记录（read-your-writes）。"""
+        with self._cond:
+            return self._pending.get(self._key(workdir, page_name))
+
+    def pending_pages(self, workdir: Path) -> Set[str]:
+        """某个试卷目录下尚未落盘的页面名。"""
+        wd = str(workdir)
+        with self._cond:
+            return {page for (w, page) in self._pending if w == wd}
+
+    def failed_pages(self, workdir: Optional[Path] = None) -> Dict[str, str]:
+        """重试后仍未落盘的页面：page_name -> 错误信息（workdir 为 None 时键为 目录/页面）。"""
+        wd = str(workdir) if workdir is not None else None
+        with self._cond:
+            if wd is None:
+                return {f"{w}/{page}": err for (w, page), (_, err) in self._failed.items()}
+            return {page: err for (w, page), (_, err) in self._failed.items() if w == wd}
+
+    def flush(self, workdir: Optional[Path] = None, timeout: Optional[float] = None) -> bool:
+        """
+        等待记录全部落盘；后台写入失败的记录在调用线程中再同步写一次。
+
+        Args:
+            workdir: 只等待该目录的记录（None 表示全部）
+            timeout: 超时秒数（None 表示一直等待）
+
+        Returns:
+            是否全部落盘（超时或仍有写入失败的记录时为 False，见 failed_pages）
+        """
+        wd = str(workdir) if workdir is not None else None
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        def mine(key: Tuple[str, str]) -> bool:
+            return wd is None or key[0] == wd
+
+        def waiting() -> bool:
+            # 还在队列中、后台线程尚未处理完的记录
+            return any(mine(k) and k not in self._failed for k in self._pending)
+
+        with self._cond:
+            while waiting():
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            failed = [
+                (key, self._pending[key], pretty)
+                for key, (pretty, _) in self._failed.items()
+                if mine(key)
+            ]
+
+        for key, cache_data, pretty in failed:
+            self._write(key, cache_data, pretty, only_if_current=True)
+
+        with self._cond:
+            return not any(mine(k) for k in self._pending)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "pending": len(self._pending),
+                "queued": self._queue.qsize(),
+                "written": self._written,
+                "errors": self._errors,
+                "failed": len(self._failed),
+                "last_error": self._last_error,
+            }
+
+    def _write(
+        self,
+        key: Tuple[str, str],
+        cache_data: Dict[str, Any],
+        pretty: bool,
+        only_if_current: bool = False,
+    ) -> Optional[str]:
+        """
+        写入一条记录并更新 pending/failed 状态，返回错误信息（成功时为 None）。
+
+        only_if_current: 记录已被更新的记录覆盖（或已落盘）时不再写入（flush 中的同步重写）
+        """
+        workdir, page_name = Path(key[0]), key[1]
+        with self._write_lock:
+            if only_if_current:
+                with self._cond:
+                    if self._pending.get(key) is not cache_data:
+                        return None
+            error: Optional[str] = None
+            try:
+                self._write_fn(workdir, page_name, cache_data, pretty)
+            except Exception as e:
+                error = f"{workdir.name}/{page_name}: {type(e).__name__}: {e}"
+                logger.warning("OCR 缓存写入失败 %s", error)
+        with self._cond:
+            current = self._pending.get(key) is cache_data
+            if error is None:
+                self._written += 1
+                # 同一页可能已被更新的记录覆盖，只移除本次写入的那一份
+                if current:
+                    del self._pending[key]
+                    self._failed.pop(key, None)
+            else:
+                self._errors += 1
+                self._last_error = error
+            self._cond.notify_all()
+        return error
+
+    def _run(self) -> None:
+        while True:
+            item = self._queue.get()
+            if item is _STOP:
+                return
+            workdir, page_name, cache_data, pretty = item
+            key = self._key(workdir, page_name)
+            error = self._write(key, cache_data, pretty)
+            for delay in _RETRY_DELAYS:
+                if error is None:
+                    break
+                time.sleep(delay)
+                error = self._write(key, cache_data, pretty, only_if_current=True)
+            if error is not None:
+                # 记录留在覆盖层，由 flush() 再同步写入
+                with self._cond:
+                    if self._pending.get(key) is cache_data:
+                        self._failed[key] = (pretty, error)
+                    self._cond.notify_all()
+
+    def close(self, timeout: Optional[float] = 30.0) -> None:
+        self.flush(timeout=timeout)
+        self._queue.put(_STOP)
+        self._thread.join(timeout=5)
+
+
+_instance: Optional[OcrCacheWriter] = None
+_instance_lock = threading.Lock()
+
+
+def get_ocr_writer(write_fn: WriteFn) -> OcrCacheWriter:
+    """进程级单例（首次调用时启动后台线程）。"""
+    global _instance
+    if _instance is None:
+        with _instance_lock:
+            if _instance is None:
+                max_pending = parse_int_env("EXAMPAPER_OCR_WRITE_QUEUE", 32, 1, 1024)
+                _instance = OcrCacheWriter(write_fn, max_pending=max_pending)
+                atexit.register(_instance.close)
+    return _instance
+
+
+def peek_ocr_writer() -> Optional[OcrCacheWriter]:
+    """已启动的写入器（未启用/未使用时为 None，不会创建）。"""
+    return _instance
@@ -0,0 +1,166 @@
+"""
+page_classifier.py - OCR 前的空白页 / 非题目页识别
+
+试卷 PDF 常带封面、考生须知、空白背页和答题卡，这些页面同样要跑一次完整的
+pipeline.predict。这里在 OCR 之前做一次廉价判断：
+
+- 像素：在降采样的页面上统计墨迹占比与行直方图（墨迹行带数），识别空白页和
+  只有页眉/页码的背页
+- 文本层（可用时）：没有题号、且含答题卡/考生须知等关键字的页面视为非题目页
+
+被跳过的页面以零版面块写入 OCR 缓存（skip_reason 记录原因），is_ocr_complete 与
+build_structure_doc 把它们当作已处理的空页面。
+
+误判可以按试卷覆盖：试卷目录下的 page_overrides.json
+
+    {"page_3": "ocr", "page_17": "skip"}
+
+"ocr" 强制运行 OCR（忽略已有的跳过记录），"skip" 强制跳过。题目提取步骤每次运行
+只读取一次该文件（load_page_overrides），再传给 run_ocr_with_cache。
+
+配置：
+- EXAMPAPER_PAGE_CLASSIFIER: 1 启用（默认关闭）
+"""
+
+from __future__ import annotations
+
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ....common import QUESTION_HEAD_PATTERN
+
+SKIP_BLANK = "blank"
+SKIP_NON_QUESTION = "non_question"
+
+OVERRIDE_OCR = "ocr"
+OVERRIDE_SKIP = "skip"
+OVERRIDES = (OVERRIDE_OCR, OVERRIDE_SKIP)
+
+PAGE_OVERRIDES_FILENAME = "page_overrides.json"
+
+# 降采样步长：300 DPI 页面约 310 x 440 个采样点
+_SAMPLE_STEP = 8
+# 灰度低于该值视为墨迹
+_INK_LEVEL = 160
+# 忽略四周的边缘（扫描阴影、装订孔）
+_EDGE_RATIO = 0.03
+# 墨迹占比低于该值直接视为空白页
+_BLANK_INK_RATIO = 0.001
+# 只有页眉/页码：墨迹行带不超过 2 条且墨迹很少
+_SPARSE_MAX_BANDS = 2
+_SPARSE_INK_RATIO = 0.004
+
+# 非题目页关键字（需同时没有题号）
+NON_QUESTION_KEYWORDS = [
+    "答题卡",
+    "考生须知",
+    "注意事项",
+    "准考证号",
+    "填涂",
+    "条形码粘贴",
+]
+
+
+def page_classifier_enabled() -> bool:
+    """是否在 OCR 前识别空白页/非题目页（EXAMPAPER_PAGE_CLASSIFIER=1）。"""
+    return (os.getenv("EXAMPAPER_PAGE_CLASSIFIER", "0") or "").strip() == "1"
+
+
+@dataclass
+class PageVerdict:
+    """页面分类结果（skip_reason 为 None 表示需要 OCR）。"""
+
+    skip_reason: Optional[str]
+    ink_ratio: float = 0.0
+    ink_bands: int = 0
+
+
+def classify_page_pixels(page: Any) -> PageVerdict:
+    """
+    根据像素判断页面是否空白。
+
+    Args:
+        page: DecodedPage（numpy 数组，RGB 或灰度）
+    """
+    arr = page.array[::_SAMPLE_STEP, ::_SAMPLE_STEP]
+    h, w = arr.shape[0], arr.shape[1]
+    my, mx = int(h * _EDGE_RATIO), int(w * _EDGE_RATIO)
+    arr = arr[my : h - my, mx : w - mx]
+    if arr.size == 0:
+        return PageVerdict(SKIP_BLANK)
+
+    # 取最暗的通道：彩色墨迹也算墨迹
+    gray = arr.min(axis=2) if arr.ndim == 3 else arr
+    ink = gray < _INK_LEVEL
+    ink_ratio = float(ink.mean())
+
+    # 行直方图：连续有墨迹的行组成一条行带
+    rows = ink.any(axis=1)
+    bands = int(rows[0]) + int((rows[1:] & ~rows[:-1]).sum())
+
+    if ink_ratio < _BLANK_INK_RATIO:
+        return PageVerdict(SKIP_BLANK, ink_ratio, bands)
+    if bands <= _SPARSE_MAX_BANDS and ink_ratio < _SPARSE_INK_RATIO:
+        return PageVerdict(SKIP_BLANK, ink_ratio, bands)
+    return PageVerdict(None, ink_ratio, bands)
+
+
+def classify_page_text(text: str) -> Optional[str]:
+    """
+    根据文本层判断非题目页。
+
+    Returns:
+        SKIP_NON_QUESTION 或 None（有题号、或没有命中关键字）
+    """
+    if not text or QUESTION_HEAD_PATTERN.search(text):
+        return None
+    compact = "".join(text.split())
+    if any(kw in compact for kw in NON_QUESTION_KEYWORDS):
+        return SKIP_NON_QUESTION
+    return None
+
+
+def load_page_overrides(workdir: Path) -> Dict[str, str]:
+    """读取试卷的人工覆盖（page_name -> "ocr" / "skip"），不存在时返回空字典。"""
+    path = Path(workdir) / PAGE_OVERRIDES_FILENAME
+    if not path.is_file():
+        return {}
+    try:
+        with path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict):
+        return {}
+    return {str(k): v for k, v in data.items() if v in OVERRIDES}
+
+
+def get_page_override(workdir: Path, page_name: str) -> Optional[str]:
+    """单页的人工覆盖决定。"""
+    return load_page_overrides(workdir).get(page_name)
+
+
+def set_page_override(workdir: Path, page_name: str, decision: Optional[str]) -> Dict[str, str]:
+    """
+    设置（decision 为 None 时清除）单页的人工覆盖，返回更新后的全部覆盖。
+
+    Raises:
+        ValueError: decision 不是 "ocr" / "skip" / None
+    """
+    if decision is not None and decision not in OVERRIDES:
+        raise ValueError(f"Unknown page override: {decision}")
+    overrides = load_page_overrides(workdir)
+    if decision is None:
+        overrides.pop(page_name, None)
+    else:
+        overrides[page_name] = decision
+
+    path = Path(workdir) / PAGE_OVERRIDES_FILENAME
+    tmp = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    with tmp.open("w", encoding="utf-8") as f:
+        json.dump(overrides, f, ensure_ascii=False, indent=2, sort_keys=True)
+    os.replace(tmp, path)
+    return overrides
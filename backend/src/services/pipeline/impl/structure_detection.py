@@ -9,22 +9,30 @@ from __future__ import annotations
 import json
 import re
 from collections import defaultdict
-from dataclasses import dataclass, field, asdict
+from dataclasses import dataclass, field, asdict, replace
 from pathlib import Path
-from typing import Any, Dict, List, Literal, Optional, Tuple
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterable, List, Literal, Optional, Tuple
 
 from ....common import (
     page_index,
     QUESTION_HEAD_PATTERN,
     NOISE_TEXT_KEYWORDS,
     EXAM_END_KEYWORDS,
+    KeywordMatcher,
     is_section_boundary_block,
 )
 
+if TYPE_CHECKING:
+    from .block_table import BlockTable
+
 
 # 资料分析标题关键字
 DATA_ANALYSIS_KEYWORDS = ["资料分析", "Data Analysis"]
 
+# 资料分析标题判断（关键字 + "部分"）与噪声过滤，各自一次扫描
+_DATA_ANALYSIS_MATCHER = KeywordMatcher(keywords={"data_analysis": DATA_ANALYSIS_KEYWORDS, "part": ["部分"]})
+_NOISE_MATCHER = KeywordMatcher(keywords={"noise": NOISE_TEXT_KEYWORDS})
+
 # 资料分析题号范围（用于兜底检测）
 DATA_ANALYSIS_QNO_START = 111
 DATA_ANALYSIS_QNO_END = 130
@@ -193,12 +201,10 @@ def detect_data_analysis_start(
             if not isinstance(text, str):
                 text = str(text)
 
-            # 检查是否包含资料分析关键字
-            for keyword in DATA_ANALYSIS_KEYWORDS:
-                if keyword in text:
-                    # 额外验证：检查是否是标题（通常有"第X部分"）
-                    if "部分" in text or block.get("label") == "title":
-                        return page_name
+            # 包含资料分析关键字，且是标题（通常有"第X部分"）
+            hits = _DATA_ANALYSIS_MATCHER.match(text)
+            if "data_analysis" in hits and ("part" in hits or block.get("label") == "title"):
+                return page_name
 
     return None
 
@@ -230,11 +236,7 @@ def is_noise_block(block: Dict[str, Any]) -> bool:
     if not isinstance(text, str):
         text = str(text)
 
-    for keyword in NOISE_TEXT_KEYWORDS:
-        if keyword in text:
-            return True
-
-    return False
+    return bool(_NOISE_MATCHER.match(text))
 
 
 def is_exam_end_block(block: Dict[str, Any]) -> bool:
@@ -276,6 +278,8 @@ def build_structure_doc(
     """
     构建结构文档。
 
+    EXAMPAPER_BLOCK_TABLE=1 时在列式块表上计算（见 block_table.py），结果相同。
+
     Args:
         ocr_caches: {page_name: ocr_cache_data} 字典
         log: 日志回调函数
@@ -283,44 +287,132 @@ def build_structure_doc(
     Returns:
         StructureDoc 结构文档
     """
-    log_fn = log or (lambda m: None)
+    from .block_table import BlockTable, block_table_enabled
 
-    doc = StructureDoc()
-    doc.total_pages = len(ocr_caches)
+    if block_table_enabled():
+        return build_structure_doc_from_table(BlockTable.from_ocr_caches(ocr_caches), log)
+    return _build_structure_doc_blocks(ocr_caches, log)
 
-    sorted_pages = sorted(ocr_caches.keys(), key=page_index)
 
-    # 1. 检测资料分析起始页（优先标题，失败则后续用题号兜底）
-    doc.data_analysis_start_page = detect_data_analysis_start(ocr_caches)
-    if doc.data_analysis_start_page:
-        log_fn(f"检测到资料分析起始页: {doc.data_analysis_start_page}")
-        da_start_idx = page_index(doc.data_analysis_start_page)
-    else:
-        log_fn("未检测到资料分析区域标题，将使用题号兜底")
-        da_start_idx = float("inf")
+def _build_structure_doc_blocks(
+    ocr_caches: Dict[str, Dict[str, Any]],
+    log: Optional[callable] = None,
+) -> StructureDoc:
+    """逐块遍历 dict 的实现（所有页面一次性交给 StructureBuilder）。"""
+    builder = StructureBuilder(ocr_caches.keys(), log)
+    for page_name in sorted(ocr_caches.keys(), key=page_index):
+        builder.add_page(page_name, ocr_caches[page_name])
+    return builder.finish()
 
-    # 2. 遍历所有页面提取题目
-    all_questions: Dict[int, QuestionNode] = {}  # qno -> QuestionNode
-    page_blocks: Dict[str, List[BBox]] = defaultdict(list)  # 记录非噪声块供材料裁剪
-    current_qno: Optional[int] = None
-    exam_ended = False  # 试卷结束标志
 
-    for page_name in sorted_pages:
-        if exam_ended:
+class StructureBuilder:
+    """
+    增量构建结构文档：页面 OCR 完成即可加入，不必等整卷识别结束。
+
+    题目续接是按页码顺序的状态机，所以页面按页码顺序处理：乱序到达的页面先放在
+    重排缓冲区中，等前面的页面都到齐后再依次处理。finish() 只做分组与材料区域
+    等收尾工作，因此最后一页到达后可以立即得到结构文档。
+
+    与一次性构建的结果相同：
+    - 资料分析起始页取第一个含标题的页面，处理到第 N 页时已知道前 N 页是否有标题，
+      正好决定第 N 页的题目是否属于资料分析
+    - 题号兜底（整卷没有标题时，第一个 111-130 题所在页为起始页）要到 finish()
+      才能确定是否生效，兜底之后新建的题目先记录下来，生效时再改为资料分析小题
+    - 已处理过的页面再次加入（如高精度重新识别后）时从头重放所有已处理页面
+    """
+
+    def __init__(self, page_names: Optional[Iterable[str]] = None, log: Optional[callable] = None) -> None:
+        """
+        Args:
+            page_names: 整卷的页面名称（用于判断是否到齐）；None 表示未知，只能由 finish() 收尾
+            log: 日志回调函数（finish() 时按一次性构建的顺序输出）
+        """
+        self._log = log or (lambda m: None)
+        self._expected: Optional[List[str]] = (
+            sorted(page_names, key=page_index) if page_names is not None else None
+        )
+        self._pages: Dict[str, Dict[str, Any]] = {}  # 已收到的页面（含缓冲区中的）
+        self._applied: List[str] = []  # 已按顺序处理的页面
+        self._reset_walk()
+
+    def _reset_walk(self) -> None:
+        self._title_page: Optional[str] = None
+        self._fallback_page: Optional[str] = None
+        self._fallback_qnos: List[int] = []
+        self._questions: Dict[int, QuestionNode] = {}  # qno -> QuestionNode
+        self._page_blocks: Dict[str, List[BBox]] = defaultdict(list)  # 记录非噪声块供材料裁剪
+        self._current_qno: Optional[int] = None
+        self._exam_ended = False
+        self._walk_log: List[Tuple[str, str]] = []  # (事件, 页面)，finish() 时输出
+
+    # ------------------------------------------------------------------
+    # 加入页面
+    # ------------------------------------------------------------------
+
+    def add_page(self, page_name: str, ocr_data: Dict[str, Any]) -> None:
+        """加入（或替换）一页的 OCR 结果，并处理所有已可按顺序处理的页面。"""
+        replaced = page_name in self._pages and page_name in self._applied
+        self._pages[page_name] = ocr_data
+        if replaced:
+            # 续接状态依赖前面所有页面：从头重放
+            applied = self._applied
+            self._applied = []
+            self._reset_walk()
+            for name in applied:
+                self._apply(name, self._pages[name])
+                self._applied.append(name)
+        self._drain()
+
+    def _drain(self) -> None:
+        """按页码顺序处理缓冲区中已到齐的页面。"""
+        if self._expected is None:
+            return
+        while len(self._applied) < len(self._expected):
+            page_name = self._expected[len(self._applied)]
+            if page_name not in self._pages:
+                return
+            self._apply(page_name, self._pages[page_name])
+            self._applied.append(page_name)
+
+    @property
+    def pages_received(self) -> int:
+        return len(self._pages)
+
+    @property
+    def pages_applied(self) -> int:
+        return len(self._applied)
+
+    @property
+    def complete(self) -> bool:
+        """整卷所有页面都已处理（page_names 已知时）。"""
+        return self._expected is not None and len(self._applied) == len(self._expected)
+
+    # ------------------------------------------------------------------
+    # 单页处理（按页码顺序调用）
+    # ------------------------------------------------------------------
+
+    def _apply(self, page_name: str, cache: Dict[str, Any]) -> None:
+        # 1. 资料分析起始页（优先标题；试卷结束之后的页面也参与检测）
+        if self._title_page is None and detect_data_analysis_start({page_name: cache}) is not None:
+            self._title_page = page_name
+
+        if self._exam_ended:
             # 试卷已结束，跳过后续页面
-            break
+            return
 
-        cache = ocr_caches[page_name]
         blocks = cache.get("blocks", [])
         page_idx = page_index(page_name)
-        is_data_analysis_page = page_idx >= da_start_idx
+        # 标题出现在本页或之前的页面：本页属于资料分析区域
+        is_data_analysis_page = self._title_page is not None
+        all_questions = self._questions
 
+        # 2. 提取题目
         for block in blocks:
             # 检测试卷结束标识
             if is_exam_end_block(block):
-                exam_ended = True
-                current_qno = None  # 终止当前题目延续
-                log_fn(f"检测到试卷结束标识: {page_name}")
+                self._exam_ended = True
+                self._current_qno = None  # 终止当前题目延续
+                self._walk_log.append(("exam_end", page_name))
                 break
 
             if is_noise_block(block):
@@ -337,19 +429,17 @@ def build_structure_doc(
             bbox = BBox.from_list(page_name, [int(x) for x in bbox_raw])
 
             # 记录所有非噪声块，供后续材料抽取
-            page_blocks[page_name].append(bbox)
+            self._page_blocks[page_name].append(bbox)
 
             # 检查是否是题目开头
             qno = extract_question_number(text)
 
             if qno is not None:
-                # 检查是否属于资料分析题号范围（兜底逻辑）
+                # 检查是否属于资料分析题号范围（兜底逻辑，finish() 时确定是否生效）
                 is_da_q = is_data_analysis_qno(qno)
-                if doc.data_analysis_start_page is None and is_da_q:
-                    doc.data_analysis_start_page = page_name
-                    da_start_idx = min(da_start_idx, page_idx)
-                    is_data_analysis_page = True
-                    log_fn(f"通过题号兜底检测到资料分析起始页: {page_name}")
+                if self._title_page is None and self._fallback_page is None and is_da_q:
+                    self._fallback_page = page_name
+                    self._walk_log.append(("fallback", page_name))
 
                 # 新题目开始
                 kind = "data_analysis_sub" if (is_data_analysis_page or is_da_q) else "normal"
@@ -364,6 +454,8 @@ def build_structure_doc(
                         bboxes=[bbox],
                         text_preview=text[:100],
                     )
+                    if kind == "normal" and self._fallback_page is not None:
+                        self._fallback_qnos.append(qno)
                 else:
                     # 跨页延续：更新 page_span 和 bboxes
                     existing = all_questions[qno]
@@ -371,70 +463,211 @@ def build_structure_doc(
                         existing.page_span.append(page_name)
                     existing.bboxes.append(bbox)
 
-                current_qno = qno
+                self._current_qno = qno
 
-            elif current_qno is not None and current_qno in all_questions:
+            elif self._current_qno is not None and self._current_qno in all_questions:
                 # 先检查是否是新部分/新材料的开头
                 if is_section_boundary_block(block):
                     # 遇到新部分开头，终止上一题的续接
-                    current_qno = None
+                    self._current_qno = None
                     continue
 
                 # 当前题目的延续内容
-                existing = all_questions[current_qno]
+                existing = all_questions[self._current_qno]
 
                 # 检查是否是同一页或下一页
                 if page_name not in existing.page_span:
                     # 可能是跨页延续
-                    last_page = existing.page_span[-1]
-                    last_idx = page_index(last_page)
-                    curr_idx = page_index(page_name)
+                    last_idx = page_index(existing.page_span[-1])
 
                     # 只有相邻页面才视为延续
-                    if curr_idx == last_idx + 1:
+                    if page_idx == last_idx + 1:
                         existing.page_span.append(page_name)
 
                 if page_name in existing.page_span:
                     existing.bboxes.append(bbox)
 
-    # 3. 整理题目列表
-    doc.questions = [all_questions[qno] for qno in sorted(all_questions.keys())]
+    # ------------------------------------------------------------------
+    # 收尾
+    # ------------------------------------------------------------------
+
+    def finish(self) -> StructureDoc:
+        """
+        生成结构文档。
+
+        可以多次调用，之后仍可继续加入页面。有缺页时（缓冲区中还有页面），在临时
+        构建器上按页码顺序处理所有已收到的页面，与一次性构建一样跳过缺失页面。
+        """
+        received = sorted(self._pages.keys(), key=page_index)
+        if len(received) > len(self._applied):
+            builder = StructureBuilder(received, self._log)
+            for page_name in received:
+                builder.add_page(page_name, self._pages[page_name])
+            return builder.finish()
+
+        log_fn = self._log
+        doc = StructureDoc()
+        doc.total_pages = len(self._pages)
+
+        if self._title_page:
+            doc.data_analysis_start_page = self._title_page
+            log_fn(f"检测到资料分析起始页: {doc.data_analysis_start_page}")
+        else:
+            log_fn("未检测到资料分析区域标题，将使用题号兜底")
+        fallback = self._title_page is None and self._fallback_page is not None
+
+        for event, page_name in self._walk_log:
+            if event == "fallback":
+                if fallback:
+                    doc.data_analysis_start_page = page_name
+                    log_fn(f"通过题号兜底检测到资料分析起始页: {page_name}")
+            else:
+                log_fn(f"检测到试卷结束标识: {page_name}")
+
+        # 3. 整理题目列表（复制节点：分组会修改 kind / parent_id）
+        fallback_qnos = set(self._fallback_qnos) if fallback else set()
+        all_questions = {
+            qno: replace(
+                q,
+                kind="data_analysis_sub" if qno in fallback_qnos else q.kind,
+                page_span=list(q.page_span),
+                bboxes=list(q.bboxes),
+            )
+            for qno, q in self._questions.items()
+        }
+        doc.questions = [all_questions[qno] for qno in sorted(all_questions.keys())]
+
+        # 4. 构建资料分析大题（包括题号兜底检测的）
+        _group_data_analysis(doc, all_questions, log_fn)
+
+        # 5. 补齐资料分析材料区域
+        _attach_material_regions(doc, self._page_blocks, received)
+
+        normal_count = len([q for q in doc.questions if q.kind == "normal"])
+        log_fn(f"共检测到 {normal_count} 道普通题目")
+
+        return doc
+
+
+def _attach_material_regions(
+    doc: StructureDoc,
+    page_blocks: Dict[str, List[BBox]],
+    sorted_pages: List[str],
+) -> None:
+    """按子题位置为每个资料分析大题收集材料区域的块。"""
+    if not (doc.big_questions and doc.data_analysis_start_page):
+        return
+
     question_by_id = {q.id: q for q in doc.questions}
+    da_start_idx = page_index(doc.data_analysis_start_page)
+
+    # 预计算每个大题的上一个大题的结束位置
+    prev_end_page_idx: Optional[int] = None
+    prev_end_max_y: Dict[str, int] = {}
+
+    for idx, big_q in enumerate(doc.big_questions):
+        sub_nodes = [
+            question_by_id[sid]
+            for sid in big_q.sub_question_ids
+            if sid in question_by_id
+        ]
+
+        # 收集子题的页面和最小 y 坐标
+        sub_pages = set()
+        sub_min_y: Dict[str, int] = {}
+        sub_max_y: Dict[str, int] = {}
+        for node in sub_nodes:
+            for b in node.bboxes:
+                sub_pages.add(b.page)
+                sub_min_y[b.page] = min(sub_min_y.get(b.page, b.y1), b.y1)
+                sub_max_y[b.page] = max(sub_max_y.get(b.page, b.y2), b.y2)
+
+        first_sub_idx = min(page_index(p) for p in sub_pages) if sub_pages else None
+
+        # 计算当前大题的材料起始位置
+        if idx == 0:
+            material_start_idx = da_start_idx
+            material_start_min_y: Dict[str, int] = {}
+        else:
+            material_start_idx = prev_end_page_idx if prev_end_page_idx else da_start_idx
+            material_start_min_y = prev_end_max_y.copy()
+
+        # 收集材料页面
+        material_pages: List[str] = []
+        for page_name in sorted_pages:
+            p_idx = page_index(page_name)
+            if p_idx < material_start_idx or first_sub_idx is None:
+                continue
+            # 材料区域：从当前大题起始到子题所在页
+            if p_idx <= first_sub_idx:
+                material_pages.append(page_name)
+            elif page_name in sub_pages:
+                # 子题跨越的页面也包含在内
+                material_pages.append(page_name)
+
+        # 收集材料区域的 bboxes
+        material_boxes: List[BBox] = []
+        for page_name in material_pages:
+            blocks = page_blocks.get(page_name, [])
+            p_idx = page_index(page_name)
+            cutoff_top = material_start_min_y.get(page_name)
+            cutoff_bottom = sub_min_y.get(page_name)
+
+            for b in blocks:
+                # 跳过上一大题子题区域内的块
+                if cutoff_top is not None and p_idx == material_start_idx and b.y1 < cutoff_top:
+                    continue
+                # 跳过当前大题子题区域内的块
+                if cutoff_bottom is not None and b.y2 > cutoff_bottom:
+                    continue
+                material_boxes.append(b)
+
+        if material_boxes:
+            big_q.material_bboxes = material_boxes
+            big_q.page_span = sorted(
+                set(big_q.page_span) | {b.page for b in material_boxes},
+                key=page_index,
+            )
+
+        # 更新下一个大题的起始位置（当前大题子题的结束位置）
+        if sub_pages:
+            prev_end_page_idx = max(page_index(p) for p in sub_pages)
+            prev_end_max_y = sub_max_y.copy()
+
 
-    # 4. 构建资料分析大题
-    # 收集所有资料分析题目（包括题号兜底检测的）
+def _group_data_analysis(
+    doc: StructureDoc,
+    all_questions: Dict[int, QuestionNode],
+    log_fn: Callable[[str], None],
+) -> None:
+    """按题号把资料分析小题分成大题（每 DATA_ANALYSIS_GROUP_SIZE 题一组）。"""
     da_questions = [
         q for q in doc.questions
         if q.kind == "data_analysis_sub" or (q.qno is not None and is_data_analysis_qno(q.qno))
     ]
-
-    if da_questions:
-        # 按题号分组
-        da_qnos = sorted([q.qno for q in da_questions if q.qno is not None])
-        log_fn(f"资料分析小题: {da_qnos[0]} - {da_qnos[-1]}")
-
-        # 按 DATA_ANALYSIS_GROUP_SIZE 分组
-        for group_idx in range(0, len(da_qnos), DATA_ANALYSIS_GROUP_SIZE):
-            group_qnos = da_qnos[group_idx:group_idx + DATA_ANALYSIS_GROUP_SIZE]
-            if not group_qnos:
-                continue
-
-            big_order = group_idx // DATA_ANALYSIS_GROUP_SIZE + 1
-            big_id = f"data_analysis_{big_order}"
-
-            # 收集该组的页面范围
-            group_pages = set()
-            sub_ids = []
-            for qno in group_qnos:
-                q = all_questions.get(qno)
-                if q:
-                    group_pages.update(q.page_span)
-                    sub_ids.append(q.id)
-                    q.parent_id = big_id
-                    # 确保 kind 正确
-                    q.kind = "data_analysis_sub"
-
-            big_q = BigQuestion(
+    if not da_questions:
+        return
+
+    da_qnos = sorted([q.qno for q in da_questions if q.qno is not None])
+    log_fn(f"资料分析小题: {da_qnos[0]} - {da_qnos[-1]}")
+
+    for group_idx in range(0, len(da_qnos), DATA_ANALYSIS_GROUP_SIZE):
+        group_qnos = da_qnos[group_idx:group_idx + DATA_ANALYSIS_GROUP_SIZE]
+        big_order = group_idx // DATA_ANALYSIS_GROUP_SIZE + 1
+        big_id = f"data_analysis_{big_order}"
+
+        group_pages = set()
+        sub_ids = []
+        for qno in group_qnos:
+            q = all_questions.get(qno)
+            if q:
+                group_pages.update(q.page_span)
+                sub_ids.append(q.id)
+                q.parent_id = big_id
+                q.kind = "data_analysis_sub"
+
+        doc.big_questions.append(
+            BigQuestion(
                 id=big_id,
                 order=big_order,
                 page_span=sorted(group_pages, key=page_index),
@@ -442,86 +675,184 @@ def build_structure_doc(
                 sub_question_ids=sub_ids,
                 qno_range=(group_qnos[0], group_qnos[-1]),
             )
-            doc.big_questions.append(big_q)
+        )
 
-        log_fn(f"构建了 {len(doc.big_questions)} 个资料分析大题")
+    log_fn(f"构建了 {len(doc.big_questions)} 个资料分析大题")
 
-        # 5. 补齐资料分析材料区域
-        if doc.big_questions and doc.data_analysis_start_page:
-            da_start_idx = page_index(doc.data_analysis_start_page)
 
-            # 预计算每个大题的上一个大题的结束位置
-            prev_end_page_idx: Optional[int] = None
-            prev_end_max_y: Dict[str, int] = {}
+def build_structure_doc_from_table(
+    table: "BlockTable",
+    log: Optional[callable] = None,
+) -> StructureDoc:
+    """
+    在列式块表上构建结构文档（与逐块遍历的结果相同）。
 
-            for idx, big_q in enumerate(doc.big_questions):
-                sub_nodes = [
-                    question_by_id[sid]
-                    for sid in big_q.sub_question_ids
-                    if sid in question_by_id
-                ]
-
-                # 收集子题的页面和最小 y 坐标
-                sub_pages = set()
-                sub_min_y: Dict[str, int] = {}
-                sub_max_y: Dict[str, int] = {}
-                for node in sub_nodes:
-                    for b in node.bboxes:
-                        sub_pages.add(b.page)
-                        sub_min_y[b.page] = min(sub_min_y.get(b.page, b.y1), b.y1)
-                        sub_max_y[b.page] = max(sub_max_y.get(b.page, b.y2), b.y2)
-
-                first_sub_idx = min(page_index(p) for p in sub_pages) if sub_pages else None
-
-                # 计算当前大题的材料起始位置
-                if idx == 0:
-                    material_start_idx = da_start_idx
-                    material_start_min_y: Dict[str, int] = {}
-                else:
-                    material_start_idx = prev_end_page_idx if prev_end_page_idx else da_start_idx
-                    material_start_min_y = prev_end_max_y.copy()
-
-                # 收集材料页面
-                material_pages: List[str] = []
-                for page_name in sorted_pages:
-                    p_idx = page_index(page_name)
-                    if p_idx < material_start_idx or first_sub_idx is None:
-                        continue
-                    # 材料区域：从当前大题起始到子题所在页
-                    if p_idx <= first_sub_idx:
-                        material_pages.append(page_name)
-                    elif page_name in sub_pages:
-                        # 子题跨越的页面也包含在内
-                        material_pages.append(page_name)
-
-                # 收集材料区域的 bboxes
-                material_boxes: List[BBox] = []
-                for page_name in material_pages:
-                    blocks = page_blocks.get(page_name, [])
-                    p_idx = page_index(page_name)
-                    cutoff_top = material_start_min_y.get(page_name)
-                    cutoff_bottom = sub_min_y.get(page_name)
-
-                    for b in blocks:
-                        # 跳过上一大题子题区域内的块
-                        if cutoff_top is not None and p_idx == material_start_idx and b.y1 < cutoff_top:
-                            continue
-                        # 跳过当前大题子题区域内的块
-                        if cutoff_bottom is not None and b.y2 > cutoff_bottom:
-                            continue
-                        material_boxes.append(b)
-
-                if material_boxes:
-                    big_q.material_bboxes = material_boxes
-                    big_q.page_span = sorted(
-                        set(big_q.page_span) | {b.page for b in material_boxes},
-                        key=page_index,
-                    )
+    噪声过滤、试卷结束截断、材料区域的块选择与页面范围均为数组运算；
+    题目续接是顺序状态机，只遍历有效行并使用预先计算的题号 / 部分标题列。
+    """
+    import numpy as np
 
-                # 更新下一个大题的起始位置（当前大题子题的结束位置）
-                if sub_pages:
-                    prev_end_page_idx = max(page_index(p) for p in sub_pages)
-                    prev_end_max_y = sub_max_y.copy()
+    from .block_table import NO_QNO
+
+    log_fn = log or (lambda m: None)
+    pages = table.pages
+    page_no = table.page_no
+
+    doc = StructureDoc()
+    doc.total_pages = len(pages)
+
+    # 1. 资料分析起始页：含关键字，且含"部分"或为标题块
+    da_keyword = table.rows_containing(DATA_ANALYSIS_KEYWORDS)
+    part_hint = table.rows_containing(("部分",))
+    da_row = table.first_row(da_keyword & (part_hint | table.labels_equal("title")))
+    if da_row is not None:
+        doc.data_analysis_start_page = pages[table.page[da_row]]
+        log_fn(f"检测到资料分析起始页: {doc.data_analysis_start_page}")
+        da_start_idx: float = page_index(doc.data_analysis_start_page)
+    else:
+        log_fn("未检测到资料分析区域标题，将使用题号兜底")
+        da_start_idx = float("inf")
+
+    # 2. 有效行：试卷结束标识之前、非噪声、有 bbox
+    end_row = table.first_row(table.exam_end)
+    in_exam = np.ones(len(table), dtype=bool)
+    if end_row is not None:
+        in_exam[end_row:] = False
+    valid = in_exam & ~table.noise & table.has_bbox
+
+    rows = np.flatnonzero(valid)
+    row_page = table.page[rows].tolist()
+    row_qno = table.qno[rows].tolist()
+    row_box = table.bbox[rows].tolist()
+    row_boundary = table.section_boundary[rows].tolist()
+
+    all_questions: Dict[int, QuestionNode] = {}
+    question_rows: Dict[int, List[int]] = {}  # qno -> 表行号（与 bboxes 一一对应）
+    current_qno: Optional[int] = None
+
+    for row, pos, qno, box, boundary in zip(rows.tolist(), row_page, row_qno, row_box, row_boundary):
+        page_name = pages[pos]
+        page_idx = int(page_no[pos])
+        bbox = BBox.from_list(page_name, box)
+
+        if qno != NO_QNO:
+            is_da_q = is_data_analysis_qno(qno)
+            if doc.data_analysis_start_page is None and is_da_q:
+                doc.data_analysis_start_page = page_name
+                da_start_idx = min(da_start_idx, page_idx)
+                log_fn(f"通过题号兜底检测到资料分析起始页: {page_name}")
+            is_data_analysis_page = page_idx >= da_start_idx
+            kind = "data_analysis_sub" if (is_data_analysis_page or is_da_q) else "normal"
+
+            if qno not in all_questions:
+                all_questions[qno] = QuestionNode(
+                    id=f"q{qno}",
+                    qno=qno,
+                    kind=kind,
+                    page_span=[page_name],
+                    bboxes=[bbox],
+                    text_preview=table.text[row][:100],
+                )
+                question_rows[qno] = [row]
+            else:
+                existing = all_questions[qno]
+                if page_name not in existing.page_span:
+                    existing.page_span.append(page_name)
+                existing.bboxes.append(bbox)
+                question_rows[qno].append(row)
+            current_qno = qno
+
+        elif current_qno is not None and current_qno in all_questions:
+            if boundary:
+                current_qno = None
+                continue
+            existing = all_questions[current_qno]
+            if page_name not in existing.page_span:
+                # 只有相邻页面才视为跨页延续
+                if page_idx == page_index(existing.page_span[-1]) + 1:
+                    existing.page_span.append(page_name)
+            if page_name in existing.page_span:
+                existing.bboxes.append(bbox)
+                question_rows[current_qno].append(row)
+
+    if end_row is not None:
+        log_fn(f"检测到试卷结束标识: {pages[table.page[end_row]]}")
+
+    # 3. 整理题目列表
+    doc.questions = [all_questions[qno] for qno in sorted(all_questions.keys())]
+
+    # 4. 资料分析大题
+    _group_data_analysis(doc, all_questions, log_fn)
+
+    # 5. 材料区域（按页的 y 范围与块选择均为数组运算）
+    if doc.big_questions and doc.data_analysis_start_page:
+        da_start_page_idx = page_index(doc.data_analysis_start_page)
+        n_pages = len(pages)
+        y1 = table.bbox[:, 1]
+        y2 = table.bbox[:, 3]
+        big_int = np.iinfo(np.int64).max
+
+        prev_end_page_idx: Optional[int] = None
+        prev_end_max_y = np.full(n_pages, -1, dtype=np.int64)
+        prev_has_end = np.zeros(n_pages, dtype=bool)
+
+        for idx, big_q in enumerate(doc.big_questions):
+            sub_rows = np.array(
+                [
+                    r
+                    for sid in big_q.sub_question_ids
+                    if sid.startswith("q") and int(sid[1:]) in question_rows
+                    for r in question_rows[int(sid[1:])]
+                ],
+                dtype=np.int64,
+            )
+            sub_page_mask = np.zeros(n_pages, dtype=bool)
+            sub_min_y = np.full(n_pages, big_int, dtype=np.int64)
+            sub_max_y = np.full(n_pages, -1, dtype=np.int64)
+            if sub_rows.size:
+                sub_pages = table.page[sub_rows]
+                sub_page_mask[sub_pages] = True
+                np.minimum.at(sub_min_y, sub_pages, y1[sub_rows])
+                np.maximum.at(sub_max_y, sub_pages, y2[sub_rows])
+
+            if idx == 0:
+                material_start_idx = da_start_page_idx
+                top_y = np.full(n_pages, -1, dtype=np.int64)
+                has_top = np.zeros(n_pages, dtype=bool)
+            else:
+                material_start_idx = prev_end_page_idx if prev_end_page_idx else da_start_page_idx
+                top_y = prev_end_max_y
+                has_top = prev_has_end
+
+            if sub_page_mask.any():
+                first_sub_idx = int(page_no[sub_page_mask].min())
+                material_page = (page_no >= material_start_idx) & (
+                    (page_no <= first_sub_idx) | sub_page_mask
+                )
+                row_pages = table.page
+                # 起始页上一大题子题之上的块、当前大题子题之下的块都不属于材料
+                skip_top = (
+                    (page_no[row_pages] == material_start_idx)
+                    & has_top[row_pages]
+                    & (y1 < top_y[row_pages])
+                )
+                skip_bottom = sub_page_mask[row_pages] & (y2 > sub_min_y[row_pages])
+                material_rows = np.flatnonzero(
+                    valid & material_page[row_pages] & ~skip_top & ~skip_bottom
+                )
+                if material_rows.size:
+                    big_q.material_bboxes = [
+                        BBox.from_list(pages[pos], box)
+                        for pos, box in zip(
+                            table.page[material_rows].tolist(), table.bbox[material_rows].tolist()
+                        )
+                    ]
+                    material_page_names = {pages[pos] for pos in np.unique(table.page[material_rows]).tolist()}
+                    big_q.page_span = sorted(set(big_q.page_span) | material_page_names, key=page_index)
+
+                prev_end_page_idx = int(page_no[sub_page_mask].max())
+                prev_end_max_y = sub_max_y
+                prev_has_end = sub_page_mask
 
     normal_count = len([q for q in doc.questions if q.kind == "normal"])
     log_fn(f"共检测到 {normal_count} 道普通题目")
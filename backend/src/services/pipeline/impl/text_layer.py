@@ -0,0 +1,242 @@
+"""
+text_layer.py - PDF 文本层快速通道
+
+对于带完整文本层的电子版 PDF（born-digital），直接用 PyMuPDF 的
+page.get_text("dict") 生成版面块，跳过 PP-StructureV3 推理。
+
+输出的 block 与 layout_blocks_from_doc 完全同构：
+    {index, label, region_label, bbox, content}
+bbox 已换算到渲染 DPI（默认 300）下的像素坐标，与 page_N.png 对齐，
+因此 find_question_spans / build_structure_doc / 裁剪步骤无法区分来源。
+文本层坐标基于未旋转的页面：先经 page.rotation_matrix 转到渲染方向，再减去
+page.rect 的原点（CropBox 偏移），与 get_pixmap 的输出一致。
+
+逐页判定文本层是否可信，不可信时返回 None，由调用方回退到 OCR：
+- 文本字符过少（扫描页 / 纯图片页）
+- 乱码比例过高（字体缺少 ToUnicode 映射）
+- 图片覆盖页面大部分面积（扫描件 + 隐藏文本层）
+- 矢量图形过多（图表/表格需要版面模型识别）
+"""
+
+from __future__ import annotations
+
+import os
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# 页码，如 "第2页共44页"、"- 3 -"、"3/44"
+_PAGE_NUMBER_RE = re.compile(r"^[-—\s]*(第\s*\d+\s*页.*|\d+(\s*/\s*\d+)?)[-—\s]*$")
+
+# 页眉/页脚所在的页面边缘比例
+_EDGE_RATIO = 0.06
+
+# 双栏判定：两栏正文各自的总高度下限、横跨中缝的正文总高度上限（占页高比例）
+_COLUMN_MIN_COVER = 0.25
+_SPANNING_MAX_COVER = 0.15
+
+
+def text_layer_enabled() -> bool:
+    """是否启用文本层快速通道（EXAMPAPER_TEXT_LAYER=1）。"""
+    return (os.getenv("EXAMPAPER_TEXT_LAYER", "0") or "").strip() == "1"
+
+
+def _env_float(name: str, default: float) -> float:
+    raw = (os.getenv(name, "") or "").strip()
+    if not raw:
+        return default
+    try:
+        return float(raw)
+    except ValueError:
+        return default
+
+
+def _is_bad_char(ch: str) -> bool:
+    """乱码字符：替换字符、私有区字符、控制字符。"""
+    code = ord(ch)
+    if ch == "�":
+        return True
+    if 0xE000 <= code <= 0xF8FF:
+        return True
+    return code < 0x20 and ch not in "\t\n\r"
+
+
+def _join_line_text(parts: List[str]) -> str:
+    """
+    拼接 span/line 文本，与 PP-StructureV3 的输出保持一致：
+    中文直接相连，仅在两侧都是拉丁字母/数字时补空格。
+    """
+    out = ""
+    for part in parts:
+        if not part:
+            continue
+        if out and out[-1].isascii() and out[-1].isalnum() and part[0].isascii() and part[0].isalnum():
+            out += " "
+        out += part
+    return out
+
+
+def _classify_block(text: str, bbox: List[float], page_h: float) -> str:
+    """按位置和内容为文本块分配 PP-StructureV3 风格的 label。"""
+    compact = "".join(text.split())
+    top, bottom = bbox[1], bbox[3]
+    if _PAGE_NUMBER_RE.match(compact) and top >= page_h * (1 - 2 * _EDGE_RATIO):
+        return "number"
+    if len(compact) <= 40:
+        if bottom <= page_h * _EDGE_RATIO:
+            return "header"
+        if top >= page_h * (1 - _EDGE_RATIO):
+            return "footer"
+    return "text"
+
+
+def _reading_order(
+    items: List[Tuple[List[float], str, str]], page_w: float, page_h: float
+) -> List[Tuple[List[float], str, str]]:
+    """
+    块的阅读顺序。
+
+    单栏页面自上而下、自左而右。双栏页面与 PP-StructureV3 一样按栏输出：
+    以横跨中缝的块（通栏标题、页眉页脚）为界分段，每段内先左栏后右栏，
+    否则左右两栏的行会交错。
+
+    双栏判定：中缝两侧各有足够高度的正文，且横跨中缝的正文很少（单栏试卷的
+    题干都横跨中缝，只有选项等短块落在一侧）。
+    """
+    mid = page_w / 2
+
+    def side(bbox: List[float]) -> int:
+        """0 左栏，1 右栏，-1 横跨中缝。"""
+        if bbox[2] <= mid:
+            return 0
+        if bbox[0] >= mid:
+            return 1
+        return -1
+
+    ordered = sorted(items, key=lambda it: (round(it[0][1], 1), it[0][0]))
+
+    cover = {0: 0.0, 1: 0.0, -1: 0.0}
+    for bbox, label, _ in ordered:
+        if label == "text":
+            cover[side(bbox)] += bbox[3] - bbox[1]
+    if (
+        min(cover[0], cover[1]) < page_h * _COLUMN_MIN_COVER
+        or cover[-1] > page_h * _SPANNING_MAX_COVER
+    ):
+        return ordered
+
+    result: List[Tuple[List[float], str, str]] = []
+    band: List[Tuple[List[float], str, str]] = []
+    for item in ordered:
+        if item[1] in ("text", "image") and side(item[0]) != -1:
+            band.append(item)
+            continue
+        # sorted 是稳定排序：栏内仍自上而下
+        result.extend(sorted(band, key=lambda it: side(it[0])))
+        band = []
+        result.append(item)
+    result.extend(sorted(band, key=lambda it: side(it[0])))
+    return result
+
+
+def _to_render_space(bbox: Any, matrix: Any, origin: Tuple[float, float]) -> List[float]:
+    """未旋转页面坐标 -> 渲染方向的页面坐标（以 page.rect 左上角为原点）。"""
+    import fitz
+
+    r = fitz.Rect(bbox) * matrix
+    return [r.x0 - origin[0], r.y0 - origin[1], r.x1 - origin[0], r.y1 - origin[1]]
+
+
+def extract_text_layer_blocks(
+    page: Any,
+    dpi: int = 300,
+) -> Tuple[Optional[List[Dict[str, Any]]], str]:
+    """
+    从 PDF 页面文本层提取版面块。
+
+    Args:
+        page: fitz.Page 对象
+        dpi: 页面图片的渲染 DPI（bbox 按 dpi/72 缩放）
+
+    Returns:
+        (blocks, reason): 文本层可信时返回 blocks 和 "ok"，
+        否则返回 None 和不可信原因（用于日志/统计）
+    """
+    import fitz
+
+    min_chars = int(_env_float("EXAMPAPER_TEXT_LAYER_MIN_CHARS", 30))
+    max_bad_ratio = _env_float("EXAMPAPER_TEXT_LAYER_MAX_BAD_RATIO", 0.02)
+    max_image_cover = _env_float("EXAMPAPER_TEXT_LAYER_MAX_IMAGE_COVER", 0.6)
+    max_drawings = int(_env_float("EXAMPAPER_TEXT_LAYER_MAX_DRAWINGS", 40))
+
+    scale = dpi / 72.0
+    rect = page.rect
+    page_w, page_h = float(rect.width), float(rect.height)
+    matrix = page.rotation_matrix
+    origin = (float(rect.x0), float(rect.y0))
+    page_area = max(1.0, page_w * page_h)
+
+    # 不保留图片二进制，图片位置单独用 get_image_info 获取
+    flags = fitz.TEXTFLAGS_DICT & ~fitz.TEXT_PRESERVE_IMAGES
+    data = page.get_text("dict", flags=flags)
+
+    text_items: List[Tuple[List[float], str]] = []
+    total_chars = 0
+    bad_chars = 0
+    for blk in data.get("blocks", []):
+        if blk.get("type") != 0:
+            continue
+        lines: List[str] = []
+        for line in blk.get("lines", []):
+            line_text = _join_line_text([span.get("text", "") for span in line.get("spans", [])])
+            if line_text.strip():
+                lines.append(line_text.strip())
+        text = _join_line_text(lines)
+        if not text:
+            continue
+        compact = "".join(text.split())
+        total_chars += len(compact)
+        bad_chars += sum(1 for ch in compact if _is_bad_char(ch))
+        text_items.append((_to_render_space(blk["bbox"], matrix, origin), text))
+
+    if total_chars < min_chars:
+        return None, "too_few_chars"
+    if bad_chars / max(1, total_chars) > max_bad_ratio:
+        return None, "bad_encoding"
+
+    image_items: List[List[float]] = []
+    image_area = 0.0
+    for info in page.get_image_info():
+        x0, y0, x1, y1 = _to_render_space(info.get("bbox", (0, 0, 0, 0)), matrix, origin)
+        x0, y0 = max(0.0, x0), max(0.0, y0)
+        x1, y1 = min(page_w, x1), min(page_h, y1)
+        if x1 <= x0 or y1 <= y0:
+            continue
+        image_items.append([x0, y0, x1, y1])
+        image_area += (x1 - x0) * (y1 - y0)
+
+    if image_area / page_area > max_image_cover:
+        return None, "image_cover"
+
+    if max_drawings >= 0 and len(page.get_drawings()) > max_drawings:
+        return None, "vector_graphics"
+
+    items: List[Tuple[List[float], str, str]] = []
+    for bbox, text in text_items:
+        items.append((bbox, _classify_block(text, bbox, page_h), text))
+    for bbox in image_items:
+        items.append((bbox, "image", ""))
+
+    items = _reading_order(items, page_w, page_h)
+
+    blocks: List[Dict[str, Any]] = []
+    for idx, (bbox, label, text) in enumerate(items):
+        blocks.append(
+            {
+                "index": idx,
+                "label": label,
+                "region_label": None,
+                "bbox": [int(round(v * scale)) for v in bbox],
+                "content": text,
+            }
+        )
+    return blocks, "ok"
@@ -0,0 +1,144 @@
+"""
+Page stream - hand rendered pages from step 0 to step 1 as they appear.
+
+When the runner fuses pdf_to_images and extract_questions, it opens a
+PageStream for the task. The render step publishes each page the moment
+its PNG exists, and the extraction step consumes pages from the stream
+instead of globbing page_*.png after rendering has finished.
+
+The stream is an in-process, append-only log:
+- publish() never blocks and ignores pages already published, so a retried
+  producer does not feed the same page twice
+- iteration replays from the first page, so a retried consumer sees every page
+- fail() wakes all consumers with PageStreamError (the runner calls it once
+  the producer has exhausted its retries)
+"""
+
+from __future__ import annotations
+
+import threading
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+
+class PageStreamError(RuntimeError):
+    """Raised to consumers when the producing step failed."""
+
+    pass
+
+
+class PageStream:
+    """
+    Thread-safe stream of (page_index, image_path) items.
+
+    page_index is 0-based and matches the PDF page order, so consumers can
+    store results by index even though pages arrive out of order.
+    """
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._items: List[Tuple[int, Path]] = []
+        self._seen: Set[int] = set()
+        self._total: Optional[int] = None
+        self._closed = False
+        self._error: Optional[str] = None
+
+    def set_total(self, total: int) -> None:
+        """Announce the total page count (known once the PDF is opened)."""
+        with self._cond:
+            self._total = int(total)
+            self._cond.notify_all()
+
+    def publish(self, page_index: int, path: Path) -> None:
+        """Publish a page that is ready on disk."""
+        with self._cond:
+            if self._closed or int(page_index) in self._seen:
+                return
+            self._seen.add(int(page_index))
+            self._items.append((int(page_index), Path(path)))
+            self._cond.notify_all()
+
+    def close(self) -> None:
+        """Mark the stream as complete (no more pages)."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def fail(self, error: str) -> None:
+        """Mark the stream as failed and wake all consumers."""
+        with self._cond:
+            self._error = error or "page stream failed"
+            self._closed = True
+            self._cond.notify_all()
+
+    @property
+    def closed(self) -> bool:
+        with self._cond:
+            return self._closed
+
+    def wait_total(self, timeout: Optional[float] = None) -> int:
+        """
+        Block until the total page count is known.
+
+        Raises:
+            PageStreamError: producer failed before announcing the total
+            TimeoutError: timeout elapsed
+        """
+        with self._cond:
+            ok = self._cond.wait_for(
+                lambda: self._total is not None or self._error is not None,
+                timeout=timeout,
+            )
+            if self._error is not None and self._total is None:
+                raise PageStreamError(self._error)
+            if not ok or self._total is None:
+                raise TimeoutError("page stream total not announced")
+            return self._total
+
+    def __iter__(self) -> Iterator[Tuple[int, Path]]:
+        """Yield pages in publish order, blocking until the stream is closed."""
+        pos = 0
+        while True:
+            with self._cond:
+                self._cond.wait_for(
+                    lambda: pos < len(self._items) or self._closed
+                )
+                if self._error is not None:
+                    raise PageStreamError(self._error)
+                if pos >= len(self._items):
+                    return
+                item = self._items[pos]
+            pos += 1
+            yield item
+
+    def paths(self) -> List[Path]:
+        """Return all published page paths sorted by page index."""
+        with self._cond:
+            return [p for _, p in sorted(self._items, key=lambda t: t[0])]
+
+
+# Active streams, keyed by task_id (owned by PipelineRunner)
+_streams: Dict[str, PageStream] = {}
+_streams_lock = threading.Lock()
+
+
+def open_page_stream(task_id: str) -> PageStream:
+    """Create (or replace) the page stream for a task."""
+    stream = PageStream()
+    with _streams_lock:
+        _streams[task_id] = stream
+    return stream
+
+
+def get_page_stream(task_id: str) -> Optional[PageStream]:
+    """Get the active page stream for a task, or None when steps are not fused."""
+    with _streams_lock:
+        return _streams.get(task_id)
+
+
+def close_page_stream(task_id: str) -> None:
+    """Drop the page stream for a task (closing it first)."""
+    with _streams_lock:
+        stream = _streams.pop(task_id, None)
+    if stream is not None and not stream.closed:
+        stream.close()
@@ -6,12 +6,14 @@ This module provides the PipelineRunner class that:
 - Handles retries with exponential backoff + jitter
 - Supports task cancellation
 - Emits progress events with structured logging
+- Optionally overlaps PDF rendering with question extraction (page streaming)
 """
 
 from __future__ import annotations
 
 import asyncio
 import logging
+import os
 import random
 from datetime import datetime
 from typing import Any, Callable, Dict, List, Optional
@@ -26,6 +28,7 @@ from .contracts import (
     TaskSnapshot,
     TaskStatus,
 )
+from .page_stream import close_page_stream, open_page_stream
 from .steps.base import StepExecutor
 
 
@@ -62,6 +65,7 @@ class PipelineRunner:
         max_retries: int = 3,
         retry_delay: float = 1.0,
         on_event: Optional[EventCallback] = None,
+        stream_pages: Optional[bool] = None,
     ) -> None:
         """
         Initialize the runner.
@@ -71,11 +75,17 @@ class PipelineRunner:
             max_retries: Maximum retry attempts per step
             retry_delay: Base delay between retries (exponential backoff)
             on_event: Callback for progress events
+            stream_pages: Run a page-producing step concurrently with the
+                page-consuming step that follows it. Defaults to the
+                EXAMPAPER_STREAM_PAGES env var.
         """
         self._steps = steps
         self._max_retries = max_retries
         self._retry_delay = retry_delay
         self._on_event = on_event or (lambda e, d: None)
+        if stream_pages is None:
+            stream_pages = (os.getenv("EXAMPAPER_STREAM_PAGES", "0") or "").strip() == "1"
+        self._stream_pages = bool(stream_pages)
 
         # Cancellation tokens per task
         self._cancellation_tokens: Dict[str, asyncio.Event] = {}
@@ -175,7 +185,12 @@ class PipelineRunner:
             self._emit("pipeline_started", {"task_id": task_id})
 
             # Execute each step
+            fused_idx = -1
             for idx, step in enumerate(self._steps):
+                # Already executed together with the previous (streaming) step
+                if idx == fused_idx:
+                    continue
+
                 # Check for cancellation
                 if self._cancellation_tokens[task_id].is_set():
                     self._emit("pipeline_cancelled", {"task_id": task_id})
@@ -213,42 +228,38 @@ class PipelineRunner:
                     )
                     continue
 
+                # Stream rendered pages straight into the next step
+                next_step = self._steps[idx + 1] if idx + 1 < len(self._steps) else None
+                next_state = (
+                    snapshot.get_step_by_name(next_step.name) if next_step else None
+                )
+                if (
+                    self._stream_pages
+                    and getattr(step, "streams_pages", False)
+                    and next_step is not None
+                    and getattr(next_step, "consumes_page_stream", False)
+                    and next_state is not None
+                    and next_state.status != StepStatus.completed
+                ):
+                    results = await self._execute_streamed(
+                        task_id, step, step_state.index, next_step, next_state.index, ctx
+                    )
+                    fused_idx = idx + 1
+                    for st, state, result in (
+                        (step, step_state, results[0]),
+                        (next_step, next_state, results[1]),
+                    ):
+                        if self._apply_result(snapshot, st, state, result):
+                            return snapshot
+                    continue
+
                 # Execute step with retry
                 result = await self._execute_with_retry(
                     task_id, step, step_state.index, ctx
                 )
 
-                # Update step state
-                step_state.status = (
-                    StepStatus.completed if result.success else StepStatus.failed
-                )
-                step_state.ended_at = datetime.now()
-                step_state.artifact_paths = result.artifact_paths
-                step_state.error_message = result.error
-
-                snapshot.updated_at = datetime.now()
-
-                # Check for failure
-                if not result.success:
-                    # Steps 0, 1, 4 are critical
-                    if step.name in [
-                        StepName.pdf_to_images,
-                        StepName.extract_questions,
-                        StepName.collect_results,
-                    ]:
-                        snapshot.status = TaskStatus.failed
-                        snapshot.error_message = result.error
-                        snapshot.current_step = -1
-
-                        self._emit(
-                            "pipeline_failed",
-                            {
-                                "task_id": task_id,
-                                "step": step.name.value,
-                                "error": result.error,
-                            },
-                        )
-                        return snapshot
+                if self._apply_result(snapshot, step, step_state, result):
+                    return snapshot
 
             # Check if all steps completed or skipped
             all_completed = all(
@@ -271,6 +282,101 @@ class PipelineRunner:
             # Cleanup cancellation token
             self._cancellation_tokens.pop(task_id, None)
 
+    def _apply_result(
+        self,
+        snapshot: TaskSnapshot,
+        step: StepExecutor,
+        step_state: Any,
+        result: StepResult,
+    ) -> bool:
+        """
+        Record a step result on the snapshot.
+
+        Returns:
+            True if a critical step failed and the pipeline must stop
+        """
+        step_state.status = (
+            StepStatus.completed if result.success else StepStatus.failed
+        )
+        step_state.ended_at = datetime.now()
+        step_state.artifact_paths = result.artifact_paths
+        step_state.error_message = result.error
+
+        snapshot.updated_at = datetime.now()
+
+        if result.success:
+            return False
+
+        # Steps 0, 1, 4 are critical
+        if step.name not in [
+            StepName.pdf_to_images,
+            StepName.extract_questions,
+            StepName.collect_results,
+        ]:
+            return False
+
+        snapshot.status = TaskStatus.failed
+        snapshot.error_message = result.error
+        snapshot.current_step = -1
+
+        self._emit(
+            "pipeline_failed",
+            {
+                "task_id": snapshot.task_id,
+                "step": step.name.value,
+                "error": result.error,
+            },
+        )
+        return True
+
+    async def _execute_streamed(
+        self,
+        task_id: str,
+        producer: StepExecutor,
+        producer_index: int,
+        consumer: StepExecutor,
+        consumer_index: int,
+        ctx: StepContext,
+    ) -> List[StepResult]:
+        """
+        Execute a page-producing step and its consumer concurrently.
+
+        The producer publishes pages to a PageStream as they are written; the
+        consumer starts working on page 1 while later pages are still being
+        rendered. The stream is failed once the producer has given up, so the
+        consumer never waits on pages that will not arrive.
+        """
+        stream = open_page_stream(task_id)
+        logger.info(
+            "Streaming pages from %s into %s",
+            producer.name.value,
+            consumer.name.value,
+            extra={"task_id": task_id},
+        )
+
+        async def run_producer() -> StepResult:
+            try:
+                result = await self._execute_with_retry(
+                    task_id, producer, producer_index, ctx
+                )
+            except BaseException:
+                stream.fail(f"{producer.name.value} aborted")
+                raise
+            if result.success:
+                stream.close()
+            else:
+                stream.fail(result.error or f"{producer.name.value} failed")
+            return result
+
+        try:
+            results = await asyncio.gather(
+                run_producer(),
+                self._execute_with_retry(task_id, consumer, consumer_index, ctx),
+            )
+        finally:
+            close_page_stream(task_id)
+        return list(results)
+
     async def _execute_with_retry(
         self,
         task_id: str,
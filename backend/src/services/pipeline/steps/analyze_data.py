@@ -27,6 +27,9 @@ class AnalyzeDataStep(BaseStepExecutor):
     4. Outputs structure.json
 
     This step does NOT call OCR - it uses cached results from Step 1.
+
+    With EXAMPAPER_INCREMENTAL_STRUCTURE=1, question extraction builds structure.json
+    as the last OCR page lands; auto mode then finds it and skips this step.
     """
 
     def __init__(
@@ -68,7 +71,7 @@ class AnalyzeDataStep(BaseStepExecutor):
         self._progress_callback(0.1)
 
         try:
-            from ..impl.ocr_cache import load_all_ocr_caches
+            from ..impl.ocr_cache import close_ocr_caches, load_all_ocr_caches
             from ..impl.structure_detection import (
                 build_structure_doc,
                 save_structure_doc,
@@ -99,27 +102,31 @@ class AnalyzeDataStep(BaseStepExecutor):
 
             # Load all OCR caches
             self._log("加载 OCR 缓存...")
-            ocr_caches = await asyncio.to_thread(load_all_ocr_caches, workdir)
-
-            if not ocr_caches:
-                raise FatalError("No OCR cache files found")
-
-            self._progress_callback(0.3)
-
-            # Build structure document
-            self._log("构建文档结构...")
-            structure_doc = await asyncio.to_thread(
-                build_structure_doc,
-                ocr_caches,
-                self._log,
-            )
-
-            self._progress_callback(0.8)
-
-            # Save structure document
-            structure_path = await asyncio.to_thread(
-                save_structure_doc, workdir, structure_doc
-            )
+            # Binary caches are memory-mapped; block content is decoded on access.
+            # The mappings stay open until the structure doc is saved.
+            ocr_caches = await asyncio.to_thread(load_all_ocr_caches, workdir, lazy=True)
+            try:
+                if not ocr_caches:
+                    raise FatalError("No OCR cache files found")
+
+                self._progress_callback(0.3)
+
+                # Build structure document
+                self._log("构建文档结构...")
+                structure_doc = await asyncio.to_thread(
+                    build_structure_doc,
+                    ocr_caches,
+                    self._log,
+                )
+
+                self._progress_callback(0.8)
+
+                # Save structure document
+                structure_path = await asyncio.to_thread(
+                    save_structure_doc, workdir, structure_doc
+                )
+            finally:
+                close_ocr_caches(ocr_caches)
 
             self._progress_callback(1.0)
 
@@ -8,10 +8,12 @@ from __future__ import annotations
 
 import asyncio
 import json
+import os
 import time
 from pathlib import Path
 from typing import Callable, List, Optional
 
+from ....common.page_store import remove_raw_pages
 from ..contracts import FatalError, StepContext, StepName, StepResult
 from .base import BaseStepExecutor
 
@@ -24,7 +26,8 @@ class CollectResultsStep(BaseStepExecutor):
     1. Validates all_questions/ directory exists and has content
     2. Counts normal questions and data analysis big questions
     3. Generates final summary metadata
-    4. This is the final step - produces the user-facing output
+    4. Removes raw page pixels (page_N.raw) whose PNG has been written
+    5. This is the final step - produces the user-facing output
 
     Note: Since Step 3 now directly generates output to all_questions/,
     this step is mainly for validation and metadata generation.
@@ -76,6 +79,12 @@ class CollectResultsStep(BaseStepExecutor):
             normal_files = sorted(all_dir.glob("q*.png"))
             big_files = sorted(all_dir.glob("data_analysis_*.png"))
 
+            # Raw pixels are only needed while the pipeline runs
+            if (os.getenv("EXAMPAPER_PAGE_STORE_KEEP_RAW", "0") or "").strip() != "1":
+                removed = await asyncio.to_thread(remove_raw_pages, workdir)
+                if removed:
+                    self._log(f"已清理 {removed} 个原始像素文件")
+
             self._progress_callback(0.5)
 
             # Validate
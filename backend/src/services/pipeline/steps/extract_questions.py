@@ -12,6 +12,7 @@ from pathlib import Path
 from typing import Any, Callable, List, Optional
 
 from ..contracts import FatalError, RetryableError, StepContext, StepName, StepResult
+from ..page_stream import PageStreamError, get_page_stream
 from .base import BaseStepExecutor
 
 
@@ -23,12 +24,21 @@ class ExtractQuestionsStep(BaseStepExecutor):
     1. Loads page images from workdir
     2. Runs OCR layout analysis on each page
     3. Detects question boundaries
-    4. Crops and saves individual question images
+    4. Crops and saves individual question images (skipped with
+       EXAMPAPER_PER_PAGE_CROPS=0; final images come from compose_long_image)
     5. Generates meta.json for each page
+    6. Optionally re-OCRs suspicious pages with the high-accuracy pipeline
+       (EXAMPAPER_OCR_QUALITY_PASS=1, see impl/ocr_quality.py)
 
     Supports parallel processing and skip_existing.
+
+    When fused with pdf_to_images, pages are taken from the task's PageStream
+    as soon as they are rendered instead of waiting for step 0 to finish.
     """
 
+    # Can consume pages streamed by the previous step (see PipelineRunner)
+    consumes_page_stream = True
+
     def __init__(
         self,
         model_provider: Any,
@@ -64,19 +74,45 @@ class ExtractQuestionsStep(BaseStepExecutor):
         """Ensure model is ready and page images exist."""
         workdir = Path(ctx.workdir)
 
-        # Check page images exist
-        page_images = list(workdir.glob("page_*.png"))
-        if not page_images:
-            raise FatalError(f"No page images found in {workdir}")
+        # Check page images exist (streamed pages are still being rendered)
+        if get_page_stream(ctx.task_id) is None:
+            page_images = list(workdir.glob("page_*.png"))
+            if not page_images:
+                raise FatalError(f"No page images found in {workdir}")
 
         # Ensure model is ready
         await self._model_provider.ensure_ready()
 
+    def _gpu_slot(self, ctx: StepContext) -> Any:
+        """
+        Inference slot handle for this task's page workers.
+
+        With the fair page scheduler enabled, pages of all tasks share the slots
+        in round-robin / weighted-fair order and manual-mode tasks go first;
+        the task's metadata "scheduler_weight" (default 1) sets its share under
+        the weighted policy. Otherwise the provider hands out the plain shared
+        GPU semaphore.
+        """
+        from ...models.page_scheduler import LANE_BULK, LANE_INTERACTIVE
+
+        lane = LANE_INTERACTIVE if ctx.metadata.get("mode") == "manual" else LANE_BULK
+        try:
+            weight = float(ctx.metadata.get("scheduler_weight") or 1.0)
+        except (TypeError, ValueError):
+            weight = 1.0
+        return self._model_provider.get_gpu_semaphore(ctx.task_id, lane=lane, weight=weight)
+
+    def _finish_gpu_slot(self, ctx: StepContext, gpu_semaphore: Any) -> None:
+        """Drop the task from the page scheduler once its pages are done."""
+        if gpu_semaphore is not None and hasattr(gpu_semaphore, "task_id"):
+            self._model_provider.get_page_scheduler().finish_task(ctx.task_id)
+
     async def execute(self, ctx: StepContext) -> StepResult:
         """Extract questions from all pages."""
         start_time = time.time()
 
         workdir = Path(ctx.workdir)
+        gpu_semaphore: Any = None
 
         try:
             # Import the extraction function from the new implementation
@@ -89,7 +125,10 @@ class ExtractQuestionsStep(BaseStepExecutor):
             #   ThreadPoolExecutor(workers) -> _GpuLockedPipeline -> _ThreadBoundPipeline.executor(1)
             # which leads to deadlocks when GPU inference hangs.
             pipeline = self._model_provider.get_pipeline_unsafe()
-            gpu_semaphore = self._model_provider.get_gpu_semaphore()
+            gpu_semaphore = self._gpu_slot(ctx)
+            page_stream = get_page_stream(ctx.task_id)
+            if page_stream is not None:
+                self._log("流式模式：页面渲染完成即开始识别")
 
             # Run extraction in thread pool
             success = await asyncio.to_thread(
@@ -103,6 +142,8 @@ class ExtractQuestionsStep(BaseStepExecutor):
                 max_workers=self._max_workers,
                 progress_callback=self._progress_callback,
                 gpu_semaphore=gpu_semaphore,  # Pass shared semaphore
+                page_stream=page_stream,
+                quality_pipeline_factory=getattr(self._model_provider, "get_accurate_pipeline", None),
             )
 
             elapsed = time.time() - start_time
@@ -130,6 +171,19 @@ class ExtractQuestionsStep(BaseStepExecutor):
                     elapsed_seconds=elapsed,
                 )
 
+        except PageStreamError as e:
+            # Rendering failed upstream; retrying here cannot produce the missing pages
+            elapsed = time.time() - start_time
+            error_msg = f"页面渲染失败，题目提取中止: {e}"
+            self._log(error_msg)
+
+            return self._make_result(
+                success=False,
+                error=error_msg,
+                can_retry=False,
+                elapsed_seconds=elapsed,
+            )
+
         except Exception as e:
             elapsed = time.time() - start_time
             error_msg = f"题目提取出错: {e}"
@@ -142,6 +196,9 @@ class ExtractQuestionsStep(BaseStepExecutor):
                 elapsed_seconds=elapsed,
             )
 
+        finally:
+            self._finish_gpu_slot(ctx, gpu_semaphore)
+
     async def rollback(self, ctx: StepContext) -> None:
         """
         Rollback is a no-op for this step.
@@ -2,37 +2,253 @@
 Step 0: PDF to Images
 
 Converts PDF pages to high-resolution PNG images using PyMuPDF (fitz).
-Supports parallel rendering via ProcessPoolExecutor for multi-core speedup.
+Supports parallel rendering via a shared, long-lived ProcessPoolExecutor whose
+workers keep opened documents cached and render contiguous page chunks.
+
+When the runner fuses this step with extract_questions, every rendered page
+is published to the task's PageStream as soon as its PNG is written: pages are
+then submitted one per render job (the worker's document cache still parses
+the xref once), so no page waits for the rest of its chunk.
+
+With EXAMPAPER_PAGE_STORE=raw, workers write the pixmap's raw pixels
+(page_N.raw, see common/page_store.py) instead of encoding a PNG, and pages are
+published right away. PNGs are encoded afterwards by the same pool for
+archival and HTTP access; the step finishes once they are all written.
 """
 
 from __future__ import annotations
 
 import asyncio
 import os
+import threading
 import time
-from concurrent.futures import ProcessPoolExecutor, as_completed
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from pathlib import Path
-from typing import Callable, List, Optional, Tuple
-
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ....common import parse_int_env
+from ....common.page_store import (
+    open_raw_page,
+    page_image_exists,
+    page_store_enabled,
+    raw_path_for,
+    write_raw_page,
+)
 from ..contracts import FatalError, RetryableError, StepContext, StepName, StepResult
+from ..page_stream import get_page_stream
 from .base import BaseStepExecutor
 
 
-def _render_page(args: Tuple[str, int, str, int]) -> Tuple[int, str]:
+# ---------------------------------------------------------------------------
+# Render pool
+#
+# One long-lived ProcessPoolExecutor is shared by all tasks, so worker spawn
+# cost is paid once per server process instead of once per upload. Each
+# worker keeps recently used documents open (keyed by path + content key),
+# and pages are submitted in contiguous chunks so the xref table of a large
+# scanned PDF is parsed once per worker rather than once per page.
+# ---------------------------------------------------------------------------
+
+_render_pool: Optional[ProcessPoolExecutor] = None
+_render_pool_lock = threading.Lock()
+
+# Worker-side document cache: (pdf_path, doc_key) -> fitz.Document
+_worker_docs: "OrderedDict[Tuple[str, str], Any]" = OrderedDict()
+
+
+def get_render_workers() -> int:
+    """Number of render processes (EXAMPAPER_RENDER_WORKERS, default: CPU count)."""
+    return parse_int_env("EXAMPAPER_RENDER_WORKERS", os.cpu_count() or 4, 1, 64)
+
+
+def get_render_chunk_pages() -> int:
+    """Pages per render job (EXAMPAPER_RENDER_CHUNK_PAGES, default: 4)."""
+    return parse_int_env("EXAMPAPER_RENDER_CHUNK_PAGES", 4, 1, 64)
+
+
+def get_render_pool() -> ProcessPoolExecutor:
+    """Get (or lazily create) the shared render pool."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is None:
+            _render_pool = ProcessPoolExecutor(max_workers=get_render_workers())
+        return _render_pool
+
+
+def shutdown_render_pool(wait: bool = True) -> None:
+    """Shut down the shared render pool (called on server shutdown)."""
+    global _render_pool
+    with _render_pool_lock:
+        pool, _render_pool = _render_pool, None
+    if pool is not None:
+        pool.shutdown(wait=wait, cancel_futures=True)
+
+
+def _discard_render_pool(pool: ProcessPoolExecutor) -> None:
+    """Drop a broken pool so the next task gets a fresh one."""
+    global _render_pool
+    with _render_pool_lock:
+        if _render_pool is pool:
+            _render_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+
+def _pdf_doc_key(pdf_path: Path, file_hash: Optional[str]) -> str:
+    """Key identifying the PDF content, so a replaced file is reopened."""
+    if file_hash:
+        return file_hash
+    st = pdf_path.stat()
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _open_cached_doc(pdf_path: str, doc_key: str) -> Any:
+    """Open a document in the worker, reusing a cached handle when possible."""
+    import fitz
+
+    key = (pdf_path, doc_key)
+    doc = _worker_docs.get(key)
+    if doc is not None:
+        _worker_docs.move_to_end(key)
+        return doc
+
+    doc = fitz.open(pdf_path)
+    _worker_docs[key] = doc
+    max_docs = parse_int_env("EXAMPAPER_RENDER_DOC_CACHE", 2, 1, 32)
+    while len(_worker_docs) > max_docs:
+        _, old = _worker_docs.popitem(last=False)
+        try:
+            old.close()
+        except Exception:
+            pass
+    return doc
+
+
+def _render_page_chunk(
+    args: Tuple[str, str, List[Tuple[int, str, bool]], int, Optional[str], Dict[str, str]]
+) -> List[Tuple[int, str, Optional[str]]]:
     """
-    Worker function for parallel PDF page rendering.
+    Worker function: render a chunk of pages from one PDF.
     Must be module-level for ProcessPoolExecutor pickling.
+
+    Each page entry is (page_num, out_path, render). Pages whose PNG already
+    exists are sent with render=False when only the text layer is needed.
+    With the raw page store enabled, raw pixels are written instead of a PNG.
+    When text_layer_workdir is set and the page has no OCR cache yet, a
+    reliable text layer is written as the page's OCR cache so step 1 skips
+    PP-StructureV3 for it. Pages with a manual override (page_overrides, read
+    once by the step) never take that path: step 1 applies the decision.
+
+    Returns:
+        [(page_num, out_path, source)] where source is "text_layer", "skipped" or None
     """
-    import fitz
-    pdf_path, page_num, out_path, dpi = args
-    doc = fitz.open(pdf_path)
-    try:
+    pdf_path, doc_key, pages, dpi, text_layer_workdir, page_overrides = args
+    doc = _open_cached_doc(pdf_path, doc_key)
+    raw_store = page_store_enabled()
+    rendered: List[Tuple[int, str, Optional[str]]] = []
+    for page_num, out_path, render in pages:
         page = doc[page_num]
-        pix = page.get_pixmap(dpi=dpi)
-        pix.save(out_path)
-        return page_num, out_path
-    finally:
-        doc.close()
+        if render:
+            pix = page.get_pixmap(dpi=dpi)
+            if raw_store and pix.n in (1, 3) and pix.stride == pix.width * pix.n:
+                write_raw_page(raw_path_for(out_path), pix.width, pix.height, pix.n, pix.samples_mv)
+            else:
+                pix.save(out_path)
+            image_size = (pix.width, pix.height)
+        else:
+            import fitz
+
+            irect = (page.rect * fitz.Matrix(dpi / 72.0, dpi / 72.0)).irect
+            image_size = (irect.width, irect.height)
+
+        source: Optional[str] = None
+        page_name = Path(out_path).stem
+        if text_layer_workdir and page_name not in page_overrides:
+            source = _write_text_layer_cache(page, Path(text_layer_workdir), page_name, dpi, image_size)
+        rendered.append((page_num, out_path, source))
+    return rendered
+
+
+def _write_text_layer_cache(
+    page: Any,
+    workdir: Path,
+    page_name: str,
+    dpi: int,
+    image_size: Tuple[int, int],
+) -> Optional[str]:
+    """
+    Save text-layer blocks as the page's OCR cache if reliable (worker side).
+
+    When the text layer is not reliable enough to replace OCR but still shows a
+    non-question page (answer sheet, instructions), the page is recorded as
+    skipped instead.
+    """
+    from ..impl.ocr_cache import has_ocr_cache, save_ocr_cache
+    from ..impl.page_classifier import classify_page_text, page_classifier_enabled
+    from ..impl.text_layer import extract_text_layer_blocks
+
+    if has_ocr_cache(workdir, page_name):
+        return None
+    try:
+        blocks, _reason = extract_text_layer_blocks(page, dpi=dpi)
+    except Exception:
+        return None
+    if not blocks:
+        if page_classifier_enabled():
+            try:
+                skip_reason = classify_page_text(page.get_text("text"))
+            except Exception:
+                skip_reason = None
+            if skip_reason:
+                save_ocr_cache(
+                    workdir, page_name, [], image_size,
+                    source="page_classifier", skip_reason=skip_reason,
+                )
+                return "skipped"
+        return None
+    save_ocr_cache(workdir, page_name, blocks, image_size, source="text_layer")
+    return "text_layer"
+
+
+def _encode_png_chunk(paths: List[str]) -> int:
+    """
+    Worker function: encode PNGs for pages rendered to the raw page store.
+
+    Returns:
+        Number of PNGs written
+    """
+    import fitz
+
+    written = 0
+    for out_path in paths:
+        if os.path.exists(out_path):
+            continue
+        raw = open_raw_page(Path(out_path))
+        if raw is None:
+            continue
+        with raw:
+            cs = fitz.csRGB if raw.channels == 3 else fitz.csGRAY
+            pix = fitz.Pixmap(cs, raw.width, raw.height, raw.read_bytes(), False)
+        tmp = f"{out_path}.{os.getpid()}.tmp"
+        pix.save(tmp, output="png")
+        os.replace(tmp, out_path)
+        written += 1
+    return written
+
+
+def _chunk_pages(
+    pages: List[Tuple[int, str, bool]], chunk_size: int
+) -> List[List[Tuple[int, str, bool]]]:
+    """Split pages into chunks of consecutive page numbers (at most chunk_size each)."""
+    chunks: List[List[Tuple[int, str, bool]]] = []
+    for page in pages:
+        last = chunks[-1] if chunks else None
+        if last is not None and len(last) < chunk_size and last[-1][0] + 1 == page[0]:
+            last.append(page)
+        else:
+            chunks.append([page])
+    return chunks
 
 
 class PdfToImagesStep(BaseStepExecutor):
@@ -42,11 +258,15 @@ class PdfToImagesStep(BaseStepExecutor):
     This step:
     1. Opens the PDF file
     2. Renders each page at 300 DPI
-    3. Saves as page_1.png, page_2.png, etc.
+    3. Saves as page_1.png, page_2.png, etc. (raw page store: page_N.raw
+       first, PNG encoded afterwards)
 
     Supports skip_existing to reuse previously converted pages.
     """
 
+    # Rendered pages can be streamed into the next step (see PipelineRunner)
+    streams_pages = True
+
     def __init__(
         self,
         dpi: int = 300,
@@ -99,56 +319,155 @@ class PdfToImagesStep(BaseStepExecutor):
         workdir = Path(ctx.workdir)
         workdir.mkdir(parents=True, exist_ok=True)
 
+        # Present only when the runner fused this step with extract_questions
+        stream = get_page_stream(ctx.task_id)
+
         try:
             import fitz
 
+            from ..impl.ocr_cache import list_cached_pages, set_ocr_expected_pages
+            from ..impl.page_classifier import load_page_overrides
+            from ..impl.text_layer import text_layer_enabled
+
             doc = fitz.open(pdf_path)
             total_pages = len(doc)
             doc.close()
 
+            # Lets is_ocr_complete answer from the pack header alone
+            set_ocr_expected_pages(workdir, total_pages)
+
             self._log(f"开始转换 PDF，共 {total_pages} 页")
+            if stream is not None:
+                stream.set_total(total_pages)
 
             artifact_paths: List[str] = [""] * total_pages
             skipped_count = 0
-            tasks_to_run: List[Tuple[str, int, str, int]] = []
+            tasks_to_run: List[Tuple[int, str, bool]] = []
+            use_text_layer = text_layer_enabled()
+            cached_pages = list_cached_pages(workdir) if use_text_layer else set()
+            # Manually overridden pages go through OCR, which applies the decision
+            page_overrides = load_page_overrides(workdir) if use_text_layer else {}
+            raw_store = page_store_enabled()
+            encode_paths: List[str] = []
 
             for page_num in range(total_pages):
                 img_name = f"page_{page_num + 1}.png"
                 img_path = workdir / img_name
 
-                if self._skip_existing and img_path.exists():
+                if self._skip_existing and page_image_exists(img_path):
+                    if not img_path.exists():
+                        # Raw pixels from an earlier run whose PNG was never encoded
+                        encode_paths.append(str(img_path))
                     artifact_paths[page_num] = str(img_path)
                     skipped_count += 1
+                    if (
+                        use_text_layer
+                        and img_path.stem not in cached_pages
+                        and img_path.stem not in page_overrides
+                    ):
+                        # Image exists but OCR has not run yet: still try the text layer
+                        tasks_to_run.append((page_num, str(img_path), False))
+                    elif stream is not None:
+                        stream.publish(page_num, img_path)
                 else:
-                    tasks_to_run.append((str(pdf_path), page_num, str(img_path), self._dpi))
+                    tasks_to_run.append((page_num, str(img_path), True))
 
             converted_count = 0
+            text_layer_count = 0
+            skipped_page_count = 0
+            loop = asyncio.get_running_loop()
+            pool = get_render_pool()
+            encode_futures: List["asyncio.Future[int]"] = []
             if tasks_to_run:
-                max_workers = min(len(tasks_to_run), os.cpu_count() or 4)
-                self._log(f"  并行渲染 {len(tasks_to_run)} 页 (workers={max_workers})")
-
-                loop = asyncio.get_running_loop()
-                with ProcessPoolExecutor(max_workers=max_workers) as executor:
-                    futures = {executor.submit(_render_page, t): t[1] for t in tasks_to_run}
-                    for future in as_completed(futures):
-                        page_num = futures[future]
-                        try:
-                            _, out_path = future.result()
+                doc_key = _pdf_doc_key(pdf_path, ctx.file_hash)
+                # A fused extract_questions step starts on each page as soon as it
+                # lands, so streamed renders are not grouped into chunks
+                chunk_pages = 1 if stream is not None else get_render_chunk_pages()
+                chunks = _chunk_pages(tasks_to_run, chunk_pages)
+                render_pages = {t[0] for t in tasks_to_run if t[2]}
+                self._log(
+                    f"  并行渲染 {len(render_pages)} 页 "
+                    f"(workers={get_render_workers()}, chunks={len(chunks)})"
+                )
+
+                # Await render futures instead of blocking in as_completed(), so a
+                # fused extract_questions step keeps running on the same event loop.
+                futures = [
+                    loop.run_in_executor(
+                        pool,
+                        _render_page_chunk,
+                        (
+                            str(pdf_path),
+                            doc_key,
+                            chunk,
+                            self._dpi,
+                            str(workdir) if use_text_layer else None,
+                            page_overrides,
+                        ),
+                    )
+                    for chunk in chunks
+                ]
+                # PNG encoding is off the hot path (pages are already published);
+                # rendered pages are still encoded in chunks
+                encode_chunk = get_render_chunk_pages()
+                rendered_raw: List[str] = []
+                try:
+                    for future in asyncio.as_completed(futures):
+                        for page_num, out_path, source in await future:
                             artifact_paths[page_num] = out_path
-                            converted_count += 1
-                            done = skipped_count + converted_count
-                            self._progress_callback(done / total_pages)
-                        except Exception as e:
-                            raise RuntimeError(f"Page {page_num + 1} render failed: {e}")
+                            if raw_store and page_num in render_pages:
+                                rendered_raw.append(out_path)
+                            if source == "text_layer":
+                                text_layer_count += 1
+                            elif source == "skipped":
+                                skipped_page_count += 1
+                            if page_num in render_pages:
+                                converted_count += 1
+                            if stream is not None:
+                                stream.publish(page_num, Path(out_path))
+                        if len(rendered_raw) >= encode_chunk:
+                            encode_futures.append(
+                                loop.run_in_executor(pool, _encode_png_chunk, rendered_raw)
+                            )
+                            rendered_raw = []
+                        done = skipped_count + converted_count
+                        self._progress_callback(done / total_pages)
+                except BrokenProcessPool as e:
+                    _discard_render_pool(pool)
+                    raise RuntimeError(f"Render pool crashed: {e}")
+                except Exception as e:
+                    for f in futures + encode_futures:
+                        f.cancel()
+                    raise RuntimeError(f"Page render failed: {e}")
+                encode_paths.extend(rendered_raw)
             else:
                 self._progress_callback(1.0)
 
+            if stream is not None:
+                stream.close()
+
+            if encode_paths:
+                encode_futures.append(
+                    loop.run_in_executor(pool, _encode_png_chunk, encode_paths)
+                )
+            if encode_futures:
+                try:
+                    encoded = sum(await asyncio.gather(*encode_futures))
+                except BrokenProcessPool as e:
+                    _discard_render_pool(pool)
+                    raise RuntimeError(f"Render pool crashed: {e}")
+                self._log(f"  PNG 编码完成: {encoded} 页")
+
             elapsed = time.time() - start_time
 
             if skipped_count > 0:
                 self._log(f"PDF 转图片完成: 转换 {converted_count} 页, 跳过 {skipped_count} 页")
             else:
                 self._log(f"PDF 转图片完成: 共 {total_pages} 页")
+            if text_layer_count > 0:
+                self._log(f"  文本层可用: {text_layer_count} 页将跳过 OCR")
+            if skipped_page_count > 0:
+                self._log(f"  非题目页: {skipped_page_count} 页将跳过 OCR")
 
             return self._make_result(
                 success=True,
@@ -158,6 +477,8 @@ class PdfToImagesStep(BaseStepExecutor):
                 total_pages=total_pages,
                 converted_pages=converted_count,
                 skipped_pages=skipped_count,
+                text_layer_pages=text_layer_count,
+                non_question_pages=skipped_page_count,
             )
 
         except Exception as e:
@@ -0,0 +1,366 @@
+"""
+predict_batcher.py - 跨页面的 PP-StructureV3 微批推理
+
+_GpuLockedPipeline 每次只把一页交给 pipeline.predict，_create_ppstructure 中的
+det_batch_size / rec_batch_size 只能在页内成批。这里在 GPU 锁之前加一层微批：
+
+- 页面 worker 提交输入后阻塞等待结果
+- 分发线程在时间窗口内收集最多 K 个来自同一槽位池的待推理页面：同一个 GPU 信号量，
+  或同一公平调度器的 TaskSlot（不同任务的页面可以合批）；池不同的请求留在队列中
+  进入后续批次
+- 调度器池按调度器自身的授权顺序（PageScheduler.plan：先分道，再 vtime / 上次授权）
+  挑选批内页面，交互页面不会排在整批 bulk 页面之后；普通信号量按到达顺序
+- 以批内第一个请求的槽位获取一次授权后对列表调用一次 predict；调度器按页记账，
+  其余页面通过 TaskSlot.charge 计入各自任务。槽位等待超时按请求各自计算
+  （从提交时起），获取槽位前已超时的请求单独失败，其余照常推理
+- 列表 predict 逐页执行的 pipeline（OcrProcessPool 进程池 / 隔离 worker / 预热 worker）
+  不启用批处理：各页直接占用自己的槽位，进程池的所有 worker 都能同时工作
+- 结果按顺序分发回各个 worker；整批失败时逐页重试，错误只影响对应页面
+- 每个推理槽位一个分发线程（EXAMPAPER_GPU_CONCURRENCY，槽位数 > 1 时多批同时推理）；
+  同一时刻只有一个线程在收集，其余线程推理完成后再接着收集，批次仍在槽位空出时凑满
+- provider 替换或释放 pipeline 时调用 close_predict_batchers，旧 pipeline 的分发线程随之退出
+
+配置：
+- EXAMPAPER_PREDICT_BATCH_SIZE: 每批最多页数 K（默认 1，即不启用）
+- EXAMPAPER_PREDICT_BATCH_WINDOW_MS: 收集窗口（默认 20ms）
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from ..common import parse_int_env
+from ..common.perf import perf_enabled, perf_event
+from .predict_watchdog import PredictWatchdogConfig, get_predict_watchdog
+
+logger = logging.getLogger(__name__)
+
+
+def get_predict_batch_size() -> int:
+    """每批最多页数（EXAMPAPER_PREDICT_BATCH_SIZE，默认 1 = 不启用）。"""
+    return parse_int_env("EXAMPAPER_PREDICT_BATCH_SIZE", default=1, lo=1, hi=32)
+
+
+def get_predict_batch_window_ms() -> int:
+    """批次收集窗口（EXAMPAPER_PREDICT_BATCH_WINDOW_MS，默认 20ms）。"""
+    return parse_int_env("EXAMPAPER_PREDICT_BATCH_WINDOW_MS", default=20, lo=0, hi=5000)
+
+
+def get_predict_dispatchers() -> int:
+    """每个批处理器的分发线程数：每个推理槽位一个（EXAMPAPER_GPU_CONCURRENCY，默认 1）。"""
+    return parse_int_env("EXAMPAPER_GPU_CONCURRENCY", default=1, lo=1, hi=8)
+
+
+def _pool(sem: Any) -> Any:
+    """槽位所属的池：TaskSlot 为其调度器，普通信号量为自身。"""
+    return getattr(sem, "pool", sem)
+
+
+class _Request:
+    __slots__ = ("input", "sem", "timeout", "deadline", "page", "enqueued", "done", "result", "error")
+
+    def __init__(self, input: Any, sem: Any, timeout: Optional[float], page: str) -> None:
+        self.input = input
+        self.sem = sem
+        self.timeout = timeout
+        # 槽位等待的截止时间（monotonic），None 表示一直等待
+        self.deadline = None if timeout is None else time.monotonic() + timeout
+        self.page = page
+        self.enqueued = time.perf_counter()
+        self.done = threading.Event()
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+
+
+class PredictBatcher:
+    """
+    单个 pipeline 的微批分发器（后台线程）。
+
+    predict() 的返回值与 pipeline.predict(单页输入) 相同（结果列表）。
+    """
+
+    def __init__(self, pipeline: Any, max_batch: int = 4, window_ms: int = 20, dispatchers: int = 1) -> None:
+        self._pipeline = pipeline
+        self._max_batch = max(1, max_batch)
+        self._window_s = max(0, window_ms) / 1000.0
+        self._cond = threading.Condition()
+        self._queue: Deque[_Request] = deque()
+        self._closed = False
+        # 是否有分发线程正在收集批次（同一时刻只有一个，避免把一批拆给多个线程）
+        self._collecting = False
+        self._in_flight = 0
+        self._batches = 0
+        self._pages = 0
+        self._fallbacks = 0
+        self._watchdog_config = PredictWatchdogConfig.from_env()
+        self._threads = [
+            threading.Thread(target=self._run, name=f"predict-batcher-{i}", daemon=True)
+            for i in range(max(1, dispatchers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    @property
+    def max_batch(self) -> int:
+        return self._max_batch
+
+    def predict(self, input: Any, sem: Any, timeout: Optional[float] = None, page: str = "") -> Any:
+        """
+        提交单页输入并等待结果。
+
+        Args:
+            input: 图片路径或 ndarray
+            sem: 推理槽位（acquire(timeout=...) / release()），由分发线程代为获取
+            timeout: 槽位等待超时（秒），None 表示一直等待
+            page: 页面名（日志/性能统计用）
+        """
+        req = _Request(input, sem, timeout, page)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("predict batcher is closed")
+            self._queue.append(req)
+            self._cond.notify_all()
+        req.done.wait()
+        if req.error is not None:
+            raise req.error
+        return req.result
+
+    def _collect(self) -> Optional[List[_Request]]:
+        """等待第一个请求，再在窗口内凑满一批与它来自同一槽位池的请求。"""
+        with self._cond:
+            while (self._collecting or not self._queue) and not self._closed:
+                self._cond.wait()
+            if self._closed and not self._queue:
+                return None
+            self._collecting = True
+            try:
+                batch = self._fill()
+            finally:
+                self._collecting = False
+                self._cond.notify_all()
+            self._in_flight += 1
+            return batch
+
+    def _fill(self) -> List[_Request]:
+        """在窗口内收集一批（调用方持有 self._cond）。"""
+        pool = _pool(self._queue[0].sem)
+
+        def matching() -> int:
+            return sum(1 for req in self._queue if _pool(req.sem) is pool)
+
+        deadline = time.monotonic() + self._window_s
+        while matching() < self._max_batch and not self._closed:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            self._cond.wait(remaining)
+
+        candidates = [req for req in self._queue if _pool(req.sem) is pool]
+        plan = getattr(pool, "plan", None)
+        if plan is not None:
+            # 按调度器的授权顺序取页，批头即调度器下一个要服务的页面
+            candidates = [candidates[i] for i in plan([req.sem for req in candidates])]
+        batch = candidates[: self._max_batch]
+        chosen = set(map(id, batch))
+        self._queue = deque(req for req in self._queue if id(req) not in chosen)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._collect()
+            if batch is None:
+                return
+            try:
+                self._dispatch(batch)
+            except BaseException as e:  # pragma: no cover - 兜底，保证 worker 不会永久阻塞
+                for req in batch:
+                    if not req.done.is_set():
+                        req.error = e
+                        req.done.set()
+            finally:
+                with self._cond:
+                    self._in_flight -= 1
+
+    @staticmethod
+    def _fail_timeout(req: _Request) -> None:
+        req.error = TimeoutError(f"GPU semaphore acquire timeout: {req.timeout}s")
+        req.done.set()
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        sem = batch[0].sem
+        t_wait0 = time.perf_counter()
+        # 批内所有请求共用 batch[0] 的槽位（调度器池中 batch[0] 是调度器下一个要服务的页面）：一直等到最晚的截止时间，获取后再按各自的截止时间筛掉超时请求
+        if any(req.deadline is None for req in batch):
+            acquired = sem.acquire()
+        else:
+            last = max(req.deadline for req in batch)
+            acquired = sem.acquire(timeout=max(0.0, last - time.monotonic()))
+        if not acquired:
+            for req in batch:
+                self._fail_timeout(req)
+            return
+        wait_ms = (time.perf_counter() - t_wait0) * 1000.0
+
+        now = time.monotonic()
+        live: List[_Request] = []
+        for req in batch:
+            if req.deadline is not None and req.deadline < now:
+                self._fail_timeout(req)
+            else:
+                live.append(req)
+        if not live:
+            sem.release()
+            return
+        # 授权已计入 batch[0] 的任务，搭车推理的页面记到各自的任务上
+        for req in live:
+            charge = getattr(req.sem, "charge", None)
+            if req is not batch[0] and charge is not None:
+                charge(1)
+        batch = live
+
+        try:
+            t0 = time.perf_counter()
+            pages = ",".join(req.page for req in batch)
+            cfg = self._watchdog_config
+
+            def _warn(elapsed_s: float) -> None:
+                logger.warning("批量推理仍未返回，已超过 %.0fs (%s)", elapsed_s, pages)
+
+            with get_predict_watchdog().watching(
+                pages, warn_after_s=cfg.warn_after_s, on_warn=_warn, hang_dump_s=cfg.hang_dump_s
+            ):
+                results: Optional[List[Any]] = None
+                if len(batch) > 1:
+                    try:
+                        out = list(self._pipeline.predict([req.input for req in batch]))
+                        if len(out) == len(batch):
+                            results = out
+                        else:
+                            logger.warning("批量推理结果数不匹配 (%d != %d)，改为逐页推理", len(out), len(batch))
+                    except Exception as e:
+                        logger.warning("批量推理失败 (%s)，改为逐页推理", e)
+                    if results is None:
+                        with self._cond:
+                            self._fallbacks += 1
+
+                if results is not None:
+                    # pipeline.predict(单页) 返回结果列表，保持相同的返回形式
+                    for req, res in zip(batch, results):
+                        req.result = [res]
+                else:
+                    for req in batch:
+                        try:
+                            req.result = self._pipeline.predict(req.input)
+                        except Exception as e:
+                            req.error = e
+            pred_ms = (time.perf_counter() - t0) * 1000.0
+        finally:
+            sem.release()
+            for req in batch:
+                req.done.set()
+
+        with self._cond:
+            self._batches += 1
+            self._pages += len(batch)
+        if perf_enabled():
+            now = time.perf_counter()
+            perf_event(
+                "ocr.predict.batch",
+                size=len(batch),
+                pages=[req.page for req in batch],
+                gpu_lock_wait_ms=round(wait_ms, 3),
+                predict_ms=round(pred_ms, 3),
+                max_queue_ms=round(max((now - req.enqueued) * 1000.0 for req in batch), 3),
+            )
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "max_batch": self._max_batch,
+                "window_ms": round(self._window_s * 1000.0, 3),
+                "dispatchers": len(self._threads),
+                "queued": len(self._queue),
+                "in_flight": self._in_flight,
+                "batches": self._batches,
+                "pages": self._pages,
+                "avg_batch": round(self._pages / self._batches, 3) if self._batches else None,
+                "fallbacks": self._fallbacks,
+            }
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        for t in self._threads:
+            t.join(timeout=5)
+
+
+_batchers: Dict[int, PredictBatcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def batches_predict(pipeline: Any) -> bool:
+    """
+    pipeline.predict(列表) 是否真正合批推理。
+
+    OcrProcessPool（含隔离 worker 与预热 worker 客户端 RemoteOcrWorker）对列表逐页调用，
+    同一批只占用一个 worker；这类 pipeline 由各页直接占用自己的槽位，
+    进程池的每个 worker 同时处理一页。
+    """
+    from .models.ocr_process_pool import OcrProcessPool
+
+    return not isinstance(pipeline, OcrProcessPool)
+
+
+def get_predict_batcher(pipeline: Any) -> Optional[PredictBatcher]:
+    """
+    获取 pipeline 对应的进程级批处理器（多个任务共享同一模型实例，因此共享同一批处理器）。
+
+    EXAMPAPER_PREDICT_BATCH_SIZE <= 1，或 pipeline 不能合批推理（见 batches_predict）时
+    返回 None（逐页推理）。
+    """
+    max_batch = get_predict_batch_size()
+    if max_batch <= 1 or pipeline is None or not batches_predict(pipeline):
+        return None
+    key = id(pipeline)
+    batcher = _batchers.get(key)
+    if batcher is None:
+        with _batchers_lock:
+            batcher = _batchers.get(key)
+            if batcher is None:
+                batcher = PredictBatcher(
+                    pipeline, max_batch, get_predict_batch_window_ms(), dispatchers=get_predict_dispatchers()
+                )
+                _batchers[key] = batcher
+    return batcher
+
+
+def get_predict_batcher_stats() -> List[Dict[str, Any]]:
+    """所有批处理器的统计信息（供 health/metrics 使用）。"""
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+    return [b.stats() for b in batchers]
+
+
+def close_predict_batchers(*pipelines: Any) -> None:
+    """
+    停止给定 pipeline 的批处理器（provider 替换或释放 pipeline 时调用）。
+
+    注册表持有 pipeline 引用，不移除则旧模型与其分发线程一直驻留。已入队的请求照常推理完毕。
+    """
+    with _batchers_lock:
+        batchers = [_batchers.pop(id(p)) for p in pipelines if p is not None and id(p) in _batchers]
+    for b in batchers:
+        b.close()
+
+
+def shutdown_predict_batchers() -> None:
+    """停止所有分发线程（应用关闭时调用）。"""
+    with _batchers_lock:
+        batchers = list(_batchers.values())
+        _batchers.clear()
+    for b in batchers:
+        b.close()
@@ -0,0 +1,247 @@
+"""
+predict_watchdog.py - 推理超时监控（进程内共享的单个看门狗线程）
+
+_GpuLockedPipeline 过去每次 predict 都重新解析环境变量、新建并启动一个
+threading.Timer 线程用于慢推理告警，卡死时再用 faulthandler.dump_traceback_later
+定时打印堆栈（进程内只能有一个，多页同时等待时互相覆盖）。高负载下每页每任务
+都要创建一个线程。
+
+这里改为一个看门狗线程：
+
+- 每次 predict 登记为一个在途推理（页面、开始时间、线程）
+- 告警与堆栈转储的截止时间放在一个最小堆中，由看门狗线程按时触发
+- 推理结束时只需从在途表中移除（堆中的过期条目在弹出时丢弃）
+- inflight() 列出当前在途推理及已耗时（见 /api/health/predicts）
+
+配置在每个处理器创建时读取一次（PredictWatchdogConfig.from_env）：
+- EXAMPAPER_GPU_LOCK_TIMEOUT_S: 等待 GPU 锁超时（默认 0 = 一直等待）
+- EXAMPAPER_OCR_PREDICT_WARN_AFTER_S: 推理超过该时间仍未返回时告警（默认 60，0 关闭）
+- EXAMPAPER_OCR_PREDICT_HANG_DUMP_S: 推理超过该时间后每隔该时间打印所有线程堆栈（默认 0 关闭）
+"""
+from __future__ import annotations
+
+import faulthandler
+import heapq
+import itertools
+import logging
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ..common import parse_int_env
+
+logger = logging.getLogger(__name__)
+
+_KIND_WARN = "warn"
+_KIND_DUMP = "dump"
+
+
+@dataclass(frozen=True)
+class PredictWatchdogConfig:
+    """推理监控配置快照。"""
+
+    gpu_lock_timeout_s: int = 0
+    warn_after_s: int = 60
+    hang_dump_s: int = 0
+
+    @classmethod
+    def from_env(cls) -> "PredictWatchdogConfig":
+        day = 24 * 60 * 60
+        return cls(
+            gpu_lock_timeout_s=parse_int_env("EXAMPAPER_GPU_LOCK_TIMEOUT_S", default=0, lo=0, hi=day),
+            warn_after_s=parse_int_env("EXAMPAPER_OCR_PREDICT_WARN_AFTER_S", default=60, lo=0, hi=day),
+            hang_dump_s=parse_int_env("EXAMPAPER_OCR_PREDICT_HANG_DUMP_S", default=0, lo=0, hi=day),
+        )
+
+
+class _InFlight:
+    __slots__ = ("token", "page", "thread", "started", "started_wall", "on_warn", "hang_dump_s", "warned", "dumps")
+
+    def __init__(
+        self,
+        token: int,
+        page: str,
+        on_warn: Optional[Callable[[float], None]],
+        hang_dump_s: float,
+    ) -> None:
+        self.token = token
+        self.page = page
+        self.thread = threading.current_thread().name
+        self.started = time.monotonic()
+        self.started_wall = time.time()
+        self.on_warn = on_warn
+        self.hang_dump_s = hang_dump_s
+        self.warned = False
+        self.dumps = 0
+
+
+class PredictWatchdog:
+    """在途推理登记表 + 单个看门狗线程。"""
+
+    def __init__(self) -> None:
+        self._cond = threading.Condition()
+        self._heap: List[Tuple[float, int, int, str]] = []
+        self._inflight: Dict[int, _InFlight] = {}
+        self._tokens = itertools.count(1)
+        self._seq = itertools.count()
+        self._thread: Optional[threading.Thread] = None
+        self._warnings = 0
+        self._dumps = 0
+        self._watched = 0
+        self._faulthandler_enabled = False
+
+    def _ensure_thread(self) -> None:
+        # 调用方持有 self._cond
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="predict-watchdog", daemon=True)
+            self._thread.start()
+
+    def _push(self, deadline: float, token: int, kind: str) -> None:
+        heapq.heappush(self._heap, (deadline, next(self._seq), token, kind))
+
+    def watch(
+        self,
+        page: str,
+        warn_after_s: float = 0,
+        on_warn: Optional[Callable[[float], None]] = None,
+        hang_dump_s: float = 0,
+    ) -> int:
+        """
+        登记一次推理，返回用于 done() 的令牌。
+
+        Args:
+            page: 页面名（可为 "page_1,page_2" 之类的批次描述）
+            warn_after_s: 超过该时间仍未结束时调用 on_warn(已耗时秒数)，0 不告警
+            on_warn: 告警回调（在看门狗线程中执行，应尽快返回）
+            hang_dump_s: 超过该时间后每隔该时间打印所有线程堆栈，0 不打印
+        """
+        with self._cond:
+            token = next(self._tokens)
+            entry = _InFlight(token, page, on_warn, float(hang_dump_s))
+            self._inflight[token] = entry
+            self._watched += 1
+            if warn_after_s > 0 and on_warn is not None:
+                self._push(entry.started + warn_after_s, token, _KIND_WARN)
+            if hang_dump_s > 0:
+                self._push(entry.started + hang_dump_s, token, _KIND_DUMP)
+                if not self._faulthandler_enabled:
+                    # 同时在崩溃（段错误等）时打印堆栈；部分环境不允许启用，忽略
+                    try:
+                        faulthandler.enable(file=sys.stderr, all_threads=True)
+                    except Exception:
+                        pass
+                    self._faulthandler_enabled = True
+            if self._heap:
+                self._ensure_thread()
+                self._cond.notify()
+        return token
+
+    def done(self, token: int) -> None:
+        """推理结束（堆中对应条目在到期弹出时丢弃）。"""
+        with self._cond:
+            self._inflight.pop(token, None)
+            # 没有在途推理时清空堆，避免过期条目堆积
+            if not self._inflight:
+                self._heap.clear()
+
+    @contextmanager
+    def watching(
+        self,
+        page: str,
+        warn_after_s: float = 0,
+        on_warn: Optional[Callable[[float], None]] = None,
+        hang_dump_s: float = 0,
+    ) -> Iterator[int]:
+        token = self.watch(page, warn_after_s, on_warn, hang_dump_s)
+        try:
+            yield token
+        finally:
+            self.done(token)
+
+    def _next_due(self) -> Tuple[_InFlight, str]:
+        """等待下一个到期条目（阻塞）；返回 (在途推理, 类型)。"""
+        with self._cond:
+            while True:
+                if not self._heap:
+                    self._cond.wait()
+                    continue
+                deadline, _seq, token, kind = self._heap[0]
+                delay = deadline - time.monotonic()
+                if delay > 0:
+                    self._cond.wait(delay)
+                    continue
+                heapq.heappop(self._heap)
+                entry = self._inflight.get(token)
+                if entry is None:
+                    continue
+                if kind == _KIND_WARN:
+                    entry.warned = True
+                    self._warnings += 1
+                else:
+                    entry.dumps += 1
+                    self._dumps += 1
+                    self._push(deadline + entry.hang_dump_s, token, _KIND_DUMP)
+                return entry, kind
+
+    def _run(self) -> None:
+        while True:
+            entry, kind = self._next_due()
+            elapsed = time.monotonic() - entry.started
+            try:
+                if kind == _KIND_WARN:
+                    entry.on_warn(elapsed)  # type: ignore[misc]
+                else:
+                    sys.stderr.write(
+                        f"[predict-watchdog] {entry.page} 推理已 {elapsed:.0f}s 未返回 "
+                        f"(线程 {entry.thread})，所有线程堆栈：\n"
+                    )
+                    faulthandler.dump_traceback(file=sys.stderr, all_threads=True)
+            except Exception as e:  # pragma: no cover - 回调异常不能中断看门狗
+                logger.warning("predict watchdog callback failed: %s", e)
+
+    def inflight(self) -> List[Dict[str, Any]]:
+        """当前在途推理（按已耗时降序）。"""
+        now = time.monotonic()
+        with self._cond:
+            entries = list(self._inflight.values())
+        items = [
+            {
+                "page": e.page,
+                "thread": e.thread,
+                "started_at": e.started_wall,
+                "elapsed_s": round(now - e.started, 3),
+                "warned": e.warned,
+                "stack_dumps": e.dumps,
+            }
+            for e in entries
+        ]
+        items.sort(key=lambda item: item["elapsed_s"], reverse=True)
+        return items
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                "inflight": len(self._inflight),
+                "watched": self._watched,
+                "warnings": self._warnings,
+                "stack_dumps": self._dumps,
+                "pending_deadlines": len(self._heap),
+                "thread_alive": self._thread is not None and self._thread.is_alive(),
+            }
+
+
+_watchdog: Optional[PredictWatchdog] = None
+_watchdog_lock = threading.Lock()
+
+
+def get_predict_watchdog() -> PredictWatchdog:
+    """进程级看门狗（首次使用时创建，线程在第一次登记截止时间时启动）。"""
+    global _watchdog
+    if _watchdog is None:
+        with _watchdog_lock:
+            if _watchdog is None:
+                _watchdog = PredictWatchdog()
+    return _watchdog
@@ -41,6 +41,7 @@ class AppConfig(BaseModel):
     step1_fallback_subprocess: bool = True
     step2_fallback_subprocess: bool = True
     light_table: bool = False
+    table_pass: str = "always"  # "always" or "conditional"
 
     # Paths
     project_root: Path = Path(__file__).parent.parent.parent.parent
@@ -84,6 +85,7 @@ class AppConfig(BaseModel):
             step1_fallback_subprocess=os.getenv("EXAMPAPER_STEP1_FALLBACK_SUBPROCESS", "1") == "1",
             step2_fallback_subprocess=os.getenv("EXAMPAPER_STEP2_FALLBACK_SUBPROCESS", "1") == "1",
             light_table=os.getenv("EXAMPAPER_LIGHT_TABLE", "0") == "1",
+            table_pass=os.getenv("EXAMPAPER_TABLE_PASS", "always") or "always",
             # AI Configuration
             ai_provider=os.getenv("AI_PROVIDER", "mock"),
             ai_base_url=os.getenv("AI_BASE_URL", "https://api.openai.com/v1"),
@@ -115,6 +117,7 @@ class AppConfig(BaseModel):
             "EXAMPAPER_STEP1_FALLBACK_SUBPROCESS": "1" if self.step1_fallback_subprocess else "0",
             "EXAMPAPER_STEP2_FALLBACK_SUBPROCESS": "1" if self.step2_fallback_subprocess else "0",
             "EXAMPAPER_LIGHT_TABLE": "1" if self.light_table else "0",
+            "EXAMPAPER_TABLE_PASS": self.table_pass,
             "EXAMPAPER_PARALLEL_EXTRACTION": "1" if self.parallel_extraction else "0",
             "EXAMPAPER_MAX_WORKERS": str(self.max_workers),
         }
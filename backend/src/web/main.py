@@ -86,6 +86,20 @@ async def lifespan(app: FastAPI):
     except Exception:
         logger.exception("Failed to shutdown model provider cleanly")
 
+    # Shutdown the shared PDF render pool
+    try:
+        from ..services.pipeline.steps.pdf_to_images import shutdown_render_pool
+        shutdown_render_pool(wait=False)
+    except Exception:
+        logger.exception("Failed to shutdown render pool cleanly")
+
+    # Stop cross-page predict batchers
+    try:
+        from ..services.predict_batcher import shutdown_predict_batchers
+        shutdown_predict_batchers()
+    except Exception:
+        logger.exception("Failed to shutdown predict batchers cleanly")
+
     # Close database connection
     try:
         await db.close()
@@ -103,3 +103,31 @@ async def health_ppstructure():
             }
         },
     )
+
+
+@router.get("/metrics")
+async def health_metrics():
+    """Runtime metrics for caches and schedulers"""
+    from ...services.pipeline.impl.ocr_mem_cache import get_ocr_mem_cache_stats
+    from ...services.models.model_provider import PPStructureProvider
+    from ...services.pipeline.impl.ocr_writer import peek_ocr_writer
+    from ...services.predict_batcher import get_predict_batcher_stats
+    from ...services.predict_watchdog import get_predict_watchdog
+
+    writer = peek_ocr_writer()
+    return {
+        "ocr_mem_cache": get_ocr_mem_cache_stats(),
+        "ocr_cache_writer": writer.stats() if writer is not None else None,
+        "page_scheduler": PPStructureProvider.get_page_scheduler_stats(),
+        "predict_batchers": get_predict_batcher_stats(),
+        "predict_watchdog": get_predict_watchdog().stats(),
+    }
+
+
+@router.get("/predicts")
+async def health_predicts():
+    """In-flight OCR predicts with elapsed time (longest first)"""
+    from ...services.predict_watchdog import get_predict_watchdog
+
+    watchdog = get_predict_watchdog()
+    return {"watchdog": watchdog.stats(), "inflight": watchdog.inflight()}
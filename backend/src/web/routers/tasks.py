@@ -5,6 +5,7 @@ import asyncio
 import hashlib
 import json
 import logging
+import re
 import shutil
 from pathlib import Path
 
@@ -15,7 +16,7 @@ from ...common.paths import resolve_exam_dir_by_hash
 from ...db.connection import get_db_manager
 from ...db.crud import TaskRepository
 from ..limiter import limiter
-from ..schemas import ProcessRequest, StepStatus
+from ..schemas import PageOverrideRequest, ProcessRequest, StepStatus
 from ..services.event_bus import event_bus
 from ..services.event_infra import get_event_store
 from ..services.task_executor import task_executor
@@ -181,14 +182,22 @@ async def stream_task(
 
 @router.post("/upload")
 @limiter.limit("10/minute")
-async def upload_pdf(request: Request, file: UploadFile = File(...), mode: str = Form("auto")):
-    """Upload a PDF file and create a new task"""
+async def upload_pdf(
+    request: Request,
+    file: UploadFile = File(...),
+    mode: str = Form("auto"),
+    weight: float = Form(1.0),
+):
+    """Upload a PDF file and create a new task (weight: OCR slot share under the page scheduler)"""
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Only PDF files are accepted")
 
     if mode not in ["auto", "manual"]:
         raise HTTPException(status_code=400, detail="Mode must be 'auto' or 'manual'")
 
+    if not 0.1 <= weight <= 10.0:
+        raise HTTPException(status_code=400, detail="Weight must be between 0.1 and 10")
+
     # Step 1: Create in-memory task
     task = task_manager.create_task(file.filename, mode)
 
@@ -220,6 +229,7 @@ async def upload_pdf(request: Request, file: UploadFile = File(...), mode: str =
     # Step 5: Update task attributes
     task.file_hash = file_hash
     task.exam_dir = exam_dir
+    task.scheduler_weight = weight
 
     # Step 6: Create database record
     # CRITICAL: This MUST happen before any emit_event call (e.g., task.add_log)
@@ -459,6 +469,45 @@ async def restart_from_step(task_id: str, from_step: int):
     }
 
 
+@router.put("/tasks/{task_id}/pages/{page_name}/override")
+async def set_page_override(task_id: str, page_name: str, req: PageOverrideRequest):
+    """Override the blank/non-question page decision for one page of a task.
+
+    Takes effect the next time the extract_questions step runs.
+    """
+    from ...services.pipeline.impl.page_classifier import set_page_override as _set_override
+
+    task = task_manager.get_task(task_id)
+    if not task:
+        raise HTTPException(status_code=404, detail="Task not found")
+
+    if not re.fullmatch(r"page_\d+", page_name):
+        raise HTTPException(status_code=400, detail=f"Invalid page name: {page_name}")
+
+    if task.exam_dir is None or not task.exam_dir.is_dir():
+        raise HTTPException(status_code=409, detail="页面尚未生成")
+
+    if task_executor.is_running(task_id):
+        raise HTTPException(status_code=409, detail="Task is already processing")
+
+    overrides = await asyncio.to_thread(_set_override, task.exam_dir, page_name, req.decision)
+
+    # Drop the page's question meta so the next extraction run reprocesses it
+    meta_path = task.exam_dir / f"questions_{page_name}" / "meta.json"
+    try:
+        meta_path.unlink()
+    except FileNotFoundError:
+        pass
+
+    return {
+        "task_id": task_id,
+        "page": page_name,
+        "decision": req.decision,
+        "overrides": overrides,
+        "message": "重新运行「提取题目」步骤后生效",
+    }
+
+
 @router.get("/results/{task_id}")
 async def get_results(task_id: str):
     """Get the list of generated images for a completed task"""
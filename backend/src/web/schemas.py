@@ -65,6 +65,14 @@ class ProcessRequest(BaseModel):
     task_id: str = Field(..., min_length=1, description="Task ID to process")
 
 
+class PageOverrideRequest(BaseModel):
+    """Manual decision for a page the blank/non-question classifier got wrong."""
+    decision: Optional[Literal["ocr", "skip"]] = Field(
+        default=None,
+        description='"ocr" forces OCR, "skip" skips the page, null clears the override'
+    )
+
+
 class StartStepRequest(BaseModel):
     """Request to start a specific step."""
     run_to_end: bool = Field(
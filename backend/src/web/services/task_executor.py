@@ -180,7 +180,7 @@ class TaskExecutorService:
             workdir=str(task.exam_dir),
             file_hash=task.file_hash,
             expected_pages=task.expected_pages,
-            metadata={"mode": task.mode},
+            metadata={"mode": task.mode, "scheduler_weight": task.scheduler_weight},
         )
         return runner, snapshot, ctx
 
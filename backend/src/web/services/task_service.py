@@ -32,6 +32,8 @@ class Task:
         self.pdf_filename = Path(pdf_filename).name
         self.file_hash: Optional[str] = None
         self.expected_pages: Optional[int] = None
+        # Weighted-fair share of OCR slots against other tasks (page scheduler)
+        self.scheduler_weight = 1.0
         self.result_images: List[Dict[str, str]] = []
         self.error_message: Optional[str] = None
         self.last_log_index = 0
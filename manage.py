@@ -8,6 +8,7 @@ manage.py - 项目统一管理入口
     python manage.py web --port 9000    # 在指定端口启动Web服务器
     python manage.py web --no-gpu       # 禁用GPU加速
     python manage.py web --workers 8    # 设置并行工作线程数
+    python manage.py ocr-worker status  # 常驻预热 OCR 进程状态（stop 停止）
 """
 
 import os
@@ -18,6 +19,8 @@ import subprocess
 from pathlib import Path
 from typing import Any, Dict, Optional
 
+PROJECT_ROOT = Path(__file__).resolve().parent
+
 
 # =============================================================================
 # Environment Configuration (from start_web_production.bat)
@@ -44,23 +47,85 @@ DEFAULT_ENV_CONFIG = {
     # Async warmup (server starts immediately, model loads in background)
     # DISABLED: Async warmup can cause first page to hang waiting for model
     "EXAMPAPER_PPSTRUCTURE_WARMUP_ASYNC": "0",
+    # Run OCR in one supervised, pre-warmed child process: a predict that misses
+    # the deadline kills and re-warms the worker and retries the page, instead of
+    # holding the GPU semaphore until the web process is restarted
+    "EXAMPAPER_OCR_ISOLATED": "1",
+    "EXAMPAPER_OCR_PREDICT_DEADLINE_S": "300",
+    "EXAMPAPER_OCR_PREDICT_RETRIES": "1",
+    # Keep the warmed OCR worker in a detached process that survives web restarts and
+    # reloads (reused while the OCR configuration is unchanged; stop with
+    # `python manage.py ocr-worker stop`)
+    # "EXAMPAPER_OCR_WARM_WORKER": "1",
     # Fallback to subprocess if in-proc fails
     "EXAMPAPER_STEP1_FALLBACK_SUBPROCESS": "1",
     "EXAMPAPER_STEP2_FALLBACK_SUBPROCESS": "1",
     # Table recognition (keep enabled for data analysis)
     "EXAMPAPER_LIGHT_TABLE": "0",
+    # Table branch only on pages with table regions / data analysis
+    # (light variant for all pages, full variant loaded on demand)
+    "EXAMPAPER_TABLE_PASS": "conditional",
     # Note: OCR batch sizes (DET_BATCH_SIZE, REC_BATCH_SIZE), PREFETCH_SIZE, and MAX_WORKERS
     # are auto-calculated based on hardware in calculate_optimal_params()
     # Parallel extraction
     "EXAMPAPER_PARALLEL_EXTRACTION": "1",
+    # Start OCR on page 1 while later pages are still rendering
+    "EXAMPAPER_STREAM_PAGES": "1",
+    # Use the PDF text layer instead of OCR for born-digital pages
+    "EXAMPAPER_TEXT_LAYER": "1",
+    # Share OCR slots fairly across concurrent tasks (manual-mode tasks first)
+    "EXAMPAPER_PAGE_SCHEDULER": "1",
+    "EXAMPAPER_PAGE_SCHEDULER_POLICY": "weighted",
+    # Cross-page micro-batching of predict() (K pages per call); measure first with
+    # scripts/benchmark_predict_batching.py
+    # "EXAMPAPER_PREDICT_BATCH_SIZE": "4",
+    # "EXAMPAPER_PREDICT_BATCH_WINDOW_MS": "20",
+    # CPU-only: run OCR in a pool of worker processes (auto = only when EXAMPAPER_USE_GPU=0)
+    "EXAMPAPER_OCR_PROCESS_POOL": "auto",
     # GPU lock timeout (seconds) - prevent infinite hangs
     "EXAMPAPER_GPU_LOCK_TIMEOUT_S": "120",
     # OCR predict warning threshold (seconds)
     "EXAMPAPER_OCR_PREDICT_WARN_AFTER_S": "60",
     # Performance optimizations
-    # In-memory LRU cache for OCR results (avoid re-loading JSON files)
+    # In-memory LRU cache for OCR results (avoid re-loading cache files), bounded by bytes
     "EXAMPAPER_OCR_MEM_CACHE": "1",
-    "EXAMPAPER_OCR_MEM_CACHE_MAX_PAGES": "64",
+    "EXAMPAPER_OCR_MEM_CACHE_MAX_MB": "256",
+    "EXAMPAPER_OCR_WRITE_BEHIND": "1",
+    # OCR cache format (json|bin|pack); all are readable. pack = one file per exam
+    "EXAMPAPER_OCR_CACHE_FORMAT": "pack",
+    # Content-addressed OCR cache shared across exams (data/cache/ocr)
+    "EXAMPAPER_OCR_GLOBAL_CACHE": "1",
+    "EXAMPAPER_OCR_GLOBAL_CACHE_MAX_MB": "1024",
+    # Decode upcoming pages on a small thread pool (bounded by MB) so OCR slots
+    # never wait on PNG decoding
+    "EXAMPAPER_DECODE_AHEAD": "1",
+    "EXAMPAPER_DECODE_AHEAD_MB": "256",
+    # Keep rendered pages as raw pixels (page_N.raw) for OCR/crops; PNGs are
+    # encoded after rendering and the raw files removed by collect_results
+    "EXAMPAPER_PAGE_STORE": "raw",
+    # Skip OCR for blank pages and answer sheets / instruction pages
+    # (per-exam overrides: PUT /api/tasks/{id}/pages/{page}/override)
+    "EXAMPAPER_PAGE_CLASSIFIER": "1",
+    # Run layout OCR on a downscaled page; bboxes are mapped back to 300 DPI.
+    # Check against the full-resolution output first: scripts/compare_ocr_dpi.py
+    # "EXAMPAPER_OCR_DPI": "150",
+    # Send only the content region (white margins trimmed) to layout OCR;
+    # check with: scripts/compare_ocr_dpi.py <exam_dir> --trim --dpi 0
+    "EXAMPAPER_OCR_TRIM": "1",
+    # Re-OCR suspicious pages (question-number gaps, no/short text) with the slower
+    # high-accuracy configuration; results are recorded in <exam>/ocr_quality.json
+    "EXAMPAPER_OCR_QUALITY_PASS": "1",
+    "EXAMPAPER_OCR_QUALITY_MAX_PAGES": "8",
+    # Structure detection over a columnar block table (keyword/regex scans over the whole
+    # exam at once); check with: scripts/benchmark_structure_detection.py [exam_dir]
+    "EXAMPAPER_BLOCK_TABLE": "1",
+    # Build structure.json page by page during question extraction, written as soon as
+    # the last OCR page lands (the structure step then finds it and skips)
+    "EXAMPAPER_INCREMENTAL_STRUCTURE": "1",
+    # Crop/stitch final images page by page from structure.json (each page decoded once);
+    # the per-page question crops written during extraction are intermediate only, so skip them
+    "EXAMPAPER_CROP_PLANNER": "1",
+    "EXAMPAPER_PER_PAGE_CROPS": "0",
     # Pre-load image to memory before GPU lock (move I/O out of critical section)
     # NOTE: Disabled - some PPStructureV3 versions don't support numpy array input
     # "EXAMPAPER_OCR_PASS_IMAGE": "1",
@@ -178,6 +243,11 @@ def calculate_optimal_params(hw: Dict[str, Any]) -> Dict[str, str]:
 
     workers = max(1, min(4, workers))
 
+    # CPU-only nodes: OCR runs in a multi-process pool (one model per ~4 cores);
+    # give it enough page workers to keep every OCR process busy
+    if not hw.get("gpu_available"):
+        workers = max(workers, min(16, cores // 4))
+
     return {
         "FLAGS_fraction_of_gpu_memory_to_use": str(gpu_mem_fraction),
         "EXAMPAPER_DET_BATCH_SIZE": str(det_bs),
@@ -367,6 +437,9 @@ def run_web_server(
     # Print config
     print_config_summary(effective_use_gpu, workers, warmup, gpu_detected, hardware)
 
+    if os.getenv("EXAMPAPER_OCR_WARM_WORKER", "0") == "1":
+        start_warm_ocr_worker()
+
     try:
         import uvicorn
         from backend.src.web.main import app
@@ -389,6 +462,38 @@ def run_web_server(
         print("\n\n[INFO] Web server stopped")
 
 
+def start_warm_ocr_worker() -> None:
+    """启动（或复用）常驻预热 OCR 进程，并让 Web 进程连接它"""
+    from backend.src.services.models.ocr_warm_worker import ensure_warm_ocr_worker
+
+    state, reused = ensure_warm_ocr_worker(PROJECT_ROOT, PROJECT_ROOT / "data")
+    os.environ["EXAMPAPER_OCR_WORKER_ADDRESS"] = state["address"]
+    os.environ["EXAMPAPER_OCR_WORKER_AUTHKEY"] = state["authkey"]
+    action = "Reusing" if reused else "Started"
+    print(f"\n[OCR Worker] {action} warm OCR worker (PID {state['pid']}, {state['address']})")
+
+
+def manage_ocr_worker(action: str) -> None:
+    """查看或停止常驻预热 OCR 进程"""
+    from backend.src.services.models.ocr_warm_worker import read_worker_state, stop_warm_ocr_worker
+
+    data_dir = PROJECT_ROOT / "data"
+    if action == "stop":
+        if stop_warm_ocr_worker(data_dir):
+            print("[OCR Worker] Stopped")
+        else:
+            print("[OCR Worker] Not running")
+        return
+
+    state = read_worker_state(data_dir)
+    if not state:
+        print("[OCR Worker] Not running")
+        return
+    print(f"[OCR Worker] PID {state.get('pid')} at {state.get('address')}")
+    print(f"  fingerprint: {state.get('fingerprint')}")
+    print(f"  log: {data_dir / 'ocr_worker.log'}")
+
+
 def main():
     """主函数"""
     parser = argparse.ArgumentParser(
@@ -402,6 +507,7 @@ def main():
   python manage.py web --no-gpu             # 禁用GPU加速
   python manage.py web --workers 8          # 设置并行工作线程数
   python manage.py web --no-warmup          # 禁用模型预热
+  python manage.py ocr-worker stop          # 停止常驻预热 OCR 进程
 
 访问 http://localhost:8000 使用完整功能
         """,
@@ -419,6 +525,10 @@ def main():
     parser_web.add_argument("--workers", type=int, default=4, help="并行工作线程数 (默认: 4)")
     parser_web.add_argument("--no-warmup", action="store_true", help="禁用模型预热")
 
+    # 常驻预热 OCR 进程
+    parser_worker = subparsers.add_parser("ocr-worker", help="常驻预热 OCR 进程（EXAMPAPER_OCR_WARM_WORKER=1）")
+    parser_worker.add_argument("action", nargs="?", default="status", choices=["status", "stop"])
+
     args = parser.parse_args()
 
     # 如果没有指定命令，默认启动Web服务器
@@ -436,6 +546,8 @@ def main():
             workers=args.workers,
             warmup=not args.no_warmup,
         )
+    elif args.command == "ocr-worker":
+        manage_ocr_worker(args.action)
     else:
         parser.print_help()
 
@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+OCR 缓存格式对比测试（JSON vs 二进制 vs 整卷 pack）
+
+对每个试卷目录的 ocr/page_*.json：
+- 编码为 page_*.bin 与 pages.pack 格式（写入临时目录，不改动原缓存）
+- 比较文件大小
+- 比较 load_all_ocr_caches 的加载耗时（完整解码 / 按需解码）
+- 比较 build_structure_doc 的端到端耗时
+
+使用方法：
+  python scripts/benchmark_ocr_cache_format.py                 # 扫描 pdf_images/ 下所有试卷
+  python scripts/benchmark_ocr_cache_format.py <exam_dir> ...  # 指定试卷目录
+  python scripts/benchmark_ocr_cache_format.py --migrate <exam_dir>  # 原地迁移（默认 pack 格式）
+  python scripts/benchmark_ocr_cache_format.py --migrate --format bin <exam_dir>
+"""
+
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.common.types import LEGACY_PDF_IMAGES_DIR
+from backend.src.services.pipeline.impl.ocr_binary import encode_ocr_page, write_ocr_page
+from backend.src.services.pipeline.impl.ocr_cache import (
+    is_ocr_complete,
+    load_all_ocr_caches,
+    migrate_ocr_caches,
+)
+from backend.src.services.pipeline.impl.ocr_pack import get_pack_path, pack_write_page
+from backend.src.services.pipeline.impl.structure_detection import build_structure_doc
+
+
+def _time_best(fn: Callable[[], object], repeat: int) -> float:
+    """多次运行取最短耗时（秒）。"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def _touch_all(caches: dict) -> None:
+    """遍历 label / bbox / 文本，模拟 build_structure_doc 的访问模式。"""
+    for cache in caches.values():
+        for blk in cache.get("blocks", []):
+            blk.get("label")
+            blk.get("bbox")
+            blk.get("content")
+
+
+def benchmark_exam(exam_dir: Path, repeat: int) -> None:
+    json_files = sorted((exam_dir / "ocr").glob("page_*.json"))
+    if not json_files:
+        print(f"  [跳过] {exam_dir.name}: 没有 ocr/page_*.json")
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        json_dir = Path(tmp) / "json"
+        bin_dir = Path(tmp) / "bin"
+        pack_dir = Path(tmp) / "pack"
+        for d in (json_dir, bin_dir, pack_dir):
+            (d / "ocr").mkdir(parents=True)
+
+        json_bytes = 0
+        bin_bytes = 0
+        for f in json_files:
+            shutil.copy2(f, json_dir / "ocr" / f.name)
+            json_bytes += f.stat().st_size
+            with f.open("r", encoding="utf-8") as fp:
+                data = json.load(fp)
+            bin_bytes += write_ocr_page(bin_dir / "ocr" / f"{f.stem}.bin", data)
+            pack_write_page(pack_dir, f.stem, encode_ocr_page(data))
+        pack_bytes = get_pack_path(pack_dir).stat().st_size
+
+        os.environ["EXAMPAPER_OCR_CACHE_FORMAT"] = "json"
+        t_json = _time_best(lambda: _touch_all(load_all_ocr_caches(json_dir)), repeat)
+        t_json_struct = _time_best(lambda: build_structure_doc(load_all_ocr_caches(json_dir)), repeat)
+
+        os.environ["EXAMPAPER_OCR_CACHE_FORMAT"] = "bin"
+        t_bin = _time_best(lambda: _touch_all(load_all_ocr_caches(bin_dir)), repeat)
+        t_bin_lazy = _time_best(lambda: _touch_all(load_all_ocr_caches(bin_dir, lazy=True)), repeat)
+        t_bin_struct = _time_best(
+            lambda: build_structure_doc(load_all_ocr_caches(bin_dir, lazy=True)), repeat
+        )
+        t_bin_complete = _time_best(lambda: is_ocr_complete(bin_dir), repeat)
+
+        os.environ["EXAMPAPER_OCR_CACHE_FORMAT"] = "pack"
+        t_pack_lazy = _time_best(lambda: _touch_all(load_all_ocr_caches(pack_dir, lazy=True)), repeat)
+        t_pack_struct = _time_best(
+            lambda: build_structure_doc(load_all_ocr_caches(pack_dir, lazy=True)), repeat
+        )
+
+    print(f"\n{exam_dir.name} ({len(json_files)} 页)")
+    print(f"  大小:  json={json_bytes / 1024:.1f}KB  bin={bin_bytes / 1024:.1f}KB  "
+          f"({bin_bytes / max(1, json_bytes):.0%})  pack={pack_bytes / 1024:.1f}KB")
+    print(f"  加载:  json={t_json * 1000:.1f}ms  bin={t_bin * 1000:.1f}ms  "
+          f"bin(lazy)={t_bin_lazy * 1000:.1f}ms  pack(lazy)={t_pack_lazy * 1000:.1f}ms")
+    print(f"  结构:  json={t_json_struct * 1000:.1f}ms  bin(lazy)={t_bin_struct * 1000:.1f}ms  "
+          f"pack(lazy)={t_pack_struct * 1000:.1f}ms")
+    print(f"  完成检查(bin, glob): {t_bin_complete * 1000:.2f}ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OCR 缓存格式对比测试")
+    parser.add_argument("exam_dirs", nargs="*", type=Path, help="试卷目录（默认扫描 pdf_images/）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测试重复次数（取最短）")
+    parser.add_argument("--migrate", action="store_true", help="原地迁移缓存格式")
+    parser.add_argument("--format", choices=["json", "bin", "pack"], default="pack",
+                        help="迁移目标格式（默认 pack）")
+    args = parser.parse_args()
+
+    exam_dirs: List[Path] = list(args.exam_dirs)
+    if not exam_dirs:
+        base = PROJECT_ROOT / LEGACY_PDF_IMAGES_DIR
+        exam_dirs = sorted(d for d in base.iterdir() if (d / "ocr").is_dir()) if base.is_dir() else []
+
+    if args.migrate:
+        os.environ["EXAMPAPER_OCR_CACHE_FORMAT"] = args.format
+        for exam_dir in exam_dirs:
+            n = migrate_ocr_caches(exam_dir)
+            print(f"  [迁移] {exam_dir.name}: {n} 页")
+        return
+
+    print("=" * 60)
+    print("OCR 缓存格式对比 (JSON vs 二进制 vs pack)")
+    print("=" * 60)
+    for exam_dir in exam_dirs:
+        benchmark_exam(exam_dir, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+跨页微批推理吞吐测试（PredictBatcher）
+
+用真实页面图片比较不同批大小 K 下的吞吐（页/秒）：
+- K=1：与线上默认一致，每页单独调用 pipeline.predict（GPU 信号量串行）
+- K>1：多个页面 worker 同时提交，分发线程在窗口内凑批后调用一次 predict
+
+默认在 CPU 模式下运行（EXAMPAPER_USE_GPU=0），便于在无 GPU 的机器上对比。
+
+--pool N 改为对 N 个 worker 的 OcrProcessPool 测试（每个 worker 一个槽位）。
+线上对进程池不启用批处理（见 predict_batcher.batches_predict），此时 K>1 的结果
+用于对比：批处理会让一批页面挤在一个 worker 上逐页执行。
+
+使用方法：
+  python scripts/benchmark_predict_batching.py <exam_dir>
+  python scripts/benchmark_predict_batching.py <exam_dir> --pages 16 --batch 1 2 4 8 --window-ms 20
+  python scripts/benchmark_predict_batching.py <exam_dir> --gpu
+  python scripts/benchmark_predict_batching.py <exam_dir> --pool 4 --threads 4
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import List
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _run(pipeline, pages: List[Path], batch: int, window_ms: int, workers: int, slots: int = 1) -> float:
+    """以 workers 个并发页面 worker、slots 个推理槽位跑完所有页面，返回耗时（秒）。"""
+    from backend.src.services.predict_batcher import PredictBatcher
+
+    sem = threading.Semaphore(slots)
+    batcher = PredictBatcher(pipeline, max_batch=batch, window_ms=window_ms) if batch > 1 else None
+
+    def one(path: Path) -> None:
+        if batcher is not None:
+            batcher.predict(str(path), sem, page=path.stem)
+        else:
+            with sem:
+                pipeline.predict(str(path))
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(one, pages))
+    finally:
+        if batcher is not None:
+            batcher.close()
+    return time.perf_counter() - start
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="跨页微批推理吞吐测试")
+    parser.add_argument("exam_dir", type=Path, help="包含 page_*.png 的试卷目录")
+    parser.add_argument("--pages", type=int, default=8, help="参与测试的页数（默认 8）")
+    parser.add_argument("--batch", type=int, nargs="+", default=[1, 2, 4], help="要测试的批大小 K")
+    parser.add_argument("--window-ms", type=int, default=20, help="批次收集窗口（毫秒）")
+    parser.add_argument("--workers", type=int, default=4, help="并发页面 worker 数")
+    parser.add_argument("--gpu", action="store_true", help="使用 GPU（默认 CPU 模式）")
+    parser.add_argument("--pool", type=int, default=0, help="改用 N 个 worker 的 CPU 进程池（默认 0 = 进程内模型）")
+    parser.add_argument("--threads", type=int, default=4, help="进程池每个 worker 的 CPU 线程数")
+    args = parser.parse_args()
+
+    os.environ["EXAMPAPER_USE_GPU"] = "1" if args.gpu and not args.pool else "0"
+
+    pages = sorted(args.exam_dir.glob("page_*.png"), key=lambda p: int(p.stem.split("_")[-1]))
+    pages = pages[: args.pages]
+    if not pages:
+        print(f"[错误] {args.exam_dir} 下没有 page_*.png")
+        sys.exit(1)
+
+    print("加载模型...")
+    if args.pool:
+        from backend.src.services.models.ocr_process_pool import OcrProcessPool
+
+        pipeline = OcrProcessPool(args.pool, args.threads)
+        pipeline.start()
+        slots = pipeline.size
+        mode = f"CPU 进程池 {slots}x{args.threads} 线程"
+    else:
+        from backend.src.common.ocr_models import get_ppstructure, warmup_ppstructure
+
+        pipeline = get_ppstructure()
+        warmup_ppstructure()
+        slots = 1
+        mode = "GPU" if args.gpu else "CPU"
+    workers = max(args.workers, slots)
+
+    from backend.src.services.predict_batcher import batches_predict
+
+    print("=" * 60)
+    print(f"微批推理吞吐 ({mode}, {len(pages)} 页, {workers} workers, 窗口 {args.window_ms}ms)")
+    if not batches_predict(pipeline):
+        print("  注意：线上对该 pipeline 不启用批处理，实际运行与 K=1 相同")
+    print("=" * 60)
+    try:
+        baseline = None
+        for k in args.batch:
+            elapsed = _run(pipeline, pages, k, args.window_ms, workers, slots)
+            throughput = len(pages) / elapsed
+            if baseline is None:
+                baseline = throughput
+            print(f"  K={k:<3d} 耗时 {elapsed:7.2f}s  吞吐 {throughput:6.2f} 页/秒  "
+                  f"({throughput / baseline:.2f}x)")
+    finally:
+        if args.pool:
+            pipeline.close()
+
+
+if __name__ == "__main__":
+    main()
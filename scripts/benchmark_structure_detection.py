@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+"""
+结构检测性能对比（逐块遍历 dict vs 列式块表）
+
+- 默认使用合成的 200 页试卷（页眉页脚、广告噪声、部分标题、跨页题目、
+  多段材料文字、资料分析材料与 111-130 题、试卷结束标识；每页约 30 块）
+- 也可以指定试卷目录，使用真实 OCR 缓存
+- 先校验两种实现输出的结构文档完全一致，再比较耗时（取最短）
+
+使用方法：
+  python scripts/benchmark_structure_detection.py
+  python scripts/benchmark_structure_detection.py --pages 400 --repeat 10
+  python scripts/benchmark_structure_detection.py <exam_dir> ...
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.pipeline.impl.block_table import BlockTable
+from backend.src.services.pipeline.impl.ocr_cache import load_all_ocr_caches
+from backend.src.services.pipeline.impl.structure_detection import (
+    _build_structure_doc_blocks,
+    build_structure_doc_from_table,
+)
+
+PAGE_W, PAGE_H = 2480, 3508
+SECTIONS = ["常识判断", "言语理解与表达", "数量关系", "判断推理"]
+NOISE_LINES = ["扫码对答案，获取解析", "关注公众号领取资料", "华图教育 直播讲解"]
+
+
+def _block(label: str, content: str, y: int, h: int, x: int = 160, w: int = 2160) -> Dict[str, Any]:
+    return {"label": label, "content": content, "bbox": [x, y, x + w, y + h]}
+
+
+def make_fixture(n_pages: int, seed: int = 7) -> Dict[str, Dict[str, Any]]:
+    """合成试卷：前 85% 为普通题（1-110 题），其后为资料分析（111-130 题），末页结束。"""
+    rng = random.Random(seed)
+    da_first_page = int(n_pages * 0.85)
+    normal_qnos = list(range(1, 111))
+    da_qnos = list(range(111, 131))
+    per_normal_page = len(normal_qnos) / max(1, da_first_page - 1)
+    per_da_page = len(da_qnos) / max(1, n_pages - da_first_page)
+
+    caches: Dict[str, Dict[str, Any]] = {}
+    next_normal = 0
+    next_da = 0
+    for page_no in range(1, n_pages + 1):
+        blocks: List[Dict[str, Any]] = [_block("header", f"2024年公务员录用考试《行测》 第{page_no}页", 60, 60)]
+        y = 180
+
+        if page_no > 1 and rng.random() < 0.3:
+            # 上一题的跨页续接内容
+            blocks.append(_block("text", "C．以上说法均不正确 D．无法确定", y, 80))
+            y += 100
+
+        if page_no < da_first_page:
+            section = (page_no - 1) * len(SECTIONS) // da_first_page
+            if page_no == 1 or section != (page_no - 2) * len(SECTIONS) // da_first_page:
+                blocks.append(_block("paragraph_title", f"{'一二三四'[section]}、{SECTIONS[section]}", y, 90))
+                y += 110
+                blocks.append(_block("text", "本部分包括表达与理解两方面的内容，每题给出一段文字。", y, 120))
+                y += 140
+            target = round(page_no * per_normal_page)
+            while next_normal < min(target, len(normal_qnos)) and y < PAGE_H - 600:
+                qno = normal_qnos[next_normal]
+                next_normal += 1
+                stem = "某地区开展了一项关于城市交通出行方式的调查研究，" * rng.randint(1, 4)
+                blocks.append(_block("text", f"{qno}．{stem}", y, 160))
+                y += 180
+                for opt in ("A．甲方案 B．乙方案", "C．丙方案 D．丁方案"):
+                    blocks.append(_block("text", opt, y, 70))
+                    y += 90
+                if rng.random() < 0.15:
+                    blocks.append(_block("image", "", y, 400, x=600, w=1200))
+                    y += 420
+            # 页面剩余部分为上一题的多段材料文字（续接行）
+            while y < PAGE_H - 400:
+                blocks.append(_block("text", "材料显示，" + "相关部门持续推进公共服务均等化建设，" * rng.randint(1, 3), y, 90))
+                y += 100
+        else:
+            if page_no == da_first_page:
+                blocks.append(_block("paragraph_title", "第五部分 资料分析", y, 90))
+                y += 110
+            if next_da % 5 == 0 and next_da < len(da_qnos):
+                blocks.append(_block("text", "根据以下资料，回答下列问题。2023年全年全国规模以上工业增加值比上年增长4.6%。", y, 200))
+                y += 220
+                blocks.append(_block("table", "<table><tr><td>指标</td><td>数值</td></tr></table>", y, 600))
+                y += 620
+            target = round((page_no - da_first_page + 1) * per_da_page)
+            while next_da < min(target, len(da_qnos)) and y < PAGE_H - 500:
+                qno = da_qnos[next_da]
+                next_da += 1
+                blocks.append(_block("text", f"{qno}．2023年该指标同比增长率约为多少？", y, 120))
+                y += 140
+                blocks.append(_block("text", "A．3.2% B．4.6% C．5.1% D．6.0%", y, 70))
+                y += 90
+
+        if rng.random() < 0.2:
+            blocks.append(_block("text", rng.choice(NOISE_LINES), PAGE_H - 300, 60))
+        if page_no == n_pages:
+            blocks.append(_block("text", "全部测验到此结束", PAGE_H - 240, 70))
+        blocks.append(_block("number", str(page_no), PAGE_H - 120, 50, x=1200, w=80))
+
+        caches[f"page_{page_no}"] = {
+            "page_name": f"page_{page_no}",
+            "image_width": PAGE_W,
+            "image_height": PAGE_H,
+            "blocks": blocks,
+        }
+    return caches
+
+
+def _time_best(fn: Callable[[], object], repeat: int) -> float:
+    """多次运行取最短耗时（秒）。"""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def benchmark(name: str, caches: Dict[str, Dict[str, Any]], repeat: int) -> None:
+    n_blocks = sum(len(c.get("blocks", [])) for c in caches.values())
+    legacy = _build_structure_doc_blocks(caches).to_dict()
+    table_doc = build_structure_doc_from_table(BlockTable.from_ocr_caches(caches)).to_dict()
+    if legacy != table_doc:
+        print(f"\n{name}: [错误] 两种实现的结构文档不一致")
+        sys.exit(1)
+
+    t_legacy = _time_best(lambda: _build_structure_doc_blocks(caches), repeat)
+    t_build = _time_best(lambda: BlockTable.from_ocr_caches(caches), repeat)
+    table = BlockTable.from_ocr_caches(caches)
+    t_detect = _time_best(lambda: build_structure_doc_from_table(table), repeat)
+    t_table = _time_best(lambda: build_structure_doc_from_table(BlockTable.from_ocr_caches(caches)), repeat)
+
+    print(f"\n{name} ({len(caches)} 页, {n_blocks} 块, {len(legacy['questions'])} 题, "
+          f"{len(legacy['big_questions'])} 个资料分析大题)")
+    print(f"  逐块遍历:  {t_legacy * 1000:.1f}ms")
+    print(f"  列式块表:  {t_table * 1000:.1f}ms  (建表 {t_build * 1000:.1f}ms + 检测 {t_detect * 1000:.1f}ms)")
+    print(f"  加速比:    {t_legacy / max(t_table, 1e-9):.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="结构检测性能对比（逐块遍历 vs 列式块表）")
+    parser.add_argument("exam_dirs", nargs="*", type=Path, help="试卷目录（默认使用合成试卷）")
+    parser.add_argument("--pages", type=int, default=200, help="合成试卷页数（默认 200）")
+    parser.add_argument("--repeat", type=int, default=5, help="每项测试重复次数（取最短）")
+    args = parser.parse_args()
+
+    print("=" * 60)
+    print("结构检测性能对比")
+    print("=" * 60)
+    if not args.exam_dirs:
+        benchmark("合成试卷", make_fixture(args.pages), args.repeat)
+        return
+    for exam_dir in args.exam_dirs:
+        benchmark(exam_dir.name, load_all_ocr_caches(exam_dir), args.repeat)
+
+
+if __name__ == "__main__":
+    main()
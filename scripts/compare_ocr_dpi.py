@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+降分辨率 / 裁边 OCR 对比测试（EXAMPAPER_OCR_DPI、EXAMPAPER_OCR_TRIM）
+
+对同一批页面分别以渲染分辨率整页（300 DPI，基准输出）和较低分辨率（--trim 时
+只识别裁掉空白边距后的内容区域）运行 OCR：
+- 耗时：每页 OCR 耗时与加速比
+- 基准对比：题号集合是否一致、每道题 crop_box_image 的 IoU（bbox 已映射回页面坐标系）
+
+任一页面题号不一致或 IoU 低于阈值时以非零状态退出，可用于上线前的回归检查。
+默认在 CPU 模式下运行（EXAMPAPER_USE_GPU=0）。
+
+使用方法：
+  python scripts/compare_ocr_dpi.py <exam_dir>
+  python scripts/compare_ocr_dpi.py <exam_dir> --dpi 150 200 --pages 10 --min-iou 0.95
+  python scripts/compare_ocr_dpi.py <exam_dir> --trim --dpi 0 150
+  python scripts/compare_ocr_dpi.py <exam_dir> --gpu
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+# 添加项目根目录到 Python 路径
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+
+def _iou(a: List[int], b: List[int]) -> float:
+    ix = max(0, min(a[2], b[2]) - max(a[0], b[0]))
+    iy = max(0, min(a[3], b[3]) - max(a[1], b[1]))
+    inter = ix * iy
+    area_a = max(0, a[2] - a[0]) * max(0, a[3] - a[1])
+    area_b = max(0, b[2] - b[0]) * max(0, b[3] - b[1])
+    union = area_a + area_b - inter
+    return inter / union if union else 1.0
+
+
+def _run_pages(
+    pipeline: Any, pages: List[Path], dpi: int, trim: bool = False
+) -> Tuple[float, Dict[str, Dict[int, List[int]]]]:
+    """以指定 OCR 分辨率处理所有页面，返回 (OCR 总耗时, {page: {qno: crop_box}})。"""
+    from backend.src.services.pipeline.impl.extract_questions import extract_questions_from_page
+    from backend.src.services.pipeline.impl.ocr_cache import run_ocr_with_cache
+
+    os.environ["EXAMPAPER_OCR_DPI"] = str(dpi)
+    os.environ["EXAMPAPER_OCR_TRIM"] = "1" if trim else "0"
+    results: Dict[str, Dict[int, List[int]]] = {}
+    elapsed = 0.0
+    with tempfile.TemporaryDirectory(prefix=f"ocr_dpi_{dpi}_") as tmp:
+        workdir = Path(tmp)
+        for path in pages:
+            t0 = time.perf_counter()
+            run_ocr_with_cache(pipeline, path, workdir, force=True)
+            elapsed += time.perf_counter() - t0
+            # 题目切分读取刚写入的缓存
+            questions = extract_questions_from_page(path, pipeline, workdir=workdir)
+            results[path.stem] = {q["qno"]: q["crop_box_image"] for q in questions}
+    return elapsed, results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="降分辨率 OCR 对比测试")
+    parser.add_argument("exam_dir", type=Path, help="包含 page_*.png 的试卷目录")
+    parser.add_argument("--pages", type=int, default=8, help="参与测试的页数（默认 8）")
+    parser.add_argument("--dpi", type=int, nargs="+", default=[150], help="要测试的 OCR 分辨率（0 = 300 DPI）")
+    parser.add_argument("--trim", action="store_true", help="对比时裁掉空白边距（EXAMPAPER_OCR_TRIM=1）")
+    parser.add_argument("--min-iou", type=float, default=0.95, help="裁剪框 IoU 阈值（默认 0.95）")
+    parser.add_argument("--gpu", action="store_true", help="使用 GPU（默认 CPU 模式）")
+    args = parser.parse_args()
+
+    os.environ["EXAMPAPER_USE_GPU"] = "1" if args.gpu else "0"
+    # 只比较模型输出，不命中跨试卷缓存
+    os.environ["EXAMPAPER_OCR_GLOBAL_CACHE"] = "0"
+    os.environ["EXAMPAPER_OCR_WRITE_BEHIND"] = "0"
+
+    from backend.src.common.ocr_models import get_ppstructure, warmup_ppstructure
+
+    pages = sorted(args.exam_dir.glob("page_*.png"), key=lambda p: int(p.stem.split("_")[-1]))
+    pages = pages[: args.pages]
+    if not pages:
+        print(f"[错误] {args.exam_dir} 下没有 page_*.png")
+        sys.exit(1)
+
+    print("加载模型...")
+    pipeline = get_ppstructure()
+    warmup_ppstructure()
+
+    print("=" * 60)
+    mode = "降分辨率 + 裁边" if args.trim else "降分辨率"
+    print(f"{mode} OCR 对比 ({'GPU' if args.gpu else 'CPU'}, {len(pages)} 页)")
+    print("=" * 60)
+    base_s, golden = _run_pages(pipeline, pages, 0)
+    print(f"  300 DPI (基准)  OCR {base_s:7.2f}s  {len(pages) / base_s:6.2f} 页/秒")
+
+    failed = False
+    for dpi in args.dpi:
+        elapsed, got = _run_pages(pipeline, pages, dpi, trim=args.trim)
+        mismatched: List[str] = []
+        ious: List[float] = []
+        for page, expected in golden.items():
+            actual = got.get(page, {})
+            if set(actual) != set(expected):
+                mismatched.append(f"{page}: 题号 {sorted(expected)} -> {sorted(actual)}")
+                continue
+            for qno, box in expected.items():
+                iou = _iou(box, actual[qno])
+                ious.append(iou)
+                if iou < args.min_iou:
+                    mismatched.append(f"{page} Q{qno}: IoU {iou:.3f}")
+        min_iou = min(ious) if ious else 1.0
+        label = f"{dpi or 300:3d} DPI{' 裁边' if args.trim else '     '}"
+        print(f"  {label}   OCR {elapsed:7.2f}s  {len(pages) / elapsed:6.2f} 页/秒  "
+              f"({base_s / elapsed:.2f}x)  最小 IoU {min_iou:.3f}  差异 {len(mismatched)}")
+        for line in mismatched:
+            print(f"    - {line}")
+        failed = failed or bool(mismatched)
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+Test that the crop plan (EXAMPAPER_CROP_PLANNER=1) writes the same files as the
+question-by-question crop on a bundled exam.
+
+The exam is cropped both ways through process_structure_to_images into two
+scratch work dirs (page images linked in) and every output file is compared
+byte for byte. Besides a full exam, an edited structure doc covers the
+single-piece paths (a piece shared with another image, a page-span fallback
+with no bboxes), duplicate pieces (two questions on the same region) and
+missing page images.
+
+Run with: python tests/test_crop_planner.py
+"""
+
+import copy
+import io
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.pipeline.impl.crop_and_stitch import process_structure_to_images
+from backend.src.services.pipeline.impl.crop_planner import plan_crops
+from backend.src.services.pipeline.impl.ocr_cache import load_all_ocr_caches
+from backend.src.services.pipeline.impl.structure_detection import (
+    BBox,
+    BigQuestion,
+    QuestionNode,
+    build_structure_doc,
+)
+
+EXAMS_DIR = PROJECT_ROOT / "pdf_images"
+
+
+def _bundled_exams():
+    """(exam dir, structure doc) for the bundled exams with OCR caches."""
+    for exam_dir in sorted(d for d in EXAMS_DIR.iterdir() if (d / "ocr").is_dir()):
+        caches = load_all_ocr_caches(exam_dir)
+        if caches:
+            yield exam_dir, build_structure_doc(caches)
+
+
+def _workdir(root, name, exam_dir, missing):
+    workdir = root / name
+    workdir.mkdir()
+    for page in exam_dir.glob("page_*.png"):
+        if page.stem in missing:
+            continue
+        try:
+            os.symlink(page, workdir / page.name)
+        except OSError:
+            shutil.copyfile(page, workdir / page.name)
+    return workdir
+
+
+def _crop(root, name, exam_dir, doc, planner, missing=()):
+    workdir = _workdir(root, name, exam_dir, missing)
+    saved = os.environ.get("EXAMPAPER_CROP_PLANNER")
+    os.environ["EXAMPAPER_CROP_PLANNER"] = "1" if planner else "0"
+    try:
+        normal, big = process_structure_to_images(workdir, doc)
+    finally:
+        if saved is None:
+            os.environ.pop("EXAMPAPER_CROP_PLANNER", None)
+        else:
+            os.environ["EXAMPAPER_CROP_PLANNER"] = saved
+    out = workdir / "all_questions"
+    files = {p.name: p.read_bytes() for p in out.iterdir()}
+    return [Path(p).name for p in normal], [Path(p).name for p in big], files
+
+
+def _assert_same(label, exam_dir, doc, missing=()):
+    with tempfile.TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        expected = _crop(root, "legacy", exam_dir, doc, planner=False, missing=missing)
+        actual = _crop(root, "planned", exam_dir, doc, planner=True, missing=missing)
+    # The parallel legacy crop lists paths in completion order
+    assert sorted(actual[0]) == sorted(expected[0]), f"normal paths differ: {label}"
+    assert sorted(actual[1]) == sorted(expected[1]), f"big paths differ: {label}"
+    assert sorted(actual[2]) == sorted(expected[2]), f"file names differ: {label}"
+    for name, data in expected[2].items():
+        assert actual[2][name] == data, f"{name} differs: {label}"
+    return expected
+
+
+def _single_page_question(doc, skip=()):
+    da_qnos = doc.get_data_analysis_qnos()
+    for q in doc.questions:
+        pages = {b.page for b in q.bboxes}
+        if q.kind == "normal" and q.qno not in da_qnos and len(pages) == 1 and not pages & set(skip):
+            return q
+    raise AssertionError("no single-page question")
+
+
+def _next_page(page):
+    return f"page_{int(page.split('_')[-1]) + 1}"
+
+
+def _subset(doc, pages):
+    """Structure doc cut down to the questions that lie on the given pages."""
+    doc = copy.deepcopy(doc)
+    pages = set(pages)
+    doc.questions = [
+        q for q in doc.questions if q.kind != "normal" or {b.page for b in q.bboxes} <= pages
+    ]
+    doc.big_questions = [b for b in doc.big_questions if set(b.page_span) <= pages]
+    return doc
+
+
+def _edited(doc):
+    """Structure doc with duplicate, shared and page-span crop jobs added."""
+    base = _single_page_question(doc)
+    page = base.bboxes[0].page
+    doc = _subset(doc, [page, _next_page(page)])
+    # Same region as another question: encoded once, then copied
+    doc.questions.append(QuestionNode(
+        id="q1001", qno=1001, kind="normal", page_span=[page], bboxes=list(base.bboxes),
+    ))
+    # Shares base's single piece but ends a page later: base encodes a copy of the piece
+    doc.questions.append(QuestionNode(
+        id="q1002", qno=1002, kind="normal", page_span=[page, _next_page(page)],
+        bboxes=list(base.bboxes) + [BBox(page=_next_page(page), x1=0, y1=200, x2=800, y2=600)],
+    ))
+    # No bboxes at all: whole pages minus the margins
+    doc.big_questions.append(BigQuestion(
+        id="data_analysis_9", order=9, page_span=[_next_page(page), page],
+        material_bboxes=[], sub_question_ids=[], qno_range=(2001, 2001),
+    ))
+    return doc
+
+
+def _missing_pages(doc):
+    """A single-page question's page and the last page of a two-page question."""
+    single = _single_page_question(doc)
+    da_qnos = doc.get_data_analysis_qnos()
+    for q in doc.questions:
+        pages = sorted({b.page for b in q.bboxes}, key=lambda p: int(p.split("_")[-1]))
+        if q.kind == "normal" and q.qno not in da_qnos and len(pages) == 2 and single.bboxes[0].page not in pages:
+            return (single.bboxes[0].page, pages[-1])
+    raise AssertionError("no two-page question")
+
+
+def test_planner_matches_legacy_crop():
+    exam_dir, doc = next(_bundled_exams())
+    normal, big, files = _assert_same(exam_dir.name, exam_dir, doc)
+    assert normal and big, f"nothing cropped in {exam_dir.name}"
+    assert len(files) == len(normal) + len(big)
+
+
+def test_single_pieces_and_duplicates():
+    exam_dir, doc = next(_bundled_exams())
+    edited = _edited(doc)
+    jobs = {job.name: job for job in plan_crops(edited)}
+    assert jobs["q1001.png"].pieces == jobs[f"q{_single_page_question(doc).qno}.png"].pieces
+    assert all(p.y1 is None for p in jobs["data_analysis_9.png"].pieces)
+
+    normal, big, files = _assert_same("edited", exam_dir, edited)
+    assert "q1001.png" in normal and "q1002.png" in normal and "data_analysis_9.png" in big
+    assert files["q1001.png"] == files[f"q{_single_page_question(doc).qno}.png"]
+
+
+def test_missing_pages():
+    exam_dir, doc = next(_bundled_exams())
+    missing = _missing_pages(doc)
+    single = _single_page_question(doc)
+    pages = set(missing) | {f"page_{int(p.split('_')[-1]) + d}" for p in missing for d in (-1, 1)}
+    doc = _subset(doc, pages)
+    normal, _, files = _assert_same(f"missing {missing}", exam_dir, doc, missing=missing)
+    # The question on the missing page is skipped, the two-page one keeps its other page
+    assert f"q{single.qno}.png" not in files
+    assert len(normal) < len([j for j in plan_crops(doc) if j.kind == "normal"])
+
+
+def main() -> int:
+    test_planner_matches_legacy_crop()
+    test_single_pieces_and_duplicates()
+    test_missing_pages()
+    print("test_crop_planner: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
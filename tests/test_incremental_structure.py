@@ -0,0 +1,80 @@
+"""
+Test the incremental structure writer.
+
+structure.json must not appear while pages arrive, and is only written by
+commit() once the whole exam is in (i.e. after the OCR cache writes were
+flushed); a missing page keeps it unwritten.
+
+Run with: python tests/test_incremental_structure.py
+"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.pipeline.impl.incremental_structure import IncrementalStructureWriter
+from backend.src.services.pipeline.impl.ocr_cache import save_ocr_cache
+from backend.src.services.pipeline.impl.structure_detection import get_structure_path, has_structure_doc
+
+PAGES = ["page_1", "page_2"]
+
+
+def _blocks(qno):
+    return [
+        {"index": 0, "label": "text", "region_label": None, "bbox": [100, 100, 2000, 180], "content": f"{qno}. 下列各项中，说法正确的是"},
+        {"index": 1, "label": "text", "region_label": None, "bbox": [100, 200, 2000, 280], "content": "A. 选项一 B. 选项二 C. 选项三 D. 选项四"},
+    ]
+
+
+def _save(workdir, page_name):
+    save_ocr_cache(workdir, page_name, _blocks(PAGES.index(page_name) + 1), (2480, 3508))
+
+
+def test_written_on_commit():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workdir = Path(tmp_dir)
+        writer = IncrementalStructureWriter(workdir, PAGES)
+        for page_name in reversed(PAGES):
+            _save(workdir, page_name)
+            writer.page_done(page_name)
+        # Every page is in, but the cache writes are not flushed yet
+        assert not has_structure_doc(workdir) and not writer.written
+
+        assert writer.commit()
+        assert get_structure_path(workdir).is_file()
+        mtime = get_structure_path(workdir).stat().st_mtime_ns
+        # Nothing changed since: a second commit does not rewrite the file
+        assert writer.commit()
+        assert get_structure_path(workdir).stat().st_mtime_ns == mtime
+
+
+def test_missing_page_not_written():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workdir = Path(tmp_dir)
+        writer = IncrementalStructureWriter(workdir, PAGES)
+        _save(workdir, "page_1")
+        writer.page_done("page_1")
+        # page_2 failed OCR: no cache
+        writer.page_done("page_2")
+        assert not writer.commit()
+        assert not has_structure_doc(workdir)
+
+
+def main() -> int:
+    test_written_on_commit()
+    test_missing_page_not_written()
+    print("test_incremental_structure: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,105 @@
+"""
+Test the single-pass multi-category keyword matcher and the section boundary
+checks built on it.
+
+Run with: python tests/test_keyword_matcher.py
+"""
+
+import io
+import re
+import sys
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.common import KeywordMatcher, SECTION_MATCHER, is_section_boundary_block
+from backend.src.common.keyword_matcher import (
+    DATA_INTRO,
+    QUESTION_RANGE,
+    SECTION_HEAD,
+    SECTION_INTRO,
+    SECTION_PART,
+    SECTION_TITLE,
+)
+
+
+def test_returns_all_categories_in_one_pass():
+    matcher = KeywordMatcher(
+        keywords={"fruit": ["苹果", "香蕉"], "color": ["红色"]},
+        patterns={"number": re.compile(r"\d+个")},
+    )
+    assert matcher.match("3个红色的苹果") == {"fruit", "color", "number"}
+    assert matcher.match("香蕉") == {"fruit"}
+    assert matcher.match("") == frozenset()
+    assert matcher.categories == {"fruit", "color", "number"}
+
+
+def test_overlapping_keywords_are_all_found():
+    # Different start positions: "根据资料" and "资料分析" overlap
+    matcher = KeywordMatcher(keywords={"intro": ["根据资料"], "head": ["资料分析"]})
+    assert matcher.match("根据资料分析") == {"intro", "head"}
+
+    # Same start position: the shorter keyword is a prefix of the longer one
+    matcher = KeywordMatcher(keywords={"long": ["扫码听课"], "short": ["扫码"]})
+    assert matcher.match("请扫码听课") == {"long", "short"}
+
+    # Keyword fully inside a longer one
+    matcher = KeywordMatcher(keywords={"end": ["测验到此结束"], "full": ["全部测验到此结束"]})
+    assert matcher.match("全部测验到此结束") == {"end", "full"}
+
+
+def test_views_cover_spaced_out_ocr_text():
+    raw = "资 料 分 析"
+    compact = "".join(raw.split())
+    assert DATA_INTRO in SECTION_MATCHER.match_views(raw, compact)
+    assert DATA_INTRO not in SECTION_MATCHER.match(raw)
+
+    # Keywords containing whitespace still match the raw view
+    matcher = KeywordMatcher(keywords={"da": ["Data Analysis"]})
+    assert matcher.match_views("Part 5 Data Analysis", "Part5DataAnalysis") == {"da"}
+
+
+def test_section_categories():
+    hits = SECTION_MATCHER.match_views("三、数量关系", "三、数量关系")
+    assert {SECTION_TITLE, SECTION_HEAD} <= hits
+    assert SECTION_PART in SECTION_MATCHER.match("第 二 部分 言语理解与表达")
+    assert QUESTION_RANGE in SECTION_MATCHER.match("根据以下资料，回答 111-115 题")
+    assert SECTION_INTRO in SECTION_MATCHER.match("本部分包括两种类型的题目")
+
+
+def test_section_boundary_block():
+    def blk(content, label="text"):
+        return {"label": label, "content": content}
+
+    assert is_section_boundary_block(blk("一、常识判断"))
+    assert is_section_boundary_block(blk("第三部分 数量关系"))
+    assert is_section_boundary_block(blk("数量关系：本部分包括两种类型的题目"))
+    assert is_section_boundary_block(blk("根据以下资料，回答116～120题。"))
+    assert is_section_boundary_block(blk("资 料 分 析"))
+
+    # Section name alone, or intro wording alone, is not a boundary
+    assert not is_section_boundary_block(blk("下列关于数量关系的说法正确的是"))
+    assert not is_section_boundary_block(blk("每题给出一段文字"))
+    assert not is_section_boundary_block(blk("12．某地区开展了一项调查研究"))
+    assert not is_section_boundary_block(blk(""))
+    assert not is_section_boundary_block(blk("一、常识判断", label="header"))
+
+
+def main() -> int:
+    test_returns_all_categories_in_one_pass()
+    test_overlapping_keywords_are_all_found()
+    test_views_cover_spaced_out_ocr_text()
+    test_section_categories()
+    test_section_boundary_block()
+    print("test_keyword_matcher: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
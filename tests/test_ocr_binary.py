@@ -0,0 +1,164 @@
+"""
+Test the binary OCR cache format (page_N.bin) round-trip.
+
+Every bundled OCR cache must decode back to the same dict, both fully decoded
+and through the lazy block views over the file mapping; extra block fields,
+missing labels and float bboxes must survive, and corrupt files must raise
+OcrBinaryError.
+
+Run with: python tests/test_ocr_binary.py
+"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.pipeline.impl.ocr_binary import (
+    OcrBinaryError,
+    OcrBinaryPage,
+    close_lazy_pages,
+    encode_ocr_page,
+    read_ocr_page,
+    write_ocr_page,
+)
+from backend.src.services.pipeline.impl.ocr_cache import load_all_ocr_caches
+
+EXAMS_DIR = PROJECT_ROOT / "pdf_images"
+
+SAMPLE_PAGE = {
+    "page_name": "page_3",
+    "image_width": 2480,
+    "image_height": 3508,
+    "source": "test",
+    "blocks": [
+        {"index": 0, "label": "text", "region_label": "paragraph", "bbox": [10, 20, 300, 80], "content": "1. 下列说法正确的是"},
+        {"index": 1, "label": "table", "region_label": None, "bbox": [12.5, 90.25, 800.0, 400.75], "content": "<table></table>"},
+        {"index": 2, "label": None, "region_label": None, "bbox": [0, 0, 0, 0], "content": "", "content_truncated": True, "score": 0.5},
+    ],
+}
+
+
+def _write(tmp_dir, name, data):
+    path = Path(tmp_dir) / name
+    write_ocr_page(path, data)
+    return path
+
+
+def test_round_trip_sample():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = _write(tmp_dir, "page_3.bin", SAMPLE_PAGE)
+        assert read_ocr_page(path) == SAMPLE_PAGE
+
+        lazy = read_ocr_page(path, lazy=True)
+        assert [b.to_dict() for b in lazy["blocks"]] == SAMPLE_PAGE["blocks"]
+        assert lazy["page_name"] == "page_3" and lazy["source"] == "test"
+
+        blocks = lazy["blocks"]
+        assert blocks[0]["bbox"] == [10, 20, 300, 80]
+        assert all(isinstance(v, int) for v in blocks[0]["bbox"])
+        assert blocks[1]["bbox"] == [12.5, 90.25, 800.0, 400.75]
+        assert blocks[2].get("label") is None
+        assert blocks[2]["content_truncated"] is True
+        assert blocks[0].get("content_truncated") is None
+
+
+def test_lazy_blocks_are_mapped():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = _write(tmp_dir, "page_3.bin", SAMPLE_PAGE)
+        lazy = read_ocr_page(path, lazy=True)
+        blocks = lazy["blocks"]
+        assert blocks[0]["content"] == SAMPLE_PAGE["blocks"][0]["content"]
+
+        # Closing the mapping keeps decoded strings and fixed fields readable
+        close_lazy_pages([lazy])
+        close_lazy_pages([lazy])
+        assert blocks[0]["content"] == SAMPLE_PAGE["blocks"][0]["content"]
+        assert blocks[1]["bbox"] == SAMPLE_PAGE["blocks"][1]["bbox"]
+        try:
+            blocks[1]["content"]
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("content decoded from a closed mapping")
+
+
+def test_page_close():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = _write(tmp_dir, "page_3.bin", SAMPLE_PAGE)
+        with OcrBinaryPage(path) as page:
+            assert page.as_cache_data(lazy=False) == SAMPLE_PAGE
+        page.close()
+
+        page = OcrBinaryPage(path, use_mmap=False)
+        page.close()
+        assert page.as_cache_data(lazy=False) == SAMPLE_PAGE
+
+
+def test_from_buffer_offset():
+    raw = encode_ocr_page(SAMPLE_PAGE)
+    buf = b"\xff" * 17 + raw + b"\xff" * 5
+    page = OcrBinaryPage.from_buffer(buf, 17, len(raw))
+    assert page.as_cache_data(lazy=False) == SAMPLE_PAGE
+
+
+def test_empty_page():
+    data = {"page_name": "page_1", "image_width": 0, "image_height": 0, "blocks": []}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = _write(tmp_dir, "page_1.bin", data)
+        assert read_ocr_page(path) == data
+
+
+def test_corrupt_files():
+    raw = encode_ocr_page(SAMPLE_PAGE)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        cases = {
+            "truncated header": raw[:10],
+            "truncated records": raw[:60],
+            "bad magic": b"XXXX" + raw[4:],
+        }
+        for label, content in cases.items():
+            path = Path(tmp_dir) / "page_1.bin"
+            path.write_bytes(content)
+            try:
+                read_ocr_page(path)
+            except OcrBinaryError:
+                continue
+            raise AssertionError(f"no OcrBinaryError for {label}")
+
+
+def test_round_trip_bundled_caches():
+    checked = 0
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for exam_dir in sorted(d for d in EXAMS_DIR.iterdir() if (d / "ocr").is_dir()):
+            for page_name, data in load_all_ocr_caches(exam_dir).items():
+                path = _write(tmp_dir, f"{page_name}.bin", data)
+                assert read_ocr_page(path) == data, f"{exam_dir.name}/{page_name}"
+                lazy = read_ocr_page(path, lazy=True)
+                assert [b.to_dict() for b in lazy["blocks"]] == data["blocks"]
+                checked += 1
+    assert checked > 0, "no bundled OCR caches found"
+
+
+def main() -> int:
+    test_round_trip_sample()
+    test_lazy_blocks_are_mapped()
+    test_page_close()
+    test_from_buffer_offset()
+    test_empty_page()
+    test_corrupt_files()
+    test_round_trip_bundled_caches()
+    print("test_ocr_binary: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,126 @@
+"""
+Test that pages served from the in-memory OCR cache keep their whole record.
+
+The memory cache sits in front of every cache format. A page the classifier
+skipped must still carry its skip_reason when it comes back from memory, or
+the OCR quality pass would flag it as a page without text and re-OCR it.
+
+Run with: python tests/test_ocr_cache.py
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.pipeline.impl.ocr_cache import (
+    close_ocr_caches,
+    get_ocr_cache_dir,
+    load_all_ocr_caches,
+    open_ocr_caches,
+    save_ocr_cache,
+)
+from backend.src.services.pipeline.impl.ocr_mem_cache import get_ocr_mem_cache
+from backend.src.services.pipeline.impl.ocr_quality import REASON_NO_TEXT, find_suspicious_pages
+
+FORMATS = ("json", "bin", "pack")
+
+QUESTION_BLOCKS = [
+    {"index": 0, "label": "text", "region_label": None, "bbox": [100, 100, 2000, 180], "content": "1. 下列各项中，说法正确的是"},
+    {"index": 1, "label": "text", "region_label": None, "bbox": [100, 200, 2000, 280], "content": "A. 选项一 B. 选项二 C. 选项三 D. 选项四"},
+]
+
+
+def _set_format(fmt):
+    os.environ["EXAMPAPER_OCR_CACHE_FORMAT"] = fmt
+
+
+def _save_exam(workdir):
+    save_ocr_cache(workdir, "page_1", QUESTION_BLOCKS, (2480, 3508))
+    save_ocr_cache(workdir, "page_2", [], (2480, 3508), source="page_classifier", skip_reason="blank")
+    save_ocr_cache(workdir, "page_3", QUESTION_BLOCKS, (2480, 3508), source="text_layer")
+
+
+def test_skipped_page_is_not_suspicious():
+    for fmt in FORMATS:
+        _set_format(fmt)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            workdir = Path(tmp_dir)
+            _save_exam(workdir)
+            for lazy in (True, False):
+                # save_ocr_cache filled the memory cache, so these loads hit it
+                caches = load_all_ocr_caches(workdir, lazy=lazy)
+                try:
+                    assert caches["page_2"].get("skip_reason") == "blank", (fmt, lazy)
+                    assert caches["page_3"].get("source") == "text_layer", (fmt, lazy)
+                    suspicious = find_suspicious_pages(caches)
+                finally:
+                    close_ocr_caches(caches)
+                assert "page_2" not in suspicious, (fmt, lazy, suspicious)
+
+            # Same result when the pages come from disk
+            get_ocr_mem_cache().clear()
+            with open_ocr_caches(workdir) as caches:
+                assert "page_2" not in find_suspicious_pages(caches), fmt
+
+
+def test_blank_page_without_skip_reason_is_suspicious():
+    _set_format("json")
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workdir = Path(tmp_dir)
+        save_ocr_cache(workdir, "page_1", QUESTION_BLOCKS, (2480, 3508))
+        save_ocr_cache(workdir, "page_2", [], (2480, 3508))
+        suspicious = find_suspicious_pages(load_all_ocr_caches(workdir))
+        assert suspicious.get("page_2") == [REASON_NO_TEXT], suspicious
+
+
+def test_memory_hit_returns_disk_record():
+    for fmt in ("json", "bin"):
+        _set_format(fmt)
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            workdir = Path(tmp_dir)
+            record = {
+                "page_name": "page_1",
+                "image_width": 2480,
+                "image_height": 3508,
+                "blocks": QUESTION_BLOCKS,
+                "source": "reocr",
+                "ocr_width": 1240,
+                "ocr_height": 1754,
+                "ocr_box": [10, 20, 2470, 3500],
+            }
+            cache_dir = get_ocr_cache_dir(workdir)
+            if fmt == "json":
+                (cache_dir / "page_1.json").write_text(json.dumps(record, ensure_ascii=False), encoding="utf-8")
+            else:
+                from backend.src.services.pipeline.impl.ocr_binary import write_ocr_page
+
+                write_ocr_page(cache_dir / "page_1.bin", record)
+
+            assert load_all_ocr_caches(workdir) == {"page_1": record}
+            hits = get_ocr_mem_cache().stats()["hits"]
+            # Second load is served from memory and must be the same record
+            assert load_all_ocr_caches(workdir) == {"page_1": record}
+            assert get_ocr_mem_cache().stats()["hits"] == hits + 1
+
+
+def main() -> int:
+    test_skipped_page_is_not_suspicious()
+    test_blank_page_without_skip_reason_is_suspicious()
+    test_memory_hit_returns_disk_record()
+    print("test_ocr_cache: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,215 @@
+"""
+Test the content-addressed, cross-exam OCR cache.
+
+Keys separate pages by pixel hash, model configuration fingerprint and OCR
+input variant; entries are written atomically and read back whole; corrupt
+entries are dropped; past EXAMPAPER_OCR_GLOBAL_CACHE_MAX_MB the oldest entries
+(by mtime, refreshed on hit) are evicted down to 90% of the limit. A forced
+re-OCR skips the lookup and replaces the entry with its fresh result.
+
+Run with: python tests/test_ocr_global_cache.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.common import DecodedPage
+from backend.src.services.pipeline.impl import ocr_global_cache
+from backend.src.services.pipeline.impl.ocr_cache import run_ocr_with_cache
+from backend.src.services.pipeline.impl.ocr_global_cache import (
+    decoded_page_hash,
+    global_cache_get,
+    global_cache_key,
+    global_cache_put,
+    page_pixel_hash,
+)
+
+BLOCKS = [{"index": 0, "label": "text", "region_label": None, "bbox": [100, 100, 2000, 180], "content": "1. 下列说法正确的是"}]
+SIZE = (2480, 3508)
+
+
+@contextmanager
+def _env(**values):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update({name: value for name, value in values.items() if value is not None})
+    for name, value in values.items():
+        if value is None:
+            os.environ.pop(name, None)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+@contextmanager
+def _cache_dir(max_mb="1024"):
+    with tempfile.TemporaryDirectory() as tmp:
+        with _env(EXAMPAPER_OCR_GLOBAL_CACHE_DIR=tmp, EXAMPAPER_OCR_GLOBAL_CACHE_MAX_MB=max_mb):
+            # The running total is per process; start each test from a fresh scan
+            ocr_global_cache._total_bytes = None
+            try:
+                yield Path(tmp)
+            finally:
+                ocr_global_cache._total_bytes = None
+
+
+def _entries(root):
+    return sorted(root.glob("*/*.json"))
+
+
+def test_pixel_hash_ignores_encoding():
+    arr = np.zeros((40, 30, 3), dtype=np.uint8)
+    arr[10:20, 5:25] = 200
+    img = Image.fromarray(arr, "RGB")
+    page = DecodedPage(np.asarray(img), img.mode, img.width, img.height)
+    assert page_pixel_hash(img) == decoded_page_hash(page)
+
+    arr[0, 0] = 1
+    assert page_pixel_hash(Image.fromarray(arr, "RGB")) != page_pixel_hash(img)
+
+
+def test_key_separates_fingerprint_and_variant():
+    with _cache_dir():
+        with _env(EXAMPAPER_USE_GPU="0", EXAMPAPER_TABLE_PASS=None):
+            cpu = global_cache_key("ab" * 16)
+            scaled = global_cache_key("ab" * 16, "ocr1240x1754")
+            global_cache_put(cpu, BLOCKS, SIZE)
+            assert cpu.startswith("ab" * 16) and scaled.startswith(cpu)
+            # Same pixels, other OCR input: a separate entry
+            assert global_cache_get(scaled) is None
+        with _env(EXAMPAPER_USE_GPU="1"):
+            gpu = global_cache_key("ab" * 16)
+        with _env(EXAMPAPER_USE_GPU="0", EXAMPAPER_TABLE_PASS="conditional"):
+            conditional = global_cache_key("ab" * 16)
+        # Same pixels, other model configuration: other keys, no hit
+        assert len({cpu, gpu, conditional}) == 3
+        assert global_cache_get(gpu) is None and global_cache_get(conditional) is None
+        assert global_cache_get(cpu) == (BLOCKS, SIZE)
+
+
+def test_put_and_get_are_atomic():
+    with _cache_dir() as root:
+        key = global_cache_key("cd" * 16)
+        global_cache_put(key, BLOCKS, SIZE)
+        assert global_cache_get(key) == (BLOCKS, SIZE)
+        assert [p.name for p in _entries(root)] == [f"{key}.json"]
+        assert _entries(root)[0].parent.name == key[:2]
+
+        # Concurrent writers of one key: the reader always sees one whole entry
+        variants = [[dict(BLOCKS[0], content=f"v{i}" * 500)] for i in range(8)]
+        threads = [threading.Thread(target=global_cache_put, args=(key, v, SIZE)) for v in variants]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join(5.0)
+        blocks, size = global_cache_get(key)
+        assert blocks in variants and size == SIZE
+        # No temp files left behind
+        assert [p.name for p in root.rglob("*")] == [key[:2], f"{key}.json"]
+
+
+def test_corrupt_entry_is_dropped():
+    with _cache_dir() as root:
+        key = global_cache_key("ef" * 16)
+        global_cache_put(key, BLOCKS, SIZE)
+        _entries(root)[0].write_text('{"blocks": [', encoding="utf-8")
+        assert global_cache_get(key) is None
+        assert _entries(root) == []
+
+
+def test_evicts_oldest_to_ninety_percent():
+    limit = 1024 * 1024
+    with _cache_dir(max_mb="1") as root:
+        big = [dict(BLOCKS[0], content="x" * 100_000)]
+        keys = [global_cache_key(f"{i:02d}" * 16) for i in range(11)]
+        for i, key in enumerate(keys[:10]):
+            global_cache_put(key, big, SIZE)
+            # Deterministic LRU order: entry i was last used at time 1000 + i
+            path = next(root.glob(f"*/{key}.json"))
+            os.utime(path, (1000 + i, 1000 + i))
+        assert len(_entries(root)) == 10
+        # A hit refreshes the oldest entry
+        assert global_cache_get(keys[0]) is not None
+
+        global_cache_put(keys[10], big, SIZE)
+        remaining = {p.stem for p in _entries(root)}
+        total = sum(p.stat().st_size for p in _entries(root))
+        assert total <= int(limit * 0.9), total
+        assert keys[0] in remaining and keys[10] in remaining
+        # The least recently used entries went first
+        assert keys[1] not in remaining and keys[2] not in remaining
+        assert set(keys[3:10]) <= remaining
+        assert ocr_global_cache._total_bytes == total
+
+
+class _Pipeline:
+    """Returns one text block with the given content; counts predict calls."""
+
+    def __init__(self, content):
+        self.content = content
+        self.calls = 0
+
+    def predict(self, input):
+        self.calls += 1
+        return [{"parsing_res_list": [{"label": "text", "bbox": [10, 10, 50, 20], "content": self.content}]}]
+
+
+def test_force_skips_lookup_and_refreshes_entry():
+    arr = np.full((80, 60, 3), 255, dtype=np.uint8)
+    arr[20:40, 10:50] = 0
+    # Path input (PIL hash) and decoded input (trimming needs the pixels)
+    for trim in ("0", "1"):
+        with _cache_dir(), tempfile.TemporaryDirectory() as exams:
+            with _env(EXAMPAPER_OCR_GLOBAL_CACHE="1", EXAMPAPER_OCR_TRIM=trim):
+
+                def run(exam, pipeline, force=False):
+                    workdir = Path(exams) / exam
+                    workdir.mkdir()
+                    Image.fromarray(arr, "RGB").save(workdir / "page_1.png")
+                    blocks, _ = run_ocr_with_cache(pipeline, workdir / "page_1.png", workdir, force=force)
+                    return [b["content"] for b in blocks]
+
+                assert run("a", _Pipeline("old")) == ["old"]
+                # Same pixels in another exam: served from the global cache
+                cached = _Pipeline("unused")
+                assert run("b", cached) == ["old"] and cached.calls == 0
+
+                fresh = _Pipeline("new")
+                assert run("c", fresh, force=True) == ["new"] and fresh.calls == 1, trim
+                # The forced result replaced the entry
+                assert run("d", _Pipeline("unused")) == ["new"], trim
+
+
+def main() -> int:
+    test_pixel_hash_ignores_encoding()
+    test_key_separates_fingerprint_and_variant()
+    test_put_and_get_are_atomic()
+    test_corrupt_entry_is_dropped()
+    test_evicts_oldest_to_ninety_percent()
+    test_force_skips_lookup_and_refreshes_entry()
+    print("test_ocr_global_cache: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
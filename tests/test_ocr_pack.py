@@ -0,0 +1,268 @@
+"""
+Test the single-file OCR store (ocr/pages.pack).
+
+Covers writing into a fresh workdir (no ocr/ directory yet), slot ordering
+(page N lives in slot N-1 whatever the write order), rewrites, slot growth
+and dead-data compaction via rebuild, and torn-write recovery: a record
+whose bytes or crc do not match its slot is treated as a missing page
+instead of failing the whole load. Readers take a shared lock: they do not
+block each other, only writers wait for them.
+
+Run with: python tests/test_ocr_pack.py
+"""
+
+import io
+import os
+import sys
+import tempfile
+import threading
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.pipeline.impl import ocr_pack
+from backend.src.services.pipeline.impl.ocr_binary import encode_ocr_page
+from backend.src.services.pipeline.impl.ocr_pack import (
+    get_pack_path,
+    pack_load_all,
+    pack_load_page,
+    pack_remove_page,
+    pack_set_expected_pages,
+    pack_write_page,
+    read_pack_index,
+)
+
+
+def _page(page_no, text="", n_blocks=2):
+    return {
+        "page_name": f"page_{page_no}",
+        "image_width": 1000,
+        "image_height": 1400,
+        "blocks": [
+            {
+                "index": i,
+                "label": "text",
+                "region_label": None,
+                "bbox": [0, i * 10, 100, i * 10 + 8],
+                "content": f"{page_no}.{i} {text}",
+            }
+            for i in range(n_blocks)
+        ],
+    }
+
+
+def _write(workdir, page_no, text="", n_blocks=2):
+    data = _page(page_no, text, n_blocks)
+    pack_write_page(workdir, f"page_{page_no}", encode_ocr_page(data))
+    return data
+
+
+def test_fresh_workdir():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        # Neither the workdir nor its ocr/ directory exists before the first write
+        workdir = Path(tmp_dir) / "exam"
+        data = _write(workdir, 1)
+        assert get_pack_path(workdir).is_file()
+        assert pack_load_page(workdir, "page_1") == data
+
+        other = Path(tmp_dir) / "other"
+        pack_set_expected_pages(other, 3)
+        index = read_pack_index(other)
+        assert index.expected_pages == 3 and index.done_pages() == set()
+
+
+def test_slot_order():
+    with tempfile.TemporaryDirectory() as workdir:
+        expected = {}
+        for page_no in (5, 1, 3, 2, 4):
+            expected[f"page_{page_no}"] = _write(workdir, page_no)
+
+        index = read_pack_index(workdir)
+        assert index.done_pages() == set(expected)
+        # Records are appended in write order, slots follow page numbers
+        offsets = {n: slot[0] for n, slot in index.slots.items()}
+        assert offsets[5] < offsets[1] < offsets[3] < offsets[2] < offsets[4]
+
+        assert pack_load_all(workdir) == expected
+        for page_name, data in expected.items():
+            assert pack_load_page(workdir, page_name) == data
+        assert pack_load_page(workdir, "page_6") is None
+
+        lazy = pack_load_all(workdir, lazy=True)
+        assert lazy["page_3"]["blocks"][1]["content"] == "3.1 "
+
+
+def test_rewrite_and_remove():
+    with tempfile.TemporaryDirectory() as workdir:
+        _write(workdir, 1, "old")
+        new = _write(workdir, 1, "new")
+        _write(workdir, 2)
+        assert pack_load_page(workdir, "page_1") == new
+
+        pack_remove_page(workdir, "page_2")
+        assert read_pack_index(workdir).done_pages() == {"page_1"}
+        assert set(pack_load_all(workdir)) == {"page_1"}
+
+
+def test_expected_pages():
+    with tempfile.TemporaryDirectory() as workdir:
+        assert read_pack_index(workdir) is None
+        pack_set_expected_pages(workdir, 12)
+        _write(workdir, 1)
+        pack_set_expected_pages(workdir, 14)
+        index = read_pack_index(workdir)
+        assert index.expected_pages == 14
+        assert index.done_pages() == {"page_1"}
+
+
+def test_rebuild_grows_slots():
+    with tempfile.TemporaryDirectory() as workdir:
+        expected = {f"page_{n}": _write(workdir, n) for n in (1, 2, 3)}
+        n_slots = read_pack_index(workdir).n_slots
+        page_no = n_slots + 7
+        expected[f"page_{page_no}"] = _write(workdir, page_no)
+
+        index = read_pack_index(workdir)
+        assert index.n_slots >= page_no
+        assert pack_load_all(workdir) == expected
+
+
+def test_rebuild_drops_dead_data():
+    with tempfile.TemporaryDirectory() as workdir:
+        _write(workdir, 2)
+        big = 4000
+        for i in range(6):
+            last = _write(workdir, 1, f"rev{i}" + "x" * 100, n_blocks=big)
+        size_before = os.path.getsize(get_pack_path(workdir))
+        live = sum(length for _, length, _ in read_pack_index(workdir).slots.values())
+        # At most one dead copy of page_1 plus the header/index survives a rebuild
+        assert size_before < 3 * live, (size_before, live)
+        assert pack_load_page(workdir, "page_1") == last
+        assert set(pack_load_all(workdir)) == {"page_1", "page_2"}
+
+
+def test_torn_record_is_missing():
+    with tempfile.TemporaryDirectory() as workdir:
+        _write(workdir, 1)
+        good = _write(workdir, 2)
+        _write(workdir, 3)
+        pack_path = get_pack_path(workdir)
+        offset, length, _crc = read_pack_index(workdir).slots[1]
+
+        # Flip bytes in page_1's record: the crc no longer matches
+        raw = bytearray(pack_path.read_bytes())
+        raw[offset + length // 2] ^= 0xFF
+        pack_path.write_bytes(bytes(raw))
+
+        assert pack_load_page(workdir, "page_1") is None
+        assert pack_load_page(workdir, "page_2") == good
+        assert set(pack_load_all(workdir)) == {"page_2", "page_3"}
+
+
+def test_slot_past_end_is_missing():
+    with tempfile.TemporaryDirectory() as workdir:
+        good = _write(workdir, 1)
+        _write(workdir, 2)
+        pack_path = get_pack_path(workdir)
+        offset, length, _crc = read_pack_index(workdir).slots[2]
+
+        # Crash after the slot update but before the record reached the disk
+        with pack_path.open("r+b") as f:
+            f.truncate(offset + length // 2)
+
+        assert pack_load_page(workdir, "page_2") is None
+        assert pack_load_all(workdir) == {"page_1": good}
+
+        # The next write of that page recovers it
+        again = _write(workdir, 2, "again")
+        assert pack_load_all(workdir) == {"page_1": good, "page_2": again}
+
+
+def test_bad_header():
+    with tempfile.TemporaryDirectory() as workdir:
+        _write(workdir, 1)
+        pack_path = get_pack_path(workdir)
+        pack_path.write_bytes(b"XXXX" + pack_path.read_bytes()[4:])
+        assert read_pack_index(workdir) is None
+        assert pack_load_page(workdir, "page_1") is None
+        assert pack_load_all(workdir) == {}
+
+
+def test_invalid_page_name():
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            pack_write_page(workdir, "cover", b"")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("invalid page name accepted")
+        assert not get_pack_path(workdir).exists()
+
+
+def test_readers_do_not_block_each_other():
+    with tempfile.TemporaryDirectory() as workdir:
+        first = _write(workdir, 1)
+        pack_path = get_pack_path(workdir)
+        results = {}
+
+        def read():
+            results["page"] = pack_load_page(workdir, "page_1")
+            results["all"] = pack_load_all(workdir)
+            results["index"] = read_pack_index(workdir)
+
+        # Another reader holds the lock: reads still go through
+        with ocr_pack._read_lock(pack_path):
+            reader = threading.Thread(target=read)
+            reader.start()
+            reader.join(2.0)
+            assert not reader.is_alive(), "reader blocked by another reader"
+            assert results["page"] == first and results["all"] == {"page_1": first}
+            assert results["index"].done_pages() == {"page_1"}
+
+            # A writer waits until the reader is done
+            writer = threading.Thread(target=_write, args=(workdir, 2))
+            writer.start()
+            writer.join(0.2)
+            assert writer.is_alive(), "writer did not wait for the reader"
+        writer.join(2.0)
+        assert not writer.is_alive()
+        assert set(pack_load_all(workdir)) == {"page_1", "page_2"}
+
+
+def test_read_without_lock_file():
+    with tempfile.TemporaryDirectory() as workdir:
+        data = _write(workdir, 1)
+        lock_path = get_pack_path(workdir).with_name("pages.pack.lock")
+        lock_path.unlink()
+        # A read-only copy of the store: reading does not create the lock file
+        assert pack_load_page(workdir, "page_1") == data
+        assert pack_load_all(workdir) == {"page_1": data}
+        assert read_pack_index(workdir).done_pages() == {"page_1"}
+        assert not lock_path.exists()
+
+
+def main() -> int:
+    test_fresh_workdir()
+    test_slot_order()
+    test_rewrite_and_remove()
+    test_expected_pages()
+    test_rebuild_grows_slots()
+    test_rebuild_drops_dead_data()
+    test_torn_record_is_missing()
+    test_slot_past_end_is_missing()
+    test_bad_header()
+    test_invalid_page_name()
+    test_readers_do_not_block_each_other()
+    test_read_without_lock_file()
+    print("test_ocr_pack: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
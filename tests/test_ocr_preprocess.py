@@ -0,0 +1,158 @@
+"""
+Test the OCR input transform (reduced OCR DPI and trimmed margins) and the
+mapping of OCR bboxes back to page coordinates.
+
+Covers the identity transform, scale only, crop only, crop plus scale (page box
+-> OCR box -> page box round trip), clamping at the page edge, the cache
+variant / cache fields that tell transformed results apart, and
+find_content_box on blank pages and on pages where trimming gains too little.
+
+Run with: python tests/test_ocr_preprocess.py
+"""
+
+import io
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.common import DecodedPage
+from backend.src.services.pipeline.impl.ocr_preprocess import OcrInputTransform, find_content_box
+
+# A4 at 300 DPI
+PAGE = (2480, 3508)
+
+
+def _page(width, height, ink=()):
+    """White RGB page with black rectangles (x1, y1, x2, y2)."""
+    arr = np.full((height, width, 3), 255, dtype=np.uint8)
+    for x1, y1, x2, y2 in ink:
+        arr[y1:y2, x1:x2] = 0
+    return DecodedPage(arr, "RGB", width, height)
+
+
+def test_identity():
+    for t in (OcrInputTransform.identity(PAGE), OcrInputTransform.for_page(PAGE, ocr_dpi=0),
+              OcrInputTransform.for_page(PAGE, ocr_dpi=300), OcrInputTransform.for_page(PAGE, ocr_dpi=600)):
+        assert t.is_identity and not t.is_cropped
+        assert t.ocr_size == PAGE and t.content_box == (0, 0) + PAGE
+        assert t.cache_variant == "" and t.cache_fields() == {}
+        assert t.to_page_box([10, 20, 30, 40]) == [10, 20, 30, 40]
+
+    page = _page(60, 80)
+    t = OcrInputTransform.for_page((60, 80), ocr_dpi=0)
+    assert t.prepare(page) is page
+    blocks = [{"bbox": [1, 2, 3, 4]}]
+    assert t.to_page_blocks(blocks) is blocks and blocks[0]["bbox"] == [1, 2, 3, 4]
+
+
+def test_scale_only():
+    t = OcrInputTransform.for_page(PAGE, ocr_dpi=150)
+    assert not t.is_identity and not t.is_cropped
+    assert t.ocr_size == (1240, 1754)
+    assert t.cache_variant == "ocr1240x1754"
+    assert t.cache_fields() == {"ocr_width": 1240, "ocr_height": 1754}
+    assert t.to_page_box([100, 200, 300, 401]) == [200, 400, 600, 802]
+
+    small = t.prepare(_page(*PAGE))
+    assert (small.width, small.height) == (1240, 1754)
+    assert small.array.shape == (1754, 1240, 3)
+
+
+def test_crop_only():
+    box = (100, 200, 2300, 3300)
+    t = OcrInputTransform.for_page(PAGE, ocr_dpi=0, content_box=box)
+    assert t.is_cropped and not t.is_identity
+    assert t.ocr_size == t.content_size == (2200, 3100)
+    assert t.cache_variant == "box100_200_2300_3300"
+    assert t.cache_fields() == {"ocr_width": 2200, "ocr_height": 3100, "ocr_box": list(box)}
+    assert t.to_page_box([0, 0, 50, 60]) == [100, 200, 150, 260]
+
+    page = _page(*PAGE)
+    cropped = t.prepare(page)
+    assert (cropped.width, cropped.height) == (2200, 3100)
+    # Crop only: a view on the page pixels, no copy
+    assert np.shares_memory(cropped.array, page.array)
+
+
+def test_crop_and_scale_round_trip():
+    box = (100, 200, 2300, 3300)
+    t = OcrInputTransform.for_page(PAGE, ocr_dpi=150, content_box=box)
+    assert t.ocr_size == (1100, 1550)
+    assert t.cache_variant == "box100_200_2300_3300-ocr1100x1550"
+
+    page_box = [500, 600, 900, 1000]
+    ocr_box = [(page_box[0] - 100) / 2, (page_box[1] - 200) / 2, (page_box[2] - 100) / 2, (page_box[3] - 200) / 2]
+    assert t.to_page_box(ocr_box) == page_box
+
+    # Fractional OCR boxes are rounded outward: the page box covers the OCR box
+    x1, y1, x2, y2 = t.to_page_box([10.4, 10.6, 20.2, 20.7])
+    assert (x1, y1, x2, y2) == (120, 221, 141, 242)
+
+    blocks = t.to_page_blocks([{"bbox": ocr_box}, {"bbox": None}])
+    assert blocks[0]["bbox"] == page_box and blocks[1]["bbox"] is None
+
+    small = t.prepare(_page(*PAGE, ink=[(100, 200, 2300, 3300)]))
+    assert small.array.shape == (1550, 1100, 3)
+    # Everything inside the content box is ink: the scaled crop is all black
+    assert int(small.array.max()) == 0
+
+
+def test_clamps_to_page_edge():
+    t = OcrInputTransform.for_page(PAGE, ocr_dpi=150)
+    assert t.to_page_box([1200, 1700, 1300, 1800]) == [2400, 3400, 2480, 3508]
+
+    t = OcrInputTransform.for_page(PAGE, ocr_dpi=150, content_box=(100, 200, 2480, 3508))
+    x1, y1, x2, y2 = t.to_page_box([0, 0, 5000, 5000])
+    assert (x1, y1) == (100, 200) and (x2, y2) == PAGE
+
+
+def test_find_content_box():
+    assert find_content_box(_page(600, 800)) is None
+
+    # Ink in opposite corners: the content box is almost the whole page
+    assert find_content_box(_page(600, 800, ink=[(0, 0, 40, 40), (560, 760, 600, 800)])) is None
+
+    # Ink in the middle: its box plus the padding
+    assert find_content_box(_page(600, 800, ink=[(200, 300, 400, 500)])) == (184, 284, 416, 516)
+
+
+def test_for_decoded_page_trims_when_enabled():
+    page = _page(600, 800, ink=[(200, 300, 400, 500)])
+    saved = os.environ.get("EXAMPAPER_OCR_TRIM")
+    try:
+        os.environ["EXAMPAPER_OCR_TRIM"] = "1"
+        t = OcrInputTransform.for_decoded_page(page, ocr_dpi=0)
+        assert t.content_box == (184, 284, 416, 516)
+        os.environ["EXAMPAPER_OCR_TRIM"] = "0"
+        assert OcrInputTransform.for_decoded_page(page, ocr_dpi=0).is_identity
+    finally:
+        if saved is None:
+            os.environ.pop("EXAMPAPER_OCR_TRIM", None)
+        else:
+            os.environ["EXAMPAPER_OCR_TRIM"] = saved
+
+
+def main() -> int:
+    test_identity()
+    test_scale_only()
+    test_crop_only()
+    test_crop_and_scale_round_trip()
+    test_clamps_to_page_edge()
+    test_find_content_box()
+    test_for_decoded_page_trims_when_enabled()
+    print("test_ocr_preprocess: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
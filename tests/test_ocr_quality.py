@@ -0,0 +1,116 @@
+"""
+Test the OCR quality pass (high-accuracy re-OCR of suspicious pages).
+
+ocr_quality.json must be written after every page, so a pass that stops
+halfway keeps the pages it already re-OCRed. reocr_page retries with the
+image path only when the pipeline rejects the array input, not on other
+errors.
+
+Run with: python tests/test_ocr_quality.py
+"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from PIL import Image
+
+from backend.src.services.pipeline.impl.ocr_cache import save_ocr_cache
+from backend.src.services.pipeline.impl.ocr_quality import (
+    load_quality_report,
+    reocr_page,
+    run_ocr_quality_pass,
+)
+
+QUESTION_BLOCKS = [
+    {"index": 0, "label": "text", "region_label": None, "bbox": [10, 10, 90, 20], "content": "1. 下列各项中，说法正确的是哪一项呢"},
+    {"index": 1, "label": "text", "region_label": None, "bbox": [10, 30, 90, 40], "content": "A. 选项一 B. 选项二 C. 选项三 D. 选项四"},
+]
+
+
+class _Pipeline:
+    """Returns QUESTION_BLOCKS; can reject array input or fail outright."""
+
+    def __init__(self, reject_arrays=None, error=None):
+        self.reject_arrays = reject_arrays
+        self.error = error
+        self.inputs = []
+
+    def predict(self, input):
+        self.inputs.append(type(input).__name__)
+        if self.error is not None:
+            raise self.error
+        if self.reject_arrays is not None and not isinstance(input, str):
+            raise self.reject_arrays
+        return [{"parsing_res_list": [dict(b) for b in QUESTION_BLOCKS]}]
+
+
+def _exam(tmp_dir, pages=3):
+    workdir = Path(tmp_dir)
+    for n in range(1, pages + 1):
+        Image.new("RGB", (100, 140), "white").save(workdir / f"page_{n}.png")
+        blocks = QUESTION_BLOCKS if n == 1 else []
+        save_ocr_cache(workdir, f"page_{n}", blocks, (100, 140))
+    return workdir
+
+
+def test_report_written_per_page():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        workdir = _exam(tmp_dir)
+
+        def on_page_updated(img_path):
+            raise RuntimeError(f"refresh failed: {img_path.stem}")
+
+        try:
+            run_ocr_quality_pass(workdir, _Pipeline, on_page_updated=on_page_updated)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("refresh error swallowed")
+
+        pages = load_quality_report(workdir)["pages"]
+        assert list(pages) == ["page_2"], pages
+        assert pages["page_2"]["accepted"] is True
+
+        # The next run picks up where the first one stopped
+        updated = run_ocr_quality_pass(workdir, _Pipeline)
+        assert updated == ["page_3"], updated
+        assert set(load_quality_report(workdir)["pages"]) == {"page_2", "page_3"}
+
+
+def test_reocr_path_fallback():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        img_path = _exam(tmp_dir, pages=1) / "page_1.png"
+
+        pipeline = _Pipeline(reject_arrays=TypeError("unsupported input type"))
+        assert [b["content"] for b in reocr_page(pipeline, img_path)] == [b["content"] for b in QUESTION_BLOCKS]
+        assert pipeline.inputs == ["ndarray", "str"], pipeline.inputs
+
+        pipeline = _Pipeline(error=RuntimeError("out of memory"))
+        try:
+            reocr_page(pipeline, img_path)
+        except RuntimeError:
+            pass
+        else:
+            raise AssertionError("predict error swallowed")
+        assert pipeline.inputs == ["ndarray"], pipeline.inputs
+
+
+def main() -> int:
+    test_report_written_per_page()
+    test_reocr_path_fallback()
+    print("test_ocr_quality: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
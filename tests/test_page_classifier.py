@@ -0,0 +1,109 @@
+"""
+Test the blank / non-question page classifier on the bundled exam pages.
+
+Every page of the exams under pdf_images/ that has question heads in its OCR
+cache must go to OCR, and the bundled blank pages (no layout blocks at all)
+must be skipped; synthetic blank, header-only and answer-sheet pages must be
+skipped too.
+
+Run with: python tests/test_page_classifier.py
+"""
+
+import io
+import sys
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+
+from backend.src.common import QUESTION_HEAD_PATTERN, DecodedPage, decode_page_image
+from backend.src.services.pipeline.impl.ocr_cache import load_all_ocr_caches
+from backend.src.services.pipeline.impl.page_classifier import (
+    SKIP_BLANK,
+    SKIP_NON_QUESTION,
+    classify_page_pixels,
+    classify_page_text,
+)
+
+EXAMS_DIR = PROJECT_ROOT / "pdf_images"
+PAGE_W, PAGE_H = 2480, 3508
+
+
+def _bundled_pages():
+    """(image path, page text, has question heads, block count) for every cached bundled page."""
+    for exam_dir in sorted(d for d in EXAMS_DIR.iterdir() if (d / "ocr").is_dir()):
+        for page_name, data in sorted(load_all_ocr_caches(exam_dir).items()):
+            img_path = exam_dir / f"{page_name}.png"
+            if not img_path.is_file():
+                continue
+            texts = [b.get("content") or "" for b in data.get("blocks", []) if b.get("label") == "text"]
+            has_heads = any(QUESTION_HEAD_PATTERN.search(t.strip()) for t in texts)
+            yield img_path, "\n".join(texts), has_heads, len(data.get("blocks", []))
+
+
+def _page(array: np.ndarray) -> DecodedPage:
+    return DecodedPage(array, "RGB", array.shape[1], array.shape[0])
+
+
+def test_bundled_pages():
+    kept = blank = 0
+    for img_path, text, has_heads, n_blocks in _bundled_pages():
+        verdict = classify_page_pixels(decode_page_image(img_path))
+        if has_heads:
+            assert verdict.skip_reason is None, (img_path, verdict)
+            assert classify_page_text(text) is None, img_path
+            kept += 1
+        elif n_blocks == 0:
+            assert verdict.skip_reason == SKIP_BLANK, (img_path, verdict)
+            blank += 1
+    assert kept > 0 and blank > 0, "no bundled exam pages found"
+
+
+def test_blank_and_header_only_pages_are_skipped():
+    white = np.full((PAGE_H, PAGE_W, 3), 255, dtype=np.uint8)
+    assert classify_page_pixels(_page(white)).skip_reason == SKIP_BLANK
+
+    # Scan shadow along the edge only
+    shadow = white.copy()
+    shadow[:, :40] = 30
+    assert classify_page_pixels(_page(shadow)).skip_reason == SKIP_BLANK
+
+    # A header line and a page number
+    back = white.copy()
+    back[200:224, 700:1700] = 0
+    back[3300:3324, 1200:1260] = 0
+    verdict = classify_page_pixels(_page(back))
+    assert verdict.skip_reason == SKIP_BLANK and verdict.ink_bands == 2, verdict
+
+    # Same page with a few lines of body text is kept
+    body = back.copy()
+    for y in range(600, 1400, 120):
+        body[y : y + 40, 300:2200] = 0
+    assert classify_page_pixels(_page(body)).skip_reason is None
+
+
+def test_page_text():
+    assert classify_page_text("答题卡\n准考证号 填涂样例") == SKIP_NON_QUESTION
+    assert classify_page_text("考 生 须 知：请在规定位置作答") == SKIP_NON_QUESTION
+    # Question heads win over keywords
+    assert classify_page_text("注意事项\n1．下列说法正确的是") is None
+    assert classify_page_text("") is None
+
+
+def main() -> int:
+    test_bundled_pages()
+    test_blank_and_header_only_pages_are_skipped()
+    test_page_text()
+    print("test_page_classifier: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
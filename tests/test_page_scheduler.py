@@ -0,0 +1,282 @@
+"""
+Test the process-wide OCR page scheduler.
+
+Grant order is checked deterministically: with one slot held by the test,
+every task queues its pages first, then the slot is released one page at a
+time and the order in which the workers get it is recorded. Covers weighted
+fairness, round-robin, interactive-before-bulk lanes, newcomers joining at
+the lane's virtual time, timeouts, the TaskSlot semaphore view and the
+provider handing out scheduler slots when the scheduler is enabled, with the
+task's scheduler_weight from the step context.
+
+Run with: python tests/test_page_scheduler.py
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.models.page_scheduler import (
+    LANE_BULK,
+    LANE_INTERACTIVE,
+    POLICY_ROUND_ROBIN,
+    POLICY_WEIGHTED,
+    PageScheduler,
+    TaskSlot,
+)
+from backend.src.services.models.model_provider import PPStructureProvider
+from backend.src.services.pipeline.contracts import StepContext
+from backend.src.services.pipeline.steps.extract_questions import ExtractQuestionsStep
+
+HOLDER = "__holder__"
+
+
+class _Run:
+    """Queue pages of several tasks behind a held slot, then record the grant order."""
+
+    def __init__(self, scheduler):
+        self.scheduler = scheduler
+        self.order = []
+        self._granted = threading.Semaphore(0)
+        self._threads = []
+        assert scheduler.acquire(HOLDER)
+
+    def queue(self, task_id, pages, lane=LANE_BULK, weight=1.0):
+        for _ in range(pages):
+            before = self._queued()
+            t = threading.Thread(target=self._worker, args=(task_id, lane, weight), daemon=True)
+            t.start()
+            self._threads.append(t)
+            # Wait until the page is queued so queue order is deterministic
+            self._wait(lambda: self._queued() > before)
+
+    def _queued(self):
+        return sum(t["queued"] for t in self.scheduler.stats()["tasks"])
+
+    def _wait(self, cond, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not cond():
+            assert time.monotonic() < deadline, "scheduler did not make progress"
+            time.sleep(0.001)
+
+    def _worker(self, task_id, lane, weight):
+        assert self.scheduler.acquire(task_id, lane, weight)
+        self.order.append(task_id)
+        self._granted.release()
+
+    def drain(self, pages=None):
+        """Release the held slot and pass it along one granted page at a time."""
+        if not self.order:
+            self.scheduler.release(HOLDER)
+        total = len(self._threads) - len(self.order) if pages is None else pages
+        for _ in range(total):
+            assert self._granted.acquire(timeout=5.0), "page never granted"
+            self.scheduler.release(self.order[-1])
+        return list(self.order)
+
+    def join(self):
+        for t in self._threads:
+            t.join(5.0)
+
+
+def test_weighted_fairness():
+    run = _Run(PageScheduler(slots=1, policy=POLICY_WEIGHTED))
+    run.queue("heavy", 12, weight=3.0)
+    run.queue("light", 12, weight=1.0)
+    order = run.drain(16)
+
+    # Shares follow the weights (3:1) while both tasks are backlogged
+    assert order.count("heavy") == 12 and order.count("light") == 4, order
+    for n in range(4, 17, 4):
+        prefix = order[:n]
+        assert prefix.count("heavy") == 3 * prefix.count("light"), order
+
+    # Once the heavy task is done the light one gets every slot
+    order = run.drain()
+    run.join()
+    assert order[16:] == ["light"] * 8, order
+
+
+def test_equal_weights_alternate():
+    run = _Run(PageScheduler(slots=1, policy=POLICY_WEIGHTED))
+    run.queue("a", 5)
+    run.queue("b", 5)
+    order = run.drain()
+    run.join()
+    assert order == ["a", "b"] * 5, order
+
+
+def test_round_robin_ignores_weight():
+    run = _Run(PageScheduler(slots=1, policy=POLICY_ROUND_ROBIN))
+    run.queue("a", 4, weight=5.0)
+    run.queue("b", 4)
+    run.queue("c", 4)
+    order = run.drain()
+    run.join()
+    assert order == ["a", "b", "c"] * 4, order
+
+
+def test_interactive_lane_first():
+    run = _Run(PageScheduler(slots=1, policy=POLICY_WEIGHTED))
+    run.queue("import", 6, lane=LANE_BULK, weight=10.0)
+    run.queue("manual", 3, lane=LANE_INTERACTIVE)
+    order = run.drain()
+    run.join()
+    assert order == ["manual"] * 3 + ["import"] * 6, order
+
+
+def test_newcomer_starts_at_lane_vtime():
+    scheduler = PageScheduler(slots=1, policy=POLICY_WEIGHTED)
+    # "old" already served many pages; a newcomer must not get a catch-up burst
+    for _ in range(20):
+        assert scheduler.acquire("old")
+        scheduler.release("old")
+    run = _Run(scheduler)
+    run.queue("old", 4)
+    run.queue("new", 4)
+    order = run.drain()
+    run.join()
+    assert order[:4].count("new") == 2, order
+
+
+def test_timeout_and_finish_task():
+    scheduler = PageScheduler(slots=1)
+    assert scheduler.acquire("a")
+    start = time.monotonic()
+    assert not scheduler.acquire("b", timeout=0.05)
+    assert time.monotonic() - start < 2.0
+    stats = scheduler.stats()
+    assert stats["free"] == 0 and stats["queued"][LANE_BULK] == 0
+
+    scheduler.release("a")
+    slot = scheduler.slot("b")
+    assert slot.acquire(blocking=False)
+    assert not scheduler.slot("c").acquire(blocking=False)
+    slot.release()
+
+    for task_id in ("a", "b", "c"):
+        scheduler.finish_task(task_id)
+    stats = scheduler.stats()
+    assert stats["tasks"] == [] and stats["free"] == 1
+    assert stats["granted_total"] == 2
+
+
+def test_task_slot_limits_concurrency():
+    scheduler = PageScheduler(slots=2)
+    active = []
+    peak = [0]
+    lock = threading.Lock()
+
+    def worker(task_id):
+        for _ in range(5):
+            with scheduler.slot(task_id):
+                with lock:
+                    active.append(task_id)
+                    peak[0] = max(peak[0], len(active))
+                time.sleep(0.002)
+                with lock:
+                    active.remove(task_id)
+
+    threads = [threading.Thread(target=worker, args=(f"t{i % 3}",)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(10.0)
+    assert peak[0] <= 2
+    assert scheduler.stats()["granted_total"] == 30
+    assert scheduler.stats()["free"] == 2
+
+
+def test_invalid_arguments():
+    for make in (
+        lambda: PageScheduler(policy="fifo"),
+        lambda: PageScheduler().slot("a", lane="urgent"),
+        lambda: PageScheduler().acquire("a", lane="urgent"),
+    ):
+        try:
+            make()
+        except ValueError:
+            continue
+        raise AssertionError("invalid argument accepted")
+
+
+def test_provider_slot_uses_scheduler():
+    saved = os.environ.get("EXAMPAPER_PAGE_SCHEDULER")
+    try:
+        os.environ["EXAMPAPER_PAGE_SCHEDULER"] = "1"
+        scheduler = PPStructureProvider.get_page_scheduler()
+        slot = PPStructureProvider.get_gpu_semaphore("task-a", lane=LANE_INTERACTIVE)
+        assert isinstance(slot, TaskSlot) and slot.lane == LANE_INTERACTIVE and slot.weight == 1.0
+        # Untagged callers draw from the same slots as the tasks
+        shared = PPStructureProvider.get_gpu_semaphore()
+        granted = scheduler.stats()["granted_total"]
+        for handle in (slot, shared):
+            with handle:
+                pass
+        assert scheduler.stats()["granted_total"] == granted + 2
+
+        os.environ["EXAMPAPER_PAGE_SCHEDULER"] = "0"
+        assert not isinstance(PPStructureProvider.get_gpu_semaphore("task-a"), TaskSlot)
+    finally:
+        if saved is None:
+            os.environ.pop("EXAMPAPER_PAGE_SCHEDULER", None)
+        else:
+            os.environ["EXAMPAPER_PAGE_SCHEDULER"] = saved
+
+
+def test_step_slot_carries_task_weight():
+    saved = os.environ.get("EXAMPAPER_PAGE_SCHEDULER")
+    try:
+        os.environ["EXAMPAPER_PAGE_SCHEDULER"] = "1"
+        step = ExtractQuestionsStep(PPStructureProvider)
+
+        def ctx(task_id, **metadata):
+            return StepContext(task_id=task_id, pdf_path="x.pdf", workdir=".", metadata=metadata)
+
+        slot = step._gpu_slot(ctx("task-heavy", mode="auto", scheduler_weight=3.0))
+        assert slot.lane == LANE_BULK and slot.weight == 3.0
+        # No weight, or a bad one, falls back to an equal share
+        assert step._gpu_slot(ctx("task-plain", mode="auto")).weight == 1.0
+        assert step._gpu_slot(ctx("task-bad", scheduler_weight="heavy")).weight == 1.0
+
+        # The weight reaches the scheduler with the task's first page
+        with slot:
+            pass
+        tasks = {t["task_id"]: t for t in PPStructureProvider.get_page_scheduler().stats()["tasks"]}
+        assert tasks["task-heavy"]["weight"] == 3.0
+        PPStructureProvider.get_page_scheduler().finish_task("task-heavy")
+    finally:
+        if saved is None:
+            os.environ.pop("EXAMPAPER_PAGE_SCHEDULER", None)
+        else:
+            os.environ["EXAMPAPER_PAGE_SCHEDULER"] = saved
+
+
+def main() -> int:
+    test_weighted_fairness()
+    test_equal_weights_alternate()
+    test_round_robin_ignores_weight()
+    test_interactive_lane_first()
+    test_newcomer_starts_at_lane_vtime()
+    test_timeout_and_finish_task()
+    test_task_slot_limits_concurrency()
+    test_invalid_arguments()
+    test_provider_slot_uses_scheduler()
+    test_step_slot_carries_task_weight()
+    print("test_page_scheduler: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
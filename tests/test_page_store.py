@@ -0,0 +1,103 @@
+"""
+Test raw page reads (page_N.raw) used by the crop stages.
+
+RawPage.view() is a read-only view over the mapping, RawPage.crop() must give
+the same pixels as cropping the decoded PNG (including boxes that reach past
+the page edge), and open_page_for_crops falls back to the PNG.
+
+Run with: python tests/test_page_store.py
+"""
+
+import io
+import sys
+import tempfile
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import numpy as np
+from PIL import Image
+
+from backend.src.common.page_store import (
+    RawPage,
+    open_page_for_crops,
+    open_raw_page,
+    raw_path_for,
+    write_raw_page,
+)
+
+BOXES = [
+    (0, 0, 40, 30),
+    (5, 7, 33, 21),
+    (0, 10, 40, 11),
+    (-4, -3, 12, 9),
+    (30, 20, 52, 41),
+    (10, 10, 10, 20),
+]
+
+
+def _page(channels):
+    rng = np.random.default_rng(channels)
+    shape = (30, 40) if channels == 1 else (30, 40, channels)
+    return rng.integers(0, 256, size=shape, dtype=np.uint8)
+
+
+def _write(tmp_dir, pixels):
+    png = Path(tmp_dir) / "page_1.png"
+    Image.fromarray(pixels).save(png)
+    channels = 1 if pixels.ndim == 2 else pixels.shape[2]
+    write_raw_page(raw_path_for(png), pixels.shape[1], pixels.shape[0], channels, pixels.tobytes())
+    return png
+
+
+def test_view_is_read_only():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        pixels = _page(3)
+        png = _write(tmp_dir, pixels)
+        with open_raw_page(png) as raw:
+            with raw.view() as arr:
+                assert arr.shape == raw.shape == pixels.shape
+                assert not arr.flags.writeable
+                assert np.array_equal(arr, pixels)
+            copy = raw.array()
+        assert np.array_equal(copy, pixels)
+
+
+def test_crop_matches_png():
+    for channels in (1, 3):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            png = _write(tmp_dir, _page(channels))
+            with Image.open(png) as img, open_raw_page(png) as raw:
+                for box in BOXES:
+                    expected = img.crop(box)
+                    got = raw.crop(box)
+                    assert got.mode == expected.mode and got.size == expected.size, box
+                    assert got.tobytes() == expected.tobytes(), (channels, box)
+
+
+def test_open_page_for_crops():
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        png = _write(tmp_dir, _page(3))
+        with open_page_for_crops(png) as page:
+            assert isinstance(page, RawPage) and page.size == (40, 30)
+        raw_path_for(png).unlink()
+        with open_page_for_crops(png) as page:
+            assert isinstance(page, Image.Image) and page.size == (40, 30)
+
+
+def main() -> int:
+    test_view_is_read_only()
+    test_crop_matches_png()
+    test_open_page_for_crops()
+    print("test_page_store: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
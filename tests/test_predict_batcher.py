@@ -0,0 +1,261 @@
+"""
+Test cross-page predict batching over shared inference slots.
+
+Pages of different tasks that draw from the same page scheduler are batched
+into one predict call on a single grant, and every page is charged to its
+own task; batch members are picked in the scheduler's grant order, so an
+interactive page never waits behind a whole bulk backlog; pages on unrelated
+semaphores never share a batch; the OCR process pool is never batched. With
+more than one inference slot, one batch runs per slot at the same time, and
+closing a pipeline's batcher drops it from the registry.
+
+Run with: python tests/test_predict_batcher.py
+"""
+
+import io
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.models.ocr_process_pool import OcrProcessPool
+from backend.src.services.models.page_scheduler import LANE_INTERACTIVE, PageScheduler
+from backend.src.services import predict_batcher
+from backend.src.services.predict_batcher import PredictBatcher, close_predict_batchers, get_predict_batcher
+
+
+class _Pipeline:
+    """Records the inputs of every predict call."""
+
+    def __init__(self):
+        self.calls = []
+
+    def predict(self, input):
+        self.calls.append(list(input) if isinstance(input, list) else [input])
+        if isinstance(input, list):
+            return [f"r:{x}" for x in input]
+        return [f"r:{input}"]
+
+
+class _GatedPipeline(_Pipeline):
+    """Holds the first predict call until the test opens the gate."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def predict(self, input):
+        if not self.calls:
+            self.calls.append(list(input))
+            self.gate.wait(5.0)
+            return [f"r:{x}" for x in input]
+        return super().predict(input)
+
+
+class _BlockingPipeline(_Pipeline):
+    """Holds every predict call until the test opens the gate."""
+
+    def __init__(self):
+        super().__init__()
+        self.gate = threading.Event()
+
+    def predict(self, input):
+        self.calls.append(list(input) if isinstance(input, list) else [input])
+        self.gate.wait(5.0)
+        return [f"r:{x}" for x in input] if isinstance(input, list) else [f"r:{input}"]
+
+
+@contextmanager
+def _env(**values):
+    saved = {name: os.environ.get(name) for name in values}
+    os.environ.update(values)
+    try:
+        yield
+    finally:
+        for name, value in saved.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _wait(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def _submit(batcher, jobs):
+    """Run (input, sem) jobs in threads; return input -> result."""
+    results = {}
+
+    def worker(input, sem):
+        results[input] = batcher.predict(input, sem, page=input)
+
+    threads = [threading.Thread(target=worker, args=job, daemon=True) for job in jobs]
+    for t in threads:
+        t.start()
+    return threads, results
+
+
+def test_tasks_share_scheduler_batch():
+    pipeline = _Pipeline()
+    batcher = PredictBatcher(pipeline, max_batch=4, window_ms=2000)
+    scheduler = PageScheduler(slots=1)
+    a, b = scheduler.slot("a"), scheduler.slot("b")
+    try:
+        threads, results = _submit(batcher, [("a1", a), ("b1", b), ("a2", a), ("b2", b)])
+        for t in threads:
+            t.join(5.0)
+        assert pipeline.calls == [["a1", "b1", "a2", "b2"]], pipeline.calls
+        assert results["b2"] == ["r:b2"]
+
+        stats = scheduler.stats()
+        served = {t["task_id"]: t["served"] for t in stats["tasks"]}
+        # One grant ran the batch, but each task is charged for its own pages
+        assert served == {"a": 2, "b": 2}, served
+        assert stats["granted_total"] == 1 and stats["free"] == 1
+    finally:
+        batcher.close()
+
+
+def test_separate_semaphores_do_not_mix():
+    pipeline = _Pipeline()
+    batcher = PredictBatcher(pipeline, max_batch=4, window_ms=50)
+    sem_a, sem_b = threading.Semaphore(1), threading.Semaphore(1)
+    try:
+        threads, results = _submit(batcher, [("a1", sem_a), ("b1", sem_b), ("a2", sem_a)])
+        for t in threads:
+            t.join(5.0)
+        assert len(results) == 3
+        for call in pipeline.calls:
+            assert len({x[0] for x in call}) == 1, pipeline.calls
+    finally:
+        batcher.close()
+
+
+def test_interactive_page_skips_bulk_backlog():
+    pipeline = _GatedPipeline()
+    batcher = PredictBatcher(pipeline, max_batch=2, window_ms=50)
+    scheduler = PageScheduler(slots=1)
+    bulk, ui = scheduler.slot("bulk"), scheduler.slot("ui", lane=LANE_INTERACTIVE)
+    try:
+        threads, _ = _submit(batcher, [("b0", bulk), ("b1", bulk)])
+        _wait(lambda: pipeline.calls)
+        # Bulk backlog queues behind the running batch, then one interactive page
+        for i in range(2, 8):
+            more, _ = _submit(batcher, [(f"b{i}", bulk)])
+            threads += more
+        _wait(lambda: batcher.stats()["queued"] == 6)
+        more, _ = _submit(batcher, [("UI", ui)])
+        threads += more
+        _wait(lambda: batcher.stats()["queued"] == 7)
+        pipeline.gate.set()
+        for t in threads:
+            t.join(5.0)
+        assert pipeline.calls[0] == ["b0", "b1"], pipeline.calls
+        # The next batch is headed by the interactive page, bulk pages keep their order
+        assert pipeline.calls[1] == ["UI", "b2"], pipeline.calls
+        assert [x for call in pipeline.calls[2:] for x in call] == [f"b{i}" for i in range(3, 8)]
+    finally:
+        batcher.close()
+
+
+def test_batch_follows_weighted_order():
+    pipeline = _GatedPipeline()
+    batcher = PredictBatcher(pipeline, max_batch=4, window_ms=50)
+    scheduler = PageScheduler(slots=1)
+    a, b = scheduler.slot("a"), scheduler.slot("b")
+    try:
+        threads, _ = _submit(batcher, [("a0", a)])
+        _wait(lambda: pipeline.calls)
+        for job in [("a1", a), ("a2", a), ("a3", a), ("a4", a), ("b0", b), ("b1", b)]:
+            more, _ = _submit(batcher, [job])
+            threads += more
+            _wait(lambda: batcher.stats()["queued"] == len(threads) - 1)
+        pipeline.gate.set()
+        for t in threads:
+            t.join(5.0)
+        # b joins at a's virtual time and wins the tie, then the two tasks alternate
+        assert pipeline.calls[1] == ["b0", "a1", "b1", "a2"], pipeline.calls
+        assert pipeline.calls[2] == ["a3", "a4"], pipeline.calls
+    finally:
+        batcher.close()
+
+
+def test_process_pool_is_not_batched():
+    with _env(EXAMPAPER_PREDICT_BATCH_SIZE="4"):
+        # A list predict on the pool runs page by page on one worker
+        assert get_predict_batcher(OcrProcessPool(2)) is None
+
+
+def test_one_batch_per_slot():
+    pipeline = _BlockingPipeline()
+    batcher = PredictBatcher(pipeline, max_batch=2, window_ms=2000, dispatchers=2)
+    scheduler = PageScheduler(slots=2)
+    a, b = scheduler.slot("a"), scheduler.slot("b")
+    try:
+        threads, results = _submit(batcher, [("a0", a), ("a1", a)])
+        _wait(lambda: len(pipeline.calls) == 1)
+        more, _ = _submit(batcher, [("b0", b), ("b1", b)])
+        threads += more
+        # The second batch runs on the second slot while the first is still in predict
+        _wait(lambda: len(pipeline.calls) == 2)
+        assert batcher.stats()["in_flight"] == 2 and scheduler.stats()["free"] == 0
+        pipeline.gate.set()
+        for t in threads:
+            t.join(5.0)
+        assert sorted(map(sorted, pipeline.calls)) == [["a0", "a1"], ["b0", "b1"]], pipeline.calls
+        assert results["a1"] == ["r:a1"]
+        # Pages are released before their dispatcher books the batch
+        _wait(lambda: batcher.stats()["in_flight"] == 0)
+        stats = batcher.stats()
+        assert stats["dispatchers"] == 2 and stats["batches"] == 2
+    finally:
+        batcher.close()
+
+
+def test_close_drops_registry_entry():
+    pipeline, other = _Pipeline(), _Pipeline()
+    with _env(EXAMPAPER_PREDICT_BATCH_SIZE="4", EXAMPAPER_GPU_CONCURRENCY="3"):
+        batcher = get_predict_batcher(pipeline)
+        kept = get_predict_batcher(other)
+        assert get_predict_batcher(pipeline) is batcher
+        assert batcher.stats()["dispatchers"] == 3
+        try:
+            assert batcher.predict("x", threading.Semaphore(1), page="x") == ["r:x"]
+            close_predict_batchers(pipeline, None)
+            assert id(pipeline) not in predict_batcher._batchers
+            assert not any(t.is_alive() for t in batcher._threads)
+            # A new batcher for the pipeline is created on demand; others are untouched
+            assert get_predict_batcher(other) is kept
+            assert get_predict_batcher(pipeline) is not batcher
+        finally:
+            close_predict_batchers(pipeline, other)
+
+
+def main() -> int:
+    test_tasks_share_scheduler_batch()
+    test_separate_semaphores_do_not_mix()
+    test_interactive_page_skips_bulk_backlog()
+    test_batch_follows_weighted_order()
+    test_process_pool_is_not_batched()
+    test_one_batch_per_slot()
+    test_close_drops_registry_entry()
+    print("test_predict_batcher: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,121 @@
+"""
+Test the shared predict watchdog thread.
+
+A slow predict is warned about exactly once after warn_after_s; finishing a
+predict (done) cancels its pending deadlines; hang stack dumps repeat every
+hang_dump_s while the predict is still running; inflight() lists running
+predicts longest first.
+
+Each test uses its own PredictWatchdog with sub-second deadlines.
+
+Run with: python tests/test_predict_watchdog.py
+"""
+
+import io
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.predict_watchdog import PredictWatchdog
+
+
+def _wait(cond, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not cond():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+def test_warns_once_after_deadline():
+    watchdog = PredictWatchdog()
+    warnings = []
+    with watchdog.watching("page_1", warn_after_s=0.05, on_warn=warnings.append):
+        _wait(lambda: warnings)
+        time.sleep(0.2)
+        assert len(warnings) == 1 and warnings[0] >= 0.05, warnings
+        (entry,) = watchdog.inflight()
+        assert entry["page"] == "page_1" and entry["warned"] is True
+    assert watchdog.stats()["warnings"] == 1
+    assert watchdog.inflight() == []
+
+
+def test_done_cancels_pending_deadlines():
+    watchdog = PredictWatchdog()
+    warned = []
+    token = watchdog.watch("fast", warn_after_s=0.1, on_warn=lambda s: warned.append("fast"))
+    watchdog.done(token)
+    assert watchdog.stats()["pending_deadlines"] == 0
+
+    # With another predict still running, the finished one's deadline stays
+    # queued but is dropped when it comes due
+    slow = watchdog.watch("slow", warn_after_s=0.3, on_warn=lambda s: warned.append("slow"))
+    token = watchdog.watch("fast", warn_after_s=0.05, on_warn=lambda s: warned.append("fast"))
+    watchdog.done(token)
+    time.sleep(0.15)
+    assert warned == []
+    _wait(lambda: warned)
+    assert warned == ["slow"]
+    watchdog.done(slow)
+    assert watchdog.stats()["warnings"] == 1
+
+
+def test_hang_dumps_repeat():
+    watchdog = PredictWatchdog()
+    # Leave the process-wide crash handler alone: dumps go to the swapped stderr only
+    watchdog._faulthandler_enabled = True
+    saved = sys.stderr
+    with tempfile.TemporaryFile("w+", encoding="utf-8") as out:
+        sys.stderr = out
+        try:
+            with watchdog.watching("page_7", hang_dump_s=0.05):
+                _wait(lambda: watchdog.stats()["stack_dumps"] >= 3)
+                assert watchdog.inflight()[0]["stack_dumps"] >= 3
+            dumps = watchdog.stats()["stack_dumps"]
+            time.sleep(0.15)
+            # No more dumps once the predict is done
+            assert watchdog.stats()["stack_dumps"] == dumps
+        finally:
+            sys.stderr = saved
+        out.seek(0)
+        text = out.read()
+    assert text.count("[predict-watchdog] page_7") >= 3, text[:500]
+    assert "test_hang_dumps_repeat" in text
+
+
+def test_inflight_longest_first():
+    watchdog = PredictWatchdog()
+    old = watchdog.watch("old")
+    time.sleep(0.05)
+    new = watchdog.watch("new")
+    items = watchdog.inflight()
+    assert [item["page"] for item in items] == ["old", "new"]
+    assert items[0]["elapsed_s"] >= items[1]["elapsed_s"]
+    assert not items[0]["warned"] and items[0]["stack_dumps"] == 0
+    watchdog.done(new)
+    watchdog.done(old)
+    stats = watchdog.stats()
+    assert stats["inflight"] == 0 and stats["watched"] == 2
+    # No deadline was ever set, so no thread was started
+    assert stats["thread_alive"] is False
+
+
+def main() -> int:
+    test_warns_once_after_deadline()
+    test_done_cancels_pending_deadlines()
+    test_hang_dumps_repeat()
+    test_inflight_longest_first()
+    print("test_predict_watchdog: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
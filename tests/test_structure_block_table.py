@@ -0,0 +1,83 @@
+"""
+Test that the column-table structure builder (EXAMPAPER_BLOCK_TABLE=1) gives the
+same structure doc as the block-by-block walk on the bundled exams.
+
+Besides each full exam, page subsets are compared too (the data analysis part
+alone, a missing page in the middle, the exam cut off early) so the noise,
+exam-end and material-region paths are exercised from different starting states.
+
+Run with: python tests/test_structure_block_table.py
+"""
+
+import io
+import sys
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.common import page_index
+from backend.src.services.pipeline.impl.block_table import BlockTable
+from backend.src.services.pipeline.impl.ocr_cache import load_all_ocr_caches
+from backend.src.services.pipeline.impl.structure_detection import (
+    _build_structure_doc_blocks,
+    build_structure_doc_from_table,
+)
+
+EXAMS_DIR = PROJECT_ROOT / "pdf_images"
+
+
+def _bundled_exams():
+    """(exam name, {page_name: ocr cache}) for every bundled exam with OCR caches."""
+    for exam_dir in sorted(d for d in EXAMS_DIR.iterdir() if (d / "ocr").is_dir()):
+        caches = load_all_ocr_caches(exam_dir)
+        if caches:
+            yield exam_dir.name, caches
+
+
+def _page_subsets(caches):
+    names = sorted(caches, key=page_index)
+    half = len(names) // 2
+    yield "all", names
+    yield "second half", names[half:]
+    yield "first half", names[:half]
+    yield "page missing", names[:half] + names[half + 1 :]
+    yield "reversed dict order", names[::-1]
+
+
+def _assert_same(label, caches):
+    expected = _build_structure_doc_blocks(caches).to_dict()
+    actual = build_structure_doc_from_table(BlockTable.from_ocr_caches(caches)).to_dict()
+    assert actual == expected, f"structure doc differs: {label}"
+    return expected
+
+
+def test_table_walk_matches_block_walk():
+    checked = 0
+    for exam, caches in _bundled_exams():
+        for subset, names in _page_subsets(caches):
+            doc = _assert_same(f"{exam} ({subset})", {n: caches[n] for n in names})
+            if subset == "all":
+                assert doc["questions"], f"no questions detected in {exam}"
+            checked += 1
+    assert checked > 0, "no bundled exams found"
+
+
+def test_empty_input():
+    _assert_same("empty", {})
+
+
+def main() -> int:
+    test_table_walk_matches_block_walk()
+    test_empty_input()
+    print("test_structure_block_table: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
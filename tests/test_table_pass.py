@@ -0,0 +1,116 @@
+"""
+Test conditional table recognition.
+
+The light variant runs on every page; only pages whose light layout has a
+table region are re-run on the full variant, results stay in input order,
+and the full variant is never loaded for pages without tables.
+
+Run with: python tests/test_table_pass.py
+"""
+
+import io
+import sys
+from pathlib import Path
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+from backend.src.services.models.table_pass import ConditionalTablePipeline, needs_table_pass
+
+
+def _doc(*labels, content="", source=""):
+    blocks = [
+        {"index": i, "label": label, "bbox": [0, i * 100, 800, i * 100 + 80], "content": content}
+        for i, label in enumerate(labels)
+    ]
+    return {"parsing_res_list": blocks, "source": source}
+
+
+class _Variant:
+    """Fake PP-StructureV3 variant: page inputs named "table*" get a table region."""
+
+    def __init__(self, name):
+        self.name = name
+        self.calls = []
+
+    def predict(self, input):
+        self.calls.append(input)
+        inputs = input if isinstance(input, list) else [input]
+        return [
+            _doc("text", "table" if x.startswith("table") else "text", source=f"{self.name}:{x}")
+            for x in inputs
+        ]
+
+
+def _pipeline():
+    light, full = _Variant("light"), _Variant("full")
+    loads = []
+
+    def factory():
+        loads.append(1)
+        return full
+
+    return ConditionalTablePipeline(light, factory), light, full, loads
+
+
+def test_needs_table_pass():
+    assert needs_table_pass(_doc("text", "table")) == "table"
+    assert needs_table_pass(_doc("text", "image")) is None
+    assert needs_table_pass({"parsing_res_list": []}) is None
+    # Opening the data-analysis section is not a reason on its own
+    assert needs_table_pass(_doc("paragraph_title", content="第五部分 资料分析")) is None
+
+
+def test_mixed_batch_keeps_input_order():
+    pipeline, light, full, loads = _pipeline()
+    inputs = ["p0", "table1", "p2", "table3"]
+    results = pipeline.predict(inputs)
+    assert [r["source"] for r in results] == ["light:p0", "full:table1", "light:p2", "full:table3"]
+    # One light call for the batch, one full call for just the table pages
+    assert light.calls == [inputs]
+    assert full.calls == [["table1", "table3"]]
+    assert loads == [1]
+
+    stats = pipeline.stats()
+    assert stats["light_pages"] == 4 and stats["full_pages"] == 2
+    assert stats["full_reasons"] == {"table": 2}
+
+
+def test_single_table_page_reruns_single_input():
+    pipeline, light, full, _ = _pipeline()
+    results = pipeline.predict(["p0", "table1"])
+    assert [r["source"] for r in results] == ["light:p0", "full:table1"]
+    assert full.calls == ["table1"]
+
+    results = pipeline.predict("table2")
+    assert [r["source"] for r in results] == ["full:table2"]
+
+
+def test_pages_without_tables_stay_light():
+    pipeline, light, full, loads = _pipeline()
+    results = pipeline.predict(["p0", "p1"])
+    results += pipeline.predict("p2")
+    assert [r["source"] for r in results] == ["light:p0", "light:p1", "light:p2"]
+    assert full.calls == []
+    # The full variant is never even loaded
+    assert loads == []
+    assert pipeline.stats()["full_loaded"] is False
+    assert pipeline.stats()["full_pages"] == 0
+
+
+def main() -> int:
+    test_needs_table_pass()
+    test_mixed_batch_keeps_input_order()
+    test_single_table_page_reruns_single_input()
+    test_pages_without_tables_stay_light()
+    print("test_table_pass: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,192 @@
+"""
+Test the text-layer fast path on small documents built with PyMuPDF.
+
+Pins the bbox mapping (page rotation and an offset CropBox, checked against
+the ink of get_pixmap at the same DPI), the reliability checks that send a
+page back to OCR (too few characters, garbled encoding, image cover, vector
+graphics) and the column-by-column reading order on two-column pages.
+
+Run with: python tests/test_text_layer.py
+"""
+
+import io
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Fix Windows console encoding
+if sys.platform == "win32":
+    sys.stdout = io.TextIOWrapper(sys.stdout.buffer, encoding="utf-8")
+    sys.stderr = io.TextIOWrapper(sys.stderr.buffer, encoding="utf-8")
+
+PROJECT_ROOT = Path(__file__).parent.parent
+sys.path.insert(0, str(PROJECT_ROOT))
+
+import fitz
+
+from backend.src.services.pipeline.impl.text_layer import extract_text_layer_blocks
+
+DPI = 144
+QUESTION = "Question 1: which of the following numbers is the largest?"
+FILLER = "alpha beta gamma delta epsilon zeta eta theta iota kappa "
+
+
+def _page(*texts):
+    """New A4 page with (point, text) lines."""
+    doc = fitz.open()
+    page = doc.new_page()
+    for point, text in texts:
+        page.insert_text(point, text, fontsize=11)
+    return doc, page
+
+
+def _ink_box(page, dpi):
+    """Bounding box of the dark pixels of the rendered page."""
+    pix = page.get_pixmap(dpi=dpi)
+    arr = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, pix.n)
+    ys, xs = np.nonzero(arr[:, :, :3].min(axis=2) < 128)
+    return [int(xs.min()), int(ys.min()), int(xs.max()) + 1, int(ys.max()) + 1]
+
+
+def _assert_covers(bbox, ink, label):
+    """The text bbox holds the glyph ink, with at most a line's worth of slack."""
+    for i in (0, 1):
+        assert bbox[i] <= ink[i] + 2 and ink[i] - bbox[i] <= 12, f"{label}: {bbox} vs ink {ink}"
+    for i in (2, 3):
+        assert bbox[i] >= ink[i] - 2 and bbox[i] - ink[i] <= 12, f"{label}: {bbox} vs ink {ink}"
+
+
+def test_bbox_matches_rendered_page():
+    for rotation in (0, 90, 180, 270):
+        for cropbox in (None, fitz.Rect(50, 100, 545, 742)):
+            label = f"rotation={rotation} cropbox={cropbox}"
+            doc, page = _page(((120, 300), QUESTION))
+            if cropbox is not None:
+                page.set_cropbox(cropbox)
+            page.set_rotation(rotation)
+            blocks, reason = extract_text_layer_blocks(page, dpi=DPI)
+            assert reason == "ok", label
+            assert len(blocks) == 1 and blocks[0]["content"] == QUESTION, label
+            assert blocks[0]["label"] == "text"
+            _assert_covers(blocks[0]["bbox"], _ink_box(page, DPI), label)
+            doc.close()
+
+
+def test_bbox_scales_with_dpi():
+    doc, page = _page(((120, 300), QUESTION))
+    at_72, _ = extract_text_layer_blocks(page, dpi=72)
+    at_300, _ = extract_text_layer_blocks(page, dpi=300)
+    for a, b in zip(at_72[0]["bbox"], at_300[0]["bbox"]):
+        # The 72 DPI box is rounded to whole pixels
+        assert abs(a * 300 / 72 - b) <= 3
+    doc.close()
+
+
+def test_too_few_chars():
+    doc, page = _page(((72, 100), "Page 3"))
+    assert extract_text_layer_blocks(page) == (None, "too_few_chars")
+    doc.close()
+
+
+class _Garbled:
+    """Page whose text layer decodes to private-use characters (font without ToUnicode)."""
+
+    def __init__(self, page):
+        self._page = page
+
+    def get_text(self, *args, **kwargs):
+        data = self._page.get_text(*args, **kwargs)
+        for blk in data["blocks"]:
+            for line in blk.get("lines", []):
+                for span in line["spans"]:
+                    span["text"] = "".join(chr(0xE000 + ord(ch) % 64) if ch.isalpha() else ch for ch in span["text"])
+        return data
+
+    def __getattr__(self, name):
+        return getattr(self._page, name)
+
+
+def test_bad_encoding():
+    doc, page = _page(((72, 100), QUESTION))
+    assert extract_text_layer_blocks(_Garbled(page)) == (None, "bad_encoding")
+    doc.close()
+
+
+def test_image_cover():
+    doc, page = _page(((72, 100), QUESTION))
+    pix = fitz.Pixmap(fitz.csRGB, fitz.IRect(0, 0, 8, 8), 0)
+    pix.clear_with(200)
+    page.insert_image(fitz.Rect(0, 150, 595, 842), pixmap=pix)
+    assert extract_text_layer_blocks(page) == (None, "image_cover")
+    doc.close()
+
+    # A small figure keeps the fast path and comes out as an image block
+    doc, page = _page(((72, 100), QUESTION))
+    page.insert_image(fitz.Rect(72, 200, 272, 300), pixmap=pix)
+    blocks, reason = extract_text_layer_blocks(page, dpi=72)
+    assert reason == "ok"
+    assert [b["label"] for b in blocks] == ["text", "image"]
+    assert blocks[1]["bbox"] == [72, 200, 272, 300]
+    doc.close()
+
+
+def test_vector_graphics():
+    doc, page = _page(((72, 100), QUESTION))
+    for i in range(50):
+        page.draw_line((72, 200 + i * 10), (500, 200 + i * 10))
+    assert extract_text_layer_blocks(page) == (None, "vector_graphics")
+    doc.close()
+
+
+def _first_words(blocks):
+    return [b["content"].split(" ")[0] for b in blocks]
+
+
+def test_two_columns_read_column_by_column():
+    doc = fitz.open()
+    page = doc.new_page()
+    page.insert_textbox(fitz.Rect(40, 30, 555, 50), "Title " + FILLER, fontsize=9)
+    for i in range(6):
+        top = 60 + i * 120
+        page.insert_textbox(fitz.Rect(40, top, 280, top + 110), f"L{i} " + FILLER * 3, fontsize=9)
+        page.insert_textbox(fitz.Rect(315, top, 555, top + 110), f"R{i} " + FILLER * 3, fontsize=9)
+    blocks, reason = extract_text_layer_blocks(page)
+    assert reason == "ok"
+    # The spanning title first, then the whole left column, then the right one
+    expected = ["Title"] + [f"L{i}" for i in range(6)] + [f"R{i}" for i in range(6)]
+    assert _first_words(blocks) == expected, _first_words(blocks)
+    assert [b["index"] for b in blocks] == list(range(len(blocks)))
+    doc.close()
+
+
+def test_single_column_reads_top_down():
+    doc = fitz.open()
+    page = doc.new_page()
+    for i in range(6):
+        top = 60 + i * 120
+        page.insert_textbox(fitz.Rect(40, top, 555, top + 60), f"Q{i} " + FILLER * 2, fontsize=9)
+        # Short blocks on one side of the middle do not make the page two-column
+        page.insert_textbox(fitz.Rect(315, top + 70, 475, top + 90), f"B{i} option", fontsize=9)
+    blocks, reason = extract_text_layer_blocks(page)
+    assert reason == "ok"
+    expected = [word for i in range(6) for word in (f"Q{i}", f"B{i}")]
+    assert _first_words(blocks) == expected, _first_words(blocks)
+    doc.close()
+
+
+def main() -> int:
+    test_bbox_matches_rendered_page()
+    test_bbox_scales_with_dpi()
+    test_too_few_chars()
+    test_bad_encoding()
+    test_image_cover()
+    test_vector_graphics()
+    test_two_columns_read_column_by_column()
+    test_single_column_reads_top_down()
+    print("test_text_layer: OK")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())